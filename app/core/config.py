@@ -41,13 +41,129 @@ class Settings(BaseSettings):
     # APIs
     GROQ_API_KEY: str = ""
     OPENAI_API_KEY: str = ""
+    OPENAI_BASE_URL: str = ""  # Empty for the public API; e.g. the local stub server (benchmarks/stub_provider_server.py)
+    GROQ_BASE_URL: str = ""  # Empty for the public API
     GOOGLE_SEARCH_API: str = ""
     CSE_ID: str = ""
     GOOGLE_SHEETS_SCRIPT_URL: str = ""
     
+    # Outbound HTTP client (shared keep-alive pool for Auth0, feedback and image fetches)
+    HTTP_CLIENT_TIMEOUT_SECONDS: float = 10.0  # Default per-request timeout; callers may set their own
+    HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 100  # Open connections across all hosts, per worker
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS: int = 20  # Idle connections kept for reuse
+    HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_CLIENT_HTTP2: bool = False  # Needs the h2 package (pip install httpx[http2])
+    
     # OpenAI Vision Configuration
     ENABLE_VISION_FALLBACK: bool = True  # Use OpenAI Vision for image verification
     
+    # AI call limits (per worker)
+    AI_REQUEST_TIMEOUT_SECONDS: float = 20.0  # Per-call timeout for provider completions
+    AI_MAX_CONCURRENT_CALLS: int = 8  # Max provider calls in flight at once
+    
+    # AI provider routing (latency-aware, with failover)
+    AI_PROVIDERS: str = "openai,groq"  # Preference order; providers without an API key are skipped
+    AI_ROUTER_WINDOW_SIZE: int = 100  # Recent calls per provider used for latency/error stats
+    AI_ROUTER_MAX_ERROR_RATE: float = 0.5  # Above this a provider is tried last
+    AI_ROUTER_COOLDOWN_SECONDS: float = 30.0  # How long an erroring provider stays demoted
+    AI_ROUTER_HEDGE_ENABLED: bool = False  # Send a second request once the first exceeds observed p95
+    AI_ROUTER_HEDGE_MIN_SAMPLES: int = 20  # Successful calls needed before p95 is trusted
+    
+    # Model tiering (small model first, large model only for invalid or incomplete answers)
+    EXTRACTION_MODEL_TIERING_ENABLED: bool = False  # Opt-in; escalations cost an extra call
+    
+    # LLM micro-batching (concurrent extraction prompts share one completion)
+    EXTRACTION_MICRO_BATCH_ENABLED: bool = False  # Opt-in; adds up to MAX_WAIT_MS of latency
+    EXTRACTION_MICRO_BATCH_MAX_SIZE: int = 8
+    EXTRACTION_MICRO_BATCH_MAX_WAIT_MS: float = 15.0
+    
+    # Extraction result cache (in-process LRU + MongoDB TTL collection)
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 2048  # In-process LRU size
+    EXTRACTION_CACHE_TTL_SECONDS: int = 604800  # 7 days
+    
+    # Shared product cache (keyed by canonical page URL, shared across users)
+    PRODUCT_CACHE_ENABLED: bool = True
+    PRODUCT_CACHE_FRESHNESS_SECONDS: int = 86400  # Prices change; reuse entries for 1 day
+    PRODUCT_CACHE_MIN_AGREEING_USERS: int = 2  # Results come from client-sent pages; share only once this many users agree
+    
+    # innerText reducer (keeps the most product-like text within a token budget)
+    EXTRACTION_REDUCER_ENABLED: bool = True
+    EXTRACTION_INPUT_TOKEN_BUDGET: int = 1500  # Estimated prompt tokens of innerText sent to the LLM
+    EXTRACTION_REDUCER_WINDOW_LINES: int = 8
+    
+    # Rule-based fast path (skips the LLM when confident)
+    EXTRACTION_FAST_PATH_ENABLED: bool = True
+    EXTRACTION_FAST_PATH_MIN_CONFIDENCE: float = 0.8  # 0.0-1.0, min of name and price confidence
+    
+    # Batch extraction
+    EXTRACTION_BATCH_MAX_ITEMS: int = 25
+    EXTRACTION_BATCH_CONCURRENCY: int = 4  # Items extracted at once per batch request
+    EXTRACTION_BATCH_ITEM_RATE_LIMIT: str = "60/minute"  # Items (not requests) per client
+    
+    # Image candidate pre-ranking (collapses CDN variants, drops icons/pixels before the LLM)
+    IMAGE_PRERANK_ENABLED: bool = True
+    IMAGE_PRERANK_TOP_K: int = 8  # Candidates sent to the LLM when none dominates
+    IMAGE_PRERANK_MIN_SCORE: float = 0.6  # 0.0-1.0, lowest score that may skip the LLM
+    IMAGE_PRERANK_MARGIN: float = 0.25  # Lead over the runner-up needed to skip the LLM
+    
+    # Image verification (OpenAI Vision verdicts, cached per image URL + product name)
+    VERIFICATION_MAX_CONCURRENT_CALLS: int = 4  # Per worker, within AI_MAX_CONCURRENT_CALLS
+    VERIFICATION_TIMEOUT_SECONDS: float = 8.0  # Including time queued; slower checks answer "unknown"
+    VERIFICATION_BATCH_SIZE: int = 4  # Candidate images per vision request
+    VERIFICATION_BATCH_MAX_IMAGES: int = 12  # Per /verify-images request
+    
+    # Vision image pipeline (fetch and downscale locally, send low-detail base64)
+    IMAGE_PIPELINE_ENABLED: bool = True  # Falls back to sending the URL if the fetch fails
+    IMAGE_FETCH_MAX_BYTES: int = 10485760  # 10MB
+    IMAGE_FETCH_TIMEOUT_SECONDS: float = 5.0  # Whole download, not per read
+    IMAGE_FETCH_ALLOW_PRIVATE_HOSTS: bool = False  # Only for local testing; URLs come from clients
+    IMAGE_FETCH_MAX_REDIRECTS: int = 3  # Each hop is checked for a public address
+    IMAGE_MAX_EDGE: int = 512  # Longest edge after downscaling (low detail is 512px)
+    IMAGE_MAX_PIXELS: int = 40000000  # Refuse to decode larger images
+    IMAGE_JPEG_QUALITY: int = 85
+    IMAGE_PIPELINE_CACHE_ENTRIES: int = 256  # Processed images kept in memory
+    IMAGE_PIPELINE_URL_TTL_SECONDS: float = 600.0  # Reuse a URL's fetched image for this long
+    IMAGE_DECODE_WORKERS: int = 4  # Threads decoding images, per worker
+    
+    # Local image quality filter (drops pixels, placeholders, sprites and thumbnails without a model)
+    IMAGE_QUALITY_FILTER_ENABLED: bool = True  # Applies to images the vision pipeline fetches anyway
+    IMAGE_QUALITY_FETCH_CANDIDATES: bool = False  # Opt-in; fetches selection candidates to filter them before the LLM
+    IMAGE_QUALITY_MIN_EDGE: int = 100  # Pixels, shorter edge of the original image
+    IMAGE_QUALITY_MAX_ASPECT_RATIO: float = 4.0  # Longer edge / shorter edge
+    IMAGE_QUALITY_MAX_DOMINANT_SHARE: float = 0.97  # Share of pixels in one color
+    IMAGE_QUALITY_MIN_ENTROPY: float = 1.0  # Bits, grayscale histogram (0-8)
+    
+    # Perceptual-hash image index (near-identical images reuse vision answers)
+    IMAGE_HASH_INDEX_ENABLED: bool = True
+    IMAGE_HASH_MAX_DISTANCE: int = 3  # Differing bits (of 64) still treated as the same image; max 3
+    IMAGE_HASH_SELECTION_REUSE: bool = False  # Opt-in; fetches and hashes candidates before image selection
+    
+    # AI usage accounting (tokens, latency and estimated cost per call)
+    USAGE_TRACKING_ENABLED: bool = True
+    USAGE_FLUSH_INTERVAL_SECONDS: float = 30.0  # How often per-day rollups are written to MongoDB
+    USAGE_ADMIN_USER_IDS: str = ""  # Comma-separated; these users may query everyone's usage
+    USAGE_QUERY_MAX_DAYS: int = 90
+    
+    # Per-user token budgets (estimated prompt tokens, rolling windows, per worker)
+    QUOTA_ENABLED: bool = True  # Budgets only; QUOTA_MAX_REQUEST_TOKENS applies either way
+    QUOTA_TOKENS_PER_HOUR: int = 200000
+    QUOTA_TOKENS_PER_DAY: int = 1000000
+    QUOTA_MAX_REQUEST_TOKENS: int = 25000  # Estimated tokens of innerText/HTML accepted per page
+    QUOTA_OVERSIZE_ACTION: str = "trim"  # "trim" larger pages to the cap, or "reject" them (413)
+    
+    # Asynchronous extraction jobs (MongoDB-backed queue, worker pool per process)
+    EXTRACTION_JOBS_ENABLED: bool = True
+    EXTRACTION_JOB_WORKERS: int = 4  # Jobs run concurrently per process
+    EXTRACTION_JOB_POLL_INTERVAL_SECONDS: float = 1.0  # Idle workers check for jobs queued by other processes
+    EXTRACTION_JOB_LEASE_SECONDS: int = 120  # A running job not finished by then is picked up again
+    EXTRACTION_JOB_MAX_ATTEMPTS: int = 2
+    EXTRACTION_JOB_RESULT_TTL_SECONDS: int = 3600  # Finished jobs and their results are kept this long
+    EXTRACTION_JOB_MAX_WAIT_SECONDS: float = 30.0  # Longest ?wait= a poll may block for
+    EXTRACTION_JOB_STREAM_MAX_SECONDS: float = 300.0  # Longest a job event stream stays open
+    EXTRACTION_JOB_MAX_ACTIVE_PER_USER: int = 50  # Queued + running jobs per user
+    
     # Rate Limiting
     RATE_LIMIT_ENABLED: bool = True
     
@@ -69,6 +185,11 @@ class Settings(BaseSettings):
             return []
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",") if origin.strip()]
     
+    @property
+    def usage_admin_user_ids(self) -> List[str]:
+        """Convert comma-separated USAGE_ADMIN_USER_IDS to list."""
+        return [user_id.strip() for user_id in self.USAGE_ADMIN_USER_IDS.split(",") if user_id.strip()]
+    
     @property
     def is_production(self) -> bool:
         """Check if running in production environment."""
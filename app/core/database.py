@@ -23,3 +23,9 @@ feedback_collection = db["feedback"]
 failed_page_extraction_collection = db["failed_page_extractions"]
 failed_item_extraction_collection = db["failed_item_extractions"]
 
+# AI extraction support collections
+extraction_cache_collection = db["extraction_cache"]
+product_cache_collection = db["product_cache"]
+image_hashes_collection = db["image_hashes"]
+ai_usage_collection = db["ai_usage"]
+extraction_jobs_collection = db["extraction_jobs"]
@@ -11,6 +11,10 @@ from app.repositories.item_repository import ItemRepository
 from app.repositories.feedback_repository import FeedbackRepository
 from app.repositories.failed_page_extraction_repository import FailedPageExtractionRepository
 from app.repositories.failed_item_extraction_repository import FailedItemExtractionRepository
+from app.repositories.product_cache_repository import ProductCacheRepository
+from app.repositories.ai_usage_repository import AIUsageRepository
+from app.repositories.extraction_job_repository import ExtractionJobRepository
+from app.services.ai.usage import usage_user
 from typing import Optional
 
 security = HTTPBearer()
@@ -55,6 +59,8 @@ async def get_current_user(
         
         # Convert to User model
         user = User(**user_data)
+        # AI calls made while handling this request are billed to the user
+        usage_user.set(user.user_id)
         return user
     
     except JWTError as e:
@@ -113,12 +119,32 @@ def get_failed_item_extraction_repository() -> FailedItemExtractionRepository:
     return FailedItemExtractionRepository()
 
 
+def get_product_cache_repository() -> ProductCacheRepository:
+    """Get ProductCacheRepository instance."""
+    return ProductCacheRepository()
+
+
+def get_ai_usage_repository() -> AIUsageRepository:
+    """Get AIUsageRepository instance."""
+    return AIUsageRepository()
+
+
+def get_extraction_job_repository() -> ExtractionJobRepository:
+    """Get ExtractionJobRepository instance."""
+    return ExtractionJobRepository()
+
+
 # Service dependency injection functions
 from app.services.cart_service import CartService
 from app.services.item_service import ItemService
 from app.services.user_service import UserService
 from app.services.feedback_service import FeedbackService
 from app.services.failed_extraction_service import FailedExtractionService
+from app.services.extraction_service import ExtractionService
+from app.services.verification_service import VerificationService
+from app.services.usage_service import UsageService
+from app.services.extraction_job_service import ExtractionJobService
+from app.services.ai.extraction_cache import extraction_cache
 
 
 def get_cart_service(
@@ -160,3 +186,28 @@ def get_failed_extraction_service(
     """Get FailedExtractionService instance."""
     return FailedExtractionService(page_extraction_repo, item_extraction_repo)
 
+
+def get_extraction_service(
+    product_cache_repo: ProductCacheRepository = Depends(get_product_cache_repository)
+) -> ExtractionService:
+    """Get ExtractionService instance (backed by the process-wide extraction cache)."""
+    return ExtractionService(extraction_cache, product_cache_repo)
+
+
+def get_verification_service() -> VerificationService:
+    """Get VerificationService instance (verdicts share the process-wide extraction cache)."""
+    return VerificationService(extraction_cache)
+
+
+def get_usage_service(
+    usage_repo: AIUsageRepository = Depends(get_ai_usage_repository)
+) -> UsageService:
+    """Get UsageService instance."""
+    return UsageService(usage_repo)
+
+
+def get_extraction_job_service(
+    job_repo: ExtractionJobRepository = Depends(get_extraction_job_repository)
+) -> ExtractionJobService:
+    """Get ExtractionJobService instance (wakes the process-wide job worker pool)."""
+    return ExtractionJobService(job_repo)
@@ -0,0 +1,157 @@
+"""
+Application-scoped outbound HTTP client.
+
+Outbound requests (Auth0 JWKS, Google Sheets feedback, product image
+fetches) share one httpx client instead of opening a new one per call, so
+connections to each host are kept alive and reused across requests and the
+total number of open connections is capped. The client is created at
+startup and closed at shutdown (see main.py). Requests pinned to an address
+the caller resolved itself use an unpooled client instead (see
+`unpooled_client`).
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+import httpx
+from app.core.config import settings
+from app.utils.metrics import CounterSet
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClientManager:
+    """Owns the shared httpx.AsyncClient and its connection pool."""
+
+    def __init__(
+        self,
+        timeout: float,
+        connect_timeout: float,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        http2: bool = False,
+        verify: Any = True
+    ):
+        """
+        Initialize manager.
+
+        Args:
+            timeout: Default read/write/pool timeout in seconds (callers may override per request)
+            connect_timeout: Seconds allowed to open a connection
+            max_connections: Open connections allowed across all hosts
+            max_keepalive_connections: Idle connections kept for reuse
+            keepalive_expiry: Seconds an idle connection is kept
+            http2: Negotiate HTTP/2 where servers support it (needs the h2 package)
+            verify: TLS verification (True, a CA bundle path or an ssl.SSLContext)
+        """
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max(1, max_connections),
+            max_keepalive_connections=max(0, max_keepalive_connections),
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and self._http2_available()
+        self.verify = verify
+        self._client: Optional[httpx.AsyncClient] = None
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.counters = CounterSet()
+
+    @staticmethod
+    def _http2_available() -> bool:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP_CLIENT_HTTP2 is set but the h2 package isn't installed; using HTTP/1.1")
+            return False
+        return True
+
+    def _build(self) -> httpx.AsyncClient:
+        self._transport = httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2, verify=self.verify)
+        self.counters.incr("clients_created")
+        return self._wrap(self._transport)
+
+    def _wrap(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=self.timeout,
+            event_hooks={"request": [self._on_request], "response": [self._on_response]},
+        )
+
+    def unpooled_client(self) -> httpx.AsyncClient:
+        """
+        A client with its own connection that is never reused, for requests sent to a pinned address.
+
+        The shared pool picks connections by (scheme, address, port), so a
+        pinned request could reuse a TLS connection opened and verified for
+        another host name on the same address (shared CDN addresses are
+        common) and that host's certificate would never be checked. Close the
+        client after the response.
+        """
+        self.counters.incr("unpooled_clients")
+        limits = httpx.Limits(max_connections=1, max_keepalive_connections=0)
+        return self._wrap(httpx.AsyncHTTPTransport(limits=limits, http2=self.http2, verify=self.verify))
+
+    async def _on_request(self, request: httpx.Request) -> None:
+        self.counters.incr("requests")
+
+    async def _on_response(self, response: httpx.Response) -> None:
+        self.counters.incr(f"responses_{response.status_code // 100}xx")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        The shared client.
+
+        Created on first use if startup hasn't run (scripts, tests). Pooled
+        connections are bound to the loop that opened them, so a new client
+        is built whenever we are running on a different loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = self._build()
+            self._loop = loop
+        return self._client
+
+    async def start(self) -> None:
+        """Create the client for the running loop, so the first request doesn't pay for it."""
+        if not self.client.is_closed:
+            logger.info(f"Outbound HTTP client ready (http2={self.http2}, max_connections={self.limits.max_connections})")
+
+    async def close(self) -> None:
+        """Close the client and its pooled connections."""
+        client, self._client, self._transport = self._client, None, None
+        if client is not None and not client.is_closed:
+            try:
+                await client.aclose()
+            except RuntimeError:
+                # Its loop is gone (e.g. a client left over from another test loop)
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request counters and connection pool state."""
+        connections = []
+        pool = getattr(self._transport, "_pool", None) if self._client and not self._client.is_closed else None
+        if pool is not None:
+            connections = list(pool.connections)
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "connections": len(connections),
+            "idle_connections": sum(1 for connection in connections if connection.is_idle()),
+            **self.counters.snapshot(),
+        }
+
+    def reset(self) -> None:
+        self.counters.reset()
+
+
+http_client = HTTPClientManager(
+    timeout=settings.HTTP_CLIENT_TIMEOUT_SECONDS,
+    connect_timeout=settings.HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS,
+    max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS,
+    http2=settings.HTTP_CLIENT_HTTP2,
+)
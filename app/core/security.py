@@ -1,10 +1,10 @@
 """Security functions for Auth0 authentication and JWT token handling."""
-import httpx
 from typing import Dict, Any, Optional
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from app.core.config import settings
 from app.core.database import users_collection
+from app.core.http_client import http_client
 
 
 # Cache for Auth0 JWKS (JSON Web Key Set)
@@ -27,10 +27,9 @@ async def get_auth0_jwks() -> Dict:
     
     jwks_url = f"https://{settings.AUTH0_DOMAIN}/.well-known/jwks.json"
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(jwks_url)
-        response.raise_for_status()
-        jwks = response.json()
+    response = await http_client.client.get(jwks_url)
+    response.raise_for_status()
+    jwks = response.json()
     
     _jwks_cache = jwks
     _jwks_cache_time = datetime.utcnow()
@@ -0,0 +1,43 @@
+from pydantic import BaseModel
+from typing import Dict, Any, Optional
+from datetime import datetime
+
+
+class AIUsageRollup(BaseModel):
+    """Database representation of AI usage totals for one user, day, provider, model and operation."""
+    day: str  # UTC date, YYYY-MM-DD
+    user_id: Optional[str] = None  # None for calls made outside a user request
+    provider: str  # "openai", "groq" or "cache" for cache hits
+    model: str
+    operation: str  # e.g. "text", "text_batch", "image", "vision"
+    calls: int = 0  # Provider calls made (cache hits not included)
+    cache_hits: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0  # Estimated from list prices (see usage.MODEL_PRICES)
+    latency_ms_total: float = 0.0  # Sum over calls; divide by calls for the mean
+    updated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_mongo(cls, doc: Dict[str, Any]) -> "AIUsageRollup":
+        """
+        Convert MongoDB document to AIUsageRollup model.
+
+        Args:
+            doc: MongoDB document dictionary
+
+        Returns:
+            AIUsageRollup instance
+        """
+        return cls(**doc)
+
+    def to_mongo_dict(self) -> Dict[str, Any]:
+        """
+        Convert AIUsageRollup model to MongoDB document dict.
+
+        Returns:
+            Dictionary suitable for MongoDB storage
+        """
+        return self.model_dump(exclude_none=False)
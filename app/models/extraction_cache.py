@@ -0,0 +1,36 @@
+from pydantic import BaseModel
+from typing import Dict, Any
+from datetime import datetime
+
+
+class ExtractionCacheEntry(BaseModel):
+    """Database representation of a cached AI extraction result."""
+    cache_key: str  # sha256 of normalized input + model + prompt version
+    kind: str  # "text" or "image"
+    value: Any  # Parsed extraction result (dict for text, URL string for image)
+    model: str
+    prompt_version: str
+    created_at: str  # ISO datetime string
+    expires_at: datetime  # BSON date, drives the TTL index
+
+    @classmethod
+    def from_mongo(cls, doc: Dict[str, Any]) -> "ExtractionCacheEntry":
+        """
+        Convert MongoDB document to ExtractionCacheEntry model.
+
+        Args:
+            doc: MongoDB document dictionary
+
+        Returns:
+            ExtractionCacheEntry instance
+        """
+        return cls(**doc)
+
+    def to_mongo_dict(self) -> Dict[str, Any]:
+        """
+        Convert ExtractionCacheEntry model to MongoDB document dict.
+
+        Returns:
+            Dictionary suitable for MongoDB storage
+        """
+        return self.model_dump(exclude_none=False)
@@ -0,0 +1,46 @@
+from pydantic import BaseModel
+from typing import Dict, Any, Optional
+from datetime import datetime
+
+
+class ExtractionJob(BaseModel):
+    """Database representation of a queued /extract/extract or /extract/analyze-images request."""
+    job_id: str
+    user_id: str
+    kind: str  # "extract" or "analyze-images"
+    dedupe_key: str  # Same user, kind and payload -> same job
+    status: str  # "queued", "running", "succeeded" or "failed"
+    payload: Dict[str, Any]  # Request fields the job runs with
+    result: Optional[Any] = None  # Same body the synchronous endpoint returns
+    error: Optional[str] = None  # Last failure, kept while retries remain
+    attempts: int = 0
+    charged_tokens: int = 0  # Token budget charged at submission
+    charge_bucket: Optional[int] = None  # TokenQuota bucket of that charge, for refunds
+    worker_id: Optional[str] = None  # Worker holding the lease while running
+    lease_expires_at: Optional[datetime] = None  # A running job past this is retried by another worker
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None  # Set once finished; the TTL index removes the job after this
+
+    @classmethod
+    def from_mongo(cls, doc: Dict[str, Any]) -> "ExtractionJob":
+        """
+        Convert MongoDB document to ExtractionJob model.
+
+        Args:
+            doc: MongoDB document dictionary
+
+        Returns:
+            ExtractionJob instance
+        """
+        return cls(**doc)
+
+    def to_mongo_dict(self) -> Dict[str, Any]:
+        """
+        Convert ExtractionJob model to MongoDB document dict.
+
+        Returns:
+            Dictionary suitable for MongoDB storage
+        """
+        return self.model_dump(exclude_none=False)
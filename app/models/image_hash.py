@@ -0,0 +1,36 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List
+from datetime import datetime
+
+
+class ImageHashEntry(BaseModel):
+    """Database representation of a processed product image, keyed by perceptual hash."""
+    hash: str  # 64-bit dHash as 16 hex digits
+    bands: List[str]  # Near-match index keys (see perceptual_hash.hash_bands)
+    image_url: str  # First URL the image was seen at
+    verdicts: Dict[str, str] = Field(default_factory=dict)  # Product key -> vision verdict
+    best_for: List[str] = Field(default_factory=list)  # Product keys this image was chosen as best for
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_mongo(cls, doc: Dict[str, Any]) -> "ImageHashEntry":
+        """
+        Convert MongoDB document to ImageHashEntry model.
+
+        Args:
+            doc: MongoDB document dictionary
+
+        Returns:
+            ImageHashEntry instance
+        """
+        return cls(**doc)
+
+    def to_mongo_dict(self) -> Dict[str, Any]:
+        """
+        Convert ImageHashEntry model to MongoDB document dict.
+
+        Returns:
+            Dictionary suitable for MongoDB storage
+        """
+        return self.model_dump(exclude_none=False)
@@ -0,0 +1,48 @@
+from pydantic import BaseModel
+from typing import Dict, Any, Optional
+from datetime import datetime
+
+
+class ProductCacheVote(BaseModel):
+    """One user's extraction for a page, not yet shared with other users."""
+    product_name: Optional[str] = None
+    price: Optional[str] = None
+    image: Optional[str] = None
+    at: datetime  # When the user extracted it
+
+
+class ProductCacheEntry(BaseModel):
+    """Database representation of a shared (cross-user) product extraction."""
+    canonical_url: str  # Canonical product page URL (tracking params stripped, host lowercased)
+    domain: str  # e.g. "amazon.com"
+    product_name: Optional[str] = None
+    price: Optional[str] = None
+    image: Optional[str] = None  # Chosen main product image URL
+    details_updated_at: Optional[datetime] = None  # When name/price were last extracted
+    image_updated_at: Optional[datetime] = None  # When the image was last chosen
+    # Per-user results keyed by a hash of the user id; shared fields are only
+    # set once PRODUCT_CACHE_MIN_AGREEING_USERS users agree
+    detail_votes: Dict[str, ProductCacheVote] = {}
+    image_votes: Dict[str, ProductCacheVote] = {}
+
+    @classmethod
+    def from_mongo(cls, doc: Dict[str, Any]) -> "ProductCacheEntry":
+        """
+        Convert MongoDB document to ProductCacheEntry model.
+
+        Args:
+            doc: MongoDB document dictionary
+
+        Returns:
+            ProductCacheEntry instance
+        """
+        return cls(**doc)
+
+    def to_mongo_dict(self) -> Dict[str, Any]:
+        """
+        Convert ProductCacheEntry model to MongoDB document dict.
+
+        Returns:
+            Dictionary suitable for MongoDB storage
+        """
+        return self.model_dump(exclude_none=False)
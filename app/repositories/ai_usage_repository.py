@@ -0,0 +1,57 @@
+"""AI usage repository for database operations."""
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Union
+from app.repositories.base import BaseRepository
+from app.core.database import ai_usage_collection
+
+
+class AIUsageRepository(BaseRepository):
+    """Repository for rolled-up AI usage totals."""
+
+    def __init__(self):
+        super().__init__(ai_usage_collection)
+
+    async def increment(
+        self,
+        day: str,
+        user_id: Optional[str],
+        provider: str,
+        model: str,
+        operation: str,
+        counts: Dict[str, Union[int, float]],
+        now: datetime
+    ) -> None:
+        """
+        Add counts to the rollup document for a day, user, provider, model and operation.
+
+        Args:
+            day: UTC date, YYYY-MM-DD
+            user_id: User the usage belongs to (None outside a user request)
+            provider: Provider name
+            model: Model name
+            operation: Operation name
+            counts: Field -> amount to add (calls, prompt_tokens, cost_usd, ...)
+            now: Update time
+        """
+        await self.collection.update_one(
+            {"day": day, "user_id": user_id, "provider": provider, "model": model, "operation": operation},
+            {"$inc": counts, "$set": {"updated_at": now}},
+            upsert=True,
+        )
+
+    async def find_since(self, since_day: str, user_id: Optional[str] = None, limit: int = 10000) -> List[Dict[str, Any]]:
+        """
+        Find rollup documents from a day onwards.
+
+        Args:
+            since_day: First UTC date to include, YYYY-MM-DD
+            user_id: Only this user's usage, or everyone's if None
+            limit: Maximum number of documents
+
+        Returns:
+            List of rollup documents, oldest day first
+        """
+        query: Dict[str, Any] = {"day": {"$gte": since_day}}
+        if user_id is not None:
+            query["user_id"] = user_id
+        return await self.collection.find(query).sort("day", 1).limit(limit).to_list(length=limit)
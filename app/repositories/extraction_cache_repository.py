@@ -0,0 +1,43 @@
+"""Extraction cache repository for database operations."""
+from datetime import datetime
+from typing import Optional, Dict, Any
+from app.repositories.base import BaseRepository
+from app.core.database import extraction_cache_collection
+
+
+class ExtractionCacheRepository(BaseRepository):
+    """Repository for persisted AI extraction results."""
+
+    def __init__(self):
+        super().__init__(extraction_cache_collection)
+
+    async def find_fresh(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a cache entry that has not expired yet.
+
+        The TTL index removes expired documents lazily, so expiry is also
+        checked here.
+
+        Args:
+            cache_key: Content-addressed cache key
+
+        Returns:
+            Cache entry document or None if missing or expired
+        """
+        return await self.find_one({
+            "cache_key": cache_key,
+            "expires_at": {"$gt": datetime.utcnow()},
+        })
+
+    async def upsert(self, entry_data: Dict[str, Any]) -> None:
+        """
+        Insert or replace a cache entry.
+
+        Args:
+            entry_data: Cache entry document dictionary
+        """
+        await self.collection.update_one(
+            {"cache_key": entry_data["cache_key"]},
+            {"$set": entry_data},
+            upsert=True,
+        )
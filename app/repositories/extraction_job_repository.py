@@ -0,0 +1,217 @@
+"""Extraction job repository for database operations."""
+from datetime import datetime
+from typing import Dict, Any, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.repositories.base import BaseRepository
+from app.core.database import extraction_jobs_collection
+
+# Statuses a job can be in
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+
+class ExtractionJobRepository(BaseRepository):
+    """Repository for the asynchronous extraction job queue."""
+
+    def __init__(self):
+        super().__init__(extraction_jobs_collection)
+
+    async def create_if_absent(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Insert a job unless one with the same dedupe_key exists.
+
+        Args:
+            document: Full job document
+
+        Returns:
+            The stored job: the new one, or the existing job with the same dedupe_key
+        """
+        try:
+            await self.collection.update_one(
+                {"dedupe_key": document["dedupe_key"]},
+                {"$setOnInsert": document},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Lost a race with a concurrent submit of the same job
+            pass
+        return await self.collection.find_one({"dedupe_key": document["dedupe_key"]})
+
+    async def delete_stale(self, dedupe_key: str, now: datetime) -> None:
+        """
+        Remove a failed or expired job so the same submission can run again.
+
+        Args:
+            dedupe_key: Key of the submission
+            now: Current time
+        """
+        await self.collection.delete_many({"dedupe_key": dedupe_key, "status": STATUS_FAILED})
+        await self.collection.delete_many({"dedupe_key": dedupe_key, "expires_at": {"$lte": now}})
+
+    async def find_by_id(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a job by its ID.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            Job document or None if not found
+        """
+        return await self.collection.find_one({"job_id": job_id})
+
+    async def claim_next(
+        self,
+        worker_id: str,
+        now: datetime,
+        lease_until: datetime,
+        max_attempts: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest queued job, or a running job whose lease ran out.
+
+        Args:
+            worker_id: Worker taking the job
+            now: Current time
+            lease_until: When the job may be taken by another worker if still running
+            max_attempts: Jobs whose lease ran out are only taken again below this many attempts
+
+        Returns:
+            The claimed job document (after the update) or None if there is nothing to run
+        """
+        update = {
+            "$set": {
+                "status": STATUS_RUNNING,
+                "worker_id": worker_id,
+                "started_at": now,
+                "lease_expires_at": lease_until,
+            },
+            "$inc": {"attempts": 1},
+        }
+        for query in (
+            {"status": STATUS_QUEUED},
+            {"status": STATUS_RUNNING, "lease_expires_at": {"$lt": now}, "attempts": {"$lt": max_attempts}},
+        ):
+            job = await self.collection.find_one_and_update(
+                query,
+                update,
+                sort=[("created_at", 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if job:
+                return job
+        return None
+
+    async def complete(self, job_id: str, worker_id: str, result: Any, now: datetime, expires_at: datetime) -> bool:
+        """
+        Store a job's result.
+
+        Args:
+            job_id: Job identifier
+            worker_id: Worker that ran the job (the write is skipped if it lost the lease)
+            result: Response body for the job
+            now: Finish time
+            expires_at: When the result is removed
+
+        Returns:
+            True if the job was updated
+        """
+        matched = await self.update_one(
+            {"job_id": job_id, "worker_id": worker_id, "status": STATUS_RUNNING},
+            {"$set": {
+                "status": STATUS_SUCCEEDED,
+                "result": result,
+                "error": None,
+                "finished_at": now,
+                "lease_expires_at": None,
+                "expires_at": expires_at,
+            }},
+        )
+        return matched > 0
+
+    async def fail(self, job_id: str, worker_id: str, error: str, now: datetime, expires_at: datetime) -> bool:
+        """
+        Mark a job as failed for good.
+
+        Args:
+            job_id: Job identifier
+            worker_id: Worker that ran the job
+            error: Error message shown to the client
+            now: Finish time
+            expires_at: When the job is removed
+
+        Returns:
+            True if the job was updated
+        """
+        matched = await self.update_one(
+            {"job_id": job_id, "worker_id": worker_id, "status": STATUS_RUNNING},
+            {"$set": {
+                "status": STATUS_FAILED,
+                "error": error,
+                "finished_at": now,
+                "lease_expires_at": None,
+                "expires_at": expires_at,
+            }},
+        )
+        return matched > 0
+
+    async def fail_abandoned(self, now: datetime, max_attempts: int, error: str, expires_at: datetime) -> int:
+        """
+        Fail running jobs whose lease ran out on their last allowed attempt.
+
+        Such a job took its worker down with it (crash, OOM) every time, so it
+        is never claimed again.
+
+        Args:
+            now: Current time
+            max_attempts: Attempts a job is allowed
+            error: Error message shown to the client
+            expires_at: When the jobs are removed
+
+        Returns:
+            Number of jobs failed
+        """
+        result = await self.collection.update_many(
+            {"status": STATUS_RUNNING, "lease_expires_at": {"$lt": now}, "attempts": {"$gte": max_attempts}},
+            {"$set": {
+                "status": STATUS_FAILED,
+                "error": error,
+                "finished_at": now,
+                "lease_expires_at": None,
+                "expires_at": expires_at,
+            }},
+        )
+        return result.modified_count
+
+    async def requeue(self, job_id: str, worker_id: str, error: Optional[str] = None) -> bool:
+        """
+        Put a running job back in the queue (retry, or worker shutting down).
+
+        Args:
+            job_id: Job identifier
+            worker_id: Worker giving the job up
+            error: Error from the attempt, if it failed
+
+        Returns:
+            True if the job was updated
+        """
+        matched = await self.update_one(
+            {"job_id": job_id, "worker_id": worker_id, "status": STATUS_RUNNING},
+            {"$set": {"status": STATUS_QUEUED, "worker_id": None, "lease_expires_at": None, "error": error}},
+        )
+        return matched > 0
+
+    async def count_active(self, user_id: str) -> int:
+        """
+        Count a user's queued and running jobs.
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            Number of unfinished jobs
+        """
+        return await self.count_documents({"user_id": user_id, "status": {"$in": [STATUS_QUEUED, STATUS_RUNNING]}})
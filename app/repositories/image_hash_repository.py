@@ -0,0 +1,72 @@
+"""Image hash repository for database operations."""
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from app.repositories.base import BaseRepository
+from app.core.database import image_hashes_collection
+
+
+class ImageHashRepository(BaseRepository):
+    """Repository for processed product images keyed by perceptual hash."""
+
+    def __init__(self):
+        super().__init__(image_hashes_collection)
+
+    async def find_by_bands(self, bands: List[str], verdict_key: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Find images sharing at least one hash band that have a verdict for a product.
+
+        Args:
+            bands: Band keys of the hash being looked up
+            verdict_key: Product key the verdict must be stored under
+            limit: Maximum number of candidates
+
+        Returns:
+            List of image hash documents
+        """
+        query = {"bands": {"$in": bands}, f"verdicts.{verdict_key}": {"$exists": True}}
+        return await self.collection.find(query).limit(limit).to_list(length=limit)
+
+    async def find_best_for(self, product_key: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Find images previously chosen as the best image for a product.
+
+        Args:
+            product_key: Product key (see image_hash_index.product_key)
+            limit: Maximum number of documents
+
+        Returns:
+            List of image hash documents
+        """
+        return await self.collection.find({"best_for": product_key}).limit(limit).to_list(length=limit)
+
+    async def upsert(
+        self,
+        hash_hex: str,
+        bands: List[str],
+        image_url: str,
+        now: datetime,
+        verdicts: Optional[Dict[str, str]] = None,
+        best_for: Optional[str] = None
+    ) -> None:
+        """
+        Record an image, optionally with a verdict or best-image decision.
+
+        Args:
+            hash_hex: Perceptual hash as hex
+            bands: Band keys of the hash
+            image_url: URL the image was fetched from
+            now: Update time
+            verdicts: Product key -> verdict to store
+            best_for: Product key this image was chosen as best for
+        """
+        update = {
+            "$set": {
+                "bands": bands,
+                "updated_at": now,
+                **{f"verdicts.{key}": verdict for key, verdict in (verdicts or {}).items()},
+            },
+            "$setOnInsert": {"image_url": image_url, "created_at": now},
+        }
+        if best_for:
+            update["$addToSet"] = {"best_for": best_for}
+        await self.collection.update_one({"hash": hash_hex}, update, upsert=True)
@@ -0,0 +1,142 @@
+"""Product cache repository for database operations."""
+from datetime import datetime
+from typing import Optional, Dict, Any
+from app.repositories.base import BaseRepository
+from app.core.database import product_cache_collection
+
+
+class ProductCacheRepository(BaseRepository):
+    """Repository for shared product extractions keyed by canonical page URL."""
+
+    def __init__(self):
+        super().__init__(product_cache_collection)
+
+    async def find_by_url(self, canonical_url: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the product cache entry for a canonical URL.
+
+        Args:
+            canonical_url: Canonical product page URL
+
+        Returns:
+            Product cache document or None if not found
+        """
+        return await self.find_one({"canonical_url": canonical_url})
+
+    async def record_details_vote(
+        self,
+        canonical_url: str,
+        domain: str,
+        voter: str,
+        product_name: str,
+        price: Optional[str],
+        now: datetime
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Store one user's extracted name and price for a product page.
+
+        Args:
+            canonical_url: Canonical product page URL
+            domain: Page domain
+            voter: Hash of the user id
+            product_name: Extracted product name
+            price: Extracted price (may be None)
+            now: Extraction time
+
+        Returns:
+            The product cache document after the update
+        """
+        await self.collection.update_one(
+            {"canonical_url": canonical_url},
+            {
+                "$set": {
+                    "domain": domain,
+                    f"detail_votes.{voter}": {"product_name": product_name, "price": price, "at": now},
+                },
+            },
+            upsert=True,
+        )
+        return await self.find_by_url(canonical_url)
+
+    async def record_image_vote(
+        self,
+        canonical_url: str,
+        domain: str,
+        voter: str,
+        image: str,
+        now: datetime
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Store one user's chosen image for a product page.
+
+        Args:
+            canonical_url: Canonical product page URL
+            domain: Page domain
+            voter: Hash of the user id
+            image: Chosen image URL
+            now: Selection time
+
+        Returns:
+            The product cache document after the update
+        """
+        await self.collection.update_one(
+            {"canonical_url": canonical_url},
+            {"$set": {"domain": domain, f"image_votes.{voter}": {"image": image, "at": now}}},
+            upsert=True,
+        )
+        return await self.find_by_url(canonical_url)
+
+    async def upsert_details(
+        self,
+        canonical_url: str,
+        domain: str,
+        product_name: str,
+        price: Optional[str],
+        now: datetime
+    ) -> None:
+        """
+        Store the shared name and price for a product page (clearing the per-user votes).
+
+        Args:
+            canonical_url: Canonical product page URL
+            domain: Page domain
+            product_name: Extracted product name
+            price: Extracted price (may be None)
+            now: Extraction time
+        """
+        await self.collection.update_one(
+            {"canonical_url": canonical_url},
+            {
+                "$set": {
+                    "domain": domain,
+                    "product_name": product_name,
+                    "price": price,
+                    "details_updated_at": now,
+                },
+                "$unset": {"detail_votes": ""},
+            },
+            upsert=True,
+        )
+
+    async def upsert_image(self, canonical_url: str, domain: str, image: str, now: datetime) -> None:
+        """
+        Store the shared product image for a product page (clearing the per-user votes).
+
+        Args:
+            canonical_url: Canonical product page URL
+            domain: Page domain
+            image: Chosen image URL
+            now: Selection time
+        """
+        await self.collection.update_one(
+            {"canonical_url": canonical_url},
+            {
+                "$set": {
+                    "domain": domain,
+                    "image": image,
+                    "image_updated_at": now,
+                },
+                "$unset": {"image_votes": ""},
+            },
+            upsert=True,
+        )
@@ -1,23 +1,150 @@
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, Depends, Request
-from app.schemas.extraction import ImageRequest, InnerTextRequest
-from app.services.ai.openai_parser import parse_images_with_openai, parse_inner_text_with_openai
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from app.schemas.extraction import (
+    ImageRequest,
+    ProductVerificationRequest,
+    BatchVerificationRequest,
+    InnerTextRequest,
+    StreamExtractionRequest,
+    HtmlRequest,
+    BatchExtractionRequest,
+)
+from app.services.extraction_service import (
+    ExtractionService,
+    SOURCE_LLM,
+    product_cache_counters,
+    text_flight,
+    image_flight,
+    reducer_counters,
+    image_prerank_counters,
+    source_counters,
+    text_router,
+    image_router,
+    text_tiers,
+    text_batchers,
+)
+from app.services.verification_service import (
+    VerificationService,
+    VERDICT_MATCH,
+    VERDICT_UNKNOWN,
+    verification_counters,
+    verification_flight,
+    verification_limiter,
+)
+from app.services.extraction_job_service import (
+    ExtractionJobService,
+    JobLimitExceeded,
+    JOB_EXTRACT,
+    JOB_ANALYZE_IMAGES,
+    FINISHED_STATUSES,
+    job_view,
+    job_worker_pool,
+)
+from app.services.ai.extraction_cache import extraction_cache
+from app.services.ai.limits import ai_call_limiter
+from app.services.ai.json_output import parse_path_counters
+from app.services.ai.image_pipeline import pipeline_counters, processed_images
+from app.services.ai.image_hash_index import image_hash_index
+from app.services.ai.image_quality import quality_counters
+from app.services.ai.usage import usage_tracker
+from app.services.ai.token_quota import (
+    QuotaCharge,
+    token_quota,
+    text_prompt_tokens,
+    image_selection_tokens,
+    vision_tokens,
+)
 from app.utils.utils import extract_product_name_from_url
-from app.core.dependencies import get_current_user
+from app.core.config import settings
+from app.core.http_client import http_client
+from app.core.dependencies import (
+    get_current_user,
+    get_extraction_service,
+    get_verification_service,
+    get_extraction_job_service,
+)
 from app.models.user import User
-from app.utils.rate_limiter import rate_limit
+from app.utils.rate_limiter import rate_limit, consume_rate_limit
+from app.utils.sse import format_sse
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _page_too_large() -> str:
+    return f"Page too large: at most {settings.QUOTA_MAX_REQUEST_TOKENS} estimated tokens."
+
+def _fit_page(text: str, html: bool = False) -> str:
+    """Trim a page to QUOTA_MAX_REQUEST_TOKENS, or refuse it with 413 under the reject policy."""
+    fitted = token_quota.fit(text, html)
+    if fitted is None:
+        raise HTTPException(status_code=413, detail=_page_too_large())
+    return fitted
+
+def _charge_tokens(current_user: User, tokens: int) -> Optional[QuotaCharge]:
+    """Charge estimated prompt tokens to the user's rolling budget, refusing with 429 once it's spent."""
+    charge = token_quota.charge(current_user.user_id, tokens)
+    if charge is not None and not charge.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Token budget exceeded: {charge.status.limit} tokens per {charge.status.window}",
+            headers={**charge.status.headers(), "Retry-After": str(charge.status.reset_seconds)},
+        )
+    return charge
+
+def _budget_headers(current_user: User, charge: Optional[QuotaCharge]) -> dict:
+    """Remaining-budget headers for the response (none when quotas are disabled)."""
+    status = token_quota.status(current_user.user_id)
+    if status is None or charge is None:
+        return {}
+    return {**status.headers(), "X-Token-Budget-Charged": str(charge.tokens)}
+
+def _require_jobs() -> None:
+    """Refuse ?job=true when no worker pool runs jobs."""
+    if not settings.EXTRACTION_JOBS_ENABLED:
+        raise HTTPException(status_code=503, detail="Extraction jobs are disabled.")
+
+async def _submit_job(
+    response: Response,
+    current_user: User,
+    job_service: ExtractionJobService,
+    kind: str,
+    payload: Dict[str, Any],
+    charge: Optional[QuotaCharge]
+) -> dict:
+    """Queue a job and answer 202 with its id; tokens are refunded when the job already existed."""
+    try:
+        job, created = await job_service.submit(current_user.user_id, kind, payload, charge)
+    except JobLimitExceeded as e:
+        token_quota.refund(charge)
+        raise HTTPException(status_code=429, detail=str(e))
+
+    if not created:
+        token_quota.refund(charge)
+    response.status_code = 202
+    response.headers["Location"] = f"/extract/jobs/{job.job_id}"
+    response.headers.update(_budget_headers(current_user, charge))
+    return {"job_id": job.job_id, "status": job.status, "deduplicated": not created}
+
 @router.post("/analyze-images")
 @rate_limit("10/minute")
 async def analyze_images(
     request: Request,
+    response: Response,
     payload: ImageRequest,
-    current_user: User = Depends(get_current_user)
+    job: bool = False,
+    current_user: User = Depends(get_current_user),
+    extraction_service: ExtractionService = Depends(get_extraction_service),
+    job_service: ExtractionJobService = Depends(get_extraction_job_service)
 ):
-    """Endpoint to analyze and determine the best product image."""
+    """
+    Endpoint to analyze and determine the best product image.
+
+    With ?job=true the request is queued instead and 202 is returned with a
+    job_id to poll at /extract/jobs/{job_id}.
+    """
     try:
         if not payload.page_url or not payload.image_urls.strip():
             raise HTTPException(status_code=400, detail="Missing page_url or image_urls.")
@@ -31,10 +158,22 @@ async def analyze_images(
 
         if not image_urls:
             raise HTTPException(status_code=400, detail="No valid image URLs found.")
+        if job:
+            _require_jobs()
+
+        charge = _charge_tokens(current_user, image_selection_tokens(image_urls))
+
+        if job:
+            return await _submit_job(
+                response, current_user, job_service, JOB_ANALYZE_IMAGES,
+                {"page_url": page_url_str, "product_name": product_name, "image_urls": image_urls},
+                charge,
+            )
+
+        # Select image (shared product cache, pre-ranker, cached result or routed AI provider)
+        result = await extraction_service.select_product_image(page_url_str, product_name, image_urls)
+        response.headers.update(_budget_headers(current_user, charge))
 
-        # Call OpenAI function
-        result = parse_images_with_openai(page_url_str, product_name, image_urls)
-        
         return result
 
     except HTTPException:
@@ -47,17 +186,371 @@ async def analyze_images(
 @rate_limit("10/minute")
 async def extract_cart_info(
     request: Request,
+    response: Response,
     payload: InnerTextRequest,
-    current_user: User = Depends(get_current_user)
+    job: bool = False,
+    current_user: User = Depends(get_current_user),
+    extraction_service: ExtractionService = Depends(get_extraction_service),
+    job_service: ExtractionJobService = Depends(get_extraction_job_service)
 ):
+    """
+    Extract product name and price from a page's innerText.
+
+    With ?job=true the request is queued instead and 202 is returned with a
+    job_id to poll at /extract/jobs/{job_id}.
+    """
     try:
-        # Call the parser
-        extracted_data = parse_inner_text_with_openai(payload.inner_text)
+        # Extract (shared product cache, rules, cached result or routed AI provider)
+        if job:
+            _require_jobs()
+        page_url = str(payload.page_url) if payload.page_url else None
+        inner_text = _fit_page(payload.inner_text)
+        charge = _charge_tokens(current_user, text_prompt_tokens(inner_text))
+
+        if job:
+            # Charged at submission: the job may run in another worker process
+            return await _submit_job(
+                response, current_user, job_service, JOB_EXTRACT,
+                {"inner_text": inner_text, "page_url": page_url},
+                charge,
+            )
 
-        return {"cart_items": extracted_data}
+        extracted_data, source = await extraction_service.extract_from_text(inner_text, page_url)
+
+        # Only answers that needed the provider count against the budget
+        if source != SOURCE_LLM:
+            token_quota.refund(charge)
+        response.headers.update(_budget_headers(current_user, charge))
+
+        # "source" says which path answered: product_cache, rules, cache or llm
+        return {"cart_items": extracted_data, "source": source}
 
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error in extract_cart_info: {type(e).__name__}: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.post("/extract-stream")
+@rate_limit("10/minute")
+async def extract_cart_info_stream(
+    request: Request,
+    payload: StreamExtractionRequest,
+    current_user: User = Depends(get_current_user),
+    extraction_service: ExtractionService = Depends(get_extraction_service)
+):
+    """
+    Streaming variant of /extract using Server-Sent Events.
+
+    Emits a "field" event ({"name", "value"}) for product_name, price and
+    (when page_url and image_urls are given) image as soon as each is known,
+    then a "done" event with the same payload as /extract plus the image.
+    Failures after the stream starts are sent as an "error" event.
+    """
+    page_url = str(payload.page_url) if payload.page_url else None
+    image_urls = [url.strip() for url in (payload.image_urls or "").split(",") if url.strip()]
+    inner_text = _fit_page(payload.inner_text)
+
+    # Charged up front and not refunded: the headers go out before the source is known
+    tokens = text_prompt_tokens(inner_text)
+    if page_url and image_urls:
+        tokens += image_selection_tokens(image_urls)
+    charge = _charge_tokens(current_user, tokens)
+
+    async def events():
+        try:
+            async for event, data in extraction_service.stream_from_text(inner_text, page_url, image_urls):
+                yield format_sse(event, data)
+        except Exception as e:
+            logger.error(f"Error in extract_cart_info_stream: {type(e).__name__}: {str(e)}", exc_info=True)
+            yield format_sse("error", {"detail": f"Internal Server Error: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **_budget_headers(current_user, charge)},
+    )
+
+@router.post("/extract-html")
+@rate_limit("30/minute")
+async def extract_from_html(
+    request: Request,
+    response: Response,
+    payload: HtmlRequest,
+    current_user: User = Depends(get_current_user),
+    extraction_service: ExtractionService = Depends(get_extraction_service)
+):
+    """Extract product fields from JSON-LD/OpenGraph/microdata, falling back to the AI parser."""
+    try:
+        page_url = str(payload.page_url) if payload.page_url else None
+        html = _fit_page(payload.html, html=True)
+        charge = _charge_tokens(current_user, text_prompt_tokens(html))
+
+        extracted_data, image, source = await extraction_service.extract_from_html(html, page_url)
+
+        # Most pages answer from structured data without the provider
+        if source != SOURCE_LLM:
+            token_quota.refund(charge)
+        response.headers.update(_budget_headers(current_user, charge))
+
+        # "source" is structured_data, or the extract_from_text source when it fell back
+        return {"cart_items": extracted_data, "image": image, "source": source}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in extract_from_html: {type(e).__name__}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.post("/extract-batch")
+@rate_limit("10/minute")
+async def extract_batch(
+    request: Request,
+    response: Response,
+    payload: BatchExtractionRequest,
+    current_user: User = Depends(get_current_user),
+    extraction_service: ExtractionService = Depends(get_extraction_service)
+):
+    """Extract several pages (innerText or HTML) in one request with per-item results."""
+    try:
+        if len(payload.items) > settings.EXTRACTION_BATCH_MAX_ITEMS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many items: at most {settings.EXTRACTION_BATCH_MAX_ITEMS} per batch."
+            )
+
+        # Each item counts against a per-client item budget, not just the request
+        if not consume_rate_limit(request, settings.EXTRACTION_BATCH_ITEM_RATE_LIMIT, "extract-batch-items", len(payload.items)):
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded: {settings.EXTRACTION_BATCH_ITEM_RATE_LIMIT} batch items"
+            )
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(payload.items)
+        indexes, items = [], []
+        for index, item in enumerate(payload.items):
+            html = not item.inner_text
+            page = token_quota.fit(item.html if html else item.inner_text, html)
+            if page is None:
+                # Under the reject policy an oversized page fails on its own and isn't charged
+                results[index] = {"index": index, "error": _page_too_large()}
+                continue
+            indexes.append(index)
+            items.append({
+                "inner_text": None if html else page,
+                "html": page if html else None,
+                "page_url": str(item.page_url) if item.page_url else None,
+            })
+        item_tokens = [text_prompt_tokens(item["inner_text"] or item["html"]) for item in items]
+        charge = _charge_tokens(current_user, sum(item_tokens))
+
+        extracted = await extraction_service.extract_batch(items, settings.EXTRACTION_BATCH_CONCURRENCY) if items else []
+        for index, result in zip(indexes, extracted):
+            results[index] = {**result, "index": index}
+
+        # Refund items that failed or didn't need the provider
+        token_quota.refund(charge, sum(
+            tokens for tokens, result in zip(item_tokens, extracted) if result.get("source") != SOURCE_LLM
+        ))
+        response.headers.update(_budget_headers(current_user, charge))
+
+        failed = sum(1 for result in results if "error" in result)
+        return {"results": results, "succeeded": len(results) - failed, "failed": failed}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in extract_batch: {type(e).__name__}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.post("/verify-image")
+@rate_limit("30/minute")
+async def verify_image(
+    request: Request,
+    response: Response,
+    payload: ProductVerificationRequest,
+    current_user: User = Depends(get_current_user),
+    verification_service: VerificationService = Depends(get_verification_service)
+):
+    """Check whether an image shows the named product (match, mismatch or unknown)."""
+    try:
+        charge = _charge_tokens(current_user, vision_tokens(1))
+
+        verdict, source = await verification_service.verify_image(str(payload.image_url), payload.product_name)
+
+        if source != SOURCE_LLM:
+            token_quota.refund(charge)
+        response.headers.update(_budget_headers(current_user, charge))
+
+        # "unknown" means the check timed out or failed; callers should keep the image
+        matches = None if verdict == VERDICT_UNKNOWN else verdict == VERDICT_MATCH
+        return {"verdict": verdict, "matches": matches, "source": source}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in verify_image: {type(e).__name__}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.post("/verify-images")
+@rate_limit("10/minute")
+async def verify_images(
+    request: Request,
+    response: Response,
+    payload: BatchVerificationRequest,
+    current_user: User = Depends(get_current_user),
+    verification_service: VerificationService = Depends(get_verification_service)
+):
+    """Check several candidate images for one product, with /verify-image results per image."""
+    try:
+        if len(payload.image_urls) > settings.VERIFICATION_BATCH_MAX_IMAGES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many images: at most {settings.VERIFICATION_BATCH_MAX_IMAGES} per request."
+            )
+
+        image_urls = [str(url) for url in payload.image_urls]
+        charge = _charge_tokens(current_user, vision_tokens(len(image_urls)))
+
+        results = await verification_service.verify_images(image_urls, payload.product_name)
+
+        token_quota.refund(charge, vision_tokens(sum(1 for _, source in results if source != SOURCE_LLM)))
+        response.headers.update(_budget_headers(current_user, charge))
+
+        return {
+            "results": [
+                {
+                    "image_url": image_url,
+                    "verdict": verdict,
+                    "matches": None if verdict == VERDICT_UNKNOWN else verdict == VERDICT_MATCH,
+                    "source": source,
+                }
+                for image_url, (verdict, source) in zip(image_urls, results)
+            ]
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in verify_images: {type(e).__name__}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.get("/jobs/{job_id}")
+@rate_limit("60/minute")
+async def get_extraction_job(
+    request: Request,
+    job_id: str,
+    wait: float = 0,
+    current_user: User = Depends(get_current_user),
+    job_service: ExtractionJobService = Depends(get_extraction_job_service)
+):
+    """
+    Get an extraction job's status and, once it has succeeded, its result.
+
+    "result" is the body the synchronous endpoint would have returned. With
+    ?wait=N the request blocks up to N seconds (at most
+    EXTRACTION_JOB_MAX_WAIT_SECONDS) for the job to finish.
+    """
+    try:
+        timeout = min(max(wait, 0), settings.EXTRACTION_JOB_MAX_WAIT_SECONDS)
+        extraction_job = await job_service.wait(current_user.user_id, job_id, timeout)
+        if extraction_job is None:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        return job_view(extraction_job)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_extraction_job: {type(e).__name__}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.get("/jobs/{job_id}/events")
+@rate_limit("60/minute")
+async def stream_extraction_job(
+    request: Request,
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    job_service: ExtractionJobService = Depends(get_extraction_job_service)
+):
+    """
+    Subscribe to an extraction job using Server-Sent Events.
+
+    Emits a "status" event with the job whenever its status changes, then a
+    "done" event with the finished job (including the result or error). The
+    stream is closed after EXTRACTION_JOB_STREAM_MAX_SECONDS with a "timeout"
+    event if the job hasn't finished by then.
+    """
+    first = await job_service.get(current_user.user_id, job_id)
+    if first is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def events():
+        try:
+            extraction_job, sent_status = first, None
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.EXTRACTION_JOB_STREAM_MAX_SECONDS
+            while extraction_job is not None and extraction_job.status not in FINISHED_STATUSES:
+                if extraction_job.status != sent_status:
+                    sent_status = extraction_job.status
+                    yield format_sse("status", job_view(extraction_job))
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    yield format_sse("timeout", {"job_id": job_id, "status": extraction_job.status})
+                    return
+                extraction_job = await job_service.wait(
+                    current_user.user_id, job_id, remaining, since=extraction_job.status
+                )
+            if extraction_job is None:
+                yield format_sse("error", {"detail": "Job not found."})
+            else:
+                yield format_sse("done", job_view(extraction_job))
+        except Exception as e:
+            logger.error(f"Error in stream_extraction_job: {type(e).__name__}: {str(e)}", exc_info=True)
+            yield format_sse("error", {"detail": f"Internal Server Error: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/metrics")
+async def extraction_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    """Expose extraction cache and AI call counters for capacity sizing."""
+    return {
+        "sources": source_counters.snapshot(),
+        "cache": extraction_cache.stats(),
+        "product_cache": product_cache_counters.snapshot(),
+        "single_flight": {
+            "text": text_flight.stats(),
+            "image": image_flight.stats(),
+        },
+        "input_reducer": reducer_counters.snapshot(),
+        "image_prerank": image_prerank_counters.snapshot(),
+        "ai_calls": ai_call_limiter.stats(),
+        "providers": {
+            "text": text_router.stats(),
+            "image": image_router.stats(),
+        },
+        "model_tiers": text_tiers.stats(),
+        "parse_paths": parse_path_counters.snapshot(),
+        "micro_batching": {name: batcher.stats() for name, batcher in text_batchers.items()},
+        "verification": {
+            **verification_counters.snapshot(),
+            "single_flight": verification_flight.stats(),
+            "in_flight": verification_limiter.stats(),
+        },
+        "image_pipeline": {
+            **pipeline_counters.snapshot(),
+            "cache": processed_images.stats(),
+            "decode_workers": settings.IMAGE_DECODE_WORKERS,
+        },
+        "image_quality": quality_counters.snapshot(),
+        "image_hashes": image_hash_index.stats(),
+        "http_client": http_client.stats(),
+        "ai_usage": usage_tracker.stats(),
+        "token_quota": token_quota.stats(),
+        "jobs": job_worker_pool.stats(),
+    }
@@ -0,0 +1,44 @@
+import logging
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from app.core.config import settings
+from app.core.dependencies import get_current_user, get_usage_service
+from app.models.user import User
+from app.services.usage_service import UsageService
+from app.utils.rate_limiter import rate_limit
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# user_id value selecting every user's usage
+ALL_USERS = "*"
+
+
+@router.get("/ai")
+@rate_limit("30/minute")
+async def get_ai_usage(
+    request: Request,
+    days: int = Query(7, ge=1),
+    user_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    usage_service: UsageService = Depends(get_usage_service)
+):
+    """
+    AI usage (calls, tokens, estimated cost, latency) per user and UTC day.
+
+    Users see their own usage; users listed in USAGE_ADMIN_USER_IDS may ask
+    for another user's, or for everyone's with user_id=*.
+    """
+    if days > settings.USAGE_QUERY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.USAGE_QUERY_MAX_DAYS} days can be queried")
+
+    target = user_id or current_user.user_id
+    if target != current_user.user_id and current_user.user_id not in settings.usage_admin_user_ids:
+        raise HTTPException(status_code=403, detail="Not allowed to view other users' usage")
+
+    try:
+        return await usage_service.get_usage(None if target == ALL_USERS else target, days)
+    except Exception as e:
+        logger.error(f"Error in get_ai_usage: {type(e).__name__}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
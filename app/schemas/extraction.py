@@ -1,5 +1,6 @@
 """Extraction API schemas for request/response validation."""
-from pydantic import BaseModel, HttpUrl, field_validator
+from pydantic import BaseModel, HttpUrl, field_validator, model_validator
+from typing import List, Optional
 from app.utils.sanitize import sanitize_product_name
 
 
@@ -19,6 +20,7 @@ class ImageRequest(BaseModel):
 class InnerTextRequest(BaseModel):
     """Request schema for inner text extraction."""
     inner_text: str
+    page_url: Optional[HttpUrl] = None  # Enables the shared product cache when provided
     
     @field_validator('inner_text')
     @classmethod
@@ -28,6 +30,62 @@ class InnerTextRequest(BaseModel):
         return v.strip()
 
 
+class StreamExtractionRequest(BaseModel):
+    """Request schema for streaming (SSE) extraction."""
+    inner_text: str
+    page_url: Optional[HttpUrl] = None
+    image_urls: Optional[str] = None  # Comma-separated; with page_url, the image is streamed too
+    
+    @field_validator('inner_text')
+    @classmethod
+    def validate_inner_text(cls, v: str) -> str:
+        if not v or not v.strip():
+            raise ValueError("inner_text cannot be empty")
+        return v.strip()
+
+
+class HtmlRequest(BaseModel):
+    """Request schema for structured-data extraction from raw HTML."""
+    html: str
+    page_url: Optional[HttpUrl] = None  # Enables the shared product cache when provided
+    
+    @field_validator('html')
+    @classmethod
+    def validate_html(cls, v: str) -> str:
+        if not v or not v.strip():
+            raise ValueError("html cannot be empty")
+        return v
+
+
+class BatchExtractionItem(BaseModel):
+    """One page in a batch extraction request (innerText or raw HTML)."""
+    inner_text: Optional[str] = None
+    html: Optional[str] = None
+    page_url: Optional[HttpUrl] = None
+    
+    @model_validator(mode='after')
+    def validate_content(self) -> 'BatchExtractionItem':
+        has_text = bool(self.inner_text and self.inner_text.strip())
+        has_html = bool(self.html and self.html.strip())
+        if has_text == has_html:
+            raise ValueError("Provide exactly one of inner_text or html")
+        if has_text:
+            self.inner_text = self.inner_text.strip()
+        return self
+
+
+class BatchExtractionRequest(BaseModel):
+    """Request schema for batch extraction."""
+    items: List[BatchExtractionItem]
+    
+    @field_validator('items')
+    @classmethod
+    def validate_items(cls, v: List[BatchExtractionItem]) -> List[BatchExtractionItem]:
+        if not v:
+            raise ValueError("items cannot be empty")
+        return v
+
+
 class ProductVerificationRequest(BaseModel):
     """Request schema for product image verification."""
     product_name: str
@@ -49,6 +107,34 @@ class ProductVerificationRequest(BaseModel):
         return v.strip()
 
 
+class BatchVerificationRequest(BaseModel):
+    """Request schema for verifying several candidate images of one product."""
+    product_name: str
+    price: str
+    image_urls: List[HttpUrl]
+    
+    @field_validator('product_name')
+    @classmethod
+    def validate_product_name(cls, v: str) -> str:
+        if not v or not v.strip():
+            raise ValueError("product_name cannot be empty")
+        return sanitize_product_name(v.strip())
+    
+    @field_validator('price')
+    @classmethod
+    def validate_price(cls, v: str) -> str:
+        if not v or not v.strip():
+            raise ValueError("price cannot be empty")
+        return v.strip()
+    
+    @field_validator('image_urls')
+    @classmethod
+    def validate_image_urls(cls, v: List[HttpUrl]) -> List[HttpUrl]:
+        if not v:
+            raise ValueError("image_urls cannot be empty")
+        return v
+
+
 class URLRequest(BaseModel):
     """Request schema for URL classification."""
     url: HttpUrl
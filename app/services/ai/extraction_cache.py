@@ -0,0 +1,202 @@
+"""
+Content-addressed cache for AI extraction results.
+
+Results are keyed by a sha256 of the normalized input plus the model and prompt
+version that produced them. Lookups go to an in-process LRU first and then to
+the MongoDB `extraction_cache` collection, which expires entries via a TTL
+index on `expires_at`.
+"""
+import copy
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable
+from app.core.config import settings
+from app.models.extraction_cache import ExtractionCacheEntry
+from app.repositories.extraction_cache_repository import ExtractionCacheRepository
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Cache kinds
+TEXT = "text"
+IMAGE = "image"
+VERIFY = "verify"
+
+_ZERO_WIDTH = re.compile("[\u200b\u200c\u200d\u2060\ufeff]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize innerText so trivially different captures share a cache key.
+
+    Applies NFKC, drops zero-width characters and collapses whitespace.
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    text = _ZERO_WIDTH.sub("", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _digest(parts: Dict[str, Any]) -> str:
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def text_cache_key(inner_text: str, model: str, prompt_version: str) -> str:
+    """Build the cache key for an innerText extraction."""
+    return _digest({
+        "kind": TEXT,
+        "text": normalize_text(inner_text),
+        "model": model,
+        "prompt_version": prompt_version,
+    })
+
+
+def image_cache_key(page_url: str, image_urls: Iterable[str], model: str, prompt_version: str) -> str:
+    """Build the cache key for an image selection (page URL + sorted image set)."""
+    return _digest({
+        "kind": IMAGE,
+        "page_url": page_url.strip(),
+        "images": sorted({url.strip() for url in image_urls if url and url.strip()}),
+        "model": model,
+        "prompt_version": prompt_version,
+    })
+
+
+def verification_cache_key(image_url: str, product_name: str, model: str, prompt_version: str) -> str:
+    """Build the cache key for an image verification (image URL hash + normalized product name)."""
+    return _digest({
+        "kind": VERIFY,
+        "image": hashlib.sha256(image_url.strip().encode("utf-8")).hexdigest(),
+        "product_name": normalize_text(product_name).lower(),
+        "model": model,
+        "prompt_version": prompt_version,
+    })
+
+
+class ExtractionCache:
+    """Two-tier (memory + MongoDB) cache for extraction results."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        repository_factory: Callable[[], ExtractionCacheRepository] = ExtractionCacheRepository,
+        enabled: bool = True
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            max_entries: In-process LRU size
+            ttl_seconds: Lifetime of entries in both tiers
+            repository_factory: Builds the repository backing the persistent tier
+            enabled: When False, every lookup is a miss and nothing is stored
+        """
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.memory = LRUCache(max_entries, ttl_seconds=ttl_seconds)
+        self.repository_factory = repository_factory
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, kind: str, counter: str) -> None:
+        counters = self._counters.setdefault(
+            kind, {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "stores": 0}
+        )
+        counters[counter] += 1
+
+    async def get(self, kind: str, key: str) -> Any:
+        """
+        Look up a cached result.
+
+        Args:
+            kind: Cache kind (TEXT, IMAGE or VERIFY)
+            key: Content-addressed key
+
+        Returns:
+            Cached value or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        value = self.memory.get(key)
+        if value is not None:
+            self._count(kind, "memory_hits")
+            return copy.deepcopy(value)
+
+        try:
+            doc = await self.repository_factory().find_fresh(key)
+        except Exception as e:
+            # The persistent tier is an optimisation; never fail the request over it
+            logger.warning(f"Extraction cache read failed: {e}")
+            doc = None
+
+        if doc is not None:
+            value = ExtractionCacheEntry.from_mongo(doc).value
+            self.memory.set(key, copy.deepcopy(value))
+            self._count(kind, "persistent_hits")
+            return value
+
+        self._count(kind, "misses")
+        return None
+
+    async def set(self, kind: str, key: str, value: Any, model: str, prompt_version: str) -> None:
+        """
+        Store a result in both tiers.
+
+        Args:
+            kind: Cache kind (TEXT, IMAGE or VERIFY)
+            key: Content-addressed key
+            value: Result to cache (must be JSON/BSON serializable)
+            model: Model that produced the result
+            prompt_version: Prompt version that produced the result
+        """
+        if not self.enabled or value is None:
+            return
+
+        self.memory.set(key, copy.deepcopy(value))
+        self._count(kind, "stores")
+
+        now = datetime.utcnow()
+        entry = ExtractionCacheEntry(
+            cache_key=key,
+            kind=kind,
+            value=value,
+            model=model,
+            prompt_version=prompt_version,
+            created_at=now.isoformat(),
+            expires_at=now + timedelta(seconds=self.ttl_seconds),
+        )
+        try:
+            await self.repository_factory().upsert(entry.to_mongo_dict())
+        except Exception as e:
+            logger.warning(f"Extraction cache write failed: {e}")
+
+    def clear(self) -> None:
+        """Clear the in-process tier and counters (persistent tier is untouched)."""
+        self.memory.clear()
+        self._counters = {}
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters per kind plus LRU occupancy."""
+        kinds = {}
+        for kind, counters in self._counters.items():
+            lookups = counters["memory_hits"] + counters["persistent_hits"] + counters["misses"]
+            hits = counters["memory_hits"] + counters["persistent_hits"]
+            kinds[kind] = {**counters, "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+        return {
+            "enabled": self.enabled,
+            "memory": self.memory.stats(),
+            "kinds": kinds,
+        }
+
+
+extraction_cache = ExtractionCache(
+    max_entries=settings.EXTRACTION_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.EXTRACTION_CACHE_TTL_SECONDS,
+    enabled=settings.EXTRACTION_CACHE_ENABLED,
+)
@@ -1,12 +1,51 @@
 import json
-from groq import Groq
+import logging
+from contextlib import aclosing
+from groq import AsyncGroq
 from app.core.config import settings
+from app.services.ai.limits import run_ai_call, run_ai_stream
+from app.services.ai.provider_router import GROQ
+from app.services.ai.json_output import (
+    ExtractedProduct,
+    parse_json_output,
+    PATH_JSON_MODE,
+)
+
+logger = logging.getLogger(__name__)
+
+client = AsyncGroq(
+    api_key=settings.GROQ_API_KEY,
+    base_url=settings.GROQ_BASE_URL or None,
+    timeout=settings.AI_REQUEST_TIMEOUT_SECONDS,
+)
+
+TEXT_MODEL = "llama-3.3-70b-versatile"
+TEXT_SMALL_MODEL = "llama-3.1-8b-instant"  # First tier when model tiering is enabled
+IMAGE_MODEL = "llama-3.3-70b-versatile"
+
+def _text_prompt(input_text: str) -> str:
+    """Build the product extraction prompt for one page of innerText."""
+    return f"""
+    You are an AI that extracts product details from shopping website text.
+    Analyze the following text and extract the following information:
+    - Product Name
+    - Price
+
+    Provide the output as a JSON object with keys 'product_name' and 'price'.
+    If a field is missing, use 'null' as the value.
+    Remember to only output the JSON, don't output anything else.
 
-client = Groq(api_key=settings.GROQ_API_KEY)
+    Text:
+    {input_text.strip()}
+    """
 
-def parse_inner_text_with_groq(input_text: str) -> dict:
+async def parse_inner_text_with_groq(input_text: str, model: str = TEXT_MODEL) -> dict:
     """
     Send plain innerText to Groq and extract product information.
+
+    Args:
+        input_text: Page innerText
+        model: Chat model to use (TEXT_MODEL or TEXT_SMALL_MODEL)
     
     Returns:
         dict: Dictionary with 'product_name' and 'price' keys
@@ -14,53 +53,106 @@ def parse_inner_text_with_groq(input_text: str) -> dict:
     if not isinstance(input_text, str) or not input_text.strip():
         raise ValueError("Invalid input: Expecting plain text input.")
 
+    prompt = _text_prompt(input_text)
+
+    try:
+        # Send the request to Groq
+        response = await run_ai_call(lambda: client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_completion_tokens=500,
+            temperature=0,
+            response_format={"type": "json_object"},
+        ), provider=GROQ, model=model, operation="text")
+
+        # Parse the (JSON-constrained) response, repairing it locally if needed
+        result = response.choices[0].message.content.strip()
+        parsed_result, path = parse_json_output(result, PATH_JSON_MODE)
+        if path != PATH_JSON_MODE:
+            logger.info(f"Repaired Groq JSON output ({path})")
+
+        return ExtractedProduct.model_validate(parsed_result).model_dump()
+
+    except Exception as e:
+        raise ValueError(f"Error parsing text with Groq: {e}")
+    
+
+async def stream_inner_text_with_groq(input_text: str, model: str = TEXT_MODEL):
+    """
+    Stream the extraction completion for plain innerText from Groq.
+
+    Yields:
+        str: Content deltas of the JSON answer as they arrive
+    """
+    if not isinstance(input_text, str) or not input_text.strip():
+        raise ValueError("Invalid input: Expecting plain text input.")
+
+    prompt = _text_prompt(input_text)
+
+    try:
+        # Closing the stream right away frees its call slot when the caller stops early
+        async with aclosing(run_ai_stream(lambda: client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_completion_tokens=500,
+            temperature=0,
+            response_format={"type": "json_object"},
+            stream=True,
+        ), provider=GROQ, model=model, operation="text_stream")) as chunks:
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    except Exception as e:
+        raise ValueError(f"Error streaming text with Groq: {e}")
+
+async def parse_inner_texts_with_groq(input_texts: list, model: str = TEXT_MODEL) -> list:
+    """
+    Send several innerTexts to Groq in one completion and extract product information for each.
+    
+    Returns:
+        list: One dictionary with 'product_name' and 'price' keys per input, in input order
+    """
+    if not isinstance(input_texts, list) or not input_texts or not all(isinstance(t, str) and t.strip() for t in input_texts):
+        raise ValueError("Invalid input: Expecting a list of plain text inputs.")
+
+    pages = "\n\n".join(f"### Page {i + 1}\n{text.strip()}" for i, text in enumerate(input_texts))
+
     # Create a prompt for Groq
     prompt = f"""
     You are an AI that extracts product details from shopping website text.
-    Analyze the following text and extract the following information:
+    Below are {len(input_texts)} independent pages. For each page, extract:
     - Product Name
     - Price
 
-    Provide the output as a JSON object with keys 'product_name' and 'price'.
+    Provide the output as a JSON array with exactly {len(input_texts)} objects, one per page and in the same order,
+    each with keys 'product_name' and 'price'.
     If a field is missing, use 'null' as the value.
-    Remember to only output the JSON, don't output anything else.
+    Remember to only output the JSON array, don't output anything else.
 
-    Text:
-    {input_text.strip()}
+    {pages}
     """
 
     try:
-        # Send the request to Groq
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        response = await run_ai_call(lambda: client.chat.completions.create(
+            model=model,
             messages=[{"role": "user", "content": prompt}],
-            max_completion_tokens=500,
+            max_completion_tokens=100 + 150 * len(input_texts),
             temperature=0,
-        )
+        ), provider=GROQ, model=model, operation="text_batch")
 
-        # Parse the response as JSON
         result = response.choices[0].message.content.strip()
-        try:
-            # Extract JSON content from Groq's response, ignoring formatting like triple backticks
-            start_index = result.find("{")
-            end_index = result.rfind("}") + 1
+        parsed_result, _ = parse_json_output(result)
 
-            if start_index == -1 or end_index == -1:
-                raise ValueError("Groq response does not contain valid JSON.")
+        if not isinstance(parsed_result, list) or len(parsed_result) != len(input_texts):
+            raise ValueError(f"Groq returned a mismatched batch for {len(input_texts)} pages: {result}")
 
-            # Extract and parse the JSON substring
-            json_content = result[start_index:end_index]
-            parsed_result = json.loads(json_content)
-        except json.JSONDecodeError:
-            raise ValueError(f"Groq returned invalid JSON: {result}")
-
-        return parsed_result
+        return [ExtractedProduct.model_validate(item).model_dump() for item in parsed_result]
 
     except Exception as e:
-        raise ValueError(f"Error parsing text with Groq: {e}")
-    
+        raise ValueError(f"Error parsing batched text with Groq: {e}")
 
-def parse_images_with_groq(image_urls: list) -> str:
+async def parse_images_with_groq(image_urls: list) -> str:
     """
     Send an array of image URLs to Groq and determine the best product image.
     Returns the selected image URL as plain text instead of JSON.
@@ -93,12 +185,12 @@ def parse_images_with_groq(image_urls: list) -> str:
 
     try:
         # Send the request to Groq
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        response = await run_ai_call(lambda: client.chat.completions.create(
+            model=IMAGE_MODEL,
             messages=[{"role": "user", "content": prompt}],
             max_completion_tokens=200,
             temperature=0.3,
-        )
+        ), provider=GROQ, model=IMAGE_MODEL, operation="image")
 
         # Extract plain text response
         result = response.choices[0].message.content.strip()
@@ -0,0 +1,179 @@
+"""
+Perceptual-hash index of processed product images.
+
+The same product photo appears under many URLs (CDNs, sizes, cache-busting
+parameters). Every image the vision pipeline processes is recorded in the
+MongoDB `image_hashes` collection by its dHash, together with the vision
+verdicts and best-image decisions made for it. A new URL whose image is
+within IMAGE_HASH_MAX_DISTANCE bits of a known one reuses those answers
+instead of making another vision call.
+"""
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.models.image_hash import ImageHashEntry
+from app.repositories.image_hash_repository import ImageHashRepository
+from app.services.ai.extraction_cache import normalize_text
+from app.services.ai.perceptual_hash import BANDS, hamming, hash_bands, hash_to_hex, hex_to_hash
+from app.utils.metrics import CounterSet
+
+logger = logging.getLogger(__name__)
+
+# Candidates compared per lookup (documents sharing a band with the hash)
+MAX_CANDIDATES = 50
+
+
+def product_key(product_name: str) -> str:
+    """Key for a product in the index (hash of the normalized name, safe as a Mongo field name)."""
+    return hashlib.sha256(normalize_text(product_name).lower().encode("utf-8")).hexdigest()[:24]
+
+
+class ImageHashIndex:
+    """Near-duplicate lookup of vision answers by perceptual hash."""
+
+    def __init__(
+        self,
+        max_distance: int,
+        repository_factory: Callable[[], ImageHashRepository] = ImageHashRepository,
+        enabled: bool = True
+    ):
+        """
+        Initialize index.
+
+        Args:
+            max_distance: Largest Hamming distance treated as the same image
+                          (at most BANDS - 1, so band lookup finds every match)
+            repository_factory: Builds the repository backing the index
+            enabled: When False, lookups miss and nothing is stored
+        """
+        self.max_distance = max(0, min(max_distance, BANDS - 1))
+        self.repository_factory = repository_factory
+        self.enabled = enabled
+        self.counters = CounterSet()
+
+    def _nearest(self, value: int, docs: List[dict]) -> Optional[Tuple[ImageHashEntry, int]]:
+        best = None
+        for doc in docs:
+            entry = ImageHashEntry.from_mongo(doc)
+            distance = hamming(value, hex_to_hash(entry.hash))
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (entry, distance)
+        return best
+
+    async def find_verdict(self, value: int, product_name: str) -> Optional[str]:
+        """
+        Find a vision verdict for this product on the same or a near-identical image.
+
+        Args:
+            value: dHash of the image
+            product_name: Product the image is checked against
+
+        Returns:
+            The stored verdict, or None
+        """
+        if not self.enabled:
+            return None
+
+        self.counters.incr("lookups")
+        key = product_key(product_name)
+        try:
+            # Only documents with a verdict for this product, so the limit isn't used up by others
+            docs = await self.repository_factory().find_by_bands(hash_bands(value), key, MAX_CANDIDATES)
+        except Exception as e:
+            # The index is an optimisation; never fail the request over it
+            logger.warning(f"Image hash lookup failed: {e}")
+            self.counters.incr("errors")
+            return None
+
+        nearest = self._nearest(value, docs)
+        if nearest is None:
+            self.counters.incr("misses")
+            return None
+        entry, distance = nearest
+        self.counters.incr("exact_hits" if distance == 0 else "near_hits")
+        return entry.verdicts[key]
+
+    async def find_best(self, candidates: Dict[str, int], product_name: str) -> Optional[str]:
+        """
+        Find a candidate that shows an image previously chosen as best for this product.
+
+        Args:
+            candidates: Candidate image URL -> dHash
+            product_name: Product the images belong to
+
+        Returns:
+            The matching candidate URL (closest match first), or None
+        """
+        if not self.enabled or not candidates:
+            return None
+
+        self.counters.incr("lookups")
+        try:
+            docs = await self.repository_factory().find_best_for(product_key(product_name), MAX_CANDIDATES)
+        except Exception as e:
+            logger.warning(f"Image hash lookup failed: {e}")
+            self.counters.incr("errors")
+            return None
+
+        matches = []
+        for url, value in candidates.items():
+            nearest = self._nearest(value, docs)
+            if nearest is not None:
+                matches.append((nearest[1], url))
+        if not matches:
+            self.counters.incr("misses")
+            return None
+        distance, url = min(matches)
+        self.counters.incr("exact_hits" if distance == 0 else "near_hits")
+        return url
+
+    async def record(
+        self,
+        value: int,
+        image_url: str,
+        product_name: str,
+        verdict: Optional[str] = None,
+        best: bool = False
+    ) -> None:
+        """
+        Record a processed image with a verdict and/or best-image decision.
+
+        Args:
+            value: dHash of the image
+            image_url: URL the image was fetched from
+            product_name: Product the answer is about
+            verdict: Vision verdict for this product, if any
+            best: True if the image was chosen as the product's best image
+        """
+        if not self.enabled:
+            return
+
+        key = product_key(product_name)
+        try:
+            await self.repository_factory().upsert(
+                hash_to_hex(value),
+                hash_bands(value),
+                image_url,
+                datetime.utcnow(),
+                verdicts={key: verdict} if verdict else None,
+                best_for=key if best else None,
+            )
+            self.counters.incr("stores")
+        except Exception as e:
+            logger.warning(f"Image hash write failed: {e}")
+            self.counters.incr("errors")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return lookup counters."""
+        return {"enabled": self.enabled, "max_distance": self.max_distance, **self.counters.snapshot()}
+
+    def reset(self) -> None:
+        self.counters.reset()
+
+
+image_hash_index = ImageHashIndex(
+    max_distance=settings.IMAGE_HASH_MAX_DISTANCE,
+    enabled=settings.IMAGE_HASH_INDEX_ENABLED,
+)
@@ -0,0 +1,260 @@
+"""
+Local fetch-and-downscale stage for images sent to vision models.
+
+Passing a retailer's image URL straight to the provider makes it download
+the full multi-megabyte original and bill high-detail image tokens. Instead
+the image is fetched here (with size and time limits), downscaled with
+Pillow to IMAGE_MAX_EDGE and sent as a base64 JPEG with low detail.
+Processed images are cached by a hash of the fetched bytes, so the same
+picture served from different URLs is only processed once. Decoding runs
+on a bounded thread pool, so a burst of images can't take every default
+executor thread or block the event loop.
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import ipaddress
+import logging
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from urllib.parse import urlsplit
+import httpx
+from PIL import Image, UnidentifiedImageError
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.http_client import http_client
+from app.services.ai.image_quality import ImageQuality, measure_quality
+from app.services.ai.perceptual_hash import dhash
+from app.utils.cache import LRUCache
+from app.utils.metrics import CounterSet
+
+logger = logging.getLogger(__name__)
+
+# Pipeline counters (fetches, bytes_fetched, bytes_sent, cache_hits, url_hits, failures)
+pipeline_counters = CounterSet()
+
+
+class ProcessedImage(BaseModel):
+    """A downscaled image ready for a vision call."""
+    data_url: str  # "data:image/jpeg;base64,..."
+    dhash: int  # Perceptual hash (see perceptual_hash.py)
+    quality: ImageQuality  # Features for the quality filter (see image_quality.py)
+
+
+# Decoding, resizing and measuring images is CPU-bound
+decode_pool = ThreadPoolExecutor(max_workers=max(1, settings.IMAGE_DECODE_WORKERS), thread_name_prefix="image-decode")
+
+# Processed images keyed by sha256 of the fetched bytes
+processed_images = LRUCache(settings.IMAGE_PIPELINE_CACHE_ENTRIES)
+
+# Content hash of recently fetched URLs, so hashing then sending an image downloads it once
+recent_urls = LRUCache(settings.IMAGE_PIPELINE_CACHE_ENTRIES * 4, ttl_seconds=settings.IMAGE_PIPELINE_URL_TTL_SECONDS)
+
+
+async def _resolve(host: str, port: int) -> List[str]:
+    """Resolve a host name to its addresses."""
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+async def _check_public_host(url: str) -> str:
+    """
+    Refuse non-HTTP URLs and hosts resolving to private addresses (the URL comes from clients).
+
+    Returns:
+        The checked address to connect to, so the host isn't resolved again
+        (and possibly differently) when connecting
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"Unsupported image URL: {url}")
+
+    try:
+        addresses = await _resolve(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+    except OSError as e:
+        raise ValueError(f"Could not resolve image host {parts.hostname}: {e}")
+    if not addresses:
+        raise ValueError(f"Could not resolve image host {parts.hostname}")
+    if not settings.IMAGE_FETCH_ALLOW_PRIVATE_HOSTS:
+        for address in addresses:
+            if not ipaddress.ip_address(address).is_global:
+                raise ValueError(f"Image host {parts.hostname} is not a public address")
+    return addresses[0]
+
+
+async def fetch_image(url: str, max_bytes: int, timeout: float) -> bytes:
+    """
+    Download an image with size and time limits.
+
+    Redirects are followed here, up to IMAGE_FETCH_MAX_REDIRECTS, so every
+    hop's host is checked, and each request connects to the address that
+    was checked rather than resolving the host again, on a connection of
+    its own.
+
+    Args:
+        url: Image URL
+        max_bytes: Largest body accepted
+        timeout: Seconds allowed for the whole download
+
+    Returns:
+        Raw image bytes
+
+    Raises:
+        ValueError: If the download fails, is too large, too slow or isn't an image
+    """
+    async def download() -> bytes:
+        current = httpx.URL(url)
+        for _ in range(settings.IMAGE_FETCH_MAX_REDIRECTS + 1):
+            address = await _check_public_host(str(current))
+            # Not the shared pool: its connections are picked by address, so one
+            # verified for another host name on this address could be reused
+            async with http_client.unpooled_client() as client, client.stream(
+                "GET",
+                current.copy_with(host=address),
+                headers={"Host": current.netloc.decode("ascii")},
+                # TLS still verifies the certificate against the host name
+                extensions={"sni_hostname": current.host},
+                timeout=timeout,
+                follow_redirects=False,
+            ) as response:
+                if response.is_redirect:
+                    current = current.join(response.headers["location"])
+                    continue
+                response.raise_for_status()
+                if response.headers.get("content-type", "").startswith("text/"):
+                    raise ValueError(f"Not an image: {response.headers['content-type']}")
+                declared = response.headers.get("content-length")
+                if declared and declared.isdigit() and int(declared) > max_bytes:
+                    raise ValueError(f"Image too large: {declared} bytes")
+
+                chunks = []
+                size = 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ValueError(f"Image too large: over {max_bytes} bytes")
+                    chunks.append(chunk)
+                return b"".join(chunks)
+        raise ValueError(f"Too many redirects fetching {url}")
+
+    try:
+        return await asyncio.wait_for(download(), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise ValueError(f"Image download timed out after {timeout}s")
+    except httpx.HTTPError as e:
+        raise ValueError(f"Image download failed: {type(e).__name__}: {e}")
+
+
+def downscale_image(data: bytes, max_edge: int, quality: int) -> bytes:
+    """
+    Downscale an image so its longest edge is at most max_edge, as JPEG.
+
+    Transparent areas are flattened onto white and animated images keep
+    their first frame.
+
+    Raises:
+        ValueError: If the bytes aren't a decodable image or it is too large to decode
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+                raise ValueError(f"Image too large to decode: {image.width}x{image.height}")
+            # Let JPEG decoding skip detail we'd throw away anyway
+            image.draft("RGB", (max_edge, max_edge))
+            if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+                rgba = image.convert("RGBA")
+                flattened = Image.new("RGB", rgba.size, (255, 255, 255))
+                flattened.paste(rgba, mask=rgba.getchannel("A"))
+            else:
+                flattened = image.convert("RGB")
+            flattened.thumbnail((max_edge, max_edge))
+
+            output = io.BytesIO()
+            flattened.save(output, "JPEG", quality=quality, optimize=True)
+            return output.getvalue()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Could not decode image: {type(e).__name__}: {e}")
+
+
+def _process(data: bytes, max_edge: int, quality: int) -> Tuple[bytes, int, ImageQuality]:
+    """Downscale image bytes, then hash and measure the result."""
+    processed = downscale_image(data, max_edge, quality)
+    with Image.open(io.BytesIO(data)) as original:
+        # Only reads the header
+        original_size = original.size
+    with Image.open(io.BytesIO(processed)) as image:
+        return processed, dhash(image), measure_quality(image, original_size)
+
+
+async def process_image(url: str) -> ProcessedImage:
+    """
+    Fetch, downscale, encode, hash and measure an image.
+
+    A URL processed within IMAGE_PIPELINE_URL_TTL_SECONDS isn't fetched
+    again, so a caller can hash an image and then send it without a
+    second download.
+
+    Args:
+        url: Image URL
+
+    Returns:
+        ProcessedImage with the data URL, perceptual hash and quality features
+
+    Raises:
+        ValueError: If the image can't be fetched or decoded
+    """
+    digest = recent_urls.get(url)
+    image = processed_images.get(digest) if digest else None
+    if image is not None:
+        pipeline_counters.incr("url_hits")
+        return image
+
+    try:
+        data = await fetch_image(url, settings.IMAGE_FETCH_MAX_BYTES, settings.IMAGE_FETCH_TIMEOUT_SECONDS)
+    except ValueError:
+        pipeline_counters.incr("failures")
+        raise
+    pipeline_counters.incr("fetches")
+    pipeline_counters.incr("bytes_fetched", len(data))
+
+    digest = hashlib.sha256(data).hexdigest()
+    recent_urls.set(url, digest)
+    image = processed_images.get(digest)
+    if image is not None:
+        pipeline_counters.incr("cache_hits")
+        return image
+
+    try:
+        processed, perceptual_hash, quality = await asyncio.get_running_loop().run_in_executor(
+            decode_pool, _process, data, settings.IMAGE_MAX_EDGE, settings.IMAGE_JPEG_QUALITY
+        )
+    except ValueError:
+        pipeline_counters.incr("failures")
+        raise
+    pipeline_counters.incr("bytes_sent", len(processed))
+
+    image = ProcessedImage(
+        data_url="data:image/jpeg;base64," + base64.b64encode(processed).decode("ascii"),
+        dhash=perceptual_hash,
+        quality=quality,
+    )
+    processed_images.set(digest, image)
+    return image
+
+
+async def prepare_image(url: str) -> str:
+    """
+    Fetch, downscale and encode an image for a low-detail vision call.
+
+    Args:
+        url: Image URL
+
+    Returns:
+        A "data:image/jpeg;base64,..." URL
+
+    Raises:
+        ValueError: If the image can't be fetched or decoded
+    """
+    return (await process_image(url)).data_url
@@ -0,0 +1,102 @@
+"""
+Local image quality filter.
+
+Many image candidates can be rejected without any model: tracking pixels,
+sprites, solid-color placeholders, extreme aspect ratios and tiny
+thumbnails. The vision pipeline measures a few cheap features of every
+image it processes (see image_pipeline.py, which runs this on its bounded
+decode pool); callers reject low-quality images before they reach image
+selection or the vision verifier, and the pre-ranker uses the measured
+size in place of URL hints.
+"""
+from typing import Optional, Tuple
+from PIL import Image
+from pydantic import BaseModel
+from app.core.config import settings
+from app.utils.metrics import CounterSet
+
+# Rejection reasons
+TOO_SMALL = "too_small"
+EXTREME_ASPECT_RATIO = "extreme_aspect_ratio"
+SOLID_COLOR = "solid_color"
+LOW_ENTROPY = "low_entropy"
+
+# Images checked and rejected, plus one counter per rejection reason
+quality_counters = CounterSet()
+
+# Features are measured on a thumbnail this size; plenty for histograms
+_SAMPLE_EDGE = 128
+# Bits kept per channel when grouping pixels into colors, so JPEG noise
+# around a flat placeholder still counts as one color
+_COLOR_BITS = 3
+
+
+class ImageQuality(BaseModel):
+    """Cheap quality features of a fetched image."""
+    width: int  # Original size, before downscaling
+    height: int
+    entropy: float  # Shannon entropy of the grayscale histogram, in bits (0-8)
+    dominant_color_share: float  # Share of pixels in the most common (coarse) color, 0.0-1.0
+
+    @property
+    def aspect_ratio(self) -> float:
+        """Longer edge over shorter edge (1.0 for a square)."""
+        return max(self.width, self.height) / max(1, min(self.width, self.height))
+
+
+def measure_quality(image: Image.Image, original_size: Tuple[int, int]) -> ImageQuality:
+    """
+    Measure quality features of an image.
+
+    CPU-bound; run it off the event loop.
+
+    Args:
+        image: Decoded image (may already be downscaled)
+        original_size: (width, height) of the image as fetched
+
+    Returns:
+        ImageQuality
+    """
+    sample = image.convert("RGB")
+    sample.thumbnail((_SAMPLE_EDGE, _SAMPLE_EDGE))
+    shift = 8 - _COLOR_BITS
+    coarse = sample.point(lambda value: value >> shift)
+    pixels = sample.width * sample.height
+    colors = coarse.getcolors(maxcolors=pixels) or [(0, None)]
+
+    return ImageQuality(
+        width=original_size[0],
+        height=original_size[1],
+        entropy=max(0.0, round(sample.convert("L").entropy(), 4)),
+        dominant_color_share=round(max(count for count, _ in colors) / pixels, 4),
+    )
+
+
+def rejection_reason(quality: ImageQuality) -> Optional[str]:
+    """
+    Why an image can't be a usable product photo, if it can't.
+
+    Thresholds come from the IMAGE_QUALITY_* settings.
+
+    Returns:
+        A rejection reason, or None if the image passes
+    """
+    if min(quality.width, quality.height) < settings.IMAGE_QUALITY_MIN_EDGE:
+        return TOO_SMALL
+    if quality.aspect_ratio > settings.IMAGE_QUALITY_MAX_ASPECT_RATIO:
+        return EXTREME_ASPECT_RATIO
+    if quality.dominant_color_share > settings.IMAGE_QUALITY_MAX_DOMINANT_SHARE:
+        return SOLID_COLOR
+    if quality.entropy < settings.IMAGE_QUALITY_MIN_ENTROPY:
+        return LOW_ENTROPY
+    return None
+
+
+def check_quality(quality: ImageQuality) -> Optional[str]:
+    """Like rejection_reason, but counted in quality_counters."""
+    reason = rejection_reason(quality)
+    quality_counters.incr("checked")
+    if reason:
+        quality_counters.incr("rejected")
+        quality_counters.incr(reason)
+    return reason
@@ -0,0 +1,226 @@
+"""
+Image candidate pre-ranker.
+
+The image_urls a client sends often hold dozens of CDN size/format variants
+of the same picture plus icons, sprites and tracking pixels. Before image
+selection reaches the LLM, variants are collapsed to one candidate each,
+obvious non-product assets are dropped and the rest are scored by size
+(measured when the image was fetched, else hinted by the URL) and
+similarity to the product slug. When one candidate clearly
+dominates it is the answer; otherwise only the top K are sent on.
+"""
+import re
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+from pydantic import BaseModel
+from app.services.ai.image_quality import ImageQuality
+
+# Query parameters that only choose a rendition (size, crop, quality, format)
+SIZE_QUERY_PARAMS = {"w", "width", "wid", "sw", "imwidth", "maxwidth", "h", "height", "hei", "sh", "imheight", "maxheight"}
+RENDITION_QUERY_PARAMS = SIZE_QUERY_PARAMS | {
+    "size", "sz", "resize", "fit", "crop", "quality", "qlt", "q", "fmt", "fm", "format",
+    "auto", "dpr", "scale", "op_sharpen", "op_usm", "bg", "canvas", "pad", "mode",
+}
+IMAGE_EXTENSIONS = ("jpg", "jpeg", "png", "webp", "avif", "gif", "jfif", "bmp", "tif", "tiff", "heic")
+
+# Filename/path words that mark page furniture rather than product photos
+NON_PRODUCT_WORDS = {
+    "icon", "icons", "logo", "logos", "sprite", "sprites", "favicon", "pixel", "spacer", "blank",
+    "placeholder", "loading", "loader", "spinner", "badge", "badges", "avatar", "tracking",
+    "beacon", "transparent", "1x1", "payment", "payments", "rating", "ratings", "stars",
+    "arrow", "button", "btn", "social", "flag", "flags", "banner", "newsletter",
+}
+NON_PRODUCT_EXTENSIONS = {"svg", "ico"}
+TRACKING_HOSTS = ("doubleclick.net", "google-analytics.com", "googletagmanager.com", "facebook.com",
+                  "bat.bing.com", "scorecardresearch.com", "analytics.", "pixel.")
+MIN_ASSET_SIZE = 50  # Pixel hints below this are icons or tracking pixels
+
+# Slug words that say nothing about which product it is
+_SLUG_STOPWORDS = {"unknown", "product", "products", "item", "items", "html", "htm", "php", "aspx",
+                   "www", "com", "shop", "store", "the", "and", "for", "with", "dp", "gp", "p"}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Size suffixes in filenames: Shopify "_800x800", WordPress "-300x200", "@2x", Amazon "._AC_SX679_"
+_DIMENSIONS = re.compile(r"[_-](\d{2,4})x(\d{2,4})?(?=[._@-]|$)")
+_RETINA = re.compile(r"@\d(?:\.\d)?x(?=\.|$)")
+_AMAZON_RENDITION = re.compile(r"\._[A-Z0-9_,]+_(?=\.[a-z]+$)")
+_AMAZON_SIZE = re.compile(r"(?:^|_)(?:AC_)?(?:S[XYLR]|U[XYLS]|SS|QL)(\d{2,4})", re.IGNORECASE)
+# Cloudinary/imgix-style transformation segments, e.g. "w_800,h_600,c_fill,f_auto"
+_TRANSFORM_PARAM = r"(?:w|h|c|f|q|g|ar|dpr|fl)_[a-z0-9.:]+"
+_TRANSFORM_SEGMENT = re.compile(rf"^{_TRANSFORM_PARAM}(?:,{_TRANSFORM_PARAM})*$")
+_TRANSFORM_SIZE = re.compile(r"(?:^|,)[wh]_(\d{2,4})(?=,|$)")
+
+
+class ImageCandidate(BaseModel):
+    """One distinct image (all size/format variants collapsed)."""
+    url: str  # Largest variant seen
+    variants: int = 1
+    size_hint: Optional[int] = None  # Largest dimension measured or hinted by the URL, in pixels
+    similarity: float = 0.0  # Share of product slug words found in the image path
+    score: float = 0.0
+
+
+class RankedImages(BaseModel):
+    """Result of pre-ranking a candidate list."""
+    candidates: List[ImageCandidate]  # Best first
+    dominant: Optional[str] = None  # Set when one candidate clearly wins
+    collapsed: int = 0  # URLs merged into another variant
+    dropped: int = 0  # Non-product assets removed
+
+
+def _split_filename(path: str):
+    directory, _, filename = path.rpartition("/")
+    stem, dot, extension = filename.rpartition(".")
+    if not dot or extension.lower() not in IMAGE_EXTENSIONS + tuple(NON_PRODUCT_EXTENSIONS):
+        return directory, filename, ""
+    return directory, stem, extension.lower()
+
+
+def _int(value: str) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def size_hint(url: str) -> Optional[int]:
+    """Largest pixel dimension hinted by an image URL's query or filename, if any."""
+    parts = urlsplit(url)
+    hints = [
+        _int(value) for key, value in parse_qsl(parts.query)
+        if key.lower() in SIZE_QUERY_PARAMS
+    ]
+    path = unquote(parts.path)
+    _, stem, _ = _split_filename(path)
+    for match in _DIMENSIONS.finditer(stem):
+        hints.extend(_int(group) for group in match.groups() if group)
+    rendition = _AMAZON_RENDITION.search(path)
+    if rendition:
+        hints.extend(_int(value) for value in _AMAZON_SIZE.findall(rendition.group(0)))
+    for segment in path.split("/"):
+        if _TRANSFORM_SEGMENT.match(segment):
+            hints.extend(_int(value) for value in _TRANSFORM_SIZE.findall(segment))
+    hints = [hint for hint in hints if hint]
+    return max(hints) if hints else None
+
+
+def variant_key(url: str) -> str:
+    """
+    Key shared by URLs that differ only by size or format.
+
+    Drops rendition query parameters, size suffixes, transformation path
+    segments and the file extension.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    path = unquote(parts.path)
+    path = _AMAZON_RENDITION.sub("", path)
+    directory, stem, _ = _split_filename(path)
+    directory = "/".join(s for s in directory.split("/") if s and not _TRANSFORM_SEGMENT.match(s))
+    stem = _RETINA.sub("", _DIMENSIONS.sub("", stem))
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query)
+        if key.lower() not in RENDITION_QUERY_PARAMS
+    )
+    return f"{host}/{directory}/{stem.lower()}?{urlencode(query)}"
+
+
+def is_non_product_asset(url: str, product_words: Optional[Set[str]] = None) -> bool:
+    """
+    True for icons, logos, sprites, tracking pixels and similar page furniture.
+
+    Furniture words that are part of the product's own name (a "logo tee",
+    a "flag banner") don't count, so its photos are kept.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if any(marker in host for marker in TRACKING_HOSTS):
+        return True
+    path = unquote(parts.path).lower()
+    _, _, extension = _split_filename(path)
+    if extension in NON_PRODUCT_EXTENSIONS:
+        return True
+    if (NON_PRODUCT_WORDS - (product_words or set())) & set(_TOKEN.findall(path)):
+        return True
+    hint = size_hint(url)
+    return hint is not None and hint < MIN_ASSET_SIZE
+
+
+def slug_tokens(product_name: str) -> Set[str]:
+    """Words of a product slug (from extract_product_name_from_url) worth matching."""
+    return {
+        token for token in _TOKEN.findall((product_name or "").lower())
+        if len(token) > 1 and token not in _SLUG_STOPWORDS
+    }
+
+
+def _similarity(url: str, product_words: Set[str]) -> float:
+    if not product_words:
+        return 0.0
+    path_words = set(_TOKEN.findall(unquote(urlsplit(url).path).lower()))
+    return len(product_words & path_words) / len(product_words)
+
+
+def _score(candidate: ImageCandidate) -> float:
+    # Unknown sizes count as middling so URLs without hints aren't penalised
+    size = min(candidate.size_hint, 1000) / 1000 if candidate.size_hint else 0.5
+    return round(0.6 * candidate.similarity + 0.4 * size, 4)
+
+
+def rank_image_candidates(
+    image_urls: List[str],
+    product_name: str,
+    min_score: float = 0.6,
+    margin: float = 0.25,
+    qualities: Optional[Dict[str, ImageQuality]] = None,
+) -> RankedImages:
+    """
+    Collapse, filter and score image candidates.
+
+    Args:
+        image_urls: Candidate image URLs in page order
+        product_name: Product name derived from the page URL
+        min_score: Lowest score (0.0-1.0) that may answer without the LLM
+        margin: How far the best score must lead the runner-up to dominate
+        qualities: Measured features of candidates that were fetched, by URL
+
+    Returns:
+        RankedImages with candidates best first and the dominant URL, if any
+    """
+    qualities = qualities or {}
+    product_words = slug_tokens(product_name)
+    groups: Dict[str, ImageCandidate] = {}
+    collapsed = dropped = 0
+    for url in image_urls:
+        url = url.strip()
+        if not url:
+            continue
+        if is_non_product_asset(url, product_words):
+            dropped += 1
+            continue
+        key = variant_key(url)
+        quality = qualities.get(url)
+        hint = max(quality.width, quality.height) if quality else size_hint(url)
+        existing = groups.get(key)
+        if existing is None:
+            groups[key] = ImageCandidate(url=url, size_hint=hint)
+            continue
+        collapsed += 1
+        existing.variants += 1
+        if hint and (existing.size_hint is None or hint > existing.size_hint):
+            existing.url, existing.size_hint = url, hint
+
+    candidates = list(groups.values())
+    for candidate in candidates:
+        candidate.similarity = _similarity(candidate.url, product_words)
+        candidate.score = _score(candidate)
+    # Stable sort keeps page order between equal scores
+    candidates.sort(key=lambda c: c.score, reverse=True)
+
+    dominant = None
+    if candidates and candidates[0].score >= min_score:
+        runner_up = candidates[1].score if len(candidates) > 1 else 0.0
+        if candidates[0].score - runner_up >= margin:
+            dominant = candidates[0].url
+
+    return RankedImages(candidates=candidates, dominant=dominant, collapsed=collapsed, dropped=dropped)
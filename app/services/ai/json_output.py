@@ -0,0 +1,220 @@
+"""
+Typed, schema-constrained LLM output with local JSON repair.
+
+Parsers ask providers for JSON output (a strict JSON schema on OpenAI, JSON
+mode on Groq). Whatever comes back is parsed directly first. If that fails,
+common defects are repaired locally before giving up, so the user doesn't
+have to retry with another paid completion. The defects are code fences,
+prose around the JSON, single quotes, Python literals, trailing commas and
+output truncated at max_tokens. Which path succeeded is counted in
+`parse_path_counters`.
+"""
+import json
+import re
+from typing import Any, Dict, Optional, Tuple
+from pydantic import BaseModel, ConfigDict, field_validator
+from app.utils.metrics import CounterSet
+
+# Parse paths (parse_path_counters keys)
+PATH_SCHEMA = "schema"  # Schema-constrained output parsed as-is
+PATH_JSON_MODE = "json_mode"  # JSON-mode output parsed as-is
+PATH_DIRECT = "direct"  # Unconstrained output parsed as-is
+PATH_REPAIRED = "repaired"  # Parsed after local repair
+PATH_FAILED = "failed"
+
+parse_path_counters = CounterSet()
+
+_CODE_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class ExtractedProduct(BaseModel):
+    """Typed result of a text extraction."""
+    model_config = ConfigDict(extra="ignore")
+
+    product_name: Optional[str] = None
+    price: Optional[str] = None
+
+    @field_validator("product_name", "price", mode="before")
+    @classmethod
+    def coerce_to_string(cls, v: Any) -> Optional[str]:
+        if v is None or isinstance(v, str):
+            return v
+        if isinstance(v, (int, float)):
+            return str(v)
+        raise ValueError("expected a string")
+
+
+# OpenAI structured-output schema for ExtractedProduct
+PRODUCT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "extracted_product",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "product_name": {"type": ["string", "null"]},
+                "price": {"type": ["string", "null"]},
+            },
+            "required": ["product_name", "price"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def _closes_single_quote(text: str, index: int) -> bool:
+    """An apostrophe ends a single-quoted string only before a JSON delimiter (so "Men's" survives)."""
+    rest = text[index + 1:].lstrip()
+    return not rest or rest[0] in ",:}]"
+
+
+def _extract_json_span(text: str) -> str:
+    """
+    Return the first JSON object/array in text, dropping surrounding prose.
+
+    Unterminated strings and brackets (output cut off at max_tokens) are closed.
+    """
+    start = next((i for i, c in enumerate(text) if c in "{["), None)
+    if start is None:
+        return text
+
+    stack = []
+    quote = None
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote and (quote == '"' or _closes_single_quote(text, index)):
+                quote = None
+            continue
+        if char in "\"'":
+            quote = char
+        elif char in "{[":
+            stack.append(_CLOSERS[char])
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return text[start:index + 1]
+
+    # Truncated output: close what is still open
+    tail = (quote or "") + "".join(reversed(stack))
+    return text[start:].rstrip().rstrip(",") + tail
+
+
+def _normalize_quotes_and_literals(text: str) -> str:
+    """Convert single-quoted strings to double quotes and Python literals to JSON."""
+    out = []
+    index = 0
+    length = len(text)
+    while index < length:
+        char = text[index]
+        if char == '"':
+            # Copy a double-quoted string verbatim
+            end = index + 1
+            while end < length and text[end] != '"':
+                end += 2 if text[end] == "\\" else 1
+            out.append(text[index:end + 1])
+            index = end + 1
+        elif char == "'":
+            # Single-quoted string: an apostrophe only closes it before a JSON delimiter
+            end = index + 1
+            chars = []
+            while end < length:
+                c = text[end]
+                if c == "\\" and end + 1 < length:
+                    chars.append(text[end:end + 2])
+                    end += 2
+                    continue
+                if c == "'" and _closes_single_quote(text, end):
+                    break
+                chars.append('\\"' if c == '"' else c)
+                end += 1
+            out.append('"' + "".join(chars) + '"')
+            index = end + 1
+        elif char.isalpha():
+            end = index
+            while end < length and (text[end].isalnum() or text[end] == "_"):
+                end += 1
+            word = text[index:end]
+            out.append(_PYTHON_LITERALS.get(word, word))
+            index = end
+        else:
+            out.append(char)
+            index += 1
+    return "".join(out)
+
+
+def repair_json(text: str) -> str:
+    """
+    Apply local fixes to malformed LLM JSON output.
+
+    Args:
+        text: Raw completion content
+
+    Returns:
+        Best-effort JSON text (may still be invalid)
+    """
+    candidate = (text or "").strip()
+    fence = _CODE_FENCE.search(candidate)
+    if fence:
+        candidate = fence.group(1).strip()
+    candidate = _extract_json_span(candidate)
+    candidate = _normalize_quotes_and_literals(candidate)
+    return _TRAILING_COMMA.sub(r"\1", candidate)
+
+
+def parse_json_output(content: str, direct_path: str = PATH_DIRECT) -> Tuple[Any, str]:
+    """
+    Parse completion content as JSON, repairing it locally if needed.
+
+    Args:
+        content: Raw completion content
+        direct_path: Path to report when the content parses as-is
+
+    Returns:
+        Tuple of (parsed JSON value, parse path)
+
+    Raises:
+        ValueError: If the content can't be parsed even after repair
+    """
+    try:
+        parsed, path = json.loads(content.strip()), direct_path
+    except (json.JSONDecodeError, AttributeError):
+        try:
+            parsed, path = json.loads(repair_json(content)), PATH_REPAIRED
+        except json.JSONDecodeError:
+            parse_path_counters.incr(PATH_FAILED)
+            raise ValueError(f"Response is not valid JSON even after repair: {content}")
+    parse_path_counters.incr(path)
+    return parsed, path
+
+
+_FIELD_VALUE = r'"{name}"\s*:\s*("(?:[^"\\]|\\.)*"|null|true|false|-?\d+(?:\.\d+)?(?=\s*[,}}]))'
+
+
+def complete_fields(partial: str) -> Dict[str, Optional[str]]:
+    """
+    Return the ExtractedProduct fields whose values are complete in partial JSON output.
+
+    A string value counts once its closing quote has arrived, a number once
+    the next delimiter has, so streamed fields are never reported half-written.
+    """
+    found = {}
+    for name in ExtractedProduct.model_fields:
+        match = re.search(_FIELD_VALUE.format(name=re.escape(name)), partial or "")
+        if match:
+            try:
+                value = ExtractedProduct.model_validate({name: json.loads(match.group(1))})
+            except ValueError:
+                continue
+            found[name] = getattr(value, name)
+    return found
@@ -0,0 +1,238 @@
+"""
+Concurrency and timeout guards for outbound AI provider calls.
+
+Every completion made by the AI service layer goes through `run_ai_call`, which
+caps how many provider calls a worker keeps in flight, applies a per-call
+timeout so a slow provider can't hold a request open indefinitely and records
+the call's usage (see usage.py). Streamed completions go through
+`run_ai_stream`, which does the same for the whole life of the stream.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+from app.core.config import settings
+from app.services.ai.usage import usage_tracker, OUTCOME_OK, OUTCOME_ERROR, OUTCOME_TIMEOUT
+
+T = TypeVar("T")
+
+
+class InFlightLimiter:
+    """Caps the number of concurrent AI calls made from this worker."""
+
+    def __init__(self, max_in_flight: int):
+        """
+        Initialize limiter.
+
+        Args:
+            max_in_flight: Maximum number of calls allowed to run at once
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.timeouts = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores are bound to the loop they first wait on, so rebuild one
+        # whenever we are running on a different loop (e.g. between test clients)
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._loop = loop
+        return self._semaphore
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        timeout: Optional[float] = None
+    ) -> T:
+        """
+        Run an AI call once a slot is free, bounded by a timeout.
+
+        Args:
+            call: Zero-argument function returning the awaitable to run
+            timeout: Seconds to wait for the call (excluding time queued for a slot)
+
+        Returns:
+            Result of the call
+
+        Raises:
+            asyncio.TimeoutError: If the call exceeds the timeout
+        """
+        async with self.slot():
+            try:
+                return await asyncio.wait_for(call(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one call slot for the duration of the block, waiting for one if needed."""
+        async with self._get_semaphore():
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of limiter counters."""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+        }
+
+
+ai_call_limiter = InFlightLimiter(settings.AI_MAX_CONCURRENT_CALLS)
+
+
+def _token_count(usage: Any, name: str) -> int:
+    value = getattr(usage, name, None)
+    return value if isinstance(value, int) else 0
+
+
+async def run_ai_call(
+    call: Callable[[], Awaitable[T]],
+    timeout: Optional[float] = None,
+    provider: str = "",
+    model: str = "",
+    operation: str = ""
+) -> T:
+    """
+    Run a provider call through the shared in-flight limiter and record its usage.
+
+    Args:
+        call: Zero-argument function returning the provider coroutine,
+              e.g. `lambda: client.chat.completions.create(...)`
+        timeout: Optional override for settings.AI_REQUEST_TIMEOUT_SECONDS
+        provider: Provider name for usage accounting ("openai", "groq")
+        model: Model the call uses
+        operation: What the call is for ("text", "image", "vision", ...)
+
+    Returns:
+        Result of the call
+    """
+    if timeout is None:
+        timeout = settings.AI_REQUEST_TIMEOUT_SECONDS
+
+    started = None
+
+    async def timed() -> T:
+        # Latency is measured once a slot is free, so queueing isn't blamed on the model
+        nonlocal started
+        started = time.monotonic()
+        return await call()
+
+    def elapsed_ms() -> float:
+        return (time.monotonic() - started) * 1000 if started is not None else 0.0
+
+    try:
+        result = await ai_call_limiter.run(timed, timeout=timeout)
+    except asyncio.TimeoutError:
+        usage_tracker.record_call(provider, model, operation, elapsed_ms(), OUTCOME_TIMEOUT)
+        raise
+    except Exception:
+        usage_tracker.record_call(provider, model, operation, elapsed_ms(), OUTCOME_ERROR)
+        raise
+
+    usage = getattr(result, "usage", None)
+    usage_tracker.record_call(
+        provider,
+        model,
+        operation,
+        elapsed_ms(),
+        OUTCOME_OK,
+        prompt_tokens=_token_count(usage, "prompt_tokens"),
+        completion_tokens=_token_count(usage, "completion_tokens"),
+    )
+    return result
+
+
+def _chunk_usage(chunk: Any) -> Any:
+    # OpenAI sends usage on a final chunk when asked to (stream_options.include_usage);
+    # Groq always reports it on the last chunk under x_groq
+    usage = getattr(chunk, "usage", None)
+    if usage is None:
+        usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+    return usage
+
+
+async def run_ai_stream(
+    call: Callable[[], Awaitable[Any]],
+    timeout: Optional[float] = None,
+    provider: str = "",
+    model: str = "",
+    operation: str = ""
+) -> AsyncIterator[Any]:
+    """
+    Stream a provider completion through the shared in-flight limiter and record its usage.
+
+    The call slot and the deadline cover the whole stream, not just the request
+    that opens it, and usage is recorded once the stream ends with the tokens
+    from its usage chunk.
+
+    Args:
+        call: Zero-argument function returning the coroutine that opens the stream
+        timeout: Optional override for settings.AI_REQUEST_TIMEOUT_SECONDS
+        provider: Provider name for usage accounting ("openai", "groq")
+        model: Model the call uses
+        operation: What the call is for ("text_stream", ...)
+
+    Yields:
+        Chunks of the stream as they arrive
+
+    Raises:
+        asyncio.TimeoutError: If the stream isn't finished within the timeout
+    """
+    if timeout is None:
+        timeout = settings.AI_REQUEST_TIMEOUT_SECONDS
+
+    async with ai_call_limiter.slot():
+        started = time.monotonic()
+        deadline = started + timeout
+        outcome = OUTCOME_OK
+        usage = None
+        stream = None
+        try:
+            stream = await asyncio.wait_for(call(), timeout=timeout)
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, deadline - time.monotonic()))
+                except StopAsyncIteration:
+                    break
+                usage = _chunk_usage(chunk) or usage
+                yield chunk
+        except asyncio.TimeoutError:
+            ai_call_limiter.timeouts += 1
+            outcome = OUTCOME_TIMEOUT
+            raise
+        except Exception:
+            outcome = OUTCOME_ERROR
+            raise
+        finally:
+            # Release the connection if the consumer stopped early or the stream failed
+            close = getattr(stream, "close", None)
+            if close is not None:
+                try:
+                    await close()
+                except Exception:
+                    pass
+            usage_tracker.record_call(
+                provider,
+                model,
+                operation,
+                (time.monotonic() - started) * 1000,
+                outcome,
+                prompt_tokens=_token_count(usage, "prompt_tokens"),
+                completion_tokens=_token_count(usage, "completion_tokens"),
+            )
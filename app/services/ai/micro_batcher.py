@@ -0,0 +1,158 @@
+"""
+Micro-batching of small, independent AI prompts.
+
+Callers submit one input each. The batcher holds pending inputs for a few
+milliseconds (or until the batch is full), sends them as a single completion
+and fans the answers back out to the waiting callers. When the batched
+response can't be used, every input falls back to its own call.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Set, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+I = TypeVar("I")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[I, R]):
+    """Coalesces concurrent single-input calls into batched calls."""
+
+    def __init__(
+        self,
+        batch_call: Callable[[List[I]], Awaitable[List[R]]],
+        single_call: Callable[[I], Awaitable[R]],
+        max_batch_size: int,
+        max_wait_ms: float,
+    ):
+        """
+        Initialize batcher.
+
+        Args:
+            batch_call: Makes one call for several inputs, returning results in input order
+            single_call: Makes one call for one input (used for lone inputs and fallbacks)
+            max_batch_size: Flush as soon as this many inputs are pending
+            max_wait_ms: Longest an input waits for others before its batch is sent
+        """
+        self.batch_call = batch_call
+        self.single_call = single_call
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._pending: List[Tuple[I, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched_items = 0
+        self.single_calls = 0
+        self.fallbacks = 0
+
+    async def submit(self, item: I) -> R:
+        """
+        Queue an input and wait for its result.
+
+        Args:
+            item: Input for one call
+
+        Returns:
+            The result for this input
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            # Keep a reference so the event loop can't drop a batch mid-call
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """Cancel queued inputs and batches still running (on shutdown); their callers see CancelledError."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, batch: List[Tuple[I, asyncio.Future]]) -> None:
+        batch = [(item, future) for item, future in batch if not future.done()]  # Skip cancelled callers
+        if not batch:
+            return
+        try:
+            await self._call(batch)
+        finally:
+            # Cancelled mid-call: don't leave callers waiting forever
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    async def _call(self, batch: List[Tuple[I, asyncio.Future]]) -> None:
+        if len(batch) > 1:
+            try:
+                results = await self.batch_call([item for item, _ in batch])
+                if not isinstance(results, list) or len(results) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} batched results, got {results!r:.200}")
+            except Exception as e:
+                logger.warning(f"Batched call of {len(batch)} failed, falling back to single calls: {e}")
+                self.fallbacks += 1
+            else:
+                self.batches += 1
+                self.batched_items += len(batch)
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+                return
+
+        await asyncio.gather(*(self._run_single(item, future) for item, future in batch))
+
+    async def _run_single(self, item: I, future: asyncio.Future) -> None:
+        self.single_calls += 1
+        try:
+            result = await self.single_call(item)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def reset(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._pending.clear()
+        self._tasks.clear()
+        self.batches = 0
+        self.batched_items = 0
+        self.single_calls = 0
+        self.fallbacks = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batching counters."""
+        return {
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "avg_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+            "single_calls": self.single_calls,
+            "fallbacks": self.fallbacks,
+            "pending": len(self._pending),
+            "running": len(self._tasks),
+        }
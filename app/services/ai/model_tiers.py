@@ -0,0 +1,112 @@
+"""
+Cheap-model-first execution with escalation to a large model.
+
+A small, fast model answers first. Its answer is only used when it parses and
+passes validation (e.g. both product name and price present); otherwise the
+same prompt escalates to the large model. Per-tier hit rates and latencies are
+tracked so the policy can be tuned.
+"""
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple, TypeVar
+from app.services.ai.provider_router import ProviderStats
+from app.utils.metrics import CounterSet
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SMALL = "small"
+LARGE = "large"
+
+
+class ModelTiering:
+    """Runs a small-model call first and escalates to a large-model call when needed."""
+
+    def __init__(self, window_size: int = 100):
+        """
+        Initialize tiering stats.
+
+        Args:
+            window_size: Recent calls per tier used for latency percentiles
+        """
+        self.window_size = window_size
+        self._latency = {tier: ProviderStats(tier, window_size) for tier in (SMALL, LARGE)}
+        # small_hits, large_hits, escalated_invalid, escalated_rejected, large_failed_fallbacks
+        self.counters = CounterSet()
+
+    async def _timed(self, tier: str, call: Callable[[], Awaitable[T]]) -> T:
+        started = time.perf_counter()
+        try:
+            result = await call()
+        except Exception:
+            self._latency[tier].record(time.perf_counter() - started, ok=False)
+            raise
+        self._latency[tier].record(time.perf_counter() - started, ok=True)
+        return result
+
+    async def run(
+        self,
+        small: Callable[[], Awaitable[T]],
+        large: Callable[[], Awaitable[T]],
+        accept: Callable[[T], bool]
+    ) -> Tuple[T, str]:
+        """
+        Run the small tier, escalating to the large tier if it fails or is rejected.
+
+        Args:
+            small: Zero-argument function returning the small-model call
+            large: Zero-argument function returning the large-model call
+            accept: Validation applied to the small model's result
+
+        Returns:
+            Tuple of (result, tier that produced it)
+        """
+        small_result = None
+        try:
+            small_result = await self._timed(SMALL, small)
+        except Exception as e:
+            # Invalid JSON, timeouts and provider errors all escalate
+            self.counters.incr("escalated_invalid")
+            logger.info(f"Small model failed, escalating: {type(e).__name__}: {e}")
+        else:
+            if accept(small_result):
+                self.counters.incr("small_hits")
+                return small_result, SMALL
+            self.counters.incr("escalated_rejected")
+
+        try:
+            result = await self._timed(LARGE, large)
+        except Exception:
+            if small_result is None:
+                raise
+            # A partial small-model answer beats an error
+            self.counters.incr("large_failed_fallbacks")
+            return small_result, SMALL
+        self.counters.incr("large_hits")
+        return result, LARGE
+
+    def reset(self) -> None:
+        self._latency = {tier: ProviderStats(tier, self.window_size) for tier in (SMALL, LARGE)}
+        self.counters.reset()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-tier hit rates and latency percentiles."""
+        result: Dict[str, Any] = {}
+        for tier, hits in ((SMALL, self.counters.get("small_hits")), (LARGE, self.counters.get("large_hits"))):
+            latency = self._latency[tier]
+            p50 = latency.latency_percentile(50)
+            p95 = latency.latency_percentile(95)
+            result[tier] = {
+                "calls": latency.calls,
+                "hits": hits,
+                "hit_rate": round(hits / latency.calls, 4) if latency.calls else 0.0,
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            }
+        result["escalations"] = {
+            "invalid": self.counters.get("escalated_invalid"),
+            "rejected": self.counters.get("escalated_rejected"),
+        }
+        result["large_failed_fallbacks"] = self.counters.get("large_failed_fallbacks")
+        return result
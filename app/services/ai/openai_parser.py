@@ -1,13 +1,57 @@
 import json
-from openai import OpenAI
+import logging
+from contextlib import aclosing
+from openai import AsyncOpenAI
 from app.core.config import settings
+from app.services.ai.limits import run_ai_call, run_ai_stream
+from app.services.ai.provider_router import OPENAI
+from app.services.ai.json_output import (
+    ExtractedProduct,
+    parse_json_output,
+    PATH_SCHEMA,
+    PRODUCT_RESPONSE_FORMAT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Create async OpenAI client instance (non-blocking inside async routes)
+client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    base_url=settings.OPENAI_BASE_URL or None,
+    timeout=settings.AI_REQUEST_TIMEOUT_SECONDS,
+)
+
+# Model and prompt versions are part of the extraction cache key.
+# Bump a prompt version whenever its prompt changes so cached answers are not reused.
+TEXT_MODEL = "gpt-4o"
+TEXT_SMALL_MODEL = "gpt-4o-mini"  # First tier when model tiering is enabled
+TEXT_PROMPT_VERSION = "2"  # 2: typed, schema-constrained output
+IMAGE_MODEL = "gpt-4o"
+IMAGE_PROMPT_VERSION = "1"
+
+def _text_prompt(input_text: str) -> str:
+    """Build the product extraction prompt for one page of innerText."""
+    return f"""
+    You are an AI that extracts product details from shopping website text.
+    Analyze the following text and extract the following information:
+    - Product Name
+    - Price
 
-# Create OpenAI client instance
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    Provide the output as a JSON object with keys 'product_name' and 'price'.
+    If a field is missing, use 'null' as the value.
+    Remember to only output the JSON, don't output anything else.
 
-def parse_inner_text_with_openai(input_text: str) -> dict:
+    Text:
+    {input_text.strip()}
+    """
+
+async def parse_inner_text_with_openai(input_text: str, model: str = TEXT_MODEL) -> dict:
     """
     Send plain innerText to OpenAI and extract product information.
+
+    Args:
+        input_text: Page innerText
+        model: Chat model to use (TEXT_MODEL or TEXT_SMALL_MODEL)
     
     Returns:
         dict: Dictionary with 'product_name' and 'price' keys
@@ -15,51 +59,106 @@ def parse_inner_text_with_openai(input_text: str) -> dict:
     if not isinstance(input_text, str) or not input_text.strip():
         raise ValueError("Invalid input: Expecting plain text input.")
 
+    prompt = _text_prompt(input_text)
+
+    try:
+        # Send the request to OpenAI using the async client API
+        response = await run_ai_call(lambda: client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=500,
+            temperature=0,
+            response_format=PRODUCT_RESPONSE_FORMAT,
+        ), provider=OPENAI, model=model, operation="text")
+
+        # Parse the (JSON-constrained) response, repairing it locally if needed
+        result = response.choices[0].message.content.strip()
+        parsed_result, path = parse_json_output(result, PATH_SCHEMA)
+        if path != PATH_SCHEMA:
+            logger.info(f"Repaired OpenAI JSON output ({path})")
+
+        return ExtractedProduct.model_validate(parsed_result).model_dump()
+
+    except Exception as e:
+        raise ValueError(f"Error parsing text with OpenAI: {e}")
+
+async def stream_inner_text_with_openai(input_text: str, model: str = TEXT_MODEL):
+    """
+    Stream the extraction completion for plain innerText from OpenAI.
+
+    Yields:
+        str: Content deltas of the JSON answer as they arrive
+    """
+    if not isinstance(input_text, str) or not input_text.strip():
+        raise ValueError("Invalid input: Expecting plain text input.")
+
+    prompt = _text_prompt(input_text)
+
+    try:
+        # Closing the stream right away frees its call slot when the caller stops early
+        async with aclosing(run_ai_stream(lambda: client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=500,
+            temperature=0,
+            response_format=PRODUCT_RESPONSE_FORMAT,
+            stream=True,
+            stream_options={"include_usage": True},
+        ), provider=OPENAI, model=model, operation="text_stream")) as chunks:
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    except Exception as e:
+        raise ValueError(f"Error streaming text with OpenAI: {e}")
+
+async def parse_inner_texts_with_openai(input_texts: list, model: str = TEXT_MODEL) -> list:
+    """
+    Send several innerTexts to OpenAI in one completion and extract product information for each.
+    
+    Returns:
+        list: One dictionary with 'product_name' and 'price' keys per input, in input order
+    """
+    if not isinstance(input_texts, list) or not input_texts or not all(isinstance(t, str) and t.strip() for t in input_texts):
+        raise ValueError("Invalid input: Expecting a list of plain text inputs.")
+
+    pages = "\n\n".join(f"### Page {i + 1}\n{text.strip()}" for i, text in enumerate(input_texts))
+
     # Create a prompt for OpenAI
     prompt = f"""
     You are an AI that extracts product details from shopping website text.
-    Analyze the following text and extract the following information:
+    Below are {len(input_texts)} independent pages. For each page, extract:
     - Product Name
     - Price
 
-    Provide the output as a JSON object with keys 'product_name' and 'price'.
+    Provide the output as a JSON array with exactly {len(input_texts)} objects, one per page and in the same order,
+    each with keys 'product_name' and 'price'.
     If a field is missing, use 'null' as the value.
-    Remember to only output the JSON, don't output anything else.
+    Remember to only output the JSON array, don't output anything else.
 
-    Text:
-    {input_text.strip()}
+    {pages}
     """
 
     try:
-        # Send the request to OpenAI using the new client API
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        response = await run_ai_call(lambda: client.chat.completions.create(
+            model=model,
             messages=[{"role": "user", "content": prompt}],
-            max_tokens=500,
+            max_tokens=100 + 150 * len(input_texts),
             temperature=0,
-        )
+        ), provider=OPENAI, model=model, operation="text_batch")
 
-        # Parse the response as JSON
         result = response.choices[0].message.content.strip()
-        try:
-            # Extract JSON content from OpenAI's response
-            start_index = result.find("{")
-            end_index = result.rfind("}") + 1
-
-            if start_index == -1 or end_index == -1:
-                raise ValueError("OpenAI response does not contain valid JSON.")
+        parsed_result, _ = parse_json_output(result)
 
-            json_content = result[start_index:end_index]
-            parsed_result = json.loads(json_content)
-        except json.JSONDecodeError:
-            raise ValueError(f"OpenAI returned invalid JSON: {result}")
+        if not isinstance(parsed_result, list) or len(parsed_result) != len(input_texts):
+            raise ValueError(f"OpenAI returned a mismatched batch for {len(input_texts)} pages: {result}")
 
-        return parsed_result
+        return [ExtractedProduct.model_validate(item).model_dump() for item in parsed_result]
 
     except Exception as e:
-        raise ValueError(f"Error parsing text with OpenAI: {e}")
+        raise ValueError(f"Error parsing batched text with OpenAI: {e}")
 
-def parse_images_with_openai(page_url: str, product_name: str, image_urls: list) -> str:
+async def parse_images_with_openai(page_url: str, product_name: str, image_urls: list) -> str:
     """
     Uses OpenAI to determine the best product image based on the page URL and product name.
     
@@ -83,12 +182,12 @@ def parse_images_with_openai(page_url: str, product_name: str, image_urls: list)
     """
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        response = await run_ai_call(lambda: client.chat.completions.create(
+            model=IMAGE_MODEL,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=85,
             temperature=0.3,
-        )
+        ), provider=OPENAI, model=IMAGE_MODEL, operation="image")
 
         result = response.choices[0].message.content.strip()
 
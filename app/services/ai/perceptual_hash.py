@@ -0,0 +1,62 @@
+"""
+Perceptual (difference) hashing of product images.
+
+dHash compares the brightness of neighbouring pixels in a 9x8 grayscale
+thumbnail, so the same photo re-encoded, resized or served from another
+CDN hashes to the same or a nearby 64-bit value. Near matches are found by
+splitting the hash into bands: two hashes within (BANDS - 1) bits of each
+other always share at least one band exactly, so a multikey index on the
+bands narrows the search before Hamming distances are compared.
+"""
+from typing import List
+from PIL import Image
+
+HASH_BITS = 64
+BANDS = 4
+_BAND_BITS = HASH_BITS // BANDS
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    Compute the 64-bit difference hash of an image.
+
+    Args:
+        image: Any Pillow image
+
+    Returns:
+        Hash as an unsigned integer
+    """
+    pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hash_to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def hex_to_hash(text: str) -> int:
+    return int(text, 16)
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+def hash_bands(value: int) -> List[str]:
+    """
+    Index keys for near-match lookup, e.g. ["0:a1b2", "1:c3d4", ...].
+
+    Any hash within BANDS - 1 bits of this one shares at least one key.
+    """
+    mask = (1 << _BAND_BITS) - 1
+    return [
+        f"{band}:{(value >> (HASH_BITS - _BAND_BITS * (band + 1))) & mask:0{_BAND_BITS // 4}x}"
+        for band in range(BANDS)
+    ]
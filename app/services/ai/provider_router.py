@@ -0,0 +1,323 @@
+"""
+Latency-aware routing of AI calls across providers (OpenAI, Groq).
+
+Each router keeps a rolling window of recent call latencies and outcomes per
+provider. Calls go to the fastest healthy provider first and fail over to the
+next one on errors or timeouts. When hedging is enabled, a second request is
+sent to the next provider once the first has been running longer than its
+observed p95 latency; whichever succeeds first wins. Streamed calls fail over
+only until the first item arrives, since the caller may already have used it.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+OPENAI = "openai"
+GROQ = "groq"
+
+# Hedged requests never start earlier than this, however fast a provider looks
+MIN_HEDGE_DELAY_SECONDS = 0.05
+# Error rates are only judged once a provider has this many recent calls
+MIN_HEALTH_SAMPLES = 5
+
+
+def configured_providers() -> List[str]:
+    """
+    Providers from settings.AI_PROVIDERS that have an API key, in preference order.
+
+    Falls back to the first listed provider when none has a key, so extraction
+    keeps its previous single-provider behaviour.
+    """
+    keys = {OPENAI: settings.OPENAI_API_KEY, GROQ: settings.GROQ_API_KEY}
+    listed = [p.strip().lower() for p in settings.AI_PROVIDERS.split(",") if p.strip().lower() in keys]
+    available = [p for p in listed if keys[p]]
+    return available or listed[:1]
+
+
+class ProviderStats:
+    """Rolling latency and error statistics for one provider."""
+
+    def __init__(self, name: str, window_size: int):
+        self.name = name
+        self._samples: deque = deque(maxlen=max(1, window_size))  # (latency_seconds, ok)
+        self.calls = 0
+        self.failures = 0
+        self.last_failure_at: Optional[float] = None
+
+    def record(self, latency: float, ok: bool) -> None:
+        self._samples.append((latency, ok))
+        self.calls += 1
+        if not ok:
+            self.failures += 1
+            self.last_failure_at = time.monotonic()
+
+    @property
+    def sample_count(self) -> int:
+        return len(self._samples)
+
+    @property
+    def success_count(self) -> int:
+        return sum(1 for _, ok in self._samples if ok)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile of recent successful calls (None without successes)."""
+        latencies = sorted(latency for latency, ok in self._samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, max(0, math.ceil(percentile / 100 * len(latencies)) - 1))
+        return latencies[index]
+
+    def is_healthy(self, max_error_rate: float, cooldown_seconds: float) -> bool:
+        """Unhealthy while the recent error rate is too high, until the cooldown since the last failure passes."""
+        if self.sample_count < MIN_HEALTH_SAMPLES or self.error_rate <= max_error_rate:
+            return True
+        return self.last_failure_at is None or time.monotonic() - self.last_failure_at >= cooldown_seconds
+
+    def stats(self, max_error_rate: float, cooldown_seconds: float) -> Dict[str, Any]:
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate, 4),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "healthy": self.is_healthy(max_error_rate, cooldown_seconds),
+        }
+
+
+class ProviderRouter:
+    """Routes a call to the fastest healthy provider with failover and optional hedging."""
+
+    def __init__(
+        self,
+        window_size: int,
+        max_error_rate: float,
+        cooldown_seconds: float,
+        hedge_enabled: bool = False,
+        hedge_min_samples: int = 20,
+    ):
+        """
+        Initialize router.
+
+        Args:
+            window_size: Recent calls per provider kept for latency/error stats
+            max_error_rate: Error rate (0.0-1.0) above which a provider is tried last
+            cooldown_seconds: How long an unhealthy provider is demoted after its last failure
+            hedge_enabled: Send a second request once the first exceeds its observed p95
+            hedge_min_samples: Successful calls needed before a provider's p95 is trusted
+        """
+        self.window_size = window_size
+        self.max_error_rate = max_error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self._providers: Dict[str, ProviderStats] = {}
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _stats_for(self, name: str) -> ProviderStats:
+        if name not in self._providers:
+            self._providers[name] = ProviderStats(name, self.window_size)
+        return self._providers[name]
+
+    def order(self, names: List[str]) -> List[str]:
+        """
+        Sort providers: healthy before unhealthy, then by median latency.
+
+        Providers without latency data sort first (in the given order) so
+        they get measured.
+        """
+        def key(item: Tuple[int, str]):
+            index, name = item
+            stats = self._stats_for(name)
+            healthy = stats.is_healthy(self.max_error_rate, self.cooldown_seconds)
+            p50 = stats.latency_percentile(50)
+            return (not healthy, p50 if p50 is not None else 0.0, index)
+
+        return [name for _, name in sorted(enumerate(names), key=key)]
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        stats = self._stats_for(name)
+        if stats.success_count < self.hedge_min_samples:
+            return None
+        return max(MIN_HEDGE_DELAY_SECONDS, stats.latency_percentile(95))
+
+    async def _attempt(self, name: str, call: Callable[[], Awaitable[T]]) -> T:
+        started = time.perf_counter()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            raise  # Lost a hedge race; not the provider's fault
+        except Exception as e:
+            self._stats_for(name).record(time.perf_counter() - started, ok=False)
+            logger.warning(f"AI provider {name} failed: {type(e).__name__}: {e}")
+            raise
+        self._stats_for(name).record(time.perf_counter() - started, ok=True)
+        return result
+
+    async def run(self, calls: Dict[str, Callable[[], Awaitable[T]]]) -> Tuple[T, str]:
+        """
+        Run an operation on the best provider, failing over on errors.
+
+        Args:
+            calls: Provider name -> zero-argument function returning the call's awaitable
+
+        Returns:
+            Tuple of (result, name of the provider that answered)
+
+        Raises:
+            ValueError: If no provider is given
+            Exception: The last provider error when every provider fails
+        """
+        if not calls:
+            raise ValueError("No AI provider configured.")
+
+        pending = self.order(list(calls))
+        last_error: Optional[BaseException] = None
+        while pending:
+            if last_error is not None:
+                self.failovers += 1
+            primary = pending.pop(0)
+            hedge = pending[0] if self.hedge_enabled and pending else None
+            delay = self._hedge_delay(primary) if hedge else None
+
+            if delay is None:
+                try:
+                    return await self._attempt(primary, calls[primary]), primary
+                except Exception as e:
+                    last_error = e
+                    continue
+
+            pending.pop(0)
+            try:
+                return await self._run_hedged(primary, hedge, calls, delay)
+            except Exception as e:
+                last_error = e
+
+        raise last_error
+
+    async def stream(self, streams: Dict[str, Callable[[], AsyncIterator[T]]]) -> AsyncIterator[Tuple[T, str]]:
+        """
+        Stream an operation from the best provider, failing over on errors before its first item.
+
+        Streams are only opened when tried. A provider's latency is recorded once
+        its stream is fully consumed; errors after the first item are recorded and
+        re-raised rather than failed over.
+
+        Args:
+            streams: Provider name -> zero-argument function returning the provider's stream
+
+        Yields:
+            Tuples of (item, name of the provider streaming)
+
+        Raises:
+            ValueError: If no provider is given
+            Exception: The stream's error, or the last provider error when every provider fails first
+        """
+        if not streams:
+            raise ValueError("No AI provider configured.")
+
+        last_error: Optional[BaseException] = None
+        for name in self.order(list(streams)):
+            if last_error is not None:
+                self.failovers += 1
+            started = time.perf_counter()
+            streamed = False
+            try:
+                async with aclosing(streams[name]()) as items:
+                    async for item in items:
+                        streamed = True
+                        yield item, name
+            except Exception as e:
+                self._stats_for(name).record(time.perf_counter() - started, ok=False)
+                logger.warning(f"AI provider {name} failed: {type(e).__name__}: {e}")
+                if streamed:
+                    raise
+                last_error = e
+                continue
+            self._stats_for(name).record(time.perf_counter() - started, ok=True)
+            return
+
+        raise last_error
+
+    async def _run_hedged(
+        self,
+        primary: str,
+        hedge: str,
+        calls: Dict[str, Callable[[], Awaitable[T]]],
+        delay: float
+    ) -> Tuple[T, str]:
+        """Run primary; if it is still running after `delay`, race it against hedge."""
+        tasks = {asyncio.ensure_future(self._attempt(primary, calls[primary])): primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                task = tasks.popitem()[0]
+                if task.exception() is None:
+                    return task.result(), primary
+                # Failed fast: plain failover rather than a hedge
+                self.failovers += 1
+                return await self._attempt(hedge, calls[hedge]), hedge
+
+            self.hedges += 1
+            tasks[asyncio.ensure_future(self._attempt(hedge, calls[hedge]))] = hedge
+            last_error: Optional[BaseException] = None
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks.pop(task)
+                    if task.exception() is None:
+                        if name == hedge:
+                            self.hedge_wins += 1
+                        return task.result(), name
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def reset(self) -> None:
+        self._providers.clear()
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-provider latency/error stats and routing counters."""
+        return {
+            "providers": {
+                name: stats.stats(self.max_error_rate, self.cooldown_seconds)
+                for name, stats in self._providers.items()
+            },
+            "failovers": self.failovers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+def create_router() -> ProviderRouter:
+    """Create a router configured from settings."""
+    return ProviderRouter(
+        window_size=settings.AI_ROUTER_WINDOW_SIZE,
+        max_error_rate=settings.AI_ROUTER_MAX_ERROR_RATE,
+        cooldown_seconds=settings.AI_ROUTER_COOLDOWN_SECONDS,
+        hedge_enabled=settings.AI_ROUTER_HEDGE_ENABLED,
+        hedge_min_samples=settings.AI_ROUTER_HEDGE_MIN_SAMPLES,
+    )
@@ -0,0 +1,198 @@
+"""
+Deterministic (rule-based) product extractor.
+
+Many product pages have an obvious title line and a single currency-formatted
+price in their innerText. This extractor finds them with regexes and simple
+heading heuristics and returns a confidence score, so the LLM is only called
+when the rules are unsure.
+"""
+import re
+from typing import List, Optional, Tuple
+from pydantic import BaseModel
+from app.services.ai.text_reducer import is_heading_like, BOILERPLATE
+
+_CURRENCY_CODES = r"USD|EUR|GBP|CAD|AUD|NZD|JPY|CNY|INR|MXN|BRL|CHF|SEK|NOK|DKK|PLN|CZK|KRW|SGD|HKD"
+_SYMBOLS = r"US\$|CA\$|C\$|AU\$|A\$|NZ\$|R\$|HK\$|S\$|[$€£¥₹₩]"
+_AMOUNT = r"\d{1,3}(?:[.,\s ]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d{1,2})?"
+
+PRICE_PATTERN = re.compile(
+    rf"(?P<prefix>{_SYMBOLS}|\b(?:{_CURRENCY_CODES})\b)\s?(?P<amount_a>{_AMOUNT})"
+    rf"|(?P<amount_b>{_AMOUNT})\s?(?P<suffix>{_SYMBOLS}|\b(?:{_CURRENCY_CODES})\b)"
+)
+# Prices on these lines are reference prices, not what the shopper pays
+_REFERENCE_PRICE = re.compile(
+    r"\b(was|list price|regular(?: price)?|reg\.?|compare at|original(?:ly)?|msrp|rrp|"
+    r"save|you save|off|per (?:oz|ounce|lb|kg|100 ?g|count|item)|shipping|delivery)\b",
+    re.IGNORECASE,
+)
+_PRIMARY_PRICE = re.compile(r"\b(price|now|sale|our price|your price|deal)\b", re.IGNORECASE)
+_NOT_A_TITLE = re.compile(
+    r"\b(add to (?:cart|bag|basket)|buy now|in stock|out of stock|quantity|qty|size|colou?r|"
+    r"ships?|shipping|delivery|returns?|menu|search|cart|checkout|home)\b",
+    re.IGNORECASE,
+)
+# Stock, shipping and promo banners are often capitalised like titles
+_STOCK_OR_PROMO = re.compile(
+    r"\b(only \d+ left|\d+ left|left in stock|low stock|limited stock|sold out|back in stock|"
+    r"selling fast|almost gone|hurry|arrives|get it (?:by|today|tomorrow)|pick ?up|"
+    r"\d+\s?% off|save|sale ends|ends (?:today|tonight|soon)|limited time|deal of the day|"
+    r"coupon|promo(?: code)?|discount|clearance|free gift|best ?seller)\b",
+    re.IGNORECASE,
+)
+
+
+class PriceMatch(BaseModel):
+    """A currency-formatted price found in the text."""
+    text: str  # As written on the page, e.g. "$1,299.99" or "1.299,99 €"
+    value: float
+    line_index: int
+    is_reference: bool = False
+    is_labeled: bool = False
+
+
+class RuleExtraction(BaseModel):
+    """Result of the rule-based extractor."""
+    product_name: Optional[str] = None
+    price: Optional[str] = None
+    name_confidence: float = 0.0
+    price_confidence: float = 0.0
+
+    @property
+    def confidence(self) -> float:
+        return min(self.name_confidence, self.price_confidence)
+
+    def as_cart_item(self) -> dict:
+        """Return the same shape as the LLM parsers."""
+        return {"product_name": self.product_name, "price": self.price}
+
+
+def parse_amount(amount: str) -> Optional[float]:
+    """
+    Parse a price amount with locale-aware decimal separators.
+
+    "1,299.99" -> 1299.99, "1.299,99" -> 1299.99, "12,99" -> 12.99,
+    "1 299" -> 1299.0, "1,299" -> 1299.0 (3 trailing digits means thousands).
+    """
+    cleaned = re.sub(r"[\s ]", "", amount)
+    if not cleaned:
+        return None
+
+    last_dot = cleaned.rfind(".")
+    last_comma = cleaned.rfind(",")
+    decimal_pos = max(last_dot, last_comma)
+
+    if decimal_pos == -1:
+        digits, decimals = cleaned, ""
+    else:
+        trailing = cleaned[decimal_pos + 1:]
+        separators = {c for c in cleaned if c in ".,"}
+        # A single kind of separator followed by exactly 3 digits is a thousands separator
+        if len(separators) == 1 and len(trailing) == 3:
+            digits, decimals = cleaned, ""
+        else:
+            digits, decimals = cleaned[:decimal_pos], trailing
+
+    digits = re.sub(r"[.,]", "", digits)
+    try:
+        return float(f"{digits}.{decimals}" if decimals else digits)
+    except ValueError:
+        return None
+
+
+def find_prices(lines: List[str]) -> List[PriceMatch]:
+    """Find all currency-formatted prices in the given lines."""
+    prices = []
+    for index, line in enumerate(lines):
+        reference = bool(_REFERENCE_PRICE.search(line))
+        labeled = bool(_PRIMARY_PRICE.search(line))
+        for match in PRICE_PATTERN.finditer(line):
+            amount = match.group("amount_a") or match.group("amount_b")
+            value = parse_amount(amount)
+            if value is None or value <= 0:
+                continue
+            prices.append(PriceMatch(
+                text=re.sub(r"[\s ]+", " ", match.group(0)).strip(),
+                value=value,
+                line_index=index,
+                is_reference=reference,
+                is_labeled=labeled and not reference,
+            ))
+    return prices
+
+
+def _pick_price(prices: List[PriceMatch]) -> Tuple[Optional[PriceMatch], float]:
+    """Choose the price the shopper pays and a confidence for that choice."""
+    if not prices:
+        return None, 0.0
+
+    payable = [p for p in prices if not p.is_reference]
+    if not payable:
+        # Only "was", "save" or "free shipping over" prices: the selling price isn't here
+        return prices[0], 0.3
+
+    payable_distinct = {p.value for p in payable}
+    if len(payable_distinct) == 1:
+        return payable[0], 0.95 if len(payable) == len(prices) else 0.9
+
+    labeled = [p for p in payable if p.is_labeled]
+    if len({p.value for p in labeled}) == 1:
+        return labeled[0], 0.85
+
+    # Several competing prices (listing pages, bundles, recommendations)
+    return (payable or prices)[0], 0.4
+
+
+def _is_title_candidate(line: str) -> bool:
+    return (
+        is_heading_like(line)
+        and 8 <= len(line) <= 150
+        and not PRICE_PATTERN.search(line)
+        and not BOILERPLATE.search(line)
+        and not _NOT_A_TITLE.search(line)
+        and not _STOCK_OR_PROMO.search(line)
+    )
+
+
+def _pick_title(lines: List[str], price_line: int) -> Tuple[Optional[str], float]:
+    """Pick the heading-like line closest above the price (or just below it)."""
+    for distance in range(1, 7):
+        index = price_line - distance
+        if index < 0:
+            break
+        if _is_title_candidate(lines[index]):
+            return lines[index], round(max(0.5, 0.97 - 0.07 * distance), 2)
+
+    for distance in range(1, 3):
+        index = price_line + distance
+        if index < len(lines) and _is_title_candidate(lines[index]):
+            return lines[index], 0.6
+
+    # Title on the same line as the price, e.g. "Nike Shoe - $99"
+    same_line = PRICE_PATTERN.sub("", lines[price_line]).strip(" -–|:")
+    if is_heading_like(same_line) and len(same_line) >= 8:
+        return same_line, 0.5
+    return None, 0.0
+
+
+def extract_with_rules(text: str) -> RuleExtraction:
+    """
+    Extract product name and price without an LLM.
+
+    Args:
+        text: Page innerText (ideally already reduced)
+
+    Returns:
+        RuleExtraction with fields and per-field confidences (0.0-1.0)
+    """
+    lines = [line.strip() for line in (text or "").splitlines() if line.strip()]
+    price, price_confidence = _pick_price(find_prices(lines))
+    if price is None:
+        return RuleExtraction()
+
+    title, name_confidence = _pick_title(lines, price.line_index)
+    return RuleExtraction(
+        product_name=title,
+        price=price.text,
+        name_confidence=name_confidence,
+        price_confidence=price_confidence,
+    )
@@ -0,0 +1,302 @@
+"""
+Structured product data extraction from raw HTML.
+
+Reads schema.org `Product` JSON-LD, schema.org microdata and OpenGraph /
+product meta tags with the standard library's incremental HTML parser. The
+HTML is fed in chunks and parsing stops as soon as a complete JSON-LD product
+(name, price and image) has been seen. Visible text is collected along the
+way so callers can fall back to text extraction when no structured data is
+present.
+"""
+import json
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+CHUNK_SIZE = 64 * 1024
+
+_VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "param", "source", "track", "wbr",
+}
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption",
+    "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li",
+    "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+}
+_HIDDEN_TAGS = {"script", "style", "noscript", "template", "svg", "head", "title"}
+
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥", "INR": "₹", "KRW": "₩"}
+
+
+class StructuredProduct(BaseModel):
+    """Product fields found in structured data."""
+    product_name: Optional[str] = None
+    price: Optional[str] = None  # Raw amount, e.g. "129.99"
+    currency: Optional[str] = None  # ISO code, e.g. "USD"
+    image: Optional[str] = None
+    source: Optional[str] = None  # "json-ld", "microdata" or "opengraph"
+
+    @property
+    def is_complete(self) -> bool:
+        return bool(self.product_name and self.price)
+
+    @property
+    def display_price(self) -> Optional[str]:
+        """Price formatted like the LLM parsers return it (e.g. "$129.99" or "129.99 CHF")."""
+        if not self.price:
+            return None
+        if not self.currency:
+            return self.price
+        symbol = CURRENCY_SYMBOLS.get(self.currency.upper())
+        return f"{symbol}{self.price}" if symbol else f"{self.price} {self.currency.upper()}"
+
+
+def _first(value: Any) -> Any:
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _text(value: Any) -> Optional[str]:
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get("url") or value.get("@id") or value.get("name")
+    if value is None:
+        return None
+    value = re.sub(r"\s+", " ", str(value)).strip()
+    return value or None
+
+
+def _is_product_type(value: Any) -> bool:
+    types = value if isinstance(value, list) else [value]
+    return any(isinstance(t, str) and t.split("/")[-1].lower() == "product" for t in types)
+
+
+def _iter_json_ld_nodes(data: Any):
+    if isinstance(data, list):
+        for item in data:
+            yield from _iter_json_ld_nodes(item)
+    elif isinstance(data, dict):
+        yield data
+        for key in ("@graph", "mainEntity", "itemListElement"):
+            if key in data:
+                yield from _iter_json_ld_nodes(data[key])
+
+
+def product_from_json_ld(data: Any) -> Optional[StructuredProduct]:
+    """Extract the first schema.org Product from parsed JSON-LD."""
+    for node in _iter_json_ld_nodes(data):
+        if not _is_product_type(node.get("@type")):
+            continue
+
+        offer = _first(node.get("offers")) or {}
+        if not isinstance(offer, dict):
+            offer = {}
+        spec = _first(offer.get("priceSpecification")) or {}
+        if not isinstance(spec, dict):
+            spec = {}
+        price = _text(offer.get("price")) or _text(offer.get("lowPrice")) or _text(spec.get("price"))
+        currency = _text(offer.get("priceCurrency")) or _text(spec.get("priceCurrency"))
+
+        return StructuredProduct(
+            product_name=_text(node.get("name")),
+            price=price,
+            currency=currency,
+            image=_text(node.get("image")),
+            source="json-ld",
+        )
+    return None
+
+
+class StructuredDataParser(HTMLParser):
+    """Incremental HTML parser collecting product structured data and visible text."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.json_ld: Optional[StructuredProduct] = None
+        self.meta: Dict[str, str] = {}
+        self.microdata: Dict[str, str] = {}
+        self._text_parts: List[str] = []
+        self._hidden_depth = 0
+        self._json_ld_buffer: Optional[List[str]] = None
+        # Microdata: stack of (tag, itemtype or None if not a scope)
+        self._scopes: List[tuple] = []
+        # Open itemprop captures: [prop, owner_type, tag, depth_in_tag, buffer]
+        self._captures: List[list] = []
+
+    def _owner_type(self) -> Optional[str]:
+        for _, itemtype in reversed(self._scopes):
+            if itemtype is not None:
+                return itemtype
+        return None
+
+    def _record_microdata(self, prop: str, owner: Optional[str], value: Optional[str]) -> None:
+        if not value or owner is None:
+            return
+        owner = owner.split("/")[-1].lower()
+        allowed = {
+            "name": ("product",),
+            "image": ("product",),
+            "price": ("product", "offer", "aggregateoffer"),
+            "lowprice": ("product", "aggregateoffer"),
+            "pricecurrency": ("product", "offer", "aggregateoffer"),
+        }
+        prop = prop.lower()
+        if owner in allowed.get(prop, ()) and prop not in self.microdata:
+            self.microdata[prop] = re.sub(r"\s+", " ", value).strip()
+
+    def handle_starttag(self, tag, attrs):
+        attributes = {k.lower(): (v or "") for k, v in attrs}
+
+        if tag == "script" and "ld+json" in attributes.get("type", "").lower():
+            self._json_ld_buffer = []
+
+        if tag == "meta":
+            key = (attributes.get("property") or attributes.get("name") or "").lower()
+            if key and attributes.get("content") and key not in self.meta:
+                self.meta[key] = attributes["content"].strip()
+
+        prop = attributes.get("itemprop")
+        if prop:
+            owner = self._owner_type()
+            direct = attributes.get("content") or attributes.get("src") or attributes.get("href")
+            if direct or tag in _VOID_TAGS:
+                self._record_microdata(prop, owner, direct)
+            elif "itemscope" not in attributes:
+                self._captures.append([prop, owner, tag, 0, []])
+
+        for capture in self._captures:
+            if capture[2] == tag:
+                capture[3] += 1
+
+        if tag not in _VOID_TAGS:
+            itemtype = attributes.get("itemtype") if "itemscope" in attributes else None
+            self._scopes.append((tag, itemtype or ("thing" if "itemscope" in attributes else None)))
+            if tag in _HIDDEN_TAGS:
+                self._hidden_depth += 1
+
+        if tag in _BLOCK_TAGS:
+            self._text_parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag == "script" and self._json_ld_buffer is not None:
+            self._finish_json_ld("".join(self._json_ld_buffer))
+            self._json_ld_buffer = None
+
+        for capture in list(self._captures):
+            if capture[2] == tag:
+                capture[3] -= 1
+                if capture[3] <= 0:
+                    self._captures.remove(capture)
+                    self._record_microdata(capture[0], capture[1], "".join(capture[4]))
+
+        # Pop up to the matching open tag (tolerates unclosed children)
+        for index in range(len(self._scopes) - 1, -1, -1):
+            if self._scopes[index][0] == tag:
+                for closed_tag, _ in self._scopes[index:]:
+                    if closed_tag in _HIDDEN_TAGS:
+                        self._hidden_depth = max(0, self._hidden_depth - 1)
+                del self._scopes[index:]
+                break
+
+        if tag in _BLOCK_TAGS:
+            self._text_parts.append("\n")
+
+    def handle_data(self, data):
+        if self._json_ld_buffer is not None:
+            self._json_ld_buffer.append(data)
+            return
+        for capture in self._captures:
+            capture[4].append(data)
+        if self._hidden_depth == 0:
+            self._text_parts.append(data)
+
+    def _finish_json_ld(self, raw: str) -> None:
+        if self.json_ld is not None and self.json_ld.is_complete:
+            return
+        raw = raw.strip()
+        raw = re.sub(r"^\s*(?:<!\[CDATA\[|<!--)", "", raw)
+        raw = re.sub(r"(?:\]\]>|-->)\s*$", "", raw)
+        try:
+            data = json.loads(raw, strict=False)
+        except ValueError:
+            return
+        product = product_from_json_ld(data)
+        if product is not None and (self.json_ld is None or product.is_complete):
+            self.json_ld = product
+
+    @property
+    def done(self) -> bool:
+        """True once a JSON-LD product with name, price and image has been found."""
+        return self.json_ld is not None and self.json_ld.is_complete and bool(self.json_ld.image)
+
+    def visible_text(self) -> str:
+        text = "".join(self._text_parts)
+        lines = (re.sub(r"[ \t\r\f\v]+", " ", line).strip() for line in text.split("\n"))
+        return "\n".join(line for line in lines if line)
+
+    def product(self) -> Optional[StructuredProduct]:
+        """Merge JSON-LD, microdata and meta tags (in that order of preference)."""
+        microdata = None
+        if self.microdata:
+            microdata = StructuredProduct(
+                product_name=self.microdata.get("name"),
+                price=self.microdata.get("price") or self.microdata.get("lowprice"),
+                currency=self.microdata.get("pricecurrency"),
+                image=self.microdata.get("image"),
+                source="microdata",
+            )
+
+        meta = self.meta
+        opengraph = StructuredProduct(
+            product_name=meta.get("og:title") or meta.get("twitter:title"),
+            price=(meta.get("product:price:amount") or meta.get("og:price:amount")
+                   or meta.get("product:sale_price:amount")),
+            currency=meta.get("product:price:currency") or meta.get("og:price:currency"),
+            image=meta.get("og:image") or meta.get("og:image:secure_url") or meta.get("twitter:image"),
+            source="opengraph",
+        )
+
+        candidates = [c for c in (self.json_ld, microdata, opengraph) if c is not None]
+        best = next((c for c in candidates if c.is_complete), None)
+        if best is None:
+            best = next((c for c in candidates if c.product_name or c.price or c.image), None)
+        if best is None:
+            return None
+
+        # Fill gaps (typically the image) from the other sources
+        merged = best.model_copy()
+        for other in candidates:
+            merged.product_name = merged.product_name or other.product_name
+            merged.image = merged.image or other.image
+            if not merged.price and other.price:
+                merged.price, merged.currency = other.price, other.currency
+            merged.currency = merged.currency or (other.currency if merged.price == other.price else None)
+        return merged
+
+
+def parse_structured_data(html: str) -> StructuredDataParser:
+    """
+    Parse HTML incrementally, stopping early once a complete JSON-LD product is found.
+
+    Args:
+        html: Raw page HTML or a <head> fragment
+
+    Returns:
+        The parser, exposing product() and visible_text()
+    """
+    parser = StructuredDataParser()
+    for start in range(0, len(html), CHUNK_SIZE):
+        parser.feed(html[start:start + CHUNK_SIZE])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return parser
@@ -0,0 +1,163 @@
+"""
+Token-budgeted reducer for page innerText before it is sent to an LLM.
+
+Whole-page innerText is mostly navigation, reviews and footers. The reducer
+splits the text into windows of consecutive lines, scores each window by
+product signals (prices, currency symbols, heading-like lines, buy-box
+keywords) and keeps the best windows, in page order, until the token budget
+is used up or no remaining window carries any product signal.
+"""
+import math
+import re
+from typing import List
+from pydantic import BaseModel
+
+# Roughly 4 characters per token for English/Latin text with GPT/Llama tokenizers
+CHARS_PER_TOKEN = 4
+MAX_LINE_CHARS = 400
+
+_PRICE = re.compile(
+    r"(?:[$€£¥₹₩]|\b(?:USD|EUR|GBP|CAD|AUD|JPY|INR|MXN|BRL|CHF|SEK|NOK|DKK|PLN)\b)\s?\d[\d.,\s]*\d?"
+    r"|\d[\d.,]*\s?(?:[$€£¥₹₩]|\b(?:USD|EUR|GBP|CAD|AUD|JPY|INR|MXN|BRL|CHF|SEK|NOK|DKK|PLN)\b)",
+    re.IGNORECASE,
+)
+_CURRENCY_SYMBOL = re.compile(r"[$€£¥₹₩]")
+_BUY_BOX = re.compile(
+    r"\b(add to (?:cart|bag|basket)|buy now|in stock|out of stock|price|sale|save \d|"
+    r"was|now|sku|model|size|color|colour|quantity|qty|free shipping|ships)\b",
+    re.IGNORECASE,
+)
+BOILERPLATE = re.compile(
+    r"\b(privacy|cookie|terms of (?:use|service)|sign in|log in|create account|newsletter|"
+    r"subscribe|copyright|©|all rights reserved|customer service|help center|careers|"
+    r"gift cards?|track (?:your )?order|store locator|follow us|reviews?|rating|helpful|"
+    r"verified purchase|report abuse|sponsored|customers also|you may also like|recommended)\b",
+    re.IGNORECASE,
+)
+
+
+class ReducedText(BaseModel):
+    """Result of reducing innerText to a token budget."""
+    text: str
+    tokens_before: int
+    tokens_after: int
+    windows_total: int
+    windows_kept: int
+
+    @property
+    def was_reduced(self) -> bool:
+        return self.tokens_after < self.tokens_before
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of prompt tokens for text (no tokenizer dependency)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _split_lines(text: str) -> List[str]:
+    lines = []
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        # Some pages collapse everything into a handful of very long lines
+        while len(line) > MAX_LINE_CHARS:
+            cut = line.rfind(" ", 0, MAX_LINE_CHARS)
+            cut = cut if cut > 0 else MAX_LINE_CHARS
+            lines.append(line[:cut].strip())
+            line = line[cut:].strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def is_heading_like(line: str) -> bool:
+    """Short, mostly capitalised line without sentence punctuation (e.g. a product title)."""
+    words = line.split()
+    if not 2 <= len(words) <= 16 or line.endswith((".", "?", "!", ":")):
+        return False
+    capitalised = sum(1 for w in words if w[:1].isupper() or w[:1].isdigit())
+    return capitalised / len(words) >= 0.6
+
+
+def score_window(lines: List[str]) -> float:
+    """Score a window of lines by how likely it is to contain the product name and price."""
+    score = 0.0
+    for line in lines:
+        prices = len(_PRICE.findall(line))
+        score += 3.0 * min(prices, 3)
+        score += 1.0 * min(len(_CURRENCY_SYMBOL.findall(line)), 3)
+        score += 1.5 * min(len(_BUY_BOX.findall(line)), 2)
+        if is_heading_like(line):
+            score += 2.0
+        score -= 2.0 * min(len(BOILERPLATE.findall(line)), 2)
+    return score
+
+
+def reduce_inner_text(text: str, token_budget: int, window_lines: int = 8) -> ReducedText:
+    """
+    Keep the highest-scoring windows of text within a token budget.
+
+    Text that already fits the budget is returned unchanged (stripped).
+
+    Args:
+        text: Raw page innerText
+        token_budget: Maximum estimated tokens to keep
+        window_lines: Number of consecutive lines per window
+
+    Returns:
+        ReducedText with the kept text and before/after token estimates
+    """
+    text = (text or "").strip()
+    tokens_before = estimate_tokens(text)
+    if tokens_before <= token_budget:
+        return ReducedText(
+            text=text,
+            tokens_before=tokens_before,
+            tokens_after=tokens_before,
+            windows_total=1,
+            windows_kept=1,
+        )
+
+    lines = _split_lines(text)
+    window_lines = max(1, window_lines)
+    windows = [lines[i:i + window_lines] for i in range(0, len(lines), window_lines)]
+
+    scored = []
+    for index, window in enumerate(windows):
+        # Product title and buy box are usually in the first part of the page
+        position_bonus = 1.5 * (1 - index / len(windows))
+        scored.append((score_window(window) + position_bonus, index))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+
+    kept = set()
+    used = 0
+    for score, index in scored:
+        if kept and score <= 0:
+            break  # Remaining windows carry no product signal
+        cost = estimate_tokens("\n".join(windows[index])) + 2  # + separator
+        if used + cost > token_budget:
+            continue
+        kept.add(index)
+        used += cost
+
+    if not kept:
+        # Even the best window exceeds the budget: keep its leading characters
+        best = "\n".join(windows[scored[0][1]])
+        reduced = best[:token_budget * CHARS_PER_TOKEN]
+        return ReducedText(
+            text=reduced,
+            tokens_before=tokens_before,
+            tokens_after=estimate_tokens(reduced),
+            windows_total=len(windows),
+            windows_kept=1,
+        )
+
+    reduced = "\n...\n".join("\n".join(windows[i]) for i in sorted(kept))
+    return ReducedText(
+        text=reduced,
+        tokens_before=tokens_before,
+        tokens_after=estimate_tokens(reduced),
+        windows_total=len(windows),
+        windows_kept=len(kept),
+    )
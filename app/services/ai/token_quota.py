@@ -0,0 +1,284 @@
+"""
+Per-user token budgets for the AI endpoints.
+
+The per-IP request rate limit treats a 10 MB page the same as a 1 KB one
+and lets users behind one NAT throttle each other. Here each request is
+charged the prompt tokens it is estimated to send to a provider, against
+rolling budgets per user (e.g. per hour and per day). Usage is kept in
+one-minute buckets per user, in memory per worker, so a budget frees up
+gradually as old buckets leave the window rather than all at once.
+Budgets are per worker process: with N workers a user can spend up to N
+times the configured limits. The per-page size cap needs no shared state
+and applies even when budgets are disabled.
+
+Estimates use the same characters-per-token rule as the innerText reducer,
+so no tokenizer is needed; they are charged before the provider is called
+and refunded when the answer came from a cache or rules instead.
+"""
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+from app.core.config import settings
+from app.services.ai.text_reducer import CHARS_PER_TOKEN, estimate_tokens, reduce_inner_text
+from app.utils.metrics import CounterSet
+
+# Prompt tokens added to the page content by the extraction and selection prompts
+TEXT_PROMPT_TOKENS = 250
+IMAGE_PROMPT_TOKENS = 200
+
+# A low-detail vision image costs a flat 85 tokens, plus the verification prompt
+VISION_IMAGE_TOKENS = 85
+VISION_PROMPT_TOKENS = 100
+
+# Charges between sweeps that forget users with no usage left in any window
+SWEEP_EVERY_CHARGES = 1000
+
+# What to do with pages larger than QUOTA_MAX_REQUEST_TOKENS
+OVERSIZE_TRIM = "trim"
+OVERSIZE_REJECT = "reject"
+
+
+def text_prompt_tokens(text: str) -> int:
+    """Estimated prompt tokens of an extraction call for text (after the innerText reducer)."""
+    tokens = estimate_tokens(text)
+    if settings.EXTRACTION_REDUCER_ENABLED:
+        tokens = min(tokens, settings.EXTRACTION_INPUT_TOKEN_BUDGET)
+    return tokens + TEXT_PROMPT_TOKENS
+
+
+def image_selection_tokens(image_urls: Sequence[str]) -> int:
+    """Estimated prompt tokens of an image selection call."""
+    return estimate_tokens(",".join(image_urls)) + IMAGE_PROMPT_TOKENS
+
+
+def vision_tokens(image_count: int) -> int:
+    """Estimated prompt tokens of verifying image_count images."""
+    return image_count * (VISION_IMAGE_TOKENS + VISION_PROMPT_TOKENS)
+
+
+@dataclass
+class QuotaWindow:
+    """One rolling budget: at most `limit` tokens per `seconds`."""
+    name: str
+    seconds: int
+    limit: int
+
+
+@dataclass
+class QuotaStatus:
+    """A user's standing in their tightest window."""
+    window: str
+    limit: int
+    remaining: int
+    reset_seconds: int  # Until the oldest usage in the window expires
+
+    def headers(self) -> Dict[str, str]:
+        """Remaining-budget response headers."""
+        return {
+            "X-Token-Budget-Window": self.window,
+            "X-Token-Budget-Limit": str(self.limit),
+            "X-Token-Budget-Remaining": str(self.remaining),
+            "X-Token-Budget-Reset": str(self.reset_seconds),
+        }
+
+
+@dataclass
+class QuotaCharge:
+    """The outcome of charging a request."""
+    user_id: str
+    tokens: int
+    bucket: int
+    allowed: bool
+    status: QuotaStatus  # For a refused charge, the window that refused it
+
+
+class TokenQuota:
+    """Rolling per-user token budgets, kept in one-minute buckets (per worker process)."""
+
+    def __init__(
+        self,
+        windows: List[QuotaWindow],
+        max_request_tokens: int = 0,
+        oversize_action: str = OVERSIZE_TRIM,
+        bucket_seconds: int = 60,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize quota.
+
+        Args:
+            windows: Budgets every charge must fit in
+            max_request_tokens: Largest page accepted, in estimated tokens (0 for no cap)
+            oversize_action: OVERSIZE_TRIM or OVERSIZE_REJECT for larger pages
+            bucket_seconds: Granularity of usage tracking
+            enabled: When False, nothing is charged (the page size cap still applies)
+            clock: Returns the current time in seconds
+        """
+        self.windows = [window for window in windows if window.limit > 0]
+        self.max_request_tokens = max_request_tokens
+        self.oversize_action = oversize_action
+        self.bucket_seconds = bucket_seconds
+        self.enabled = enabled and bool(self.windows)
+        self.clock = clock
+        self._usage: Dict[str, Dict[int, int]] = {}
+        self.counters = CounterSet()
+
+    def fit(self, text: str, html: bool = False) -> Optional[str]:
+        """
+        Apply the oversize policy to one page of input, before anything is charged.
+
+        innerText is trimmed with the reducer, keeping the most product-like
+        lines; HTML is cut at the last tag end before the cap, which keeps the
+        <head> where structured data usually is. Applies whether or not
+        budgets are enabled.
+
+        Args:
+            text: innerText or HTML from the request
+            html: Whether text is raw HTML
+
+        Returns:
+            The text to use, or None if it is oversized and the policy is to reject it
+        """
+        if self.max_request_tokens <= 0 or estimate_tokens(text) <= self.max_request_tokens:
+            return text
+        if self.oversize_action == OVERSIZE_REJECT:
+            self.counters.incr("oversized_rejected")
+            return None
+        self.counters.incr("oversized_trimmed")
+        if html:
+            # Don't leave half a tag (or half an attribute value) at the end
+            cut = text[:self.max_request_tokens * CHARS_PER_TOKEN]
+            end = cut.rfind(">")
+            return cut[:end + 1] if end >= 0 else cut
+        return reduce_inner_text(text, self.max_request_tokens, settings.EXTRACTION_REDUCER_WINDOW_LINES).text
+
+    def _bucket(self, now: float) -> int:
+        return int(now // self.bucket_seconds)
+
+    def _prune(self, user_id: str, now: float) -> Dict[int, int]:
+        usage = self._usage.get(user_id, {})
+        oldest = self._bucket(now - max(window.seconds for window in self.windows))
+        for bucket in [bucket for bucket in usage if bucket <= oldest]:
+            del usage[bucket]
+        return usage
+
+    def _window_statuses(self, usage: Dict[int, int], now: float) -> List[QuotaStatus]:
+        statuses = []
+        for window in self.windows:
+            start = self._bucket(now - window.seconds)
+            in_window = [bucket for bucket in usage if bucket > start]
+            used = sum(usage[bucket] for bucket in in_window)
+            reset = 0
+            if in_window:
+                expires = min(in_window) * self.bucket_seconds + window.seconds
+                reset = max(1, int(expires - now + 0.999))
+            statuses.append(QuotaStatus(window.name, window.limit, max(0, window.limit - used), reset))
+        return statuses
+
+    def status(self, user_id: str) -> Optional[QuotaStatus]:
+        """The user's tightest window, or None when quotas are disabled."""
+        if not self.enabled:
+            return None
+        now = self.clock()
+        statuses = self._window_statuses(self._prune(user_id, now), now)
+        return min(statuses, key=lambda status: status.remaining)
+
+    def charge(self, user_id: str, tokens: int) -> Optional[QuotaCharge]:
+        """
+        Charge tokens to a user if every window has room for them.
+
+        Args:
+            user_id: User the request is billed to
+            tokens: Estimated prompt tokens of the request
+
+        Returns:
+            The charge (check `allowed`), or None when quotas are disabled
+        """
+        if not self.enabled:
+            return None
+
+        now = self.clock()
+        usage = self._prune(user_id, now)
+        statuses = self._window_statuses(usage, now)
+        bucket = self._bucket(now)
+
+        refused = [status for status in statuses if status.remaining < tokens]
+        if refused:
+            self.counters.incr("refused")
+            self.counters.incr("tokens_refused", tokens)
+            # Report the window that will take longest to make room
+            return QuotaCharge(user_id, tokens, bucket, False, max(refused, key=lambda status: status.reset_seconds))
+
+        usage[bucket] = usage.get(bucket, 0) + tokens
+        self._usage[user_id] = usage
+        self.counters.incr("charged")
+        if self.counters.get("charged") % SWEEP_EVERY_CHARGES == 0:
+            self._sweep(now)
+        self.counters.incr("tokens_charged", tokens)
+        status = min(self._window_statuses(usage, now), key=lambda status: status.remaining)
+        return QuotaCharge(user_id, tokens, bucket, True, status)
+
+    def refund(self, charge: Optional[QuotaCharge], tokens: Optional[int] = None) -> None:
+        """
+        Give back (part of) an allowed charge, e.g. when the answer didn't need a provider call.
+
+        Args:
+            charge: The charge to refund (None and refused charges are ignored)
+            tokens: Tokens to give back; defaults to the whole charge
+        """
+        if charge is None or not charge.allowed:
+            return
+        charge.tokens -= self.refund_tokens(charge.user_id, charge.bucket, charge.tokens if tokens is None else tokens)
+
+    def refund_tokens(self, user_id: str, bucket: int, tokens: int) -> int:
+        """
+        Give back tokens charged to a user's bucket (for charges recorded elsewhere, e.g. on a job).
+
+        Args:
+            user_id: User the tokens were charged to
+            bucket: Bucket of the charge (QuotaCharge.bucket)
+            tokens: Tokens to give back
+
+        Returns:
+            Tokens actually given back (0 if the bucket is gone or was charged in another worker)
+        """
+        usage = self._usage.get(user_id)
+        if not usage or bucket not in usage:
+            return 0
+        amount = min(tokens, usage[bucket])
+        usage[bucket] -= amount
+        if not usage[bucket]:
+            del usage[bucket]
+        self.counters.incr("tokens_refunded", amount)
+        return amount
+
+    def _sweep(self, now: float) -> None:
+        for user_id in list(self._usage):
+            if not self._prune(user_id, now):
+                del self._usage[user_id]
+
+    def stats(self) -> Dict[str, object]:
+        """Return budgets, counters and the number of users being tracked."""
+        self._sweep(self.clock())
+        return {
+            "enabled": self.enabled,
+            "windows": {window.name: window.limit for window in self.windows},
+            "users": len(self._usage),
+            **self.counters.snapshot(),
+        }
+
+    def reset(self) -> None:
+        self._usage.clear()
+        self.counters.reset()
+
+
+token_quota = TokenQuota(
+    windows=[
+        QuotaWindow("hour", 3600, settings.QUOTA_TOKENS_PER_HOUR),
+        QuotaWindow("day", 86400, settings.QUOTA_TOKENS_PER_DAY),
+    ],
+    max_request_tokens=settings.QUOTA_MAX_REQUEST_TOKENS,
+    oversize_action=settings.QUOTA_OVERSIZE_ACTION,
+    enabled=settings.QUOTA_ENABLED,
+)
@@ -0,0 +1,228 @@
+"""
+Per-call accounting of AI provider usage.
+
+Every provider call made through `run_ai_call` is recorded with its
+provider, model, operation, token counts, latency and outcome; cache hits
+that avoided a call are recorded too. Totals and a latency histogram per
+model are kept in memory for /extract/metrics, and usage is rolled up per
+UTC day, user, provider, model and operation into the `ai_usage`
+collection. Recording only touches memory; a background task started
+with the app writes the rollup every USAGE_FLUSH_INTERVAL_SECONDS, so no
+request waits on MongoDB for accounting.
+"""
+import asyncio
+import logging
+from bisect import bisect_left
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.core.config import settings
+from app.repositories.ai_usage_repository import AIUsageRepository
+
+logger = logging.getLogger(__name__)
+
+# User the current request's AI calls are billed to (set by get_current_user)
+usage_user: ContextVar[Optional[str]] = ContextVar("usage_user", default=None)
+
+# Outcomes
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+OUTCOME_TIMEOUT = "timeout"
+
+# Provider recorded for cache hits
+CACHE_PROVIDER = "cache"
+
+# List prices in USD per million (prompt, completion) tokens, for cost
+# estimates only; models missing here are counted at zero cost
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+}
+
+# Upper bounds of the latency histogram buckets, in milliseconds (plus one overflow bucket)
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 20000)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated cost of a call in USD (0.0 for models without a known price)."""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def _bucket_label(index: int) -> str:
+    if index < len(LATENCY_BUCKETS_MS):
+        return f"le_{LATENCY_BUCKETS_MS[index]}"
+    return f"gt_{LATENCY_BUCKETS_MS[-1]}"
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        "calls": 0, "cache_hits": 0, "errors": 0, "timeouts": 0,
+        "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "latency_ms_total": 0.0,
+    }
+
+
+class UsageTracker:
+    """In-memory usage totals and latency histograms, rolled up to MongoDB."""
+
+    def __init__(
+        self,
+        flush_interval: float,
+        repository_factory: Callable[[], AIUsageRepository] = AIUsageRepository,
+        enabled: bool = True
+    ):
+        """
+        Initialize tracker.
+
+        Args:
+            flush_interval: Seconds between writes of the rollup to MongoDB
+            repository_factory: Builds the repository the rollup is written to
+            enabled: When False, nothing is recorded
+        """
+        self.flush_interval = flush_interval
+        self.repository_factory = repository_factory
+        self.enabled = enabled
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[Tuple[str, Optional[str], str, str, str], Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def record_call(
+        self,
+        provider: str,
+        model: str,
+        operation: str,
+        latency_ms: float,
+        outcome: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0
+    ) -> None:
+        """
+        Record one provider call.
+
+        Args:
+            provider: Provider name ("openai", "groq")
+            model: Model the call used
+            operation: What the call was for ("text", "image", "vision", ...)
+            latency_ms: Time the provider took, excluding time queued for a call slot
+            outcome: OUTCOME_OK, OUTCOME_ERROR or OUTCOME_TIMEOUT
+            prompt_tokens: Prompt tokens reported by the provider
+            completion_tokens: Completion tokens reported by the provider
+        """
+        if not self.enabled:
+            return
+
+        counts = {
+            "calls": 1,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens),
+            "latency_ms_total": latency_ms,
+        }
+        if outcome == OUTCOME_ERROR:
+            counts["errors"] = 1
+        elif outcome == OUTCOME_TIMEOUT:
+            counts["timeouts"] = 1
+
+        model_stats = self._add(provider, model, operation, counts)
+        histogram = model_stats.setdefault("latency_ms", {})
+        label = _bucket_label(bisect_left(LATENCY_BUCKETS_MS, latency_ms))
+        histogram[label] = histogram.get(label, 0) + 1
+
+    def record_cache_hit(self, model: str, operation: str) -> None:
+        """
+        Record an answer served from a cache instead of a provider call.
+
+        Args:
+            model: Model the cached answer was keyed on
+            operation: What the answer was for
+        """
+        if not self.enabled:
+            return
+
+        self._add(CACHE_PROVIDER, model, operation, {"cache_hits": 1})
+
+    def _add(self, provider: str, model: str, operation: str, counts: Dict[str, Any]) -> Dict[str, Any]:
+        model_stats = self._models.setdefault(f"{provider}/{model}", _empty_totals())
+        key = (datetime.utcnow().strftime("%Y-%m-%d"), usage_user.get(), provider, model, operation)
+        pending = self._pending.setdefault(key, {})
+        for name, amount in counts.items():
+            model_stats[name] += amount
+            pending[name] = pending.get(name, 0) + amount
+        return model_stats
+
+    def start(self) -> None:
+        """Start writing the rollup in the background on the running loop (no-op if running)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        """Stop the background writer and write what is still pending."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write usage recorded since the last flush to the rollup collection."""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        unwritten = list(pending.items())
+        try:
+            repository = self.repository_factory()
+            while unwritten:
+                (day, user_id, provider, model, operation), counts = unwritten[0]
+                await repository.increment(day, user_id, provider, model, operation, counts, datetime.utcnow())
+                unwritten.pop(0)
+            self.flushes += 1
+        except Exception as e:
+            # Accounting must never fail a request; what wasn't written goes out next time
+            logger.warning(f"AI usage flush failed: {e}")
+            self.flush_errors += 1
+        finally:
+            # Also runs on cancellation, so rollups not yet written aren't lost
+            for key, counts in unwritten:
+                merged = self._pending.setdefault(key, {})
+                for name, amount in counts.items():
+                    merged[name] = merged.get(name, 0) + amount
+
+    def stats(self) -> Dict[str, Any]:
+        """Return totals and latency histograms per provider/model."""
+        models = {}
+        for name, totals in self._models.items():
+            calls = totals["calls"]
+            models[name] = {
+                **totals,
+                "cost_usd": round(totals["cost_usd"], 6),
+                "avg_latency_ms": round(totals["latency_ms_total"] / calls, 1) if calls else None,
+            }
+        return {
+            "enabled": self.enabled,
+            "models": models,
+            "pending_rollups": len(self._pending),
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+        }
+
+    def reset(self) -> None:
+        self._models.clear()
+        self._pending.clear()
+        self.flushes = 0
+        self.flush_errors = 0
+
+
+usage_tracker = UsageTracker(
+    flush_interval=settings.USAGE_FLUSH_INTERVAL_SECONDS,
+    enabled=settings.USAGE_TRACKING_ENABLED,
+)
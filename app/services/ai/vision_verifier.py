@@ -2,33 +2,76 @@
 OpenAI Vision API verifier for image verification.
 Used as a fallback when CLIP verification fails.
 """
-from openai import OpenAI
+import asyncio
+from typing import Any, Dict, List
+from openai import AsyncOpenAI
 from app.core.config import settings
+from app.services.ai.limits import run_ai_call
+from app.services.ai.provider_router import OPENAI
+from app.services.ai.image_pipeline import prepare_image
+from app.services.ai.json_output import parse_json_output, PATH_SCHEMA
 import httpx
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
+# Initialize async OpenAI client
+client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    base_url=settings.OPENAI_BASE_URL or None,
+    timeout=settings.AI_REQUEST_TIMEOUT_SECONDS,
+) if settings.OPENAI_API_KEY else None
 
-async def verify_with_openai_vision(image_url: str, product_name: str) -> bool:
+VISION_MODEL = "gpt-4o"
+VISION_PROMPT_VERSION = "1"
+
+# OpenAI structured-output schema for batched verification (1-based image numbers)
+VERIFICATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "image_verification",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "matching": {"type": "array", "items": {"type": "integer"}},
+            },
+            "required": ["matching"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+async def _vision_image(image_url: str) -> Dict[str, Any]:
+    """Image part for a vision request: a downscaled low-detail copy, or the URL if that fails."""
+    if settings.IMAGE_PIPELINE_ENABLED:
+        try:
+            return {"url": await prepare_image(image_url), "detail": "low"}
+        except ValueError as e:
+            logger.warning(f"Image pipeline failed, sending the URL instead: {e}")
+    return {"url": image_url}
+
+
+async def ask_openai_vision(image_url: str, product_name: str) -> bool:
     """
-    Verify if an image matches a product name using OpenAI Vision API.
-    
-    This is more accurate than CLIP but costs money per request.
-    Used as a fallback when CLIP verification fails.
-    
+    Ask OpenAI Vision whether an image shows a product.
+
     Args:
         image_url: URL of the image to verify
         product_name: Name of the product to match against
-        
+
     Returns:
-        True if image matches product name, False otherwise
+        True if the image matches the product name, False otherwise
+
+    Raises:
+        ValueError: If OpenAI is not configured or the call fails
     """
     if not client:
-        return False
-    
+        raise ValueError("OpenAI API key not configured")
+
+    image = await _vision_image(image_url)
+
     try:
         # Create a prompt for OpenAI Vision
         prompt = f"""Does this image show a product called "{product_name}"?
@@ -40,27 +83,101 @@ async def verify_with_openai_vision(image_url: str, product_name: str) -> bool:
         """
         
         # Call OpenAI Vision API
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        response = await run_ai_call(lambda: client.chat.completions.create(
+            model=VISION_MODEL,
             messages=[
                 {
                     "role": "user",
                     "content": [
                         {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": image_url}}
+                        {"type": "image_url", "image_url": image}
                     ]
                 }
             ],
             max_tokens=10,
             temperature=0,
-        )
-        
-        # Parse response
-        result = response.choices[0].message.content.strip().lower()
-        return result.startswith("yes")
-        
+        ), provider=OPENAI, model=VISION_MODEL, operation="vision")
     except Exception as e:
-        logger.error(f"Error verifying image with OpenAI Vision: {e}")
+        raise ValueError(f"Error verifying image with OpenAI Vision: {type(e).__name__}: {e}")
+
+    # Parse response
+    result = (response.choices[0].message.content or "").strip().lower()
+    return result.startswith("yes")
+
+async def ask_openai_vision_batch(image_urls: List[str], product_name: str) -> List[bool]:
+    """
+    Ask OpenAI Vision which of several images show a product, in one request.
+
+    Images are numbered in order and the model answers with the numbers of
+    the matching ones, so one round trip replaces one request per image.
+
+    Args:
+        image_urls: URLs of the images to verify
+        product_name: Name of the product to match against
+
+    Returns:
+        One bool per image, in input order
+
+    Raises:
+        ValueError: If OpenAI is not configured, the call fails or the answer can't be parsed
+    """
+    if not client:
+        raise ValueError("OpenAI API key not configured")
+
+    images = await asyncio.gather(*(_vision_image(url) for url in image_urls))
+    prompt = f"""The {len(image_urls)} images below are numbered 1 to {len(image_urls)} in order.
+    Which of them show a product called "{product_name}"?
+    
+    Respond with JSON: {{"matching": [numbers of the images that show this product]}}. Consider:
+    - An image should clearly show the product described by the name
+    - The product in the image should match the name (not a different product)
+    - Generic placeholder images or unrelated images do not match
+    - Use an empty list if none match
+    """
+    content = [{"type": "text", "text": prompt}]
+    for number, image in enumerate(images, start=1):
+        content.append({"type": "text", "text": f"Image {number}:"})
+        content.append({"type": "image_url", "image_url": image})
+
+    try:
+        response = await run_ai_call(lambda: client.chat.completions.create(
+            model=VISION_MODEL,
+            messages=[{"role": "user", "content": content}],
+            response_format=VERIFICATION_RESPONSE_FORMAT,
+            max_tokens=20 + 4 * len(image_urls),
+            temperature=0,
+        ), provider=OPENAI, model=VISION_MODEL, operation="vision_batch")
+    except Exception as e:
+        raise ValueError(f"Error verifying images with OpenAI Vision: {type(e).__name__}: {e}")
+
+    parsed, _ = parse_json_output(response.choices[0].message.content or "", PATH_SCHEMA)
+    matching = parsed.get("matching") if isinstance(parsed, dict) else None
+    if not isinstance(matching, list):
+        raise ValueError(f"Expected a list of matching image numbers, got {parsed!r:.200}")
+    numbers = {int(n) for n in matching if isinstance(n, (int, float)) or str(n).isdigit()}
+    return [number in numbers for number in range(1, len(image_urls) + 1)]
+
+async def verify_with_openai_vision(image_url: str, product_name: str) -> bool:
+    """
+    Verify if an image matches a product name using OpenAI Vision API.
+    
+    This is more accurate than CLIP but costs money per request.
+    Used as a fallback when CLIP verification fails.
+    
+    Args:
+        image_url: URL of the image to verify
+        product_name: Name of the product to match against
+        
+    Returns:
+        True if image matches product name, False otherwise
+    """
+    if not client:
+        return False
+    
+    try:
+        return await ask_openai_vision(image_url, product_name)
+    except ValueError as e:
+        logger.error(str(e))
         return False
 
 async def check_openai_vision_availability() -> dict:
@@ -0,0 +1,409 @@
+"""
+Asynchronous extraction jobs.
+
+POST /extract/extract?job=true and /extract/analyze-images?job=true queue
+the request in the `extraction_jobs` collection and answer with a job id
+straight away. A bounded pool of asyncio workers in each process claims
+queued jobs with an atomic find-and-update, runs them through
+ExtractionService and stores the result on the job, where it stays for
+EXTRACTION_JOB_RESULT_TTL_SECONDS before a TTL index removes it; jobs
+still queued or running don't expire. The same user submitting the same
+request again while its job is queued, running or still holds a result
+gets that job back instead of a new one.
+
+Workers wake as soon as a job is submitted to their own process; jobs
+submitted to other processes are found by polling every
+EXTRACTION_JOB_POLL_INTERVAL_SECONDS. A running job is leased to its
+worker, so a job whose worker died is picked up again once the lease
+expires, and failed attempts are retried up to EXTRACTION_JOB_MAX_ATTEMPTS.
+A job whose lease ran out on its last attempt is marked failed instead, so
+a page that kills its worker (e.g. out of memory) isn't retried forever.
+
+Token budgets are charged at submission. As on the synchronous route, an
+extract job answered without the provider (product cache, rules or the
+content cache) is refunded; budgets are per worker process, so only a
+charge made in the process that ran the job can be given back.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+from app.core.config import settings
+from app.models.extraction_job import ExtractionJob
+from app.repositories.extraction_job_repository import (
+    ExtractionJobRepository,
+    STATUS_QUEUED,
+    STATUS_RUNNING,
+    STATUS_SUCCEEDED,
+    STATUS_FAILED,
+)
+from app.repositories.product_cache_repository import ProductCacheRepository
+from app.services.ai.extraction_cache import extraction_cache
+from app.services.ai.token_quota import QuotaCharge, token_quota
+from app.services.ai.usage import usage_user
+from app.services.extraction_service import ExtractionService, SOURCE_LLM
+from app.utils.metrics import CounterSet
+
+logger = logging.getLogger(__name__)
+
+# Job kinds (the endpoint the job stands in for)
+JOB_EXTRACT = "extract"
+JOB_ANALYZE_IMAGES = "analyze-images"
+
+# Error stored on a job whose worker died on each of its attempts
+ABANDONED_ERROR = "Job stopped its worker on every attempt"
+
+# Statuses after which a job no longer changes
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+job_counters = CounterSet()
+
+
+class JobLimitExceeded(Exception):
+    """Raised when a user already has EXTRACTION_JOB_MAX_ACTIVE_PER_USER unfinished jobs."""
+
+
+def job_dedupe_key(user_id: str, kind: str, payload: Dict[str, Any]) -> str:
+    """Key identifying a submission: same user, kind and payload -> same job."""
+    data = json.dumps({"user_id": user_id, "kind": kind, "payload": payload}, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def job_view(job: ExtractionJob) -> Dict[str, Any]:
+    """Public representation of a job (JSON-serializable)."""
+    def iso(value: Optional[datetime]) -> Optional[str]:
+        return value.isoformat() if value else None
+
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.error if job.status == STATUS_FAILED else None,
+        "created_at": iso(job.created_at),
+        "started_at": iso(job.started_at),
+        "finished_at": iso(job.finished_at),
+        "expires_at": iso(job.expires_at),
+    }
+
+
+def _default_service() -> ExtractionService:
+    return ExtractionService(extraction_cache, ProductCacheRepository())
+
+
+class JobWorkerPool:
+    """Bounded pool of asyncio workers running queued extraction jobs."""
+
+    def __init__(
+        self,
+        workers: int,
+        poll_interval: float,
+        lease_seconds: float,
+        max_attempts: int,
+        result_ttl: float,
+        repository_factory: Callable[[], ExtractionJobRepository] = ExtractionJobRepository,
+        service_factory: Callable[[], ExtractionService] = _default_service
+    ):
+        """
+        Initialize pool.
+
+        Args:
+            workers: Number of jobs run concurrently
+            poll_interval: Seconds an idle worker waits before checking the queue again
+            lease_seconds: Longest a job may run; after that another worker may take it
+            max_attempts: Attempts before a failing job is marked failed
+            result_ttl: Seconds finished jobs are kept
+            repository_factory: Builds the job repository
+            service_factory: Builds the ExtractionService jobs run on
+        """
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self.repository_factory = repository_factory
+        self.service_factory = service_factory
+        self.counters = job_counters
+        self._prefix = uuid4().hex[:8]
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._running = 0
+
+    def start(self) -> None:
+        """Start the workers on the running event loop (no-op if already started)."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._work(f"{self._prefix}-{index}"))
+            for index in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs they were running go back to the queue."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def notify(self) -> None:
+        """Wake idle workers (a job was just queued in this process)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def wait_for_update(self, timeout: float) -> None:
+        """Wait until a job in this process changes status, or timeout seconds pass."""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _publish(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _work(self, worker_id: str) -> None:
+        while True:
+            try:
+                ran = await self.process_next(worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A queue outage must not kill the worker; try again after the poll interval
+                logger.warning(f"Extraction job worker {worker_id} failed: {e}")
+                self.counters.incr("worker_errors")
+                ran = False
+            if not ran:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def process_next(self, worker_id: str) -> bool:
+        """
+        Claim and run one job.
+
+        Args:
+            worker_id: Worker the job is leased to
+
+        Returns:
+            True if a job was run, False if the queue was empty
+        """
+        repository = self.repository_factory()
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        abandoned = await repository.fail_abandoned(
+            now, self.max_attempts, ABANDONED_ERROR, now + timedelta(seconds=self.result_ttl)
+        )
+        if abandoned:
+            self.counters.incr("abandoned", abandoned)
+            self._publish()
+        doc = await repository.claim_next(worker_id, now, lease_until, self.max_attempts)
+        if not doc:
+            return False
+
+        job = ExtractionJob.from_mongo(doc)
+        self.counters.incr("claimed")
+        self._running += 1
+        self._publish()
+        # AI calls made for the job are billed to the user who submitted it
+        token = usage_user.set(job.user_id)
+        try:
+            result = await asyncio.wait_for(self._run(job), self.lease_seconds)
+        except asyncio.CancelledError:
+            await repository.requeue(job.job_id, worker_id)
+            self.counters.incr("requeued")
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}" if str(e) else type(e).__name__
+            logger.warning(f"Extraction job {job.job_id} attempt {job.attempts} failed: {error}")
+            if job.attempts < self.max_attempts:
+                await repository.requeue(job.job_id, worker_id, error)
+                self.counters.incr("retried")
+                self.notify()
+            else:
+                finished = datetime.utcnow()
+                await repository.fail(
+                    job.job_id, worker_id, error, finished, finished + timedelta(seconds=self.result_ttl)
+                )
+                self.counters.incr("failed")
+        else:
+            finished = datetime.utcnow()
+            stored = await repository.complete(
+                job.job_id, worker_id, result, finished, finished + timedelta(seconds=self.result_ttl)
+            )
+            self.counters.incr("succeeded" if stored else "lease_lost")
+            if stored:
+                self._refund(job, result)
+        finally:
+            usage_user.reset(token)
+            self._running -= 1
+            self._publish()
+        return True
+
+    def _refund(self, job: ExtractionJob, result: Any) -> None:
+        """Give back the submission's tokens when the answer didn't need the provider."""
+        if job.kind != JOB_EXTRACT or not job.charged_tokens or job.charge_bucket is None:
+            return
+        if isinstance(result, dict) and result.get("source") != SOURCE_LLM:
+            if token_quota.refund_tokens(job.user_id, job.charge_bucket, job.charged_tokens):
+                self.counters.incr("refunded")
+
+    async def _run(self, job: ExtractionJob) -> Any:
+        service = self.service_factory()
+        payload = job.payload
+        if job.kind == JOB_EXTRACT:
+            cart_items, source = await service.extract_from_text(payload["inner_text"], payload.get("page_url"))
+            return {"cart_items": cart_items, "source": source}
+        if job.kind == JOB_ANALYZE_IMAGES:
+            return await service.select_product_image(
+                payload["page_url"], payload["product_name"], payload["image_urls"]
+            )
+        raise ValueError(f"Unknown job kind: {job.kind}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return worker counts and job counters for this process."""
+        return {
+            "workers": len(self._tasks),
+            "running": self._running,
+            **self.counters.snapshot(),
+        }
+
+    def reset(self) -> None:
+        self.counters.reset()
+        self._changed = None
+        self._running = 0
+
+
+job_worker_pool = JobWorkerPool(
+    workers=settings.EXTRACTION_JOB_WORKERS,
+    poll_interval=settings.EXTRACTION_JOB_POLL_INTERVAL_SECONDS,
+    lease_seconds=settings.EXTRACTION_JOB_LEASE_SECONDS,
+    max_attempts=settings.EXTRACTION_JOB_MAX_ATTEMPTS,
+    result_ttl=settings.EXTRACTION_JOB_RESULT_TTL_SECONDS,
+)
+
+
+class ExtractionJobService:
+    """Service for submitting and reading asynchronous extraction jobs."""
+
+    def __init__(self, job_repo: ExtractionJobRepository, pool: JobWorkerPool = job_worker_pool):
+        """
+        Initialize extraction job service.
+
+        Args:
+            job_repo: Extraction job repository instance
+            pool: Worker pool woken when a job is queued
+        """
+        self.job_repo = job_repo
+        self.pool = pool
+
+    async def submit(
+        self,
+        user_id: str,
+        kind: str,
+        payload: Dict[str, Any],
+        charge: Optional[QuotaCharge] = None
+    ) -> Tuple[ExtractionJob, bool]:
+        """
+        Queue a job, or return the existing job for the same submission.
+
+        Args:
+            user_id: User submitting the job
+            kind: JOB_EXTRACT or JOB_ANALYZE_IMAGES
+            payload: Request fields the job runs with
+            charge: Token budget charge for the submission, recorded on the job for refunds
+
+        Returns:
+            Tuple of (job, created); created is False when an identical job already existed
+
+        Raises:
+            JobLimitExceeded: If the user has too many unfinished jobs
+        """
+        dedupe_key = job_dedupe_key(user_id, kind, payload)
+        now = datetime.utcnow()
+        # Failed and expired jobs don't absorb resubmissions
+        await self.job_repo.delete_stale(dedupe_key, now)
+
+        existing = await self.job_repo.find_one({"dedupe_key": dedupe_key})
+        if existing:
+            job_counters.incr("deduplicated")
+            return ExtractionJob.from_mongo(existing), False
+
+        if await self.job_repo.count_active(user_id) >= settings.EXTRACTION_JOB_MAX_ACTIVE_PER_USER:
+            job_counters.incr("rejected")
+            raise JobLimitExceeded(
+                f"At most {settings.EXTRACTION_JOB_MAX_ACTIVE_PER_USER} unfinished extraction jobs per user."
+            )
+
+        job = ExtractionJob(
+            job_id=str(uuid4()),
+            user_id=user_id,
+            kind=kind,
+            dedupe_key=dedupe_key,
+            status=STATUS_QUEUED,
+            payload=payload,
+            charged_tokens=charge.tokens if charge is not None and charge.allowed else 0,
+            charge_bucket=charge.bucket if charge is not None and charge.allowed else None,
+            created_at=now,
+        )
+        stored = ExtractionJob.from_mongo(await self.job_repo.create_if_absent(job.to_mongo_dict()))
+        created = stored.job_id == job.job_id
+        job_counters.incr("submitted" if created else "deduplicated")
+        if created:
+            self.pool.notify()
+        return stored, created
+
+    async def get(self, user_id: str, job_id: str) -> Optional[ExtractionJob]:
+        """
+        Get one of the user's jobs.
+
+        Args:
+            user_id: User the job must belong to
+            job_id: Job identifier
+
+        Returns:
+            The job, or None if it doesn't exist, belongs to another user or has expired
+        """
+        doc = await self.job_repo.find_by_id(job_id)
+        if not doc:
+            return None
+        job = ExtractionJob.from_mongo(doc)
+        # The TTL monitor only runs about once a minute
+        if job.user_id != user_id or (job.expires_at is not None and job.expires_at <= datetime.utcnow()):
+            return None
+        return job
+
+    async def wait(self, user_id: str, job_id: str, timeout: float, since: Optional[str] = None) -> Optional[ExtractionJob]:
+        """
+        Get a job once it has finished (or changed status), waiting up to timeout seconds.
+
+        Args:
+            user_id: User the job must belong to
+            job_id: Job identifier
+            timeout: Longest to wait
+            since: Return as soon as the status differs from this one (None waits for a finished job)
+
+        Returns:
+            The job as last read, or None if it doesn't exist
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            job = await self.get(user_id, job_id)
+            if job is None or job.status in FINISHED_STATUSES or (since is not None and job.status != since):
+                return job
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return job
+            # Local workers wake us at once; jobs run by other processes are seen on the next poll
+            await self.pool.wait_for_update(min(remaining, self.pool.poll_interval))
@@ -0,0 +1,680 @@
+"""Extraction service for business logic."""
+import asyncio
+import hashlib
+import logging
+from contextlib import aclosing
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+from app.core.config import settings
+from app.models.product_cache import ProductCacheEntry, ProductCacheVote
+from app.repositories.product_cache_repository import ProductCacheRepository
+from app.services.ai.extraction_cache import (
+    ExtractionCache,
+    TEXT,
+    IMAGE,
+    text_cache_key,
+    image_cache_key,
+)
+from app.services.ai.text_reducer import reduce_inner_text
+from app.services.ai.rule_extractor import extract_with_rules
+from app.services.ai.structured_data import parse_structured_data
+from app.services.ai.image_ranker import rank_image_candidates
+from app.services.ai.image_pipeline import ProcessedImage, process_image
+from app.services.ai.image_quality import ImageQuality, check_quality
+from app.services.ai.usage import usage_tracker, usage_user
+from app.services.ai.image_hash_index import image_hash_index
+from app.services.ai.openai_parser import (
+    parse_inner_text_with_openai,
+    parse_inner_texts_with_openai,
+    stream_inner_text_with_openai,
+    parse_images_with_openai,
+    TEXT_MODEL,
+    TEXT_SMALL_MODEL,
+    TEXT_PROMPT_VERSION,
+    IMAGE_MODEL,
+    IMAGE_PROMPT_VERSION,
+)
+from app.services.ai.groq_parser import (
+    parse_inner_text_with_groq,
+    parse_inner_texts_with_groq,
+    stream_inner_text_with_groq,
+    parse_images_with_groq,
+    TEXT_MODEL as GROQ_TEXT_MODEL,
+    TEXT_SMALL_MODEL as GROQ_TEXT_SMALL_MODEL,
+    IMAGE_MODEL as GROQ_IMAGE_MODEL,
+)
+from app.services.ai.provider_router import OPENAI, GROQ, configured_providers, create_router
+from app.services.ai.model_tiers import ModelTiering, SMALL
+from app.services.ai.micro_batcher import MicroBatcher
+from app.services.ai.json_output import (
+    ExtractedProduct,
+    complete_fields,
+    parse_json_output,
+    PATH_SCHEMA,
+    PATH_JSON_MODE,
+)
+from app.utils.metrics import CounterSet
+from app.utils.single_flight import SingleFlight
+from app.utils.utils import canonicalize_url, extract_product_name_from_url
+
+logger = logging.getLogger(__name__)
+
+# Which path answered an extraction (reported to clients as "source")
+SOURCE_PRODUCT_CACHE = "product_cache"
+SOURCE_STRUCTURED_DATA = "structured_data"
+SOURCE_RULES = "rules"
+SOURCE_CACHE = "cache"
+SOURCE_LLM = "llm"
+
+# Answers per source
+source_counters = CounterSet()
+
+# Shared product cache counters (details_hits, image_hits, own_hits, misses, stores, promotions, errors)
+product_cache_counters = CounterSet()
+
+# Concurrent identical requests in this worker share one in-flight completion.
+# Keys are the same content-addressed keys used by the extraction cache.
+text_flight = SingleFlight()
+image_flight = SingleFlight()
+
+# Latency-aware provider routing with failover, one router per operation
+# since prompt sizes (and so latencies) differ between them
+text_router = create_router()
+image_router = create_router()
+IMAGE_MODELS = {OPENAI: IMAGE_MODEL, GROQ: GROQ_IMAGE_MODEL}
+
+# Small-model-first text extraction (per-tier hit rates and latencies)
+text_tiers = ModelTiering(settings.AI_ROUTER_WINDOW_SIZE)
+
+# Micro-batchers for large-model text extraction, one per provider.
+# Lambdas look the parsers up at call time so they can be patched in tests.
+text_batchers = {
+    OPENAI: MicroBatcher(
+        lambda texts: parse_inner_texts_with_openai(texts),
+        lambda text: parse_inner_text_with_openai(text),
+        settings.EXTRACTION_MICRO_BATCH_MAX_SIZE,
+        settings.EXTRACTION_MICRO_BATCH_MAX_WAIT_MS,
+    ),
+    GROQ: MicroBatcher(
+        lambda texts: parse_inner_texts_with_groq(texts),
+        lambda text: parse_inner_text_with_groq(text),
+        settings.EXTRACTION_MICRO_BATCH_MAX_SIZE,
+        settings.EXTRACTION_MICRO_BATCH_MAX_WAIT_MS,
+    ),
+}
+
+# innerText reducer counters (calls, reduced_calls, tokens_before, tokens_after)
+reducer_counters = CounterSet()
+
+# Image pre-ranker counters (calls, candidates_in, candidates_out, collapsed, dropped, dominant)
+image_prerank_counters = CounterSet()
+
+
+def _is_complete_extraction(result: Any) -> bool:
+    """True if an extraction has both a product name and a price."""
+    return isinstance(result, dict) and _has_value(result.get("product_name")) and _has_value(result.get("price"))
+
+
+def _text_calls(text: str) -> Dict[str, Callable[[], Awaitable[Tuple[Dict[str, Any], str]]]]:
+    """Text extraction call per configured provider, returning (result, model used)."""
+    parsers = {
+        OPENAI: (parse_inner_text_with_openai, TEXT_SMALL_MODEL, TEXT_MODEL),
+        GROQ: (parse_inner_text_with_groq, GROQ_TEXT_SMALL_MODEL, GROQ_TEXT_MODEL),
+    }
+
+    def make_call(name: str, parse, small_model: str, large_model: str):
+        async def call() -> Tuple[Dict[str, Any], str]:
+            if not settings.EXTRACTION_MODEL_TIERING_ENABLED:
+                if settings.EXTRACTION_MICRO_BATCH_ENABLED:
+                    return await text_batchers[name].submit(text), large_model
+                return await parse(text), large_model
+            result, tier = await text_tiers.run(
+                lambda: parse(text, model=small_model),
+                lambda: parse(text, model=large_model),
+                _is_complete_extraction,
+            )
+            return result, small_model if tier == SMALL else large_model
+        return call
+
+    return {name: make_call(name, *parsers[name]) for name in configured_providers()}
+
+
+def _text_streams(text: str) -> Dict[str, Tuple[Callable[[], AsyncIterator[str]], str, str]]:
+    """Streaming text extraction per configured provider (opened when called), with its model and output mode."""
+    streams = {
+        OPENAI: (lambda: stream_inner_text_with_openai(text), TEXT_MODEL, PATH_SCHEMA),
+        GROQ: (lambda: stream_inner_text_with_groq(text), GROQ_TEXT_MODEL, PATH_JSON_MODE),
+    }
+    return {name: streams[name] for name in configured_providers()}
+
+
+def _image_calls(page_url: str, product_name: str, image_urls: List[str]) -> Dict[str, Callable[[], Awaitable[str]]]:
+    """Image selection call per configured provider."""
+    calls = {
+        OPENAI: lambda: parse_images_with_openai(page_url, product_name, image_urls),
+        GROQ: lambda: parse_images_with_groq(image_urls),
+    }
+    return {name: calls[name] for name in configured_providers()}
+
+
+def _has_value(value: Any) -> bool:
+    """True if an extracted field holds a real value (LLMs sometimes return the string 'null')."""
+    return value is not None and str(value).strip().lower() not in ("", "null", "none")
+
+
+def _voter() -> Optional[str]:
+    """
+    Product cache key for the user making the current request (None outside a user request).
+
+    Pages come from clients, so one user's results are only shared once
+    other users agree; the id is hashed since it becomes a field name.
+    """
+    user_id = usage_user.get()
+    if not user_id:
+        return None
+    return hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:16]
+
+
+def _normalize_field(value: Any) -> Optional[str]:
+    return " ".join(str(value).split()).casefold() if _has_value(value) else None
+
+
+class ExtractionService:
+    """Service for AI product extraction business logic."""
+
+    def __init__(self, cache: ExtractionCache, product_cache_repo: ProductCacheRepository):
+        """
+        Initialize extraction service.
+
+        Args:
+            cache: Extraction result cache instance
+            product_cache_repo: Shared product cache repository instance
+        """
+        self.cache = cache
+        self.product_cache_repo = product_cache_repo
+
+    def _is_fresh(self, updated_at: Optional[datetime]) -> bool:
+        if updated_at is None:
+            return False
+        window = timedelta(seconds=settings.PRODUCT_CACHE_FRESHNESS_SECONDS)
+        return datetime.utcnow() - updated_at <= window
+
+    async def _find_product(self, page_url: Optional[str]) -> Optional[ProductCacheEntry]:
+        """Look up the shared product cache entry for a page (None if disabled or missing)."""
+        if not page_url or not settings.PRODUCT_CACHE_ENABLED:
+            return None
+        try:
+            doc = await self.product_cache_repo.find_by_url(canonicalize_url(page_url))
+        except Exception as e:
+            # Cache lookups must never fail the extraction itself
+            logger.warning(f"Product cache read failed: {e}")
+            product_cache_counters.incr("errors")
+            return None
+        return ProductCacheEntry.from_mongo(doc) if doc else None
+
+    def _cached_details(self, product: Optional[ProductCacheEntry]) -> Optional[Dict[str, Any]]:
+        """Fresh shared name and price, or else this user's own earlier result."""
+        if product is None:
+            return None
+        if _has_value(product.product_name) and self._is_fresh(product.details_updated_at):
+            product_cache_counters.incr("details_hits")
+            return {"product_name": product.product_name, "price": product.price}
+        vote = product.detail_votes.get(_voter() or "")
+        if vote and _has_value(vote.product_name) and self._is_fresh(vote.at):
+            product_cache_counters.incr("own_hits")
+            return {"product_name": vote.product_name, "price": vote.price}
+        return None
+
+    def _cached_image(self, product: Optional[ProductCacheEntry]) -> Optional[str]:
+        """Fresh shared image, or else the image this user's earlier request chose."""
+        if product is None:
+            return None
+        if _has_value(product.image) and self._is_fresh(product.image_updated_at):
+            product_cache_counters.incr("image_hits")
+            return product.image
+        vote = product.image_votes.get(_voter() or "")
+        if vote and _has_value(vote.image) and self._is_fresh(vote.at):
+            product_cache_counters.incr("own_hits")
+            return vote.image
+        return None
+
+    def _agreeing(self, votes: Dict[str, ProductCacheVote], matches: Callable[[ProductCacheVote], bool]) -> bool:
+        """True once enough users' fresh results agree to share them."""
+        count = sum(1 for vote in votes.values() if self._is_fresh(vote.at) and matches(vote))
+        return count >= max(1, settings.PRODUCT_CACHE_MIN_AGREEING_USERS)
+
+    async def extract_from_text(
+        self,
+        inner_text: str,
+        page_url: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Extract product name and price from page innerText.
+
+        Tries, in order: the shared product cache (when page_url is given),
+        the rule-based fast path, the content-addressed cache and finally
+        the fastest healthy AI provider (OpenAI or Groq, with failover).
+        Concurrent identical requests share a single provider call.
+
+        Args:
+            inner_text: Page innerText captured by the extension
+            page_url: Optional product page URL
+
+        Returns:
+            Tuple of (dictionary with 'product_name' and 'price' keys, source)
+        """
+        result, source, reduced_text = await self._extract_without_llm(inner_text, page_url)
+        if source == SOURCE_PRODUCT_CACHE:
+            source_counters.incr(source)
+            return result, source
+
+        if result is None:
+            key = text_cache_key(inner_text, TEXT_MODEL, TEXT_PROMPT_VERSION)
+
+            async def parse_and_cache() -> Dict[str, Any]:
+                (parsed, model), _ = await text_router.run(_text_calls(reduced_text))
+                await self.cache.set(TEXT, key, parsed, model, TEXT_PROMPT_VERSION)
+                return parsed
+
+            result, source = await text_flight.do(key, parse_and_cache), SOURCE_LLM
+
+        source_counters.incr(source)
+        if page_url and settings.PRODUCT_CACHE_ENABLED:
+            product_cache_counters.incr("misses")
+            await self._store_details(page_url, result)
+        return result, source
+
+    async def _extract_without_llm(
+        self,
+        inner_text: str,
+        page_url: Optional[str]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], str]:
+        """
+        Try the shared product cache, the rule-based fast path and the content cache.
+
+        Returns:
+            Tuple of (result or None if only an LLM can answer, source, reduced innerText)
+        """
+        cached = self._cached_details(await self._find_product(page_url))
+        if cached is not None:
+            return cached, SOURCE_PRODUCT_CACHE, inner_text
+
+        reduced_text = self._reduce(inner_text)
+        result = self._extract_with_rules(reduced_text)
+        if result is not None:
+            return result, SOURCE_RULES, reduced_text
+
+        result = await self.cache.get(TEXT, text_cache_key(inner_text, TEXT_MODEL, TEXT_PROMPT_VERSION))
+        if result is not None:
+            usage_tracker.record_cache_hit(TEXT_MODEL, "text")
+            return result, SOURCE_CACHE, reduced_text
+        return None, None, reduced_text
+
+    async def stream_from_text(
+        self,
+        inner_text: str,
+        page_url: Optional[str] = None,
+        image_urls: Optional[List[str]] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Extract product fields from innerText, yielding each field as soon as it is known.
+
+        Non-LLM answers (product cache, rules, content cache) are yielded at
+        once; otherwise the completion is streamed and each field is yielded
+        when its value is complete in the partial JSON. With page_url and
+        image_urls, the product image is selected concurrently.
+
+        Args:
+            inner_text: Page innerText captured by the extension
+            page_url: Optional product page URL
+            image_urls: Optional candidate image URLs
+
+        Yields:
+            ("field", {"name", "value"}) events, then one ("done", {"cart_items", "image", "source"})
+        """
+        image_task = None
+        if page_url and image_urls:
+            image_task = asyncio.ensure_future(
+                self.select_product_image(page_url, extract_product_name_from_url(page_url), image_urls)
+            )
+        emitted = set()
+
+        def field_events(fields: Dict[str, Any]):
+            for name, value in fields.items():
+                if name not in emitted:
+                    emitted.add(name)
+                    yield "field", {"name": name, "value": value}
+            if image_task is not None and image_task.done() and "image" not in emitted and not image_task.exception():
+                emitted.add("image")
+                yield "field", {"name": "image", "value": image_task.result()}
+
+        try:
+            result, source, reduced_text = await self._extract_without_llm(inner_text, page_url)
+            if result is None:
+                streams = _text_streams(reduced_text)
+                content, provider = "", None
+                open_streams = {name: open_stream for name, (open_stream, _, _) in streams.items()}
+                async with aclosing(text_router.stream(open_streams)) as deltas:
+                    async for delta, provider in deltas:
+                        content += delta
+                        for event in field_events(complete_fields(content)):
+                            yield event
+                if provider is None:
+                    raise ValueError("AI provider returned an empty stream.")
+
+                _, model, output_mode = streams[provider]
+                parsed, _ = parse_json_output(content, output_mode)
+                result, source = ExtractedProduct.model_validate(parsed).model_dump(), SOURCE_LLM
+                await self.cache.set(
+                    TEXT, text_cache_key(inner_text, TEXT_MODEL, TEXT_PROMPT_VERSION), result, model, TEXT_PROMPT_VERSION
+                )
+
+            for event in field_events({"product_name": result.get("product_name"), "price": result.get("price")}):
+                yield event
+
+            source_counters.incr(source)
+            if source != SOURCE_PRODUCT_CACHE and page_url and settings.PRODUCT_CACHE_ENABLED:
+                product_cache_counters.incr("misses")
+                await self._store_details(page_url, result)
+
+            image = None
+            if image_task is not None:
+                try:
+                    image = await image_task
+                except Exception as e:
+                    logger.warning(f"Image selection failed while streaming: {e}")
+                if image and "image" not in emitted:
+                    emitted.add("image")
+                    yield "field", {"name": "image", "value": image}
+
+            yield "done", {"cart_items": result, "image": image, "source": source}
+        finally:
+            if image_task is not None and not image_task.done():
+                image_task.cancel()
+
+    async def extract_batch(
+        self,
+        items: List[Dict[str, Any]],
+        max_concurrency: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract several pages concurrently with a bounded fan-out.
+
+        A failing item does not fail the batch; its error is reported in its result.
+
+        Args:
+            items: Dicts with 'page_url' and either 'inner_text' or 'html'
+            max_concurrency: Maximum number of items extracted at once
+
+        Returns:
+            One result per item, in input order: {'index', 'cart_items', 'image', 'source'}
+            on success or {'index', 'error'} on failure
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def extract_one(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    if item.get("html"):
+                        result, image, source = await self.extract_from_html(item["html"], item.get("page_url"))
+                    else:
+                        result, source = await self.extract_from_text(item["inner_text"], item.get("page_url"))
+                        image = None
+                except Exception as e:
+                    logger.warning(f"Batch item {index} failed: {type(e).__name__}: {e}")
+                    return {"index": index, "error": str(e)}
+            return {"index": index, "cart_items": result, "image": image, "source": source}
+
+        return await asyncio.gather(*(extract_one(i, item) for i, item in enumerate(items)))
+
+    async def extract_from_html(
+        self,
+        html: str,
+        page_url: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], Optional[str], str]:
+        """
+        Extract product name, price and image from raw page HTML.
+
+        Reads JSON-LD, microdata and OpenGraph product data first. Only when
+        no name and price are found there does it fall back to
+        extract_from_text on the page's visible text. The HTML comes from the
+        client, so structured data is trusted for this user's answer only; it
+        reaches the shared product cache like any other result, once other
+        users' pages agree.
+
+        Args:
+            html: Raw page HTML (the <head> alone is often enough)
+            page_url: Optional product page URL
+
+        Returns:
+            Tuple of (dictionary with 'product_name' and 'price' keys, image URL or None, source)
+        """
+        parsed = parse_structured_data(html)
+        product = parsed.product()
+
+        if product and product.is_complete:
+            result = {"product_name": product.product_name, "price": product.display_price}
+            source_counters.incr(SOURCE_STRUCTURED_DATA)
+            if page_url and settings.PRODUCT_CACHE_ENABLED:
+                await self._store_details(page_url, result)
+                if product.image:
+                    await self._store_image(page_url, product.image)
+            return result, product.image, SOURCE_STRUCTURED_DATA
+
+        text = parsed.visible_text()
+        if not text:
+            # Nothing to send to the LLM: report the fields as not found
+            source_counters.incr(SOURCE_STRUCTURED_DATA)
+            return {"product_name": None, "price": None}, product.image if product else None, SOURCE_STRUCTURED_DATA
+        result, source = await self.extract_from_text(text, page_url)
+        return result, product.image if product else None, source
+
+    def _extract_with_rules(self, text: str) -> Optional[Dict[str, Any]]:
+        """Return the rule-based answer if it clears the confidence threshold."""
+        if not settings.EXTRACTION_FAST_PATH_ENABLED:
+            return None
+        extraction = extract_with_rules(text)
+        if extraction.confidence < settings.EXTRACTION_FAST_PATH_MIN_CONFIDENCE:
+            return None
+        return extraction.as_cart_item()
+
+    def _reduce(self, inner_text: str) -> str:
+        """Trim innerText to the configured token budget before it reaches the LLM."""
+        if not settings.EXTRACTION_REDUCER_ENABLED:
+            return inner_text
+        reduced = reduce_inner_text(
+            inner_text,
+            settings.EXTRACTION_INPUT_TOKEN_BUDGET,
+            settings.EXTRACTION_REDUCER_WINDOW_LINES,
+        )
+        reducer_counters.incr("calls")
+        reducer_counters.incr("tokens_before", reduced.tokens_before)
+        reducer_counters.incr("tokens_after", reduced.tokens_after)
+        if reduced.was_reduced:
+            reducer_counters.incr("reduced_calls")
+            logger.info(
+                f"Reduced innerText from ~{reduced.tokens_before} to ~{reduced.tokens_after} tokens "
+                f"({reduced.windows_kept}/{reduced.windows_total} windows kept)"
+            )
+        return reduced.text
+
+    async def _store_details(self, page_url: str, result: Dict[str, Any]) -> None:
+        """Record the user's result for the page and share it once enough users agree."""
+        voter = _voter()
+        if voter is None or not isinstance(result, dict) or not _has_value(result.get("product_name")):
+            return
+        canonical_url = canonicalize_url(page_url)
+        domain = urlsplit(canonical_url).hostname or ""
+        product_name = str(result["product_name"])
+        price = str(result["price"]) if _has_value(result.get("price")) else None
+        now = datetime.utcnow()
+        try:
+            doc = await self.product_cache_repo.record_details_vote(canonical_url, domain, voter, product_name, price, now)
+            product_cache_counters.incr("stores")
+            votes = ProductCacheEntry.from_mongo(doc).detail_votes if doc else {}
+            name_key, price_key = _normalize_field(product_name), _normalize_field(price)
+            if self._agreeing(
+                votes,
+                lambda vote: _normalize_field(vote.product_name) == name_key and _normalize_field(vote.price) == price_key,
+            ):
+                await self.product_cache_repo.upsert_details(canonical_url, domain, product_name, price, now)
+                product_cache_counters.incr("promotions")
+        except Exception as e:
+            logger.warning(f"Product cache write failed: {e}")
+            product_cache_counters.incr("errors")
+
+    async def select_product_image(
+        self,
+        page_url: str,
+        product_name: str,
+        image_urls: List[str]
+    ) -> str:
+        """
+        Pick the main product image from a list of candidates.
+
+        Tries, in order: the shared product cache, the pre-ranker (when one
+        candidate clearly dominates), the content-addressed cache, a
+        candidate showing an image chosen for this product before (perceptual
+        hash, when IMAGE_HASH_SELECTION_REUSE is set) and the fastest healthy
+        AI provider, which only sees the top-ranked candidates. With
+        IMAGE_QUALITY_FETCH_CANDIDATES set, candidates are fetched after the
+        product cache check and those the local quality filter rejects are
+        dropped before pre-ranking.
+
+        Args:
+            page_url: Product page URL
+            product_name: Product name derived from the page URL
+            image_urls: Candidate image URLs
+
+        Returns:
+            The selected image URL
+        """
+        cached = self._cached_image(await self._find_product(page_url))
+        if cached is not None:
+            return cached
+
+        processed = {}
+        if settings.IMAGE_QUALITY_FETCH_CANDIDATES:
+            processed = await self._process_images(image_urls)
+            image_urls = self._filter_low_quality(image_urls, processed)
+
+        # A clearly dominant candidate answers without the LLM
+        result, image_urls = self._prerank_images(
+            product_name, image_urls, {url: image.quality for url, image in processed.items()}
+        )
+        if result is None:
+            key = image_cache_key(page_url, image_urls, IMAGE_MODEL, IMAGE_PROMPT_VERSION)
+            result = await self.cache.get(IMAGE, key)
+            if result is not None:
+                usage_tracker.record_cache_hit(IMAGE_MODEL, "image")
+        if result is None:
+            async def select_and_cache() -> str:
+                fingerprints = {}
+                if settings.IMAGE_HASH_SELECTION_REUSE and image_hash_index.enabled:
+                    # Already-processed candidates are served from the pipeline's cache
+                    candidates = await self._process_images(image_urls)
+                    fingerprints = {url: image.dhash for url, image in candidates.items()}
+                    selected = await image_hash_index.find_best(fingerprints, product_name)
+                    if selected is not None:
+                        return selected
+
+                selected, provider = await image_router.run(_image_calls(page_url, product_name, image_urls))
+                await self.cache.set(IMAGE, key, selected, IMAGE_MODELS[provider], IMAGE_PROMPT_VERSION)
+                if selected in fingerprints:
+                    await image_hash_index.record(fingerprints[selected], selected, product_name, best=True)
+                return selected
+
+            result = await image_flight.do(key, select_and_cache)
+
+        if settings.PRODUCT_CACHE_ENABLED:
+            product_cache_counters.incr("misses")
+            await self._store_image(page_url, result)
+        return result
+
+    async def _process_images(self, image_urls: List[str]) -> Dict[str, ProcessedImage]:
+        """
+        Fetch and process image candidates through the vision pipeline.
+
+        Only used when IMAGE_QUALITY_FETCH_CANDIDATES or
+        IMAGE_HASH_SELECTION_REUSE is set, since it downloads every
+        candidate; images that can't be fetched are left out.
+        """
+        processed = await asyncio.gather(*(process_image(url) for url in image_urls), return_exceptions=True)
+        images = {}
+        for url, image in zip(image_urls, processed):
+            if isinstance(image, ValueError):
+                logger.warning(f"Could not process image candidate: {image}")
+            elif isinstance(image, BaseException):
+                raise image
+            else:
+                images[url] = image
+        return images
+
+    def _filter_low_quality(self, image_urls: List[str], processed: Dict[str, ProcessedImage]) -> List[str]:
+        """Drop fetched candidates the quality filter rejects (keeping all of them if none pass)."""
+        if not settings.IMAGE_QUALITY_FILTER_ENABLED:
+            return image_urls
+
+        kept = [
+            url for url in image_urls
+            if url not in processed or check_quality(processed[url].quality) is None
+        ]
+        return kept or image_urls
+
+    def _prerank_images(
+        self,
+        product_name: str,
+        image_urls: List[str],
+        qualities: Optional[Dict[str, ImageQuality]] = None
+    ) -> Tuple[Optional[str], List[str]]:
+        """
+        Collapse and score image candidates before the LLM sees them.
+
+        Returns:
+            Tuple of (dominant image URL or None, candidates to send to the LLM)
+        """
+        if not settings.IMAGE_PRERANK_ENABLED:
+            return None, image_urls
+
+        ranked = rank_image_candidates(
+            image_urls,
+            product_name,
+            settings.IMAGE_PRERANK_MIN_SCORE,
+            settings.IMAGE_PRERANK_MARGIN,
+            qualities,
+        )
+        image_prerank_counters.incr("calls")
+        image_prerank_counters.incr("candidates_in", len(image_urls))
+        image_prerank_counters.incr("collapsed", ranked.collapsed)
+        image_prerank_counters.incr("dropped", ranked.dropped)
+        if ranked.dominant:
+            image_prerank_counters.incr("dominant")
+            return ranked.dominant, []
+        if not ranked.candidates:
+            # Everything looked like page furniture; let the LLM judge the original list
+            image_prerank_counters.incr("candidates_out", len(image_urls))
+            return None, image_urls
+
+        top = [candidate.url for candidate in ranked.candidates[:max(1, settings.IMAGE_PRERANK_TOP_K)]]
+        image_prerank_counters.incr("candidates_out", len(top))
+        return None, top
+
+    async def _store_image(self, page_url: str, image: str) -> None:
+        """Record the user's chosen image for the page and share it once enough users agree."""
+        voter = _voter()
+        if voter is None or not _has_value(image):
+            return
+        canonical_url = canonicalize_url(page_url)
+        domain = urlsplit(canonical_url).hostname or ""
+        now = datetime.utcnow()
+        try:
+            doc = await self.product_cache_repo.record_image_vote(canonical_url, domain, voter, image, now)
+            product_cache_counters.incr("stores")
+            votes = ProductCacheEntry.from_mongo(doc).image_votes if doc else {}
+            if self._agreeing(votes, lambda vote: vote.image == image):
+                await self.product_cache_repo.upsert_image(canonical_url, domain, image, now)
+                product_cache_counters.incr("promotions")
+        except Exception as e:
+            logger.warning(f"Product cache write failed: {e}")
+            product_cache_counters.incr("errors")
@@ -5,6 +5,7 @@ from typing import Dict, Optional
 from app.repositories.feedback_repository import FeedbackRepository
 from app.models.feedback import Feedback
 from app.core.config import settings
+from app.core.http_client import http_client
 import httpx
 import logging
 
@@ -65,22 +66,21 @@ class FeedbackService:
         # Post to Google Sheets (non-blocking)
         try:
             if settings.GOOGLE_SHEETS_SCRIPT_URL:
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    form_data = {
-                        "type": type,
-                        "description": description,
-                        "firstName": firstName or "",
-                        "lastName": lastName or "",
-                        "email": email or "",
-                        "timestamp": now
-                    }
-                    
-                    response = await client.post(
-                        settings.GOOGLE_SHEETS_SCRIPT_URL,
-                        data=form_data,
-                        follow_redirects=True
-                    )
-                    response.raise_for_status()
+                form_data = {
+                    "type": type,
+                    "description": description,
+                    "firstName": firstName or "",
+                    "lastName": lastName or "",
+                    "email": email or "",
+                    "timestamp": now
+                }
+                
+                response = await http_client.client.post(
+                    settings.GOOGLE_SHEETS_SCRIPT_URL,
+                    data=form_data,
+                    follow_redirects=True
+                )
+                response.raise_for_status()
             else:
                 logger.warning("GOOGLE_SHEETS_SCRIPT_URL not configured, skipping Google Sheets post")
                 
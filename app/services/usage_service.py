@@ -0,0 +1,82 @@
+"""AI usage service for business logic."""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from app.models.ai_usage import AIUsageRollup
+from app.repositories.ai_usage_repository import AIUsageRepository
+from app.services.ai.usage import usage_tracker
+
+# Fields summed across rollup documents
+TOTAL_FIELDS = (
+    "calls", "cache_hits", "errors", "timeouts",
+    "prompt_tokens", "completion_tokens", "cost_usd", "latency_ms_total",
+)
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {field: 0 for field in TOTAL_FIELDS}
+
+
+def _add(totals: Dict[str, Any], rollup: AIUsageRollup) -> None:
+    for field in TOTAL_FIELDS:
+        totals[field] += getattr(rollup, field)
+
+
+def _finish(totals: Dict[str, Any]) -> Dict[str, Any]:
+    latency_total = totals.pop("latency_ms_total")
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    totals["avg_latency_ms"] = round(latency_total / totals["calls"], 1) if totals["calls"] else None
+    return totals
+
+
+class UsageService:
+    """Service for AI usage reporting business logic."""
+
+    def __init__(self, usage_repo: AIUsageRepository):
+        """
+        Initialize usage service with repository.
+
+        Args:
+            usage_repo: AI usage repository instance
+        """
+        self.usage_repo = usage_repo
+
+    async def get_usage(self, user_id: Optional[str], days: int) -> Dict[str, Any]:
+        """
+        Get AI usage totals per user and day.
+
+        Usage recorded in this worker but not yet rolled up is written first.
+
+        Args:
+            user_id: Only this user's usage, or every user's if None
+            days: Number of UTC days to include, today included
+
+        Returns:
+            Dictionary with the first day included, one entry per user and day
+            (with a per provider/model breakdown) and overall totals
+        """
+        await usage_tracker.flush()
+        since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+        docs = await self.usage_repo.find_since(since, user_id)
+
+        rows: Dict[tuple, Dict[str, Any]] = {}
+        overall = _empty_totals()
+        for doc in docs:
+            rollup = AIUsageRollup.from_mongo(doc)
+            row = rows.setdefault((rollup.day, rollup.user_id), {"totals": _empty_totals(), "models": {}})
+            _add(row["totals"], rollup)
+            _add(row["models"].setdefault(f"{rollup.provider}/{rollup.model}", _empty_totals()), rollup)
+            _add(overall, rollup)
+
+        return {
+            "since": since,
+            "days": [
+                {
+                    "day": day,
+                    "user_id": row_user_id,
+                    **_finish(row["totals"]),
+                    "models": {name: _finish(totals) for name, totals in row["models"].items()},
+                }
+                for (day, row_user_id), row in sorted(rows.items(), key=lambda item: (item[0][0], item[0][1] or ""))
+            ],
+            "totals": _finish(overall),
+        }
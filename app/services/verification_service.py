@@ -0,0 +1,224 @@
+"""Image verification service for business logic."""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from app.core.config import settings
+from app.services.ai.extraction_cache import ExtractionCache, VERIFY, verification_cache_key
+from app.services.ai.limits import InFlightLimiter
+from app.services.ai.image_pipeline import ProcessedImage, process_image
+from app.services.ai.image_quality import check_quality
+from app.services.ai.image_hash_index import image_hash_index
+from app.services.ai.usage import usage_tracker
+from app.services.ai.vision_verifier import (
+    ask_openai_vision,
+    ask_openai_vision_batch,
+    VISION_MODEL,
+    VISION_PROMPT_VERSION,
+)
+from app.services.extraction_service import SOURCE_CACHE, SOURCE_LLM
+from app.utils.metrics import CounterSet
+from app.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Answered from the perceptual-hash index (same photo under another URL)
+SOURCE_IMAGE_HASH = "image_hash"
+# Rejected by the local quality filter (tracking pixel, placeholder, sprite, thumbnail)
+SOURCE_QUALITY_FILTER = "quality_filter"
+
+# Verdicts
+VERDICT_MATCH = "match"
+VERDICT_MISMATCH = "mismatch"
+VERDICT_UNKNOWN = "unknown"  # Timed out, failed or verification disabled; never cached
+
+# Verdicts returned plus timeouts, errors, batch_calls and batched_images
+verification_counters = CounterSet()
+
+# Concurrent checks of the same image and product share one vision call
+verification_flight = SingleFlight()
+
+# Verification calls in flight (on top of the shared AI call limit), so a
+# burst of checks can't take every provider slot from extraction
+verification_limiter = InFlightLimiter(settings.VERIFICATION_MAX_CONCURRENT_CALLS)
+
+
+class VerificationService:
+    """Service for product image verification business logic."""
+
+    def __init__(self, cache: ExtractionCache):
+        """
+        Initialize verification service.
+
+        Args:
+            cache: Extraction result cache instance (verdicts use the VERIFY kind)
+        """
+        self.cache = cache
+
+    async def verify_image(self, image_url: str, product_name: str) -> Tuple[str, str]:
+        """
+        Check whether an image shows the named product.
+
+        Verdicts are cached by image URL hash and normalized product name, so
+        repeat checks of popular products don't reach OpenAI. The same photo
+        under a new URL reuses the verdict through the perceptual-hash index,
+        and images the local quality filter rejects are a "mismatch" without
+        a vision call.
+        A check that doesn't finish within VERIFICATION_TIMEOUT_SECONDS
+        (queueing included) or fails answers "unknown" instead of raising.
+
+        Args:
+            image_url: URL of the image to verify
+            product_name: Name of the product to match against
+
+        Returns:
+            Tuple of (verdict, source) where verdict is "match", "mismatch" or
+            "unknown" and source is "cache", "image_hash", "quality_filter" or "llm"
+        """
+        key = verification_cache_key(image_url, product_name, VISION_MODEL, VISION_PROMPT_VERSION)
+        verdict = await self.cache.get(VERIFY, key)
+        source = SOURCE_CACHE
+        if verdict is not None:
+            usage_tracker.record_cache_hit(VISION_MODEL, "vision")
+        else:
+            verdict, source = (await self._verify_pending([key], [image_url], product_name))[0]
+
+        verification_counters.incr(verdict)
+        return verdict, source
+
+    async def verify_images(self, image_urls: List[str], product_name: str) -> List[Tuple[str, str]]:
+        """
+        Check several candidate images for the same product.
+
+        Cached verdicts are reused; the rest are sent in chunks of up to
+        VERIFICATION_BATCH_SIZE images per vision request, so one round trip
+        replaces one request per image. A chunk that times out or fails
+        answers "unknown" for each of its images.
+
+        Args:
+            image_urls: URLs of the images to verify
+            product_name: Name of the product to match against
+
+        Returns:
+            One (verdict, source) tuple per image, in input order, as from verify_image
+        """
+        keys = [verification_cache_key(url, product_name, VISION_MODEL, VISION_PROMPT_VERSION) for url in image_urls]
+        results: Dict[int, Tuple[str, str]] = {}
+        pending: Dict[str, List[int]] = {}  # Duplicate URLs are verified once
+        cached = await asyncio.gather(*(self.cache.get(VERIFY, key) for key in keys))
+        for index, (key, verdict) in enumerate(zip(keys, cached)):
+            if verdict is not None:
+                results[index] = (verdict, SOURCE_CACHE)
+                usage_tracker.record_cache_hit(VISION_MODEL, "vision_batch")
+            else:
+                pending.setdefault(key, []).append(index)
+
+        uncached = list(pending)
+        size = max(1, settings.VERIFICATION_BATCH_SIZE)
+        chunks = [uncached[start:start + size] for start in range(0, len(uncached), size)]
+        chunk_results = await asyncio.gather(*(
+            self._verify_pending(chunk, [image_urls[pending[key][0]] for key in chunk], product_name)
+            for chunk in chunks
+        ))
+        for chunk, verdicts in zip(chunks, chunk_results):
+            for key, result in zip(chunk, verdicts):
+                for index in pending[key]:
+                    results[index] = result
+
+        for verdict, _ in results.values():
+            verification_counters.incr(verdict)
+        return [results[index] for index in range(len(image_urls))]
+
+    async def _verify_pending(self, keys: List[str], image_urls: List[str], product_name: str) -> List[Tuple[str, str]]:
+        """Verify uncached images (a lone image shares in-flight calls with identical checks)."""
+        if len(keys) == 1:
+            return await verification_flight.do(keys[0], lambda: self._verify_and_cache(keys, image_urls, product_name))
+        return await self._verify_and_cache(keys, image_urls, product_name)
+
+    async def _verify_and_cache(self, keys: List[str], image_urls: List[str], product_name: str) -> List[Tuple[str, str]]:
+        results = await self._ask(lambda: self._ask_vision(image_urls, product_name))
+        if results is None:
+            return [(VERDICT_UNKNOWN, SOURCE_LLM)] * len(image_urls)
+
+        for key, (verdict, _) in zip(keys, results):
+            await self.cache.set(VERIFY, key, verdict, VISION_MODEL, VISION_PROMPT_VERSION)
+        return results
+
+    async def _ask_vision(self, image_urls: List[str], product_name: str) -> List[Tuple[str, str]]:
+        """
+        Answer from the quality filter and perceptual-hash index where possible, else ask OpenAI Vision.
+
+        Images left over go out in one request (one per image only when a
+        single image is left) and their verdicts are recorded in the index.
+        """
+        processed = await asyncio.gather(*(self._process_image(url) for url in image_urls))
+        fingerprints = [
+            image.dhash if image is not None and image_hash_index.enabled else None
+            for image in processed
+        ]
+        reused = await asyncio.gather(*(
+            image_hash_index.find_verdict(fingerprint, product_name) if fingerprint is not None else _no_verdict()
+            for fingerprint in fingerprints
+        ))
+        results: List[Optional[Tuple[str, str]]] = []
+        for image, verdict in zip(processed, reused):
+            if image is not None and settings.IMAGE_QUALITY_FILTER_ENABLED and check_quality(image.quality):
+                results.append((VERDICT_MISMATCH, SOURCE_QUALITY_FILTER))
+            elif verdict:
+                results.append((verdict, SOURCE_IMAGE_HASH))
+            else:
+                results.append(None)
+        remaining = [index for index, result in enumerate(results) if result is None]
+        if not remaining:
+            return results
+
+        urls = [image_urls[index] for index in remaining]
+        if len(urls) == 1:
+            matches = [await ask_openai_vision(urls[0], product_name)]
+        else:
+            verification_counters.incr("batch_calls")
+            verification_counters.incr("batched_images", len(urls))
+            matches = await ask_openai_vision_batch(urls, product_name)
+
+        for index, match in zip(remaining, matches):
+            verdict = VERDICT_MATCH if match else VERDICT_MISMATCH
+            results[index] = (verdict, SOURCE_LLM)
+            if fingerprints[index] is not None:
+                await image_hash_index.record(fingerprints[index], image_urls[index], product_name, verdict=verdict)
+        return results
+
+    async def _process_image(self, image_url: str) -> Optional[ProcessedImage]:
+        """Image fetched through the vision pipeline for the quality filter and hash index (None if unavailable)."""
+        if not settings.IMAGE_PIPELINE_ENABLED:
+            return None
+        if not image_hash_index.enabled and not settings.IMAGE_QUALITY_FILTER_ENABLED:
+            return None
+        try:
+            return await process_image(image_url)
+        except ValueError as e:
+            logger.warning(f"Could not process image: {e}")
+            return None
+
+    async def _ask(self, call: Callable[[], Awaitable[T]]) -> Optional[T]:
+        """Run a vision call within the verification limits; None when it is disabled, slow or fails."""
+        if not settings.ENABLE_VISION_FALLBACK:
+            return None
+
+        try:
+            return await asyncio.wait_for(
+                verification_limiter.run(call),
+                timeout=settings.VERIFICATION_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Image verification timed out after {settings.VERIFICATION_TIMEOUT_SECONDS}s")
+            verification_counters.incr("timeouts")
+            return None
+        except ValueError as e:
+            logger.warning(f"Image verification failed: {e}")
+            verification_counters.incr("errors")
+            return None
+
+
+async def _no_verdict() -> None:
+    return None
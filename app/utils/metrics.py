@@ -0,0 +1,28 @@
+"""
+Lightweight in-process counters for exposing service metrics.
+"""
+from collections import defaultdict
+from typing import Dict
+
+
+class CounterSet:
+    """Named monotonically increasing counters."""
+
+    def __init__(self):
+        self._counts: Dict[str, int] = defaultdict(int)
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        """Increment a counter by amount."""
+        self._counts[name] += amount
+
+    def get(self, name: str) -> int:
+        """Get the current value of a counter (0 if never incremented)."""
+        return self._counts.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return a copy of all counters."""
+        return dict(self._counts)
+
+    def reset(self) -> None:
+        """Reset all counters to zero."""
+        self._counts.clear()
@@ -1,6 +1,7 @@
 """
 Rate limiting utilities for FastAPI routes.
 """
+from limits import parse as parse_limit
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from app.core.config import settings
@@ -33,3 +34,16 @@ def rate_limit(limit: str):
             return func
     return decorator
 
+
+def consume_rate_limit(request: Request, limit: str, scope: str, cost: int = 1) -> bool:
+    """
+    Charge `cost` hits against a per-client limit shared by all requests in `scope`.
+    
+    Used where one request stands for many units of work (e.g. batch items).
+    
+    Returns:
+        True if the hits fit within the limit (always True when rate limiting is disabled)
+    """
+    if not limiter or not limiter.enabled:
+        return True
+    return limiter.limiter.hit(parse_limit(limit), get_rate_limit_key(request), scope, cost=cost)
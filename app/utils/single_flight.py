@@ -0,0 +1,65 @@
+"""
+Single-flight deduplication of concurrent identical async calls.
+
+While a call for a key is in flight, further callers with the same key await
+the same result instead of starting their own call.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key (per process)."""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `call` for `key`, or join the call already running for it.
+
+        The shared call runs in its own task, so a caller that is cancelled
+        (e.g. the client disconnected) does not cancel it for the others.
+
+        Args:
+            key: Deduplication key
+            call: Zero-argument function returning the awaitable to run
+
+        Returns:
+            Result of the shared call (exceptions are shared too)
+        """
+        task = self._in_flight.get(key)
+        if task is not None and not task.done():
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved when every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+    def reset(self) -> None:
+        """Reset counters (in-flight calls are left to finish)."""
+        self.calls = 0
+        self.coalesced = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of single-flight counters."""
+        total = self.calls + self.coalesced
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,10 @@
+"""
+Server-Sent Events formatting helpers.
+"""
+import json
+from typing import Any
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Format one SSE message with a JSON-encoded data payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
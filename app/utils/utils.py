@@ -1,3 +1,6 @@
+import re
+
+
 def extract_product_name_from_url(url: str) -> str:
     """Extracts the product name from a URL by removing domain and numeric IDs."""
     from urllib.parse import urlparse
@@ -11,4 +14,62 @@ def extract_product_name_from_url(url: str) -> str:
     # Join cleaned segments
     product_name = " ".join(words).replace("-", " ").replace("_", " ").strip()
 
-    return product_name if product_name else "Unknown Product"
\ No newline at end of file
+    return product_name if product_name else "Unknown Product"
+
+# Query parameters that only track the visit on any site (ad and email click IDs)
+TRACKING_QUERY_PARAMS = {
+    "gclid", "gclsrc", "dclid", "gbraid", "wbraid", "fbclid", "msclkid", "yclid", "ttclid",
+    "twclid", "igshid", "mc_cid", "mc_eid", "srsltid",
+}
+TRACKING_QUERY_PREFIXES = ("utm_", "_ga", "_gl", "mkt_", "hsa_")
+
+# Amazon's own tracking parameters; elsewhere names like "tag" or "sr" may pick the product
+AMAZON_TRACKING_QUERY_PARAMS = {
+    "ref", "ref_", "tag", "linkcode", "linkid", "camp", "creative", "creativeasin", "psc", "smid",
+    "th", "_encoding", "qid", "sr", "keywords", "crid", "sprefix", "content-id",
+}
+AMAZON_TRACKING_QUERY_PREFIXES = ("pd_rd_", "pf_rd_")
+# amazon.com, amazon.de, amazon.co.uk, amazon.com.au and their subdomains
+_AMAZON_HOST = re.compile(r"(^|\.)amazon\.(com|[a-z]{2}|co\.[a-z]{2}|com\.[a-z]{2})$")
+
+
+def _is_amazon_host(host: str) -> bool:
+    return bool(_AMAZON_HOST.search(host))
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonicalize a product page URL so visits from different users share a key.
+
+    Lowercases scheme and host, drops "www.", default ports, fragments and
+    click-tracking query parameters, and sorts the remaining query parameters.
+    On Amazon it also drops Amazon's tracking parameters and "/ref=..." path
+    segments; other sites may use those names for the product or variant.
+    """
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    port = parts.port
+    netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+
+    tracking_params, tracking_prefixes = TRACKING_QUERY_PARAMS, TRACKING_QUERY_PREFIXES
+    amazon = _is_amazon_host(host)
+    if amazon:
+        tracking_params = tracking_params | AMAZON_TRACKING_QUERY_PARAMS
+        tracking_prefixes = tracking_prefixes + AMAZON_TRACKING_QUERY_PREFIXES
+
+    segments = [s for s in parts.path.split("/") if s and not (amazon and s.lower().startswith("ref="))]
+    path = "/" + "/".join(segments) if segments else "/"
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=False)
+        if key.lower() not in tracking_params
+        and not key.lower().startswith(tracking_prefixes)
+    )
+
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
@@ -0,0 +1,154 @@
+"""
+Benchmark: GET /carts latency while extractions are in flight.
+
+Drives the app in-process through httpx's ASGI transport. The OpenAI client's
+`chat.completions.create` is replaced with a stand-in that takes
+`--provider-latency` seconds, so the real parser -> limiter -> client path runs
+without network access. Auth and the cart service are replaced via FastAPI
+dependency overrides. Every extraction posts a page of its own with no price,
+so caches, request coalescing and the rule fast path can't answer it and the
+configured number of provider calls stays in flight.
+
+`--blocking` simulates the previous behaviour (a synchronous client call made
+inside the async route) so the two modes can be compared.
+
+Usage:
+    python -m benchmarks.crud_latency_under_extraction
+    python -m benchmarks.crud_latency_under_extraction --blocking
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+# The app requires these at import time; benchmarks never touch a real database
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017/bench")
+os.environ.setdefault("ENVIRONMENT", "test")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+# Every extraction should reach the (simulated) provider: no caches, no rule
+# fast path and no per-user budget that could start refusing the load
+os.environ.setdefault("EXTRACTION_CACHE_ENABLED", "false")
+os.environ.setdefault("PRODUCT_CACHE_ENABLED", "false")
+os.environ.setdefault("EXTRACTION_FAST_PATH_ENABLED", "false")
+os.environ.setdefault("QUOTA_ENABLED", "false")
+
+import httpx
+
+from main import app
+from app.core.dependencies import get_current_user, get_cart_service
+from app.models.user import User
+from app.services.ai import openai_parser
+
+BENCH_USER = User(user_id="bench|user", email="bench@buyhive.com", name="Bench User")
+
+
+class _FakeCartService:
+    async def get_user_carts(self, user_id: str) -> list:
+        return []
+
+
+def _completion(content: str) -> SimpleNamespace:
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _install_fake_provider(latency: float, blocking: bool) -> None:
+    content = '{"product_name": "Bench Product", "price": "$19.99"}'
+
+    async def async_create(**kwargs):
+        await asyncio.sleep(latency)
+        return _completion(content)
+
+    async def blocking_create(**kwargs):
+        time.sleep(latency)  # Freezes the event loop like the old sync client did
+        return _completion(content)
+
+    openai_parser.client.chat.completions.create = blocking_create if blocking else async_create
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of samples (in the samples' unit)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+async def _probe_carts(client: httpx.AsyncClient, count: int, interval: float) -> List[float]:
+    # Probes are due on a fixed schedule and timed from when they were due, so
+    # time spent waiting for a frozen event loop to run the probe at all counts
+    latencies = []
+    first_due = time.perf_counter()
+    for index in range(count):
+        due = first_due + index * interval
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        response = await client.get("/carts")
+        latencies.append((time.perf_counter() - due) * 1000)
+        response.raise_for_status()
+    return latencies
+
+
+def _page_text(loop: int, iteration: int) -> str:
+    """A page no two requests share (so single-flight can't coalesce them) and without a price for the rules."""
+    return f"Bench catalogue page {loop}-{iteration}\nA product description with no listed price"
+
+
+async def _extract_loop(client: httpx.AsyncClient, loop: int, stop: asyncio.Event) -> int:
+    done = 0
+    while not stop.is_set():
+        await client.post("/extract/extract", json={"inner_text": _page_text(loop, done)})
+        done += 1
+    return done
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    app.dependency_overrides[get_current_user] = lambda: BENCH_USER
+    app.dependency_overrides[get_cart_service] = lambda: _FakeCartService()
+    _install_fake_provider(args.provider_latency, args.blocking)
+
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/carts")  # Warm up routing/dependency caches
+        results["idle"] = await _probe_carts(client, args.probes, args.interval)
+
+        stop = asyncio.Event()
+        extractors = [asyncio.create_task(_extract_loop(client, loop, stop)) for loop in range(args.extractions)]
+        await asyncio.sleep(args.interval)
+        results["under_extraction"] = await _probe_carts(client, args.probes, args.interval)
+        stop.set()
+        await asyncio.gather(*extractors)
+
+    app.dependency_overrides.clear()
+    return {
+        phase: {
+            "p50_ms": round(statistics.median(samples), 2),
+            "p99_ms": round(percentile(samples, 99), 2),
+            "max_ms": round(max(samples), 2),
+        }
+        for phase, samples in results.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--extractions", type=int, default=8, help="Concurrent extraction loops")
+    parser.add_argument("--provider-latency", type=float, default=0.5, help="Simulated completion time (s)")
+    parser.add_argument("--probes", type=int, default=50, help="GET /carts samples per phase")
+    parser.add_argument("--interval", type=float, default=0.02, help="Pause between probes (s)")
+    parser.add_argument("--blocking", action="store_true", help="Simulate the old synchronous client")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    mode = "blocking client" if args.blocking else "async client"
+    print(f"GET /carts latency ({mode}, {args.extractions} extractions in flight)")
+    for phase, stats in report.items():
+        print(f"  {phase:<17} p50={stats['p50_ms']:>8} ms  p99={stats['p99_ms']:>8} ms  max={stats['max_ms']:>8} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+Benchmark: extraction throughput, per-stage latency, prompt tokens and accuracy.
+
+Runs every page in `benchmarks/corpus/` (saved product-page innerText or HTML
+plus the expected product name, price and image) through the full pipeline
+in-process: the /extract/extract, /extract/extract-html and
+/extract/analyze-images routes, the reducer, rules, structured data, the
+image pre-ranker, provider routing and the real OpenAI parser. Only the
+OpenAI client's `chat.completions.create` is replaced, by a stand-in that
+waits `--provider-latency` seconds and answers with the corpus' expected
+fields that are actually present in the prompt, so accuracy measures what
+the pipeline gets right or loses before a model could help. Caches, the
+product cache, rate limits and token quotas are switched off so every page
+takes the full path.
+
+Two passes are made:
+- accuracy: each page once, in order. Field accuracy, sources, provider calls
+  and prompt tokens are deterministic and compared with the baseline.
+- load: `--rounds` passes over the corpus with `--concurrency` pages in
+  flight, for throughput and latency per request and per stage. These depend
+  on the machine and are recorded in the baseline for reference only.
+
+The baseline lives in `benchmarks/baselines/extraction_pipeline.json`.
+`--check` exits non-zero when accuracy drops, prompt tokens grow by more than
+--token-tolerance or provider calls increase; `--update-baseline` rewrites it
+(commit the result with the change that moved it).
+
+Usage:
+    python -m benchmarks.extraction_pipeline
+    python -m benchmarks.extraction_pipeline --check
+    python -m benchmarks.extraction_pipeline --update-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from unittest.mock import patch
+
+# The app requires these at import time; benchmarks never touch a real database
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017/bench")
+os.environ.setdefault("ENVIRONMENT", "test")
+os.environ.setdefault("AI_PROVIDERS", "openai")
+
+import httpx
+
+from main import app
+from app.core.config import settings
+from app.core.dependencies import get_current_user
+from app.models.user import User
+from app.services import extraction_service
+from app.services.ai import openai_parser
+from app.services.ai.extraction_cache import extraction_cache
+from app.services.ai.rule_extractor import parse_amount
+from app.services.ai.text_reducer import estimate_tokens
+from app.services.ai.token_quota import token_quota
+from app.services.ai.usage import usage_tracker
+from app.utils.rate_limiter import limiter
+from benchmarks.crud_latency_under_extraction import percentile
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+BASELINE_PATH = Path(__file__).parent / "baselines" / "extraction_pipeline.json"
+
+BENCH_USER = User(user_id="bench|user", email="bench@buyhive.com", name="Bench User")
+
+FIELDS = ("product_name", "price", "image")
+
+# Pipeline functions timed as stages (looked up on the extraction service module)
+STAGES = ("parse_structured_data", "reduce_inner_text", "extract_with_rules", "rank_image_candidates")
+
+_TEXT_PROMPT = re.compile(r"\n\s*Text:\n(.*)", re.DOTALL)
+_IMAGE_PROMPT = re.compile(r"\*\*Image URLs:\*\*\s*(\[.*?\])\s*\*\*Output format", re.DOTALL)
+
+
+def load_corpus(corpus_dir: Path = CORPUS_DIR) -> List[Dict[str, Any]]:
+    """Load the corpus pages, sorted by id."""
+    pages = [json.loads(path.read_text(encoding="utf-8")) for path in sorted(corpus_dir.glob("*.json"))]
+    for page in pages:
+        if bool(page.get("inner_text")) == bool(page.get("html")):
+            raise ValueError(f"Corpus page {page.get('id')} needs exactly one of inner_text or html")
+    return pages
+
+
+def _normalize_name(value: Any) -> Optional[str]:
+    if not isinstance(value, str) or value.strip().lower() in ("", "null", "none"):
+        return None
+    return " ".join(value.casefold().split()).strip(" .,-")
+
+
+def field_matches(field: str, expected: Any, actual: Any) -> bool:
+    """Whether an extracted field is right (names ignore case/spacing, prices compare amounts)."""
+    if field == "product_name":
+        return _normalize_name(expected) == _normalize_name(actual)
+    if field == "price":
+        if not isinstance(actual, str):
+            return False
+        return parse_amount(expected) == parse_amount(actual)
+    return expected == actual
+
+
+class StubProvider:
+    """
+    Stand-in for `chat.completions.create` that answers from the corpus.
+
+    Text prompts get the expected name and price of the corpus page whose
+    name appears in the prompt, each only if it appears there verbatim
+    (a model can't report what it wasn't shown). Image prompts get the first
+    listed URL that is some page's expected image, else the first URL.
+    """
+
+    def __init__(self, pages: List[Dict[str, Any]], latency: float):
+        self.expected = [page["expected"] for page in pages]
+        self.images = {page["expected"].get("image") for page in pages}
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.latencies_ms: List[float] = []
+
+    def _answer_text(self, text: str) -> str:
+        folded = text.casefold()
+        seen = [expected for expected in self.expected if expected["product_name"].casefold() in folded]
+        if not seen:
+            return json.dumps({"product_name": None, "price": None})
+        expected = max(seen, key=lambda item: len(item["product_name"]))
+        return json.dumps({
+            "product_name": expected["product_name"],
+            "price": expected["price"] if expected["price"] in text else None,
+        })
+
+    def _answer_image(self, urls: List[str]) -> str:
+        return next((url for url in urls if url in self.images), urls[0])
+
+    async def create(self, **kwargs) -> SimpleNamespace:
+        start = time.perf_counter()
+        prompt = kwargs["messages"][0]["content"]
+        await asyncio.sleep(self.latency)
+
+        image_list = _IMAGE_PROMPT.search(prompt)
+        if image_list:
+            operation, content = "image", self._answer_image(json.loads(image_list.group(1)))
+        else:
+            text = _TEXT_PROMPT.search(prompt)
+            operation, content = "text", self._answer_text(text.group(1) if text else prompt)
+
+        prompt_tokens = estimate_tokens(prompt)
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+        self.prompt_tokens += prompt_tokens
+        self.latencies_ms.append((time.perf_counter() - start) * 1000)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=estimate_tokens(content)),
+        )
+
+
+class StageTimer:
+    """Collects wall time of wrapped pipeline functions, per stage."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def wrap(self, stage: str, func: Callable) -> Callable:
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.samples.setdefault(stage, []).append((time.perf_counter() - start) * 1000)
+        return timed
+
+    def record(self, stage: str, elapsed_ms: float) -> None:
+        self.samples.setdefault(stage, []).append(elapsed_ms)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Count and p50/p95/p99 of latency samples in ms."""
+    return {
+        "count": len(samples),
+        "p50_ms": round(statistics.median(samples), 3) if samples else 0.0,
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+    }
+
+
+@contextmanager
+def isolated_pipeline(provider: StubProvider, timer: StageTimer) -> Iterator[None]:
+    """Run the app with the stub provider, timed stages and caches, limits and quotas off."""
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(openai_parser.client.chat.completions, "create", provider.create))
+        stack.enter_context(patch.object(extraction_cache, "enabled", False))
+        stack.enter_context(patch.object(settings, "PRODUCT_CACHE_ENABLED", False))
+        stack.enter_context(patch.object(token_quota, "enabled", False))
+        stack.enter_context(patch.object(usage_tracker, "enabled", False))
+        if limiter:
+            stack.enter_context(patch.object(limiter, "enabled", False))
+        for stage in STAGES:
+            func = getattr(extraction_service, stage)
+            stack.enter_context(patch.object(extraction_service, stage, timer.wrap(stage, func)))
+        app.dependency_overrides[get_current_user] = lambda: BENCH_USER
+        try:
+            yield
+        finally:
+            app.dependency_overrides.pop(get_current_user, None)
+
+
+async def _post(client: httpx.AsyncClient, timer: StageTimer, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    response = await client.post(path, json=payload)
+    timer.record(f"request {path}", (time.perf_counter() - start) * 1000)
+    response.raise_for_status()
+    return response.json()
+
+
+async def extract_page(client: httpx.AsyncClient, timer: StageTimer, page: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract one corpus page the way the extension does; returns fields plus the text source."""
+    if page.get("html"):
+        data = await _post(client, timer, "/extract/extract-html", {"html": page["html"], "page_url": page["page_url"]})
+        image = data["image"]
+    else:
+        data = await _post(client, timer, "/extract/extract", {"inner_text": page["inner_text"], "page_url": page["page_url"]})
+        image = None
+
+    if image is None and page.get("image_urls"):
+        image = await _post(client, timer, "/extract/analyze-images", {
+            "page_url": page["page_url"],
+            "image_urls": ",".join(page["image_urls"]),
+        })
+
+    return {**data["cart_items"], "image": image, "source": data["source"]}
+
+
+async def run(
+    pages: List[Dict[str, Any]],
+    rounds: int = 3,
+    concurrency: int = 8,
+    provider_latency: float = 0.2
+) -> Dict[str, Any]:
+    """
+    Run the accuracy pass and `rounds` load passes over the corpus.
+
+    Returns:
+        The report (see BASELINE_PATH for its shape)
+    """
+    accuracy_provider = StubProvider(pages, 0.0)
+    accuracy_timer = StageTimer()
+    transport = httpx.ASGITransport(app=app)
+
+    with isolated_pipeline(accuracy_provider, accuracy_timer):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            results = [await extract_page(client, accuracy_timer, page) for page in pages]
+
+    correct = {field: 0 for field in FIELDS}
+    expected_counts = {field: 0 for field in FIELDS}
+    sources: Dict[str, int] = {}
+    mismatches = []
+    for page, result in zip(pages, results):
+        sources[result["source"]] = sources.get(result["source"], 0) + 1
+        for field in FIELDS:
+            expected = page["expected"].get(field)
+            if expected is None:
+                continue
+            expected_counts[field] += 1
+            if field_matches(field, expected, result.get(field)):
+                correct[field] += 1
+            else:
+                mismatches.append({"page": page["id"], "field": field, "expected": expected, "actual": result.get(field)})
+
+    report: Dict[str, Any] = {
+        "corpus": {
+            "pages": len(pages),
+            "inner_text": sum(1 for page in pages if page.get("inner_text")),
+            "html": sum(1 for page in pages if page.get("html")),
+        },
+        "accuracy": {
+            field: round(correct[field] / expected_counts[field], 4) if expected_counts[field] else None
+            for field in FIELDS
+        },
+        "mismatches": mismatches,
+        "sources": dict(sorted(sources.items())),
+        "provider_calls": dict(sorted(accuracy_provider.calls.items())),
+        "prompt_tokens": {
+            "total": accuracy_provider.prompt_tokens,
+            "per_page": round(accuracy_provider.prompt_tokens / len(pages), 1) if pages else 0.0,
+        },
+    }
+
+    if rounds > 0:
+        load_provider = StubProvider(pages, provider_latency)
+        load_timer = StageTimer()
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        page_latencies: List[float] = []
+
+        async def timed_page(client: httpx.AsyncClient, page: Dict[str, Any]) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                await extract_page(client, load_timer, page)
+                page_latencies.append((time.perf_counter() - start) * 1000)
+
+        with isolated_pipeline(load_provider, load_timer):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                start = time.perf_counter()
+                await asyncio.gather(*(timed_page(client, page) for _ in range(rounds) for page in pages))
+                elapsed = time.perf_counter() - start
+
+        load_timer.samples["provider"] = load_provider.latencies_ms
+        report["load"] = {
+            "rounds": rounds,
+            "concurrency": concurrency,
+            "provider_latency_ms": round(provider_latency * 1000, 1),
+            "pages": len(page_latencies),
+            "throughput_pages_per_s": round(len(page_latencies) / elapsed, 2) if elapsed else 0.0,
+            "page_latency": summarize(page_latencies),
+            "stages": {stage: summarize(samples) for stage, samples in sorted(load_timer.samples.items())},
+        }
+
+    return report
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], token_tolerance: float = 0.05) -> List[str]:
+    """
+    List regressions of the deterministic results against the baseline.
+
+    Returns:
+        One message per regression (empty if none)
+    """
+    regressions = []
+    for field, accuracy in baseline.get("accuracy", {}).items():
+        current = report["accuracy"].get(field)
+        if accuracy is not None and (current is None or current < accuracy):
+            regressions.append(f"{field} accuracy dropped from {accuracy} to {current}")
+
+    baseline_tokens = baseline.get("prompt_tokens", {}).get("total")
+    if baseline_tokens and report["prompt_tokens"]["total"] > baseline_tokens * (1 + token_tolerance):
+        regressions.append(f"prompt tokens grew from {baseline_tokens} to {report['prompt_tokens']['total']}")
+
+    for operation, calls in baseline.get("provider_calls", {}).items():
+        current = report["provider_calls"].get(operation, 0)
+        if current > calls:
+            regressions.append(f"{operation} provider calls grew from {calls} to {current}")
+    return regressions
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    corpus = report["corpus"]
+    print(f"Corpus: {corpus['pages']} pages ({corpus['inner_text']} innerText, {corpus['html']} HTML)")
+    print("Accuracy: " + "  ".join(f"{field}={value}" for field, value in report["accuracy"].items()))
+    for mismatch in report["mismatches"]:
+        print(f"  {mismatch['page']}: {mismatch['field']} expected {mismatch['expected']!r}, got {mismatch['actual']!r}")
+    print(f"Sources: {report['sources']}")
+    print(f"Provider calls: {report['provider_calls']}  prompt tokens: {report['prompt_tokens']}")
+
+    load = report.get("load")
+    if load:
+        print(f"Load: {load['pages']} pages, concurrency {load['concurrency']}, "
+              f"provider latency {load['provider_latency_ms']} ms -> {load['throughput_pages_per_s']} pages/s")
+        for stage, stats in [("page", load["page_latency"]), *load["stages"].items()]:
+            print(f"  {stage:<36} n={stats['count']:>5}  p50={stats['p50_ms']:>9} ms  "
+                  f"p95={stats['p95_ms']:>9} ms  p99={stats['p99_ms']:>9} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=3, help="Load passes over the corpus (0 skips the load pass)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Pages in flight during the load pass")
+    parser.add_argument("--provider-latency", type=float, default=0.2, help="Simulated completion time (s)")
+    parser.add_argument("--token-tolerance", type=float, default=0.05, help="Allowed prompt token growth (fraction)")
+    parser.add_argument("--check", action="store_true", help="Exit 1 on regressions against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(load_corpus(), args.rounds, args.concurrency, args.provider_latency))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+    if args.update_baseline:
+        BASELINE_PATH.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline written to {BASELINE_PATH}")
+    elif args.check:
+        regressions = compare_with_baseline(report, json.loads(BASELINE_PATH.read_text(encoding="utf-8")), args.token_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+Local stand-in for the OpenAI and Groq chat-completions API, for load tests.
+
+Serves `POST /v1/chat/completions` (OpenAI SDK) and
+`POST /openai/v1/chat/completions` (Groq SDK), including streaming, so the
+real parsers, SDK clients, retries, timeouts, the in-flight limiter and
+provider failover all run without spending API credit. Each request:
+
+1. is refused with 429 once `--rpm` requests were served in the last minute
+   (with `retry-after` and `x-ratelimit-*` headers like the real APIs), or at
+   random with probability `--rate-limit-rate`;
+2. fails with a 500 error body with probability `--error-rate`;
+3. hangs for `--hang-seconds` with probability `--hang-rate` (to exercise
+   client timeouts), otherwise waits a latency drawn from `--latency`;
+4. answers with the first recording whose `match` regex is found in the
+   prompt, or else a default answer: rule-based name and price for
+   extraction prompts (one per page for batched prompts), the first URL for
+   image selection, "yes" / all images for vision checks.
+
+Latency specs, in milliseconds: `fixed:MS`, `uniform:LOW,HIGH`,
+`normal:MEAN,STDDEV` or `lognormal:MEDIAN,SIGMA`.
+
+Recordings are a JSON list of {"match": regex, "content": str} with optional
+"status" (to replay an error) and "latency" (a spec overriding --latency).
+GET /stats reports requests, responses per status and peak concurrency.
+
+Usage:
+    python -m benchmarks.stub_provider_server --port 8090 --latency lognormal:600,0.5 --error-rate 0.02
+    python -m benchmarks.stub_provider_server --port 8091 --latency fixed:150 --rpm 300
+
+    # Point the app at them (the SDKs still need some API key)
+    OPENAI_BASE_URL=http://127.0.0.1:8090/v1 OPENAI_API_KEY=stub \\
+    GROQ_BASE_URL=http://127.0.0.1:8091 GROQ_API_KEY=stub uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# rule_extractor pulls in app settings, which require these at import time
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017/bench")
+os.environ.setdefault("ENVIRONMENT", "test")
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.ai.rule_extractor import extract_with_rules
+from app.services.ai.text_reducer import estimate_tokens
+
+# Prompt tokens a low-detail image costs
+IMAGE_TOKENS = 85
+
+# Characters per streamed content delta
+STREAM_CHUNK_CHARS = 16
+
+_IMAGE_LIST = re.compile(r"Image URLs:\**\s*(\[.*?\])", re.DOTALL)
+_TEXT = re.compile(r"\n\s*Text:\n(.*)", re.DOTALL)
+_PAGE = re.compile(r"^\s*### Page \d+\n", re.MULTILINE)
+
+
+class LatencyModel:
+    """Draws request latencies (in seconds) from a distribution spec in milliseconds."""
+
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+
+    def __init__(self, spec: str, rng: Optional[random.Random] = None):
+        kind, _, params = spec.partition(":")
+        try:
+            values = [float(value) for value in params.split(",")] if params else []
+        except ValueError:
+            values = []
+        if kind not in self.KINDS or len(values) != self.KINDS[kind]:
+            raise ValueError(
+                f"Invalid latency spec {spec!r}: use fixed:MS, uniform:LOW,HIGH, normal:MEAN,STDDEV or lognormal:MEDIAN,SIGMA"
+            )
+        self.spec = spec
+        self.kind = kind
+        self.values = values
+        self.rng = rng or random.Random()
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            ms = self.values[0]
+        elif self.kind == "uniform":
+            ms = self.rng.uniform(*self.values)
+        elif self.kind == "normal":
+            ms = self.rng.gauss(*self.values)
+        else:
+            median, sigma = self.values
+            ms = median * self.rng.lognormvariate(0.0, sigma)
+        return max(0.0, ms) / 1000
+
+
+@dataclass
+class Recording:
+    """A recorded reply for prompts matching a regex."""
+    match: re.Pattern
+    content: str = ""
+    status: int = 200
+    latency: Optional[LatencyModel] = None
+
+
+def load_recordings(path: Path, rng: Optional[random.Random] = None) -> List[Recording]:
+    """Load recordings from a JSON list of {"match", "content", "status"?, "latency"?}."""
+    entries = json.loads(path.read_text(encoding="utf-8"))
+    return [
+        Recording(
+            match=re.compile(entry["match"], re.IGNORECASE),
+            content=entry.get("content", ""),
+            status=entry.get("status", 200),
+            latency=LatencyModel(entry["latency"], rng) if entry.get("latency") else None,
+        )
+        for entry in entries
+    ]
+
+
+@dataclass
+class StubConfig:
+    """Behaviour of the stub server."""
+    latency: str = "fixed:200"
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    rpm: int = 0  # Requests per minute before 429s; 0 for no limit
+    hang_rate: float = 0.0
+    hang_seconds: float = 60.0
+    seed: Optional[int] = None
+    recordings: List[Recording] = field(default_factory=list)
+
+
+def _prompt_parts(messages: List[Dict[str, Any]]) -> Tuple[str, int]:
+    """Join the text of all messages and count attached images."""
+    texts, images = [], 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                texts.append(part.get("text", ""))
+            elif part.get("type") == "image_url":
+                images += 1
+    return "\n".join(texts), images
+
+
+def _extraction_answer(text: str) -> Dict[str, Any]:
+    answer = extract_with_rules(text.strip()).as_cart_item()
+    return {key: (value if value else None) for key, value in answer.items()}
+
+
+def default_answer(prompt: str, images: int) -> str:
+    """A plausible reply for the app's prompts when no recording matches."""
+    if images > 1 or '"matching"' in prompt:
+        return json.dumps({"matching": list(range(1, images + 1))})
+    if images == 1:
+        return "yes"
+
+    image_list = _IMAGE_LIST.search(prompt)
+    if image_list:
+        try:
+            urls = json.loads(image_list.group(1))
+        except ValueError:
+            urls = []
+        return urls[0] if urls else ""
+
+    pages = _PAGE.split(prompt)
+    if len(pages) > 1:
+        return json.dumps([_extraction_answer(page) for page in pages[1:]])
+
+    text = _TEXT.search(prompt)
+    return json.dumps(_extraction_answer(text.group(1) if text else prompt))
+
+
+class StubProviderServer:
+    """The chat-completions stand-in and its counters."""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.latency = LatencyModel(config.latency, self.rng)
+        self._served: Deque[float] = deque()
+        self.counts: Dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completions = 0
+        self.app = self._build_app()
+
+    def _count(self, name: str) -> None:
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Stub chat-completions provider")
+        app.add_api_route("/v1/chat/completions", self.chat_completions, methods=["POST"])
+        app.add_api_route("/openai/v1/chat/completions", self.chat_completions, methods=["POST"])
+        app.add_api_route("/stats", self.stats, methods=["GET"])
+        return app
+
+    def _rate_limited(self, now: float) -> Optional[JSONResponse]:
+        """A 429 response if this request is over --rpm or randomly throttled."""
+        limit = self.config.rpm
+        while self._served and now - self._served[0] >= 60:
+            self._served.popleft()
+
+        if limit and len(self._served) >= limit:
+            retry_after = max(0.001, 60 - (now - self._served[0]))
+        elif self.config.rate_limit_rate and self.rng.random() < self.config.rate_limit_rate:
+            retry_after = 1.0
+        else:
+            self._served.append(now)
+            return None
+
+        headers = {
+            "retry-after": str(max(1, round(retry_after))),
+            "retry-after-ms": str(int(retry_after * 1000)),
+            "x-ratelimit-reset-requests": f"{retry_after:.3f}s",
+        }
+        if limit:
+            headers["x-ratelimit-limit-requests"] = str(limit)
+            headers["x-ratelimit-remaining-requests"] = "0"
+        return self._error(429, "rate_limit_exceeded", "Rate limit reached for requests (stub)", headers)
+
+    def _error(self, status: int, code: str, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+        self._count(f"responses_{status}")
+        body = {"error": {"message": message, "type": code, "param": None, "code": code}}
+        return JSONResponse(body, status_code=status, headers=headers)
+
+    def _completion(self, model: str, content: str, prompt_tokens: int) -> Dict[str, Any]:
+        self.completions += 1
+        completion_tokens = estimate_tokens(content)
+        return {
+            "id": f"chatcmpl-stub-{self.completions}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _stream(self, model: str, content: str, prompt_tokens: int, include_usage: bool):
+        self.completions += 1
+        chunk_id, created = f"chatcmpl-stub-{self.completions}", int(time.time())
+
+        def chunk(choices: List[Dict[str, Any]], usage: Optional[Dict[str, int]] = None) -> str:
+            body = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": choices,
+            }
+            if usage is not None:
+                body["usage"] = usage
+            return f"data: {json.dumps(body)}\n\n"
+
+        def delta(fields: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            return chunk([{"index": 0, "delta": fields, "finish_reason": finish_reason, "logprobs": None}])
+
+        async def events():
+            yield delta({"role": "assistant", "content": ""})
+            for start in range(0, len(content), STREAM_CHUNK_CHARS):
+                yield delta({"content": content[start:start + STREAM_CHUNK_CHARS]})
+            yield delta({}, "stop")
+            if include_usage:
+                # stream_options.include_usage: one last chunk with no choices, only usage
+                completion_tokens = estimate_tokens(content)
+                yield chunk([], {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                })
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def chat_completions(self, request: Request):
+        self._count("requests")
+        now = time.monotonic()
+        throttled = self._rate_limited(now)
+        if throttled is not None:
+            return throttled
+
+        body = await request.json()
+        prompt, images = _prompt_parts(body.get("messages", []))
+        model = body.get("model", "stub")
+        recording = next((entry for entry in self.config.recordings if entry.match.search(prompt)), None)
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.config.hang_rate and self.rng.random() < self.config.hang_rate:
+                self._count("hangs")
+                await asyncio.sleep(self.config.hang_seconds)
+            else:
+                latency = recording.latency if recording and recording.latency else self.latency
+                await asyncio.sleep(latency.sample())
+        finally:
+            self.in_flight -= 1
+
+        if self.config.error_rate and self.rng.random() < self.config.error_rate:
+            return self._error(500, "server_error", "The server had an error while processing your request (stub)")
+        if recording and recording.status != 200:
+            return self._error(recording.status, "recorded_error", f"Recorded {recording.status} response (stub)")
+
+        content = recording.content if recording else default_answer(prompt, images)
+        self._count("responses_200")
+        prompt_tokens = estimate_tokens(prompt) + images * IMAGE_TOKENS
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return self._stream(model, content, prompt_tokens, include_usage)
+        return self._completion(model, content, prompt_tokens)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency.spec,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            **self.counts,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="fixed:200", help="Latency distribution (ms), e.g. lognormal:600,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before 429s (0: unlimited)")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fraction of requests that hang")
+    parser.add_argument("--hang-seconds", type=float, default=60.0, help="How long hanging requests take")
+    parser.add_argument("--recordings", type=Path, help="JSON list of recorded replies")
+    parser.add_argument("--seed", type=int, help="Seed for latencies and failures")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    config = StubConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        rpm=args.rpm,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        seed=args.seed,
+        recordings=load_recordings(args.recordings, rng) if args.recordings else [],
+    )
+
+    import uvicorn
+    uvicorn.run(StubProviderServer(config).app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
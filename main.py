@@ -8,16 +8,66 @@ from app.routers.user_routes import router as user_router
 from app.routers.extraction_routes import router as extraction_router
 from app.routers.feedback_routes import router as feedback_router
 from app.routers.failed_extraction_routes import router as failed_extraction_router
+from app.routers.usage_routes import router as usage_router
 from app.core.config import settings
 from app.services.ai.vision_verifier import check_openai_vision_availability
 from app.core.database import client
+from app.core.http_client import http_client
+from app.services.ai.usage import usage_tracker
+from app.services.extraction_job_service import job_worker_pool
+from app.services.extraction_service import text_batchers
 from app.core.database import users_collection, carts_collection, items_collection, feedback_collection, failed_page_extraction_collection, failed_item_extraction_collection
+from app.core.database import extraction_cache_collection, product_cache_collection, image_hashes_collection, ai_usage_collection
+from app.core.database import extraction_jobs_collection
 from datetime import datetime
-import httpx
 
 app = FastAPI()
 
 
+@app.on_event("startup")
+async def start_http_client() -> None:
+    """Open the shared outbound HTTP client (keep-alive pool)."""
+    await http_client.start()
+
+
+@app.on_event("startup")
+async def start_job_workers() -> None:
+    """Start the worker pool for asynchronous extraction jobs (after the HTTP client it uses)."""
+    if settings.EXTRACTION_JOBS_ENABLED:
+        job_worker_pool.start()
+
+
+@app.on_event("startup")
+async def start_usage_flush() -> None:
+    """Start writing the AI usage rollup to MongoDB in the background."""
+    usage_tracker.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_workers() -> None:
+    """Stop job workers before the clients they use close; jobs still running are queued again."""
+    await job_worker_pool.stop()
+
+
+@app.on_event("shutdown")
+async def close_micro_batchers() -> None:
+    """Cancel micro-batches still running so none outlives the loop."""
+    for batcher in text_batchers.values():
+        await batcher.close()
+
+
+@app.on_event("shutdown")
+async def close_http_client() -> None:
+    """Close pooled outbound connections."""
+    await http_client.close()
+
+
+@app.on_event("shutdown")
+async def flush_ai_usage() -> None:
+    """Stop the background rollup and write AI usage not yet rolled up to MongoDB."""
+    await usage_tracker.stop()
+
+
 @app.on_event("startup")
 async def ensure_mongo_indexes() -> None:
     """
@@ -42,6 +92,25 @@ async def ensure_mongo_indexes() -> None:
         await failed_item_extraction_collection.create_index("domain")
         await failed_item_extraction_collection.create_index("timestamp")
         await failed_item_extraction_collection.create_index("type")
+        await extraction_cache_collection.create_index("cache_key", unique=True)
+        # TTL index: MongoDB removes entries once expires_at has passed
+        await extraction_cache_collection.create_index("expires_at", expireAfterSeconds=0)
+        await product_cache_collection.create_index("canonical_url", unique=True)
+        await product_cache_collection.create_index("domain")
+        await image_hashes_collection.create_index("hash", unique=True)
+        # Multikey index on the hash bands for near-duplicate lookups
+        await image_hashes_collection.create_index("bands")
+        await image_hashes_collection.create_index("best_for")
+        await ai_usage_collection.create_index(
+            [("day", 1), ("user_id", 1), ("provider", 1), ("model", 1), ("operation", 1)], unique=True
+        )
+        await extraction_jobs_collection.create_index("job_id", unique=True)
+        await extraction_jobs_collection.create_index("dedupe_key", unique=True)
+        # Workers claim the oldest job in a status
+        await extraction_jobs_collection.create_index([("status", 1), ("created_at", 1)])
+        await extraction_jobs_collection.create_index([("user_id", 1), ("status", 1)])
+        # TTL index: finished jobs and their results are removed once expires_at has passed
+        await extraction_jobs_collection.create_index("expires_at", expireAfterSeconds=0)
     except Exception:
         # Index creation should never prevent the app from starting
         return
@@ -68,10 +137,8 @@ async def limit_request_size(request: Request, call_next):
                 content="Request body too large. Maximum size is 10MB.",
                 status_code=413
             )
-        # Recreate request with body for downstream handlers
-        async def receive():
-            return {"type": "http.request", "body": body}
-        request._receive = receive
+        # call_next replays the cached body to downstream handlers; don't
+        # replace receive, streaming responses need it to see http.disconnect
     return await call_next(request)
 
 # Add CORS middleware
@@ -105,13 +172,9 @@ async def check_openai_connectivity() -> dict:
     """Check if OpenAI API is reachable."""
     if not settings.OPENAI_API_KEY:
         return {"status": "unavailable", "message": "OpenAI API key not configured"}
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as http_client:
-            # Simple connectivity check - OpenAI API doesn't have a ping endpoint
-            # So we just check if the key is configured
-            return {"status": "ok", "message": "OpenAI API key configured"}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+    # Simple connectivity check - OpenAI API doesn't have a ping endpoint
+    # So we just check if the key is configured
+    return {"status": "ok", "message": "OpenAI API key configured"}
 
 @app.get("/health")
 async def health():
@@ -176,3 +239,4 @@ app.include_router(user_router, prefix="/users", tags=["User"])
 app.include_router(extraction_router, prefix="/extract", tags=["Extraction Processing"])
 app.include_router(feedback_router, prefix="/feedback", tags=["Feedback"])
 app.include_router(failed_extraction_router, prefix="/failed-extraction", tags=["Failed Extraction"])
+app.include_router(usage_router, prefix="/usage", tags=["Usage"])
@@ -748,6 +748,235 @@ def ensure_jwt_secret_key(monkeypatch):
     settings.JWT_SECRET_KEY = original_secret
 
 
+class FakeCollection:
+    """
+    Minimal in-memory stand-in for a Motor collection.
+
+    Supports the subset of queries used by the AI support repositories
+    (equality, $gt/$gte/$lt/$lte/$in/$ne/$exists filters on plain or dotted paths,
+    array fields matching any element, $set/$setOnInsert/$inc/$addToSet/$unset
+    updates with dotted $set paths,
+    and find_one_and_update for the job queue).
+    """
+
+    def __init__(self):
+        self.docs = []
+
+    @staticmethod
+    def _matches(doc: dict, query: dict) -> bool:
+        for key, cond in query.items():
+            value, exists = doc, True
+            for part in key.split("."):
+                exists = isinstance(value, dict) and part in value
+                value = value.get(part) if exists else None
+                if not exists:
+                    break
+            if isinstance(cond, dict) and any(k.startswith("$") for k in cond):
+                for op, operand in cond.items():
+                    if op == "$exists" and exists != bool(operand):
+                        return False
+                    if op == "$in" and isinstance(value, list):
+                        if not any(v in operand for v in value):
+                            return False
+                    elif op == "$in" and value not in operand:
+                        return False
+                    if op == "$ne" and value == operand:
+                        return False
+                    if op in ("$gt", "$gte", "$lt", "$lte") and value is None:
+                        return False
+                    if op == "$gt" and not value > operand:
+                        return False
+                    if op == "$gte" and not value >= operand:
+                        return False
+                    if op == "$lt" and not value < operand:
+                        return False
+                    if op == "$lte" and not value <= operand:
+                        return False
+            elif isinstance(value, list) and not isinstance(cond, list):
+                if cond not in value:
+                    return False
+            elif value != cond:
+                return False
+        return True
+
+    @staticmethod
+    def _apply(doc: dict, update: dict, inserting: bool = False) -> None:
+        for k, v in update.get("$set", {}).items():
+            target = doc
+            *parents, leaf = k.split(".")
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[leaf] = copy.deepcopy(v)
+        for k in update.get("$unset", {}):
+            doc.pop(k, None)
+        if inserting:
+            for k, v in update.get("$setOnInsert", {}).items():
+                doc[k] = copy.deepcopy(v)
+        for k, v in update.get("$inc", {}).items():
+            doc[k] = doc.get(k, 0) + v
+        for k, v in update.get("$addToSet", {}).items():
+            values = doc.setdefault(k, [])
+            if v not in values:
+                values.append(copy.deepcopy(v))
+
+    async def find_one(self, query: dict, projection=None, sort=None):
+        docs = [d for d in self.docs if self._matches(d, query)]
+        if sort:
+            for field, direction in reversed(sort):
+                docs.sort(key=lambda d: d.get(field), reverse=direction < 0)
+        return copy.deepcopy(docs[0]) if docs else None
+
+    def find(self, query: dict = None, projection=None):
+        docs = [d for d in self.docs if self._matches(d, query or {})]
+
+        class _Cursor:
+            def __init__(self, items):
+                self._items = items
+
+            def sort(self, key_or_list, direction=None):
+                sort_list = key_or_list if isinstance(key_or_list, list) else [(key_or_list, direction or 1)]
+                for field, dirn in reversed(sort_list):
+                    self._items.sort(key=lambda d: d.get(field), reverse=dirn < 0)
+                return self
+
+            def limit(self, n):
+                if n:
+                    self._items = self._items[:n]
+                return self
+
+            async def to_list(self, length=None):
+                return copy.deepcopy(self._items[:length] if length else self._items)
+
+        return _Cursor(docs)
+
+    async def insert_one(self, doc: dict):
+        self.docs.append(copy.deepcopy(doc))
+        return MagicMock(inserted_id="mock_id")
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                self._apply(doc, update)
+                return MockUpdateResult(modified_count=1, matched_count=1)
+        if upsert:
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            self._apply(doc, update, inserting=True)
+            self.docs.append(doc)
+            return MockUpdateResult(modified_count=0, matched_count=0, upserted_id="upserted")
+        return MockUpdateResult(modified_count=0, matched_count=0)
+
+    async def update_many(self, query: dict, update: dict):
+        matched = [doc for doc in self.docs if self._matches(doc, query)]
+        for doc in matched:
+            self._apply(doc, update)
+        return MockUpdateResult(modified_count=len(matched), matched_count=len(matched))
+
+    async def find_one_and_update(self, query: dict, update: dict, sort=None, return_document=None):
+        docs = [d for d in self.docs if self._matches(d, query)]
+        if sort:
+            for field, direction in reversed(sort):
+                docs.sort(key=lambda d: d.get(field), reverse=direction < 0)
+        if not docs:
+            return None
+        before = copy.deepcopy(docs[0])
+        self._apply(docs[0], update)
+        return copy.deepcopy(docs[0]) if return_document else before
+
+    async def delete_one(self, query: dict):
+        for i, doc in enumerate(self.docs):
+            if self._matches(doc, query):
+                del self.docs[i]
+                return MagicMock(deleted_count=1)
+        return MagicMock(deleted_count=0)
+
+    async def delete_many(self, query: dict):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not self._matches(d, query)]
+        return MagicMock(deleted_count=before - len(self.docs))
+
+    async def count_documents(self, query: dict):
+        return len([d for d in self.docs if self._matches(d, query)])
+
+    async def create_index(self, *args, **kwargs):
+        return "mock_index"
+
+
+@pytest.fixture(autouse=True)
+def ai_collections():
+    """
+    Replace the AI support collections (caches etc.) with in-memory fakes and
+    reset process-wide AI state so tests never reach a real MongoDB.
+    """
+    import app.repositories.extraction_cache_repository as extraction_cache_repo_module
+    import app.repositories.product_cache_repository as product_cache_repo_module
+    import app.repositories.image_hash_repository as image_hash_repo_module
+    import app.repositories.ai_usage_repository as ai_usage_repo_module
+    import app.repositories.extraction_job_repository as extraction_job_repo_module
+    from app.services.ai.extraction_cache import extraction_cache
+    from app.services.ai.json_output import parse_path_counters
+    from app.services.verification_service import verification_counters, verification_flight
+    from app.services.ai.image_pipeline import pipeline_counters, processed_images, recent_urls
+    from app.services.ai.image_hash_index import image_hash_index
+    from app.services.ai.image_quality import quality_counters
+    from app.core.http_client import http_client
+    from app.services.ai.usage import usage_tracker
+    from app.services.ai.token_quota import token_quota
+    from app.services.extraction_job_service import job_worker_pool
+    from app.services.extraction_service import (
+        product_cache_counters, text_flight, image_flight, reducer_counters, source_counters,
+        image_prerank_counters, text_router, image_router, text_tiers, text_batchers,
+    )
+
+    collections = {
+        "extraction_cache": FakeCollection(),
+        "product_cache": FakeCollection(),
+        "image_hashes": FakeCollection(),
+        "ai_usage": FakeCollection(),
+        "extraction_jobs": FakeCollection(),
+    }
+    extraction_cache.clear()
+    product_cache_counters.reset()
+    text_flight.reset()
+    image_flight.reset()
+    reducer_counters.reset()
+    image_prerank_counters.reset()
+    source_counters.reset()
+    text_router.reset()
+    image_router.reset()
+    text_tiers.reset()
+    parse_path_counters.reset()
+    verification_counters.reset()
+    verification_flight.reset()
+    pipeline_counters.reset()
+    processed_images.clear()
+    recent_urls.clear()
+    image_hash_index.reset()
+    quality_counters.reset()
+    http_client.reset()
+    usage_tracker.reset()
+    token_quota.reset()
+    job_worker_pool.reset()
+    for batcher in text_batchers.values():
+        batcher.reset()
+    with patch.object(extraction_cache_repo_module, "extraction_cache_collection", collections["extraction_cache"]), \
+         patch.object(product_cache_repo_module, "product_cache_collection", collections["product_cache"]), \
+         patch.object(image_hash_repo_module, "image_hashes_collection", collections["image_hashes"]), \
+         patch.object(ai_usage_repo_module, "ai_usage_collection", collections["ai_usage"]), \
+         patch.object(extraction_job_repo_module, "extraction_jobs_collection", collections["extraction_jobs"]):
+        yield collections
+    extraction_cache.clear()
+    product_cache_counters.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limiter():
+    """Reset in-memory rate limit counters so tests don't throttle each other."""
+    from app.utils.rate_limiter import limiter
+    if limiter:
+        limiter.reset()
+    yield
+
+
 @pytest.fixture(autouse=True)
 def cleanup_test_data():
     """
@@ -0,0 +1,83 @@
+"""
+Tests for the AI call concurrency limiter and non-blocking parsers.
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.services.ai.limits import InFlightLimiter
+from app.services.ai import openai_parser
+
+
+def _completion(content: str) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class TestInFlightLimiter:
+    """Test suite for InFlightLimiter."""
+
+    async def test_caps_concurrent_calls(self):
+        """No more than max_in_flight calls should run at once."""
+        limiter = InFlightLimiter(max_in_flight=2)
+
+        async def slow_call():
+            await asyncio.sleep(0.01)
+            return limiter.in_flight
+
+        observed = await asyncio.gather(*(limiter.run(slow_call, timeout=1) for _ in range(6)))
+
+        assert max(observed) <= 2
+        assert limiter.peak_in_flight == 2
+        assert limiter.completed == 6
+        assert limiter.in_flight == 0
+
+    async def test_timeout_raises_and_counts(self):
+        """Calls exceeding the timeout should raise and be counted."""
+        limiter = InFlightLimiter(max_in_flight=1)
+
+        async def hanging_call():
+            await asyncio.sleep(1)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await limiter.run(hanging_call, timeout=0.01)
+
+        assert limiter.timeouts == 1
+        assert limiter.in_flight == 0
+
+
+class TestAsyncParsers:
+    """Test suite for the async OpenAI parser path."""
+
+    async def test_parse_inner_text_does_not_block_loop(self):
+        """Other coroutines should keep running while a completion is pending."""
+        async def fake_create(**kwargs):
+            await asyncio.sleep(0.05)
+            return _completion('{"product_name": "Shoe", "price": "$10"}')
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            for _ in range(5):
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        with patch.object(openai_parser.client.chat.completions, "create", side_effect=fake_create):
+            result, _ = await asyncio.gather(
+                openai_parser.parse_inner_text_with_openai("Shoe $10"),
+                ticker(),
+            )
+
+        assert result == {"product_name": "Shoe", "price": "$10"}
+        assert ticks == 5
+
+    async def test_parse_inner_text_timeout_surfaces_as_value_error(self):
+        """A provider timeout should surface as the parser's ValueError."""
+        async def hanging_create(**kwargs):
+            await asyncio.sleep(1)
+
+        with patch.object(openai_parser.client.chat.completions, "create", side_effect=hanging_create), \
+             patch.object(openai_parser.settings, "AI_REQUEST_TIMEOUT_SECONDS", 0.01):
+            with pytest.raises(ValueError):
+                await openai_parser.parse_inner_text_with_openai("Shoe $10")
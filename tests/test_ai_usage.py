@@ -0,0 +1,194 @@
+"""
+Tests for per-call AI usage accounting and the usage endpoint.
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from fastapi import status
+
+from app.services.ai.limits import ai_call_limiter, run_ai_call, run_ai_stream
+from app.services.ai.usage import UsageTracker, usage_tracker, usage_user, estimate_cost
+from tests.conftest import TEST_AUTH0_ID
+
+
+def completion(content: str, prompt_tokens: int = 1000, completion_tokens: int = 20):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+    )
+
+
+class TestRunAICallAccounting:
+    """Test suite for usage recorded by run_ai_call."""
+
+    async def test_successful_call_records_tokens_cost_and_latency(self):
+        async def call():
+            await asyncio.sleep(0.01)
+            return completion("ok", 1000, 20)
+
+        await run_ai_call(call, provider="openai", model="gpt-4o", operation="text")
+
+        stats = usage_tracker.stats()["models"]["openai/gpt-4o"]
+        assert stats["calls"] == 1
+        assert stats["prompt_tokens"] == 1000
+        assert stats["completion_tokens"] == 20
+        assert stats["cost_usd"] == round(estimate_cost("gpt-4o", 1000, 20), 6) > 0
+        assert stats["avg_latency_ms"] >= 10
+        assert sum(stats["latency_ms"].values()) == 1
+
+    async def test_errors_and_timeouts_are_counted(self):
+        async def fail():
+            raise RuntimeError("provider down")
+
+        async def hang():
+            await asyncio.sleep(1)
+
+        with pytest.raises(RuntimeError):
+            await run_ai_call(fail, provider="groq", model="llama-3.1-8b-instant", operation="text")
+        with pytest.raises(asyncio.TimeoutError):
+            await run_ai_call(hang, timeout=0.01, provider="groq", model="llama-3.1-8b-instant", operation="text")
+
+        stats = usage_tracker.stats()["models"]["groq/llama-3.1-8b-instant"]
+        assert (stats["calls"], stats["errors"], stats["timeouts"]) == (2, 1, 1)
+
+    async def test_stream_holds_its_slot_and_records_usage_once_consumed(self):
+        async def chunks():
+            for text in ("{", "}"):
+                await asyncio.sleep(0.01)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+            yield SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=900, completion_tokens=2))
+
+        async def call():
+            return chunks()
+
+        in_flight = []
+        async for _ in run_ai_stream(call, provider="openai", model="gpt-4o", operation="text_stream"):
+            in_flight.append(ai_call_limiter.in_flight)
+
+        assert in_flight == [1, 1, 1]
+        assert ai_call_limiter.in_flight == 0
+        stats = usage_tracker.stats()["models"]["openai/gpt-4o"]
+        assert (stats["calls"], stats["prompt_tokens"], stats["completion_tokens"]) == (1, 900, 2)
+        assert stats["avg_latency_ms"] >= 20
+
+    async def test_stream_deadline_covers_the_whole_stream(self):
+        async def chunks():
+            yield SimpleNamespace(choices=[], usage=None)
+            await asyncio.sleep(1)
+            yield SimpleNamespace(choices=[], usage=None)
+
+        async def call():
+            return chunks()
+
+        with pytest.raises(asyncio.TimeoutError):
+            async for _ in run_ai_stream(call, timeout=0.05, provider="groq", model="llama-3.1-8b-instant"):
+                pass
+
+        assert usage_tracker.stats()["models"]["groq/llama-3.1-8b-instant"]["timeouts"] == 1
+        assert ai_call_limiter.in_flight == 0
+
+    async def test_responses_without_usage_count_no_tokens(self):
+        await run_ai_call(AsyncMock(return_value=object()), provider="openai", model="gpt-4o", operation="text")
+        assert usage_tracker.stats()["models"]["openai/gpt-4o"]["prompt_tokens"] == 0
+
+
+class TestRollup:
+    """Test suite for the MongoDB rollup."""
+
+    async def test_flush_rolls_up_per_user_and_day(self, ai_collections):
+        token = usage_user.set("user-1")
+        try:
+            for _ in range(3):
+                usage_tracker.record_call("openai", "gpt-4o", "text", 200, "ok", 100, 10)
+            usage_tracker.record_cache_hit("gpt-4o", "text")
+        finally:
+            usage_user.reset(token)
+        await usage_tracker.flush()
+
+        docs = {doc["provider"]: doc for doc in ai_collections["ai_usage"].docs}
+        assert docs["openai"]["user_id"] == "user-1"
+        assert docs["openai"]["calls"] == 3
+        assert docs["openai"]["prompt_tokens"] == 300
+        assert docs["cache"]["cache_hits"] == 1
+        assert usage_tracker.stats()["pending_rollups"] == 0
+
+    async def test_failed_flush_keeps_usage_for_next_time(self):
+        repository = AsyncMock()
+        repository.increment.side_effect = RuntimeError("mongo down")
+        tracker = UsageTracker(60, repository_factory=lambda: repository)
+
+        tracker.record_call("openai", "gpt-4o", "text", 200, "ok", 100, 10)
+        await tracker.flush()
+
+        assert tracker.flush_errors == 1
+        assert tracker.stats()["pending_rollups"] == 1
+
+    async def test_cancelled_flush_keeps_unwritten_usage(self):
+        written = []
+
+        async def increment(day, user_id, provider, model, operation, counts, now):
+            if written:
+                await asyncio.Event().wait()
+            written.append(provider)
+
+        repository = AsyncMock()
+        repository.increment.side_effect = increment
+        tracker = UsageTracker(60, repository_factory=lambda: repository)
+        tracker.record_call("openai", "gpt-4o", "text", 200, "ok", 100, 10)
+        tracker.record_call("groq", "llama-3.1-8b-instant", "text", 100, "ok", 50, 5)
+
+        flush = asyncio.create_task(tracker.flush())
+        await asyncio.sleep(0)
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+
+        assert written == ["openai"]
+        assert tracker.stats()["pending_rollups"] == 1
+
+    async def test_background_task_flushes_and_stop_writes_the_rest(self):
+        repository = AsyncMock()
+        tracker = UsageTracker(0.01, repository_factory=lambda: repository)
+        tracker.start()
+
+        tracker.record_call("openai", "gpt-4o", "text", 200, "ok", 100, 10)
+        await asyncio.sleep(0.05)
+        assert repository.increment.await_count == 1
+
+        tracker.record_cache_hit("gpt-4o", "text")
+        await tracker.stop()
+        assert repository.increment.await_count == 2
+        assert tracker.stats()["pending_rollups"] == 0
+
+
+class TestUsageRoute:
+    """Test suite for GET /usage/ai."""
+
+    def test_calls_are_billed_to_the_requesting_user(self, authenticated_client):
+        create = AsyncMock(return_value=completion("yes", 800, 1))
+        payload = {"product_name": "Lamp", "price": "$10", "image_url": "https://cdn.shop.com/lamp.jpg"}
+        with patch('app.services.verification_service.settings.IMAGE_PIPELINE_ENABLED', False), \
+             patch('app.services.ai.vision_verifier.client') as mock_client:
+            mock_client.chat.completions.create = create
+            authenticated_client.post("/extract/verify-image", json=payload)
+            authenticated_client.post("/extract/verify-image", json=payload)
+
+        response = authenticated_client.get("/usage/ai")
+
+        assert response.status_code == status.HTTP_200_OK
+        [day] = response.json()["days"]
+        assert day["user_id"] == TEST_AUTH0_ID
+        assert (day["calls"], day["cache_hits"], day["prompt_tokens"]) == (1, 1, 800)
+        assert day["models"]["openai/gpt-4o"]["calls"] == 1
+        assert response.json()["totals"]["cost_usd"] > 0
+
+    def test_other_users_need_admin(self, authenticated_client):
+        assert authenticated_client.get("/usage/ai?user_id=someone-else").status_code == status.HTTP_403_FORBIDDEN
+
+        with patch('app.routers.usage_routes.settings.USAGE_ADMIN_USER_IDS', TEST_AUTH0_ID):
+            response = authenticated_client.get("/usage/ai?user_id=*")
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_too_many_days(self, authenticated_client):
+        assert authenticated_client.get("/usage/ai?days=1000").status_code == status.HTTP_400_BAD_REQUEST
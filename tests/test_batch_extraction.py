@@ -0,0 +1,112 @@
+"""
+Tests for batch extraction with bounded fan-out.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi import status
+
+from app.services.extraction_service import ExtractionService
+from app.services.ai.extraction_cache import extraction_cache
+from app.repositories.product_cache_repository import ProductCacheRepository
+
+
+JSON_LD_PAGE = (
+    '<script type="application/ld+json">'
+    '{"@type": "Product", "name": "Desk Lamp", "offers": {"price": "25.00", "priceCurrency": "USD"}}'
+    '</script>'
+)
+
+
+class TestExtractBatchService:
+    """Test suite for ExtractionService.extract_batch."""
+
+    async def test_concurrency_is_bounded(self):
+        """No more than max_concurrency items should be extracted at once."""
+        running = 0
+        peak = 0
+
+        async def slow_parse(text):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"product_name": text, "price": "null"}
+
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        items = [{"inner_text": f"Page {i}"} for i in range(8)]
+        with patch('app.services.extraction_service.parse_inner_text_with_openai', side_effect=slow_parse):
+            results = await service.extract_batch(items, max_concurrency=3)
+
+        assert peak == 3
+        assert [r["index"] for r in results] == list(range(8))
+        assert results[5]["cart_items"]["product_name"] == "Page 5"
+
+    async def test_item_errors_do_not_fail_batch(self):
+        """A failing item should be reported next to the successful ones."""
+        async def parse(text):
+            if text == "bad page":
+                raise ValueError("Error parsing text with OpenAI: boom")
+            return {"product_name": "Nike Shoe", "price": "$99"}
+
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        items = [{"inner_text": "good page"}, {"inner_text": "bad page"}, {"html": JSON_LD_PAGE}]
+        with patch('app.services.extraction_service.parse_inner_text_with_openai', side_effect=parse):
+            results = await service.extract_batch(items, max_concurrency=2)
+
+        assert results[0]["source"] == "llm"
+        assert results[1] == {"index": 1, "error": "Error parsing text with OpenAI: boom"}
+        assert results[2]["cart_items"] == {"product_name": "Desk Lamp", "price": "$25.00"}
+        assert results[2]["source"] == "structured_data"
+
+
+class TestExtractBatchRoute:
+    """Test suite for POST /extract/extract-batch."""
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_extract_batch(self, mock_openai, authenticated_client):
+        """The route should return per-item results and totals."""
+        mock_openai.return_value = {"product_name": "Nike Shoe", "price": "$99"}
+
+        response = authenticated_client.post("/extract/extract-batch", json={"items": [
+            {"inner_text": "Nike Shoe page one"},
+            {"html": JSON_LD_PAGE, "page_url": "https://shop.com/lamp"},
+        ]})
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["succeeded"] == 2
+        assert data["failed"] == 0
+        assert data["results"][1]["source"] == "structured_data"
+
+    def test_item_needs_exactly_one_payload(self, authenticated_client):
+        """Items with neither or both of inner_text/html should be rejected."""
+        response = authenticated_client.post("/extract/extract-batch", json={"items": [
+            {"inner_text": "text", "html": "<p>html</p>"},
+        ]})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_too_many_items(self, authenticated_client):
+        """Batches over the configured size should be rejected."""
+        with patch('app.routers.extraction_routes.settings.EXTRACTION_BATCH_MAX_ITEMS', 2):
+            response = authenticated_client.post("/extract/extract-batch", json={"items": [
+                {"inner_text": f"page {i}"} for i in range(3)
+            ]})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_items_count_against_rate_limit(self, mock_openai, authenticated_client):
+        """Items, not requests, should be charged against the batch item budget."""
+        mock_openai.return_value = {"product_name": "Nike Shoe", "price": "$99"}
+
+        with patch('app.routers.extraction_routes.settings.EXTRACTION_BATCH_ITEM_RATE_LIMIT', "5/minute"):
+            first = authenticated_client.post("/extract/extract-batch", json={"items": [
+                {"inner_text": f"page {i}"} for i in range(4)
+            ]})
+            second = authenticated_client.post("/extract/extract-batch", json={"items": [
+                {"inner_text": f"page {i}"} for i in range(2)
+            ]})
+
+        assert first.status_code == status.HTTP_200_OK
+        assert second.status_code == status.HTTP_429_TOO_MANY_REQUESTS
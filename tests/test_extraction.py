@@ -9,7 +9,7 @@ from fastapi import status
 class TestExtractionRoutes:
     """Test suite for extraction endpoints."""
     
-    @patch('app.routers.extraction_routes.parse_images_with_openai')
+    @patch('app.services.extraction_service.parse_images_with_openai')
     @patch('app.routers.extraction_routes.extract_product_name_from_url')
     def test_analyze_images_valid(self, mock_extract_name, mock_openai, authenticated_client):
         """Test /analyze-images endpoint with valid input."""
@@ -59,7 +59,7 @@ class TestExtractionRoutes:
         # Should return 400 when no valid URLs found after parsing
         assert response.status_code == status.HTTP_400_BAD_REQUEST
     
-    @patch('app.routers.extraction_routes.parse_images_with_openai')
+    @patch('app.services.extraction_service.parse_images_with_openai')
     @patch('app.routers.extraction_routes.extract_product_name_from_url')
     def test_analyze_images_openai_failure(self, mock_extract_name, mock_openai, authenticated_client):
         """Test /analyze-images endpoint when OpenAI service fails."""
@@ -74,7 +74,7 @@ class TestExtractionRoutes:
         response = authenticated_client.post("/extract/analyze-images", json=payload)
         assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     
-    @patch('app.routers.extraction_routes.parse_inner_text_with_openai')
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
     def test_extract_valid(self, mock_openai, authenticated_client):
         """Test /extract endpoint with valid text input."""
         mock_openai.return_value = {
@@ -103,7 +103,7 @@ class TestExtractionRoutes:
         # Empty input should return 422 (Pydantic validation) or 400
         assert response.status_code in [status.HTTP_400_BAD_REQUEST, status.HTTP_422_UNPROCESSABLE_ENTITY]
     
-    @patch('app.routers.extraction_routes.parse_inner_text_with_openai')
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
     def test_extract_openai_failure(self, mock_openai, authenticated_client):
         """Test /extract endpoint when OpenAI service fails."""
         mock_openai.side_effect = Exception("OpenAI API error")
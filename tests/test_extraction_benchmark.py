@@ -0,0 +1,45 @@
+"""
+Tests for the offline extraction benchmark and its recorded baseline.
+
+The accuracy pass is deterministic, so running it here makes accuracy,
+prompt token and provider call regressions fail the suite.
+"""
+import json
+
+from benchmarks.extraction_pipeline import (
+    BASELINE_PATH,
+    compare_with_baseline,
+    field_matches,
+    load_corpus,
+    run,
+)
+
+
+class TestExtractionBenchmark:
+    """Test suite for benchmarks.extraction_pipeline."""
+
+    async def test_accuracy_pass_matches_baseline(self):
+        pages = load_corpus()
+        report = await run(pages, rounds=0)
+
+        assert report["corpus"]["pages"] == len(pages)
+        assert compare_with_baseline(report, json.loads(BASELINE_PATH.read_text())) == []
+
+    async def test_load_pass_reports_stages(self):
+        pages = [page for page in load_corpus() if page.get("inner_text")][:2]
+        report = await run(pages, rounds=1, concurrency=2, provider_latency=0.0)
+
+        assert report["load"]["pages"] == 2
+        assert "provider" in report["load"]["stages"]
+        assert "reduce_inner_text" in report["load"]["stages"]
+
+    def test_regressions_are_reported(self):
+        baseline = {"accuracy": {"price": 1.0}, "prompt_tokens": {"total": 1000}, "provider_calls": {"text": 4}}
+        report = {"accuracy": {"price": 0.9}, "prompt_tokens": {"total": 1100}, "provider_calls": {"text": 5}}
+
+        assert len(compare_with_baseline(report, baseline)) == 3
+
+    def test_field_matching(self):
+        assert field_matches("product_name", "Red Lamp", " red  lamp ")
+        assert field_matches("price", "1.299,00 €", "€1299.00")
+        assert not field_matches("price", "$49.99", None)
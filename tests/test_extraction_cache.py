@@ -0,0 +1,249 @@
+"""
+Tests for the content-addressed extraction cache.
+"""
+import pytest
+from unittest.mock import patch
+from fastapi import status
+
+from app.utils.cache import LRUCache
+from app.services.ai.extraction_cache import (
+    extraction_cache,
+    text_cache_key,
+    image_cache_key,
+    TEXT,
+)
+
+
+class TestLRUCache:
+    """Test suite for LRUCache."""
+
+    def test_evicts_least_recently_used(self):
+        """Oldest untouched entry should be evicted first."""
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert cache.evictions == 1
+
+    def test_expired_entries_miss(self):
+        """Entries past their TTL should count as misses."""
+        cache = LRUCache(max_entries=2, ttl_seconds=-1)
+        cache.set("a", 1)
+
+        assert cache.get("a") is None
+        assert cache.misses == 1
+
+
+class TestCacheKeys:
+    """Test suite for cache key construction."""
+
+    def test_text_key_ignores_whitespace_differences(self):
+        """Whitespace-only differences should share a key."""
+        assert text_cache_key("Nike  Shoe\n$99", "gpt-4o", "1") == text_cache_key(" Nike Shoe $99 ", "gpt-4o", "1")
+
+    def test_text_key_depends_on_model_and_prompt_version(self):
+        """Changing model or prompt version should change the key."""
+        base = text_cache_key("Nike Shoe $99", "gpt-4o", "1")
+        assert base != text_cache_key("Nike Shoe $99", "gpt-4o-mini", "1")
+        assert base != text_cache_key("Nike Shoe $99", "gpt-4o", "2")
+
+    def test_image_key_ignores_image_order(self):
+        """Image keys should be built from the sorted image set."""
+        a = image_cache_key("https://shop.com/p", ["https://x/1.jpg", "https://x/2.jpg"], "gpt-4o", "1")
+        b = image_cache_key("https://shop.com/p", ["https://x/2.jpg", "https://x/1.jpg"], "gpt-4o", "1")
+        assert a == b
+
+
+class TestExtractionCacheRoutes:
+    """Test suite for cached extraction endpoints."""
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_repeat_extract_served_from_cache(self, mock_openai, authenticated_client):
+        """Identical text should only reach OpenAI once."""
+        mock_openai.return_value = {"product_name": "Nike Shoe", "price": "$99"}
+
+        first = authenticated_client.post("/extract/extract", json={"inner_text": "Nike Shoe $99"})
+        second = authenticated_client.post("/extract/extract", json={"inner_text": "Nike  Shoe   $99"})
+
+        assert first.status_code == status.HTTP_200_OK
+        assert first.json()["source"] == "llm"
+        assert second.json() == {**first.json(), "source": "cache"}
+        mock_openai.assert_called_once()
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_persistent_tier_serves_after_memory_cleared(self, mock_openai, authenticated_client, ai_collections):
+        """A result persisted to MongoDB should be reused by a fresh process."""
+        mock_openai.return_value = {"product_name": "Nike Shoe", "price": "$99"}
+
+        authenticated_client.post("/extract/extract", json={"inner_text": "Nike Shoe $99"})
+        assert len(ai_collections["extraction_cache"].docs) == 1
+
+        extraction_cache.memory.clear()
+        response = authenticated_client.post("/extract/extract", json={"inner_text": "Nike Shoe $99"})
+
+        assert response.json()["cart_items"]["product_name"] == "Nike Shoe"
+        mock_openai.assert_called_once()
+        assert extraction_cache.stats()["kinds"][TEXT]["persistent_hits"] == 1
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_failures_are_not_cached(self, mock_openai, authenticated_client):
+        """A failed extraction should be retried on the next call."""
+        mock_openai.side_effect = [Exception("OpenAI API error"), {"product_name": "Nike Shoe", "price": "$99"}]
+
+        first = authenticated_client.post("/extract/extract", json={"inner_text": "Nike Shoe $99"})
+        second = authenticated_client.post("/extract/extract", json={"inner_text": "Nike Shoe $99"})
+
+        assert first.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert second.status_code == status.HTTP_200_OK
+        assert mock_openai.call_count == 2
+
+    @patch('app.services.extraction_service.parse_images_with_openai')
+    def test_repeat_analyze_images_served_from_cache(self, mock_openai, authenticated_client):
+        """Same page URL and image set (any order) should only reach OpenAI once."""
+        mock_openai.return_value = "https://example.com/img1.jpg"
+
+        authenticated_client.post("/extract/analyze-images", json={
+            "page_url": "https://example.com/product",
+            "image_urls": "https://example.com/img1.jpg,https://example.com/img2.jpg",
+        })
+        response = authenticated_client.post("/extract/analyze-images", json={
+            "page_url": "https://example.com/product",
+            "image_urls": "https://example.com/img2.jpg,https://example.com/img1.jpg",
+        })
+
+        assert response.json() == "https://example.com/img1.jpg"
+        mock_openai.assert_called_once()
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_metrics_report_hits_and_misses(self, mock_openai, authenticated_client):
+        """Metrics endpoint should expose cache hit/miss counters."""
+        mock_openai.return_value = {"product_name": "Nike Shoe", "price": "$99"}
+
+        authenticated_client.post("/extract/extract", json={"inner_text": "Nike Shoe $99"})
+        authenticated_client.post("/extract/extract", json={"inner_text": "Nike Shoe $99"})
+
+        response = authenticated_client.get("/extract/metrics")
+        assert response.status_code == status.HTTP_200_OK
+        text_stats = response.json()["cache"]["kinds"][TEXT]
+        assert text_stats["misses"] == 1
+        assert text_stats["memory_hits"] == 1
+        assert text_stats["hit_rate"] == 0.5
+
+
+class TestProductCache:
+    """Test suite for the shared product cache keyed by canonical URL."""
+
+    def test_canonicalize_url_strips_tracking_and_lowercases_host(self):
+        """Tracking params, fragments and host case should not affect the key."""
+        from app.utils.utils import canonicalize_url
+
+        assert canonicalize_url(
+            "HTTPS://WWW.Amazon.com/Nike-Shoe/dp/B0123/ref=sr_1_3?utm_source=x&qid=1#reviews"
+        ) == "https://amazon.com/Nike-Shoe/dp/B0123"
+        assert canonicalize_url("https://shop.com/p?size=9&color=red&gclid=abc") == \
+            "https://shop.com/p?color=red&size=9"
+
+    def test_amazon_tracking_names_are_kept_on_other_sites(self):
+        """Params like tag/sr and /ref= segments may select the product outside Amazon."""
+        from app.utils.utils import canonicalize_url
+
+        assert canonicalize_url("https://shop.com/p?tag=blue&sr=2&th=1&utm_medium=email") == \
+            "https://shop.com/p?sr=2&tag=blue&th=1"
+        assert canonicalize_url("https://shop.com/products/ref=42") == "https://shop.com/products/ref=42"
+        assert canonicalize_url("https://smile.amazon.co.uk/dp/B0123?tag=aff-21&th=1&psc=1") == \
+            "https://smile.amazon.co.uk/dp/B0123"
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_same_page_served_from_product_cache(self, mock_openai, authenticated_client):
+        """A different innerText for the same canonical page should reuse the user's stored product."""
+        mock_openai.return_value = {"product_name": "Nike Shoe", "price": "$99"}
+
+        authenticated_client.post("/extract/extract", json={
+            "inner_text": "Nike Shoe $99 (first capture)",
+            "page_url": "https://www.shop.com/nike-shoe?utm_campaign=mail",
+        })
+        response = authenticated_client.post("/extract/extract", json={
+            "inner_text": "Nike Shoe $99 (different capture)",
+            "page_url": "https://SHOP.com/nike-shoe?fbclid=xyz",
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "cart_items": {"product_name": "Nike Shoe", "price": "$99"},
+            "source": "product_cache",
+        }
+        mock_openai.assert_called_once()
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_stale_product_entry_is_not_used(self, mock_openai, authenticated_client, ai_collections):
+        """Entries older than the freshness window should fall through to the parser."""
+        from datetime import datetime, timedelta
+
+        ai_collections["product_cache"].docs.append({
+            "canonical_url": "https://shop.com/nike-shoe",
+            "domain": "shop.com",
+            "product_name": "Old Name",
+            "price": "$50",
+            "details_updated_at": datetime.utcnow() - timedelta(days=30),
+        })
+        mock_openai.return_value = {"product_name": "Nike Shoe", "price": "$99"}
+
+        response = authenticated_client.post("/extract/extract", json={
+            "inner_text": "Nike Shoe $99",
+            "page_url": "https://shop.com/nike-shoe",
+        })
+
+        assert response.json()["cart_items"]["product_name"] == "Nike Shoe"
+        mock_openai.assert_called_once()
+
+    @patch('app.services.extraction_service.parse_images_with_openai')
+    def test_image_served_from_product_cache(self, mock_openai, authenticated_client):
+        """A stored image for the page should answer a new candidate set without OpenAI."""
+        mock_openai.return_value = "https://cdn.shop.com/main.jpg"
+
+        authenticated_client.post("/extract/analyze-images", json={
+            "page_url": "https://shop.com/nike-shoe?utm_source=x",
+            "image_urls": "https://cdn.shop.com/main.jpg,https://cdn.shop.com/icon.png",
+        })
+        response = authenticated_client.post("/extract/analyze-images", json={
+            "page_url": "https://shop.com/nike-shoe",
+            "image_urls": "https://cdn.shop.com/main.jpg?v=2,https://cdn.shop.com/logo.png",
+        })
+
+        assert response.json() == "https://cdn.shop.com/main.jpg"
+        mock_openai.assert_called_once()
+
+    async def test_one_users_pages_are_not_shared_until_others_agree(self, ai_collections):
+        """Made-up text for a URL must not reach other users; agreeing users promote the result."""
+        from app.repositories.product_cache_repository import ProductCacheRepository
+        from app.services.ai.usage import usage_user
+        from app.services.extraction_service import ExtractionService
+
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        page_url = "https://shop.com/nike-shoe"
+
+        async def extract_as(user_id, answer):
+            token = usage_user.set(user_id)
+            try:
+                with patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+                     patch('app.services.extraction_service.parse_inner_text_with_openai') as mock_openai:
+                    mock_openai.return_value = answer
+                    return await service.extract_from_text(f"{user_id}'s capture of the page", page_url)
+            finally:
+                usage_user.reset(token)
+
+        forged = {"product_name": "Nike Shoe", "price": "$1"}
+        real = {"product_name": "Nike Shoe", "price": "$99"}
+        assert await extract_as("mallory", forged) == (forged, "llm")
+        # Served back to the user who sent it, but not to anyone else
+        assert await extract_as("mallory", real) == (forged, "product_cache")
+        assert await extract_as("alice", real) == (real, "llm")
+        assert await extract_as("bob", real) == (real, "llm")
+        assert await extract_as("carol", forged) == (real, "product_cache")
+
+        doc = await ai_collections["product_cache"].find_one({"canonical_url": page_url})
+        assert doc["price"] == "$99"
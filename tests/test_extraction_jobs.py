@@ -0,0 +1,232 @@
+"""
+Tests for asynchronous extraction jobs and their worker pool.
+"""
+import json
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import status
+
+from app.repositories.extraction_job_repository import ExtractionJobRepository
+from app.services.ai.token_quota import token_quota
+from app.services.extraction_job_service import (
+    ExtractionJobService,
+    JobLimitExceeded,
+    JobWorkerPool,
+    JOB_EXTRACT,
+    JOB_ANALYZE_IMAGES,
+)
+
+
+def make_pool(extraction_service, **kwargs) -> JobWorkerPool:
+    options = {"workers": 1, "poll_interval": 0.01, "lease_seconds": 5, "max_attempts": 2, "result_ttl": 60}
+    options.update(kwargs)
+    return JobWorkerPool(service_factory=lambda: extraction_service, **options)
+
+
+def sse_events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestJobWorkerPool:
+    """Test suite for ExtractionJobService and JobWorkerPool."""
+
+    async def test_submitted_job_runs_and_keeps_its_result(self):
+        extraction_service = MagicMock()
+        extraction_service.extract_from_text = AsyncMock(return_value=({"product_name": "Lamp", "price": "$10"}, "llm"))
+        pool = make_pool(extraction_service)
+        service = ExtractionJobService(ExtractionJobRepository(), pool)
+
+        job, created = await service.submit("alice", JOB_EXTRACT, {"inner_text": "Lamp $10", "page_url": None})
+        assert created and job.status == "queued"
+        # A backlog must not be removed by the TTL index
+        assert job.expires_at is None
+
+        assert await pool.process_next("worker-1")
+        assert not await pool.process_next("worker-1")
+
+        finished = await service.get("alice", job.job_id)
+        assert finished.status == "succeeded"
+        assert finished.result == {"cart_items": {"product_name": "Lamp", "price": "$10"}, "source": "llm"}
+        assert finished.attempts == 1
+        assert finished.expires_at > finished.finished_at + timedelta(seconds=59)
+        extraction_service.extract_from_text.assert_awaited_once_with("Lamp $10", None)
+
+    async def test_identical_submissions_share_a_job(self):
+        service = ExtractionJobService(ExtractionJobRepository(), make_pool(MagicMock()))
+        payload = {"page_url": "https://shop.com/lamp", "product_name": "lamp", "image_urls": ["https://a.com/1.jpg"]}
+
+        first, _ = await service.submit("alice", JOB_ANALYZE_IMAGES, payload)
+        second, created = await service.submit("alice", JOB_ANALYZE_IMAGES, payload)
+        other_user, _ = await service.submit("bob", JOB_ANALYZE_IMAGES, payload)
+
+        assert not created
+        assert second.job_id == first.job_id
+        assert other_user.job_id != first.job_id
+        assert await service.get("bob", first.job_id) is None
+
+    async def test_failing_job_is_retried_then_failed(self, ai_collections):
+        extraction_service = MagicMock()
+        extraction_service.extract_from_text = AsyncMock(side_effect=RuntimeError("provider down"))
+        pool = make_pool(extraction_service)
+        service = ExtractionJobService(ExtractionJobRepository(), pool)
+        job, _ = await service.submit("alice", JOB_EXTRACT, {"inner_text": "Lamp", "page_url": None})
+
+        await pool.process_next("worker-1")
+        assert (await service.get("alice", job.job_id)).status == "queued"
+        await pool.process_next("worker-1")
+
+        failed = await service.get("alice", job.job_id)
+        assert failed.status == "failed"
+        assert failed.attempts == 2
+        assert failed.error == "RuntimeError: provider down"
+        assert pool.stats()["retried"] == 1 and pool.stats()["failed"] == 1
+
+        # A failed job doesn't absorb the next identical submission
+        retry, created = await service.submit("alice", JOB_EXTRACT, {"inner_text": "Lamp", "page_url": None})
+        assert created and retry.job_id != job.job_id
+
+    async def test_job_with_expired_lease_is_taken_over(self, ai_collections):
+        extraction_service = MagicMock()
+        extraction_service.select_product_image = AsyncMock(return_value="https://a.com/1.jpg")
+        pool = make_pool(extraction_service)
+        service = ExtractionJobService(ExtractionJobRepository(), pool)
+        payload = {"page_url": "https://shop.com/lamp", "product_name": "lamp", "image_urls": ["https://a.com/1.jpg"]}
+        job, _ = await service.submit("alice", JOB_ANALYZE_IMAGES, payload)
+
+        # A worker claimed the job and died
+        repository = ExtractionJobRepository()
+        now = datetime.utcnow()
+        await repository.claim_next("dead-worker", now, now - timedelta(seconds=1), 2)
+
+        assert await pool.process_next("worker-2")
+        taken_over = await service.get("alice", job.job_id)
+        assert taken_over.status == "succeeded"
+        assert taken_over.result == "https://a.com/1.jpg"
+        assert taken_over.worker_id == "worker-2"
+        assert not await repository.complete(job.job_id, "dead-worker", "late", now, now)
+
+    async def test_job_that_kills_its_workers_is_failed_after_max_attempts(self, ai_collections):
+        extraction_service = MagicMock()
+        extraction_service.extract_from_text = AsyncMock(return_value=({"product_name": "Lamp"}, "llm"))
+        pool = make_pool(extraction_service)
+        service = ExtractionJobService(ExtractionJobRepository(), pool)
+        job, _ = await service.submit("alice", JOB_EXTRACT, {"inner_text": "Huge page", "page_url": None})
+
+        # Both allowed attempts died with their worker
+        repository = ExtractionJobRepository()
+        for worker_id in ("dead-1", "dead-2"):
+            now = datetime.utcnow()
+            assert await repository.claim_next(worker_id, now, now - timedelta(seconds=1), 2)
+
+        assert not await pool.process_next("worker-3")
+        failed = await service.get("alice", job.job_id)
+        assert failed.status == "failed"
+        assert failed.attempts == 2
+        assert failed.expires_at is not None
+        assert pool.stats()["abandoned"] == 1
+        extraction_service.extract_from_text.assert_not_awaited()
+
+    async def test_answers_without_the_provider_are_refunded(self):
+        extraction_service = MagicMock()
+        extraction_service.extract_from_text = AsyncMock(return_value=({"product_name": "Lamp", "price": "$10"}, "rules"))
+        pool = make_pool(extraction_service)
+        service = ExtractionJobService(ExtractionJobRepository(), pool)
+        charge = token_quota.charge("alice", 500)
+        remaining = token_quota.status("alice").remaining
+
+        await service.submit("alice", JOB_EXTRACT, {"inner_text": "Lamp $10", "page_url": None}, charge)
+        await pool.process_next("worker-1")
+
+        assert token_quota.status("alice").remaining == remaining + 500
+        assert pool.stats()["refunded"] == 1
+
+    async def test_active_jobs_per_user_are_capped(self):
+        service = ExtractionJobService(ExtractionJobRepository(), make_pool(MagicMock()))
+
+        with patch('app.services.extraction_job_service.settings.EXTRACTION_JOB_MAX_ACTIVE_PER_USER', 1):
+            await service.submit("alice", JOB_EXTRACT, {"inner_text": "Lamp", "page_url": None})
+            with pytest.raises(JobLimitExceeded):
+                await service.submit("alice", JOB_EXTRACT, {"inner_text": "Chair", "page_url": None})
+
+    async def test_expired_jobs_are_not_returned(self, ai_collections):
+        service = ExtractionJobService(ExtractionJobRepository(), make_pool(MagicMock()))
+        job, _ = await service.submit("alice", JOB_EXTRACT, {"inner_text": "Lamp", "page_url": None})
+        ai_collections["extraction_jobs"].docs[0]["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+
+        assert await service.get("alice", job.job_id) is None
+        _, created = await service.submit("alice", JOB_EXTRACT, {"inner_text": "Lamp", "page_url": None})
+        assert created
+
+
+class TestJobRoutes:
+    """Test suite for job mode on the extraction routes."""
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_extract_job_is_submitted_and_polled(self, mock_parse, authenticated_client):
+        mock_parse.return_value = {"product_name": "Lamp", "price": "$10"}
+        inner_text = "Some page text without a clear product " * 10
+
+        with patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False):
+            submitted = authenticated_client.post("/extract/extract?job=true", json={"inner_text": inner_text})
+            duplicate = authenticated_client.post("/extract/extract?job=true", json={"inner_text": inner_text})
+            job_id = submitted.json()["job_id"]
+            polled = authenticated_client.get(f"/extract/jobs/{job_id}?wait=5")
+
+        assert submitted.status_code == status.HTTP_202_ACCEPTED
+        assert submitted.headers["Location"] == f"/extract/jobs/{job_id}"
+        assert submitted.json()["deduplicated"] is False
+        assert int(submitted.headers["X-Token-Budget-Charged"]) > 0
+
+        assert duplicate.json()["job_id"] == job_id
+        assert duplicate.json()["deduplicated"] is True
+        assert duplicate.headers["X-Token-Budget-Charged"] == "0"
+
+        assert polled.status_code == status.HTTP_200_OK
+        assert polled.json()["status"] == "succeeded"
+        assert polled.json()["result"] == {"cart_items": {"product_name": "Lamp", "price": "$10"}, "source": "llm"}
+        mock_parse.assert_called_once()
+
+    def test_job_events_stream_ends_with_done(self, authenticated_client):
+        with patch('app.services.extraction_service.ExtractionService.select_product_image',
+                   new_callable=AsyncMock) as mock_select:
+            mock_select.return_value = "https://a.com/1.jpg"
+            submitted = authenticated_client.post(
+                "/extract/analyze-images?job=true",
+                json={"page_url": "https://shop.com/lamp", "image_urls": "https://a.com/1.jpg,https://a.com/2.jpg"},
+            )
+            response = authenticated_client.get(f"/extract/jobs/{submitted.json()['job_id']}/events")
+
+        events = sse_events(response.text)
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert events[-1][0] == "done"
+        assert events[-1][1]["result"] == "https://a.com/1.jpg"
+        assert all(name == "status" for name, _ in events[:-1])
+
+    def test_job_mode_refused_when_jobs_are_disabled(self, authenticated_client, ai_collections):
+        with patch('app.routers.extraction_routes.settings.EXTRACTION_JOBS_ENABLED', False):
+            response = authenticated_client.post("/extract/extract?job=true", json={"inner_text": "Lamp $10"})
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert ai_collections["extraction_jobs"].docs == []
+        assert token_quota.stats().get("tokens_charged", 0) == 0
+
+    def test_other_users_jobs_are_not_found(self, authenticated_client, ai_collections):
+        now = datetime.utcnow()
+        ai_collections["extraction_jobs"].docs.append({
+            "job_id": "someone-elses", "user_id": "other-user", "kind": JOB_EXTRACT, "dedupe_key": "k",
+            "status": "succeeded", "payload": {}, "result": {"cart_items": {}}, "attempts": 1,
+            "created_at": now, "expires_at": now + timedelta(hours=1),
+        })
+
+        assert authenticated_client.get("/extract/jobs/someone-elses").status_code == status.HTTP_404_NOT_FOUND
+        assert authenticated_client.get("/extract/jobs/someone-elses/events").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_metrics_report_jobs(self, authenticated_client):
+        response = authenticated_client.get("/extract/metrics")
+
+        assert response.json()["jobs"]["workers"] > 0
@@ -0,0 +1,136 @@
+"""
+Tests for the Server-Sent Events streaming extraction variant.
+"""
+import json
+import pytest
+from unittest.mock import patch
+from fastapi import status
+
+from app.services.extraction_service import ExtractionService, text_router
+from app.services.ai.extraction_cache import extraction_cache, TEXT
+from app.repositories.product_cache_repository import ProductCacheRepository
+
+
+DELTAS = ['{"product_', 'name": "Nike Air', ' Zoom"', ', "price": "$1', '29.99"}']
+
+
+def fake_stream(deltas, seen=None):
+    """Return a stand-in for stream_inner_text_with_openai yielding deltas."""
+    def stream(text, model="gpt-4o"):
+        async def generate():
+            for delta in deltas:
+                if seen is not None:
+                    seen.append(delta)
+                yield delta
+        return generate()
+    return stream
+
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestStreamFromText:
+    """Test suite for ExtractionService.stream_from_text."""
+
+    async def test_fields_are_emitted_as_soon_as_complete(self):
+        """product_name should be yielded before the price has streamed in."""
+        seen = []
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        events = []
+        with patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+             patch('app.services.extraction_service.stream_inner_text_with_openai', fake_stream(DELTAS, seen)):
+            async for event in service.stream_from_text("Nike Air Zoom $129.99"):
+                events.append((event, len(seen)))
+
+        assert events[0] == (("field", {"name": "product_name", "value": "Nike Air Zoom"}), 3)
+        assert events[1] == (("field", {"name": "price", "value": "$129.99"}), 5)
+        done, _ = events[-1]
+        assert done == ("done", {
+            "cart_items": {"product_name": "Nike Air Zoom", "price": "$129.99"},
+            "image": None,
+            "source": "llm",
+        })
+        assert extraction_cache.stats()["kinds"][TEXT]["stores"] == 1
+
+    async def test_stream_fails_over_to_groq_before_output(self):
+        """An OpenAI stream failing before any delta should be answered by Groq."""
+        def failing_stream(text, model="gpt-4o"):
+            async def generate():
+                raise ValueError("Error streaming text with OpenAI: boom")
+                yield  # pragma: no cover
+            return generate()
+
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        with patch('app.services.ai.provider_router.settings.OPENAI_API_KEY', "sk-test"), \
+             patch('app.services.ai.provider_router.settings.GROQ_API_KEY', "gsk-test"), \
+             patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+             patch('app.services.extraction_service.stream_inner_text_with_openai', failing_stream), \
+             patch('app.services.extraction_service.stream_inner_text_with_groq', fake_stream(DELTAS)):
+            events = [e async for e in service.stream_from_text("Nike Air Zoom $129.99")]
+
+        assert events[-1][1]["cart_items"] == {"product_name": "Nike Air Zoom", "price": "$129.99"}
+        assert text_router.failovers == 1
+        assert text_router.stats()["providers"]["groq"]["failures"] == 0
+
+    async def test_cached_answer_streams_without_llm(self):
+        """Rule-based answers should be emitted at once without a completion."""
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        with patch('app.services.extraction_service.stream_inner_text_with_openai') as mock_stream:
+            events = [e async for e in service.stream_from_text("Nike Air Zoom Pegasus 40\nPrice: $129.99")]
+
+        mock_stream.assert_not_called()
+        assert [e[0] for e in events] == ["field", "field", "done"]
+        assert events[-1][1]["source"] == "rules"
+
+    async def test_image_is_streamed_with_fields(self):
+        """With page_url and image_urls the selected image is emitted as a field."""
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        with patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+             patch('app.services.extraction_service.stream_inner_text_with_openai', fake_stream(DELTAS)), \
+             patch('app.services.extraction_service.parse_images_with_openai') as mock_images:
+            mock_images.return_value = "https://cdn.shop.com/1.jpg"
+            events = [e async for e in service.stream_from_text(
+                "Nike Air Zoom $129.99",
+                "https://shop.com/nike-air-zoom",
+                ["https://cdn.shop.com/1.jpg", "https://cdn.shop.com/2.jpg"],
+            )]
+
+        assert ("field", {"name": "image", "value": "https://cdn.shop.com/1.jpg"}) in events
+        assert events[-1][1]["image"] == "https://cdn.shop.com/1.jpg"
+
+
+class TestExtractStreamRoute:
+    """Test suite for POST /extract/extract-stream."""
+
+    def test_extract_stream(self, authenticated_client):
+        """The route should return an SSE stream ending in a done event."""
+        with patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+             patch('app.services.extraction_service.stream_inner_text_with_openai', fake_stream(DELTAS)):
+            response = authenticated_client.post("/extract/extract-stream", json={"inner_text": "Nike Air Zoom $129.99"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.text)
+        assert [e[0] for e in events] == ["field", "field", "done"]
+        assert events[-1][1]["cart_items"]["price"] == "$129.99"
+
+    def test_stream_error_event(self, authenticated_client):
+        """Provider failures mid-stream should become an error event."""
+        def failing_stream(text, model="gpt-4o"):
+            async def generate():
+                raise ValueError("Error streaming text with OpenAI: boom")
+                yield  # pragma: no cover
+            return generate()
+
+        with patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+             patch('app.services.extraction_service.stream_inner_text_with_openai', failing_stream):
+            response = authenticated_client.post("/extract/extract-stream", json={"inner_text": "Nike Air Zoom $129.99"})
+
+        events = parse_sse(response.text)
+        assert events[-1][0] == "error"
+        assert "boom" in events[-1][1]["detail"]
@@ -0,0 +1,119 @@
+"""
+Tests for the shared outbound HTTP client.
+"""
+import io
+import sys
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, patch
+from PIL import Image
+
+from app.core.http_client import HTTPClientManager, http_client
+from app.services.ai.image_pipeline import fetch_image
+from app.services.feedback_service import FeedbackService
+
+
+def make_image() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (200, 200), (10, 120, 10)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+IMAGE = make_image()
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    posted = []
+
+    def _reply(self, content_type: str, body: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply("image/jpeg", IMAGE)
+
+    def do_POST(self):
+        KeepAliveHandler.posted.append(self.rfile.read(int(self.headers["Content-Length"])))
+        self._reply("text/plain", b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def local_host():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def allow_local_host():
+    with patch('app.services.ai.image_pipeline.settings.IMAGE_FETCH_ALLOW_PRIVATE_HOSTS', True):
+        yield
+
+
+class TestHTTPClientManager:
+    """Test suite for HTTPClientManager."""
+
+    async def test_requests_reuse_one_kept_alive_connection(self, local_host):
+        await http_client.close()
+
+        for name in ("a", "b", "c"):
+            assert (await http_client.client.get(f"{local_host}/{name}.jpg")).content == IMAGE
+
+        stats = http_client.stats()
+        assert stats["requests"] == 3
+        assert stats["responses_2xx"] == 3
+        assert stats["connections"] == 1
+        assert stats["idle_connections"] == 1
+        assert stats["clients_created"] == 1
+
+    async def test_image_fetches_stay_out_of_the_pool(self, local_host):
+        """Fetches pinned to a resolved address use a connection of their own each time."""
+        await http_client.close()
+
+        for name in ("a", "b"):
+            assert await fetch_image(f"{local_host}/{name}.jpg", 1_000_000, 5) == IMAGE
+
+        stats = http_client.stats()
+        assert stats["unpooled_clients"] == 2
+        assert stats["responses_2xx"] == 2
+        assert stats["connections"] == 0
+
+    async def test_closed_client_is_rebuilt(self):
+        manager = HTTPClientManager(5, 1, 10, 5, 30)
+        await manager.start()
+        first = manager.client
+        await manager.close()
+
+        assert first.is_closed
+        assert manager.client is not first
+        assert manager.stats()["clients_created"] == 2
+        await manager.close()
+
+    def test_http2_falls_back_without_h2(self):
+        with patch.dict(sys.modules, {"h2": None}):
+            manager = HTTPClientManager(5, 1, 10, 5, 30, http2=True)
+        assert manager.http2 is False
+
+    async def test_feedback_posts_through_shared_client(self, local_host):
+        service = FeedbackService(AsyncMock())
+        with patch('app.services.feedback_service.settings.GOOGLE_SHEETS_SCRIPT_URL', f"{local_host}/sheet"):
+            result = await service.submit_feedback("bug", "Broken button")
+
+        assert result["message"] == "Feedback submitted successfully"
+        assert b"Broken+button" in KeepAliveHandler.posted[-1]
+        assert http_client.stats()["requests"] == 1
+
+
+def test_metrics_include_http_client(authenticated_client):
+    response = authenticated_client.get("/extract/metrics")
+    assert "max_connections" in response.json()["http_client"]
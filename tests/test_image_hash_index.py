@@ -0,0 +1,196 @@
+"""
+Tests for perceptual hashing and the image hash index.
+
+A local HTTP server serves the same photo under several URLs and encodings.
+"""
+import io
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, patch
+from PIL import Image, ImageDraw
+
+from app.services.ai.extraction_cache import extraction_cache
+from app.services.ai.image_hash_index import ImageHashIndex, image_hash_index
+from app.services.ai.perceptual_hash import dhash, hamming, hash_bands
+from app.repositories.product_cache_repository import ProductCacheRepository
+from app.services.extraction_service import ExtractionService
+from app.services.verification_service import VerificationService, SOURCE_IMAGE_HASH
+
+
+def make_photo(size=(1600, 1200), shade=0) -> Image.Image:
+    """A synthetic 'product photo' with enough structure to hash."""
+    image = Image.new("RGB", size, (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    w, h = size
+    draw.ellipse((w * 0.2, h * 0.15, w * 0.7, h * 0.8), fill=(180 - shade, 40, 40))
+    draw.rectangle((w * 0.55, h * 0.5, w * 0.9, h * 0.95), fill=(30, 60, 160 + shade))
+    return image
+
+
+def encode(image: Image.Image, fmt="JPEG", **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+
+def make_other_photo() -> Image.Image:
+    image = Image.new("RGB", (1200, 1200), (20, 20, 20))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((100, 700, 1100, 1100), fill=(250, 250, 250))
+    draw.ellipse((500, 50, 1150, 600), fill=(250, 200, 0))
+    return image
+
+
+ROUTES = {
+    "/original.jpg": ("image/jpeg", encode(make_photo())),
+    "/resized.jpg": ("image/jpeg", encode(make_photo().resize((640, 480)), quality=60)),
+    "/resized.png": ("image/png", encode(make_photo().resize((800, 600)), "PNG")),
+    "/other.jpg": ("image/jpeg", encode(make_other_photo())),
+}
+
+
+class ImageHostHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        content_type, body = ROUTES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def image_host():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHostHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def allow_local_host():
+    with patch('app.services.ai.image_pipeline.settings.IMAGE_FETCH_ALLOW_PRIVATE_HOSTS', True):
+        yield
+
+
+class TestPerceptualHash:
+    """Test suite for dHash and band keys."""
+
+    def test_resized_and_reencoded_copies_hash_close(self):
+        original = dhash(make_photo())
+        resized = dhash(Image.open(io.BytesIO(ROUTES["/resized.jpg"][1])))
+        png = dhash(Image.open(io.BytesIO(ROUTES["/resized.png"][1])))
+
+        assert hamming(original, resized) <= 3
+        assert hamming(original, png) <= 3
+
+    def test_different_photos_hash_apart(self):
+        assert hamming(dhash(make_photo()), dhash(make_other_photo())) > 10
+
+    def test_near_hashes_share_a_band(self):
+        """Hashes within BANDS - 1 bits always share at least one band key."""
+        value = 0x0123456789ABCDEF
+        near = value ^ (1 << 3) ^ (1 << 20) ^ (1 << 40)
+
+        assert len(hash_bands(value)) == 4
+        assert set(hash_bands(value)) & set(hash_bands(near))
+
+
+class TestImageHashIndex:
+    """Test suite for ImageHashIndex."""
+
+    async def test_verdict_found_for_near_hash_only_for_same_product(self):
+        value = 0x0123456789ABCDEF
+        await image_hash_index.record(value, "https://cdn.shop.com/1.jpg", "Nike Air Zoom", verdict="match")
+
+        assert await image_hash_index.find_verdict(value ^ 0b101, "nike  air zoom") == "match"
+        assert await image_hash_index.find_verdict(value, "Adidas Samba") is None
+        assert await image_hash_index.find_verdict(value ^ 0xFFFF, "Nike Air Zoom") is None
+        assert image_hash_index.counters.get("near_hits") == 1
+        assert image_hash_index.counters.get("misses") == 2
+
+    async def test_verdict_found_behind_many_other_products(self):
+        """Copies of the photo judged for other products don't use up the candidate limit."""
+        value = 0x0123456789ABCDEF
+        for i in range(60):
+            await image_hash_index.record(value ^ (i << 50), f"https://cdn.shop.com/{i}.jpg", f"Reseller {i}", verdict="match")
+        await image_hash_index.record(value ^ 0b1, "https://cdn.shop.com/lamp.jpg", "Lamp", verdict="mismatch")
+
+        assert await image_hash_index.find_verdict(value, "Lamp") == "mismatch"
+
+    async def test_find_best_prefers_closest_candidate(self):
+        value = 0x0123456789ABCDEF
+        await image_hash_index.record(value, "https://cdn.shop.com/1.jpg", "Lamp", best=True)
+
+        best = await image_hash_index.find_best({
+            "https://cdn.a.com/far.jpg": value ^ 0b111,
+            "https://cdn.a.com/near.jpg": value ^ 0b1,
+            "https://cdn.a.com/other.jpg": ~value & 0xFFFFFFFFFFFFFFFF,
+        }, "Lamp")
+
+        assert best == "https://cdn.a.com/near.jpg"
+
+    async def test_storage_errors_are_swallowed(self):
+        repository = AsyncMock()
+        repository.find_by_bands.side_effect = RuntimeError("mongo down")
+        repository.upsert.side_effect = RuntimeError("mongo down")
+        index = ImageHashIndex(3, repository_factory=lambda: repository)
+
+        await index.record(1, "https://cdn.shop.com/1.jpg", "Lamp", verdict="match")
+        assert await index.find_verdict(1, "Lamp") is None
+        assert index.counters.get("errors") == 2
+
+
+class TestVerdictReuse:
+    """Verification answers for the same photo under another URL."""
+
+    @patch('app.services.verification_service.ask_openai_vision', new_callable=AsyncMock)
+    async def test_same_photo_under_new_url_skips_vision(self, mock_vision, image_host):
+        mock_vision.return_value = True
+        service = VerificationService(extraction_cache)
+
+        first = await service.verify_image(f"{image_host}/original.jpg", "Red Lamp")
+        second = await service.verify_image(f"{image_host}/resized.png", "Red Lamp")
+        other = await service.verify_image(f"{image_host}/other.jpg", "Red Lamp")
+
+        assert first == ("match", "llm")
+        assert second == ("match", SOURCE_IMAGE_HASH)
+        assert other == ("match", "llm")
+        assert mock_vision.call_count == 2
+
+    @patch('app.services.verification_service.ask_openai_vision', new_callable=AsyncMock)
+    async def test_disabled_index_always_asks(self, mock_vision, image_host):
+        mock_vision.return_value = True
+        service = VerificationService(extraction_cache)
+
+        with patch.object(image_hash_index, "enabled", False):
+            await service.verify_image(f"{image_host}/original.jpg", "Red Lamp")
+            second = await service.verify_image(f"{image_host}/resized.png", "Red Lamp")
+
+        assert second == ("match", "llm")
+        assert mock_vision.call_count == 2
+
+
+class TestSelectionReuse:
+    """Opt-in reuse of image selections across pages."""
+
+    async def test_previous_choice_selected_without_llm(self, image_host):
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        first_urls = [f"{image_host}/original.jpg", f"{image_host}/other.jpg"]
+        second_urls = [f"{image_host}/other.jpg", f"{image_host}/resized.jpg"]
+
+        with patch('app.services.extraction_service.settings.IMAGE_HASH_SELECTION_REUSE', True), \
+             patch('app.services.extraction_service.settings.IMAGE_PRERANK_ENABLED', False), \
+             patch('app.services.extraction_service.settings.PRODUCT_CACHE_ENABLED', False), \
+             patch('app.services.extraction_service.parse_images_with_openai', return_value=first_urls[0]) as mock_llm:
+            first = await service.select_product_image("https://a.com/p/red-lamp", "red lamp", first_urls)
+            second = await service.select_product_image("https://b.com/p/lamp-red", "red lamp", second_urls)
+
+        assert first == first_urls[0]
+        assert second == second_urls[1]
+        mock_llm.assert_called_once()
@@ -0,0 +1,340 @@
+"""
+Tests for the vision image fetch-and-downscale pipeline.
+
+A local HTTP server stands in for the retailer's image host.
+"""
+import base64
+import datetime
+import httpx
+import io
+import ssl
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from PIL import Image
+
+from app.services.ai.image_pipeline import (
+    downscale_image,
+    fetch_image,
+    prepare_image,
+    pipeline_counters,
+)
+from app.services.ai.vision_verifier import ask_openai_vision
+from app.core.http_client import http_client
+
+
+def make_image(size=(2000, 1200), mode="RGB", fmt="JPEG") -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == "RGBA" else (200, 30, 30)).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def decode_data_url(data_url: str) -> Image.Image:
+    assert data_url.startswith("data:image/jpeg;base64,")
+    return Image.open(io.BytesIO(base64.b64decode(data_url.split(",", 1)[1])))
+
+
+ROUTES = {
+    "/large.jpg": ("image/jpeg", make_image()),
+    "/copy.jpg": ("image/jpeg", make_image()),
+    "/logo.png": ("image/png", make_image((300, 100), "RGBA", "PNG")),
+    "/page.html": ("text/html", b"<html></html>"),
+    "/huge.jpg": ("image/jpeg", b"\xff" * 4096),
+    "/broken.jpg": ("image/jpeg", b"not really a jpeg"),
+}
+
+
+class ImageHostHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/slow.jpg":
+            time.sleep(0.5)
+        content_type, body = ROUTES.get(self.path, ("image/jpeg", make_image()))
+        if self.path == "/missing.jpg":
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def image_host():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHostHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def allow_local_host():
+    with patch('app.services.ai.image_pipeline.settings.IMAGE_FETCH_ALLOW_PRIVATE_HOSTS', True):
+        yield
+
+
+class TestFetch:
+    """Test suite for fetch_image."""
+
+    async def test_fetches_bytes(self, image_host):
+        assert await fetch_image(f"{image_host}/large.jpg", 10_000_000, 5) == ROUTES["/large.jpg"][1]
+
+    @pytest.mark.parametrize("path", ["/huge.jpg", "/page.html", "/missing.jpg"])
+    async def test_rejects_large_non_image_and_errors(self, image_host, path):
+        with pytest.raises(ValueError):
+            await fetch_image(f"{image_host}{path}", 1024, 5)
+
+    async def test_time_limit(self, image_host):
+        with pytest.raises(ValueError, match="timed out"):
+            await fetch_image(f"{image_host}/slow.jpg", 10_000_000, 0.1)
+
+    async def test_private_hosts_refused_by_default(self, image_host):
+        with patch('app.services.ai.image_pipeline.settings.IMAGE_FETCH_ALLOW_PRIVATE_HOSTS', False):
+            with pytest.raises(ValueError, match="not a public address"):
+                await fetch_image(f"{image_host}/large.jpg", 10_000_000, 5)
+
+
+class TestFetchPinning:
+    """Test suite for redirect and DNS checks in fetch_image."""
+
+    @pytest.fixture
+    def public_dns(self):
+        """Resolve *.example names through a table; each lookup is recorded."""
+        table = {
+            "shop.example": ["93.184.216.34"],
+            "cdn.example": ["93.184.216.35"],
+            "metadata.example": ["169.254.169.254"],
+        }
+        lookups = []
+
+        async def resolve(host, port):
+            lookups.append(host)
+            return table.get(host, [host])
+
+        with patch('app.services.ai.image_pipeline.settings.IMAGE_FETCH_ALLOW_PRIVATE_HOSTS', False), \
+             patch('app.services.ai.image_pipeline._resolve', side_effect=resolve):
+            yield table, lookups
+
+    @pytest.fixture
+    def transport(self):
+        """Serve requests from a handler instead of the network; requests are recorded."""
+        routes = {}
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return routes[(request.url.host, request.url.path)]()
+
+        with patch.object(http_client, "unpooled_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))):
+            yield routes, requests
+
+    async def test_redirect_to_private_address_is_refused(self, public_dns, transport):
+        routes, requests = transport
+        routes[("93.184.216.34", "/lamp.jpg")] = lambda: httpx.Response(
+            302, headers={"Location": "http://169.254.169.254/latest/meta-data/"}
+        )
+
+        with pytest.raises(ValueError, match="not a public address"):
+            await fetch_image("http://shop.example/lamp.jpg", 10_000_000, 5)
+        assert len(requests) == 1
+
+    async def test_redirect_to_host_resolving_privately_is_refused(self, public_dns, transport):
+        routes, requests = transport
+        routes[("93.184.216.34", "/lamp.jpg")] = lambda: httpx.Response(302, headers={"Location": "//metadata.example/x"})
+
+        with pytest.raises(ValueError, match="not a public address"):
+            await fetch_image("http://shop.example/lamp.jpg", 10_000_000, 5)
+        assert len(requests) == 1
+
+    async def test_public_redirects_are_followed_with_a_limit(self, public_dns, transport):
+        routes, requests = transport
+        routes[("93.184.216.34", "/lamp.jpg")] = lambda: httpx.Response(302, headers={"Location": "https://cdn.example/lamp.jpg"})
+        routes[("93.184.216.35", "/lamp.jpg")] = lambda: httpx.Response(200, headers={"Content-Type": "image/jpeg"}, content=b"jpeg")
+        routes[("93.184.216.34", "/loop.jpg")] = lambda: httpx.Response(302, headers={"Location": "/loop.jpg"})
+
+        assert await fetch_image("http://shop.example/lamp.jpg", 10_000_000, 5) == b"jpeg"
+        assert requests[1].headers["host"] == "cdn.example"
+        assert requests[1].extensions["sni_hostname"] == "cdn.example"
+        with pytest.raises(ValueError, match="Too many redirects"):
+            await fetch_image("http://shop.example/loop.jpg", 10_000_000, 5)
+
+    async def test_connects_to_the_checked_address(self, public_dns, transport):
+        table, lookups = public_dns
+        routes, requests = transport
+
+        def rebind():
+            # The name now points somewhere private; the request must not follow it
+            table["shop.example"] = ["127.0.0.1"]
+            return httpx.Response(200, headers={"Content-Type": "image/jpeg"}, content=b"jpeg")
+
+        routes[("93.184.216.34", "/lamp.jpg")] = rebind
+
+        assert await fetch_image("http://shop.example/lamp.jpg", 10_000_000, 5) == b"jpeg"
+        assert lookups == ["shop.example"]
+        assert requests[0].url.host == "93.184.216.34"
+        assert requests[0].headers["host"] == "shop.example"
+        with pytest.raises(ValueError, match="not a public address"):
+            await fetch_image("http://shop.example/lamp.jpg", 10_000_000, 5)
+
+
+def make_certificate(names):
+    """Self-signed certificate and key (PEM) valid for the given host names."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, names[0])])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(hours=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName(name) for name in names]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    return certificate.public_bytes(serialization.Encoding.PEM), key_pem
+
+
+class KeepAliveImageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = ROUTES["/large.jpg"][1]
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPinnedConnections:
+    """Pinned fetches to host names sharing an address don't share TLS connections."""
+
+    @pytest.fixture
+    def shared_tls_host(self, tmp_path):
+        """One keep-alive HTTPS server for shop-a.example and shop-b.example; handshakes are recorded by SNI name."""
+        cert_pem, key_pem = make_certificate(["shop-a.example", "shop-b.example"])
+        (tmp_path / "cert.pem").write_bytes(cert_pem)
+        (tmp_path / "key.pem").write_bytes(key_pem)
+        handshakes = []
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(tmp_path / "cert.pem", tmp_path / "key.pem")
+        server_context.sni_callback = lambda sock, name, context: handshakes.append(name)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveImageHandler)
+        server.socket = server_context.wrap_socket(server.socket, server_side=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        async def resolve(host, port):
+            return ["127.0.0.1"]
+
+        with patch('app.services.ai.image_pipeline._resolve', side_effect=resolve), \
+             patch.object(http_client, "verify", ssl.create_default_context(cadata=cert_pem.decode("ascii"))):
+            yield server.server_address[1], handshakes
+        server.shutdown()
+
+    async def test_each_host_name_gets_its_own_connection_and_handshake(self, shared_tls_host):
+        port, handshakes = shared_tls_host
+        expected = ROUTES["/large.jpg"][1]
+
+        assert await fetch_image(f"https://shop-a.example:{port}/a.jpg", 10_000_000, 5) == expected
+        assert await fetch_image(f"https://shop-b.example:{port}/b.jpg", 10_000_000, 5) == expected
+
+        assert handshakes == ["shop-a.example", "shop-b.example"]
+
+    async def test_certificate_is_checked_for_every_host_name(self, shared_tls_host):
+        port, handshakes = shared_tls_host
+
+        await fetch_image(f"https://shop-a.example:{port}/a.jpg", 10_000_000, 5)
+        # Same address, but the certificate doesn't cover this name
+        with pytest.raises(ValueError, match="CERTIFICATE_VERIFY_FAILED|certificate"):
+            await fetch_image(f"https://shop-c.example:{port}/c.jpg", 10_000_000, 5)
+
+        assert handshakes == ["shop-a.example", "shop-c.example"]
+
+
+class TestDownscale:
+    """Test suite for downscale_image."""
+
+    def test_longest_edge_is_capped(self):
+        image = Image.open(io.BytesIO(downscale_image(make_image((2000, 1200)), 512, 85)))
+        assert image.format == "JPEG"
+        assert image.size == (512, 307)
+
+    def test_transparency_is_flattened(self):
+        image = Image.open(io.BytesIO(downscale_image(make_image((300, 100), "RGBA", "PNG"), 512, 85)))
+        assert image.mode == "RGB"
+        assert image.size == (300, 100)
+
+    def test_undecodable_bytes_raise(self):
+        with pytest.raises(ValueError):
+            downscale_image(b"not an image", 512, 85)
+
+
+class TestPrepareImage:
+    """Test suite for prepare_image."""
+
+    async def test_same_bytes_processed_once(self, image_host):
+        """Identical images at different URLs should share one processed entry."""
+        first = await prepare_image(f"{image_host}/large.jpg")
+        with patch('app.services.ai.image_pipeline.downscale_image') as mock_downscale:
+            second = await prepare_image(f"{image_host}/copy.jpg")
+
+        assert first == second
+        mock_downscale.assert_not_called()
+        assert max(decode_data_url(first).size) == 512
+        assert pipeline_counters.get("cache_hits") == 1
+        assert pipeline_counters.get("bytes_sent") < pipeline_counters.get("bytes_fetched")
+
+    async def test_broken_image_counts_failure(self, image_host):
+        with pytest.raises(ValueError):
+            await prepare_image(f"{image_host}/broken.jpg")
+        assert pipeline_counters.get("failures") == 1
+
+
+class TestVisionRequest:
+    """Test suite for the pipeline in ask_openai_vision."""
+
+    async def test_sends_low_detail_base64(self, image_host):
+        create = AsyncMock(return_value=SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Yes"))]
+        ))
+        with patch('app.services.ai.vision_verifier.client') as mock_client:
+            mock_client.chat.completions.create = create
+            assert await ask_openai_vision(f"{image_host}/large.jpg", "Red swatch") is True
+
+        image = create.call_args.kwargs["messages"][0]["content"][1]["image_url"]
+        assert image["detail"] == "low"
+        assert image["url"].startswith("data:image/jpeg;base64,")
+
+    async def test_falls_back_to_url_when_fetch_fails(self, image_host):
+        create = AsyncMock(return_value=SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="no"))]
+        ))
+        url = f"{image_host}/missing.jpg"
+        with patch('app.services.ai.vision_verifier.client') as mock_client:
+            mock_client.chat.completions.create = create
+            assert await ask_openai_vision(url, "Red swatch") is False
+
+        assert create.call_args.kwargs["messages"][0]["content"][1]["image_url"] == {"url": url}
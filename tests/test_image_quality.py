@@ -0,0 +1,173 @@
+"""
+Tests for the local image quality filter.
+
+A local HTTP server serves a product photo and typical non-product images.
+"""
+import io
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, patch
+from PIL import Image, ImageDraw
+
+from app.repositories.product_cache_repository import ProductCacheRepository
+from app.services.ai.extraction_cache import extraction_cache
+from app.services.ai.image_pipeline import process_image
+from app.services.ai.image_quality import (
+    ImageQuality,
+    measure_quality,
+    quality_counters,
+    rejection_reason,
+    TOO_SMALL,
+    EXTREME_ASPECT_RATIO,
+    SOLID_COLOR,
+    LOW_ENTROPY,
+)
+from app.services.ai.image_ranker import rank_image_candidates
+from app.services.extraction_service import ExtractionService
+from app.services.verification_service import VerificationService, SOURCE_QUALITY_FILTER
+
+
+def make_photo(size=(1200, 900)) -> Image.Image:
+    image = Image.new("RGB", size, (235, 235, 235))
+    draw = ImageDraw.Draw(image)
+    w, h = size
+    draw.ellipse((w * 0.2, h * 0.15, w * 0.7, h * 0.8), fill=(180, 40, 40))
+    draw.rectangle((w * 0.55, h * 0.5, w * 0.9, h * 0.95), fill=(30, 60, 160))
+    return image
+
+
+def encode(image: Image.Image, fmt="JPEG") -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+ROUTES = {
+    "/photo.jpg": ("image/jpeg", encode(make_photo())),
+    "/pixel.gif": ("image/gif", encode(Image.new("RGB", (1, 1)), "GIF")),
+    "/placeholder.png": ("image/png", encode(Image.new("RGB", (800, 800), (238, 238, 238)), "PNG")),
+    "/sprite.png": ("image/png", encode(make_photo((2000, 200)), "PNG")),
+    "/thumb.jpg": ("image/jpeg", encode(make_photo((80, 60)))),
+}
+
+
+class ImageHostHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        content_type, body = ROUTES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def image_host():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHostHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def allow_local_host():
+    with patch('app.services.ai.image_pipeline.settings.IMAGE_FETCH_ALLOW_PRIVATE_HOSTS', True):
+        yield
+
+
+class TestMeasureQuality:
+    """Test suite for measure_quality and rejection_reason."""
+
+    def test_photo_passes(self):
+        image = make_photo()
+        quality = measure_quality(image, image.size)
+
+        assert (quality.width, quality.height) == (1200, 900)
+        assert quality.entropy > 1.0
+        assert quality.dominant_color_share < 0.9
+        assert rejection_reason(quality) is None
+
+    def test_solid_color_is_rejected(self):
+        image = Image.new("RGB", (500, 500), (250, 250, 250))
+        quality = measure_quality(image, image.size)
+
+        assert quality.dominant_color_share == 1.0
+        assert quality.entropy == 0.0
+        assert rejection_reason(quality) == SOLID_COLOR
+
+    @pytest.mark.parametrize("quality,reason", [
+        (ImageQuality(width=1, height=1, entropy=0.0, dominant_color_share=1.0), TOO_SMALL),
+        (ImageQuality(width=2000, height=200, entropy=5.0, dominant_color_share=0.4), EXTREME_ASPECT_RATIO),
+        (ImageQuality(width=800, height=800, entropy=0.5, dominant_color_share=0.6), LOW_ENTROPY),
+    ])
+    def test_rejection_reasons(self, quality, reason):
+        assert rejection_reason(quality) == reason
+
+    async def test_pipeline_measures_original_size(self, image_host):
+        """Dimensions should be those of the fetched image, not the downscaled copy."""
+        image = await process_image(f"{image_host}/sprite.png")
+        assert (image.quality.width, image.quality.height) == (2000, 200)
+
+
+class TestVerificationFilter:
+    """Rejected images answer without a vision call."""
+
+    @patch('app.services.verification_service.ask_openai_vision', new_callable=AsyncMock)
+    async def test_only_plausible_images_reach_vision(self, mock_vision, image_host):
+        mock_vision.return_value = True
+        urls = [f"{image_host}{path}" for path in ("/pixel.gif", "/photo.jpg", "/placeholder.png", "/sprite.png")]
+
+        results = await VerificationService(extraction_cache).verify_images(urls, "Red Lamp")
+
+        assert results == [
+            ("mismatch", SOURCE_QUALITY_FILTER),
+            ("match", "llm"),
+            ("mismatch", SOURCE_QUALITY_FILTER),
+            ("mismatch", SOURCE_QUALITY_FILTER),
+        ]
+        mock_vision.assert_called_once_with(urls[1], "Red Lamp")
+        assert quality_counters.get("rejected") == 3
+
+    @patch('app.services.verification_service.ask_openai_vision', new_callable=AsyncMock)
+    async def test_filter_can_be_disabled(self, mock_vision, image_host):
+        mock_vision.return_value = False
+        with patch('app.services.verification_service.settings.IMAGE_QUALITY_FILTER_ENABLED', False):
+            verdict = await VerificationService(extraction_cache).verify_image(f"{image_host}/pixel.gif", "Red Lamp")
+
+        assert verdict == ("mismatch", "llm")
+        mock_vision.assert_called_once()
+
+
+class TestSelectionFilter:
+    """Opt-in filtering of image selection candidates."""
+
+    async def test_rejected_candidates_never_reach_llm(self, image_host):
+        urls = [f"{image_host}{path}" for path in ("/thumb.jpg", "/photo.jpg", "/placeholder.png")]
+        urls.append("http://unresolvable.invalid/lamp.jpg")
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+
+        with patch('app.services.extraction_service.settings.IMAGE_QUALITY_FETCH_CANDIDATES', True), \
+             patch('app.services.extraction_service.settings.PRODUCT_CACHE_ENABLED', False), \
+             patch('app.services.extraction_service.parse_images_with_openai', return_value=urls[1]) as mock_llm:
+            result = await service.select_product_image("https://shop.com/p/red-lamp", "red lamp", urls)
+
+        assert result == urls[1]
+        # Candidates that couldn't be fetched are kept for the LLM to judge
+        assert sorted(mock_llm.call_args.args[2]) == sorted([urls[1], urls[3]])
+
+
+class TestRankerUsesMeasuredSize:
+    def test_measured_size_overrides_url_hint(self):
+        urls = ["https://cdn.shop.com/a_1200x1200.jpg", "https://cdn.shop.com/b.jpg"]
+        qualities = {urls[0]: ImageQuality(width=300, height=300, entropy=5.0, dominant_color_share=0.3),
+                     urls[1]: ImageQuality(width=1500, height=1000, entropy=5.0, dominant_color_share=0.3)}
+
+        ranked = rank_image_candidates(urls, "", qualities=qualities)
+
+        assert [c.url for c in ranked.candidates] == [urls[1], urls[0]]
+        assert ranked.candidates[0].size_hint == 1500
@@ -0,0 +1,139 @@
+"""
+Tests for the image candidate pre-ranker.
+"""
+import pytest
+from unittest.mock import patch
+from fastapi import status
+
+from app.services.ai.image_ranker import (
+    rank_image_candidates,
+    variant_key,
+    size_hint,
+    is_non_product_asset,
+)
+from app.services.extraction_service import image_prerank_counters
+
+
+class TestVariantCollapsing:
+    """Test suite for variant_key and size_hint."""
+
+    @pytest.mark.parametrize("a, b", [
+        ("https://cdn.shop.com/files/shoe_800x800.jpg?v=3", "https://cdn.shop.com/files/shoe_200x.webp?v=3"),
+        ("https://cdn.shop.com/shoe.jpg?width=1200&format=pjpg", "https://cdn.shop.com/shoe.png?width=300"),
+        ("https://m.media-amazon.com/images/I/71abc._AC_SX679_.jpg", "https://m.media-amazon.com/images/I/71abc._AC_SL1500_.jpg"),
+        ("https://res.cloudinary.com/x/image/upload/w_400,c_fill/v1/shoe.jpg", "https://res.cloudinary.com/x/image/upload/w_1200,f_auto/v1/shoe.jpg"),
+        ("https://cdn.shop.com/shoe@2x.jpg", "https://cdn.shop.com/shoe.jpg"),
+    ])
+    def test_size_and_format_variants_share_a_key(self, a, b):
+        """URLs differing only by size or format should collapse together."""
+        assert variant_key(a) == variant_key(b)
+
+    def test_other_query_parameters_keep_images_apart(self):
+        """Non-rendition parameters (e.g. a color) identify a different image."""
+        assert variant_key("https://cdn.shop.com/shoe.jpg?color=red") != variant_key("https://cdn.shop.com/shoe.jpg?color=blue")
+
+    @pytest.mark.parametrize("url, expected", [
+        ("https://cdn.shop.com/shoe_800x600.jpg", 800),
+        ("https://cdn.shop.com/shoe.jpg?w=320&h=480", 480),
+        ("https://m.media-amazon.com/images/I/71abc._AC_SL1500_.jpg", 1500),
+        ("https://cdn.shop.com/shoe.jpg", None),
+    ])
+    def test_size_hint(self, url, expected):
+        assert size_hint(url) == expected
+
+    @pytest.mark.parametrize("url", [
+        "https://cdn.shop.com/assets/logo.png",
+        "https://cdn.shop.com/ui/icons/cart.png",
+        "https://cdn.shop.com/img/sprite-main.png",
+        "https://cdn.shop.com/img/arrow.svg",
+        "https://www.facebook.com/tr?id=1&ev=PageView",
+        "https://cdn.shop.com/p.gif?w=1&h=1",
+    ])
+    def test_non_product_assets(self, url):
+        assert is_non_product_asset(url)
+
+    def test_product_photo_is_kept(self):
+        assert not is_non_product_asset("https://cdn.shop.com/files/nike-air-zoom_800x800.jpg")
+
+
+class TestRanking:
+    """Test suite for rank_image_candidates."""
+
+    def test_slug_match_dominates(self):
+        """A large image named after the product should win without the LLM."""
+        ranked = rank_image_candidates([
+            "https://cdn.shop.com/assets/logo.png",
+            "https://cdn.shop.com/files/nike-air-zoom-pegasus_200x200.jpg",
+            "https://cdn.shop.com/files/nike-air-zoom-pegasus_1000x1000.jpg",
+            "https://cdn.shop.com/files/lifestyle-banner-2.jpg",
+            "https://cdn.shop.com/files/IMG_4411.jpg",
+        ], "nike air zoom pegasus")
+
+        assert ranked.dominant == "https://cdn.shop.com/files/nike-air-zoom-pegasus_1000x1000.jpg"
+        assert ranked.collapsed == 1
+        assert ranked.dropped == 2
+
+    def test_furniture_words_in_the_product_name_are_kept(self):
+        """Photos of a logo tee are not dropped as logos; the site logo is kept too but ranks last."""
+        ranked = rank_image_candidates([
+            "https://cdn.shop.com/assets/logo.png",
+            "https://cdn.shop.com/files/nike-logo-tee-front_1000x1000.jpg",
+            "https://cdn.shop.com/files/nike-logo-tee-back_300x300.jpg",
+        ], "nike logo tee")
+
+        assert ranked.dominant == "https://cdn.shop.com/files/nike-logo-tee-front_1000x1000.jpg"
+        assert ranked.dropped == 0
+        assert [c.url for c in ranked.candidates][-1] == "https://cdn.shop.com/assets/logo.png"
+
+    def test_close_candidates_do_not_dominate(self):
+        """Two equally good candidates should be left to the LLM."""
+        ranked = rank_image_candidates([
+            "https://cdn.shop.com/files/nike-air-zoom-front.jpg",
+            "https://cdn.shop.com/files/nike-air-zoom-side.jpg",
+        ], "nike air zoom")
+
+        assert ranked.dominant is None
+        assert len(ranked.candidates) == 2
+
+    def test_without_slug_signal_nothing_dominates(self):
+        """A lone candidate with no slug match is not trusted on its own."""
+        ranked = rank_image_candidates(["https://example.com/img1.jpg"], "Unknown Product")
+
+        assert ranked.dominant is None
+        assert [c.url for c in ranked.candidates] == ["https://example.com/img1.jpg"]
+
+
+class TestPrerankedSelection:
+    """Test suite for the pre-ranker in /analyze-images."""
+
+    @patch('app.services.extraction_service.parse_images_with_openai')
+    def test_dominant_candidate_skips_llm(self, mock_openai, authenticated_client):
+        response = authenticated_client.post("/extract/analyze-images", json={
+            "page_url": "https://shop.com/products/trail-runner-gtx",
+            "image_urls": "https://cdn.shop.com/logo.svg,https://cdn.shop.com/files/trail-runner-gtx_1200x1200.jpg,"
+                          "https://cdn.shop.com/files/trail-runner-gtx_300x300.jpg,https://cdn.shop.com/files/IMG_0042.jpg",
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == "https://cdn.shop.com/files/trail-runner-gtx_1200x1200.jpg"
+        mock_openai.assert_not_called()
+        assert image_prerank_counters.get("dominant") == 1
+
+    @patch('app.services.extraction_service.parse_images_with_openai')
+    def test_llm_sees_only_top_k(self, mock_openai, authenticated_client):
+        mock_openai.return_value = "https://cdn.shop.com/a1.jpg"
+        urls = [f"https://cdn.shop.com/a{i}.jpg" for i in range(12)]
+        urls += [f"https://cdn.shop.com/a{i}.jpg?width=200" for i in range(12)]
+        urls.append("https://cdn.shop.com/icons/heart.png")
+
+        with patch('app.services.extraction_service.settings.IMAGE_PRERANK_TOP_K', 5):
+            response = authenticated_client.post("/extract/analyze-images", json={
+                "page_url": "https://shop.com/products/trail-runner-gtx",
+                "image_urls": ",".join(urls),
+            })
+
+        assert response.status_code == status.HTTP_200_OK
+        sent = mock_openai.call_args.args[2]
+        assert len(sent) == 5
+        assert all("icons" not in url for url in sent)
+        assert image_prerank_counters.get("collapsed") == 12
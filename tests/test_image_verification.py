@@ -0,0 +1,210 @@
+"""
+Tests for cached single- and multi-image verification.
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from fastapi import status
+
+from app.services.ai.extraction_cache import extraction_cache, verification_cache_key, VERIFY
+from app.services.ai.vision_verifier import ask_openai_vision_batch
+from app.services.verification_service import (
+    VerificationService,
+    verification_counters,
+    VERDICT_MATCH,
+    VERDICT_UNKNOWN,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_image_fetches():
+    """Vision calls are mocked here; don't fetch the example image URLs to fingerprint them."""
+    with patch('app.services.verification_service.settings.IMAGE_PIPELINE_ENABLED', False):
+        yield
+
+
+PAYLOAD = {
+    "product_name": "Nike Air Zoom",
+    "price": "$129.99",
+    "image_url": "https://cdn.shop.com/nike-air-zoom.jpg",
+}
+
+
+class TestVerificationCacheKey:
+    """Test suite for verification_cache_key."""
+
+    def test_product_name_is_normalized(self):
+        """Case and whitespace differences in the name should share a key."""
+        a = verification_cache_key("https://cdn.shop.com/1.jpg", "Nike  Air Zoom", "gpt-4o", "1")
+        b = verification_cache_key("https://cdn.shop.com/1.jpg", "nike air zoom ", "gpt-4o", "1")
+        assert a == b
+
+    def test_different_images_differ(self):
+        a = verification_cache_key("https://cdn.shop.com/1.jpg", "Nike Air Zoom", "gpt-4o", "1")
+        b = verification_cache_key("https://cdn.shop.com/2.jpg", "Nike Air Zoom", "gpt-4o", "1")
+        assert a != b
+
+
+class TestVerificationService:
+    """Test suite for VerificationService."""
+
+    async def test_timeout_answers_unknown_and_is_not_cached(self):
+        """A slow vision call should answer "unknown" without caching it."""
+        async def slow(image_url, product_name):
+            await asyncio.sleep(1)
+            return True
+
+        service = VerificationService(extraction_cache)
+        with patch('app.services.verification_service.settings.VERIFICATION_TIMEOUT_SECONDS', 0.01), \
+             patch('app.services.verification_service.ask_openai_vision', side_effect=slow):
+            verdict, source = await service.verify_image("https://cdn.shop.com/1.jpg", "Lamp")
+
+        assert verdict == VERDICT_UNKNOWN
+        assert verification_counters.get("timeouts") == 1
+        assert extraction_cache.stats()["kinds"].get(VERIFY, {}).get("stores", 0) == 0
+
+    async def test_provider_error_answers_unknown(self):
+        service = VerificationService(extraction_cache)
+        with patch('app.services.verification_service.ask_openai_vision', side_effect=ValueError("boom")):
+            verdict, _ = await service.verify_image("https://cdn.shop.com/1.jpg", "Lamp")
+
+        assert verdict == VERDICT_UNKNOWN
+        assert verification_counters.get("errors") == 1
+
+    async def test_concurrent_checks_share_one_call(self):
+        """Identical concurrent checks should make a single vision call."""
+        async def slow(image_url, product_name):
+            await asyncio.sleep(0.02)
+            return True
+
+        service = VerificationService(extraction_cache)
+        with patch('app.services.verification_service.ask_openai_vision', side_effect=slow) as mock_vision:
+            results = await asyncio.gather(*(
+                service.verify_image("https://cdn.shop.com/1.jpg", "Lamp") for _ in range(3)
+            ))
+
+        assert all(verdict == VERDICT_MATCH for verdict, _ in results)
+        assert mock_vision.call_count == 1
+
+
+class TestVerifyImageRoute:
+    """Test suite for POST /extract/verify-image."""
+
+    @patch('app.services.verification_service.ask_openai_vision')
+    def test_repeat_check_served_from_cache(self, mock_vision, authenticated_client):
+        """The second check of the same image and product should not reach OpenAI."""
+        mock_vision.return_value = True
+
+        first = authenticated_client.post("/extract/verify-image", json=PAYLOAD)
+        second = authenticated_client.post("/extract/verify-image", json={**PAYLOAD, "product_name": "nike air  zoom"})
+
+        assert first.status_code == status.HTTP_200_OK
+        assert first.json() == {"verdict": "match", "matches": True, "source": "llm"}
+        assert second.json() == {"verdict": "match", "matches": True, "source": "cache"}
+        mock_vision.assert_called_once()
+
+    @patch('app.services.verification_service.ask_openai_vision')
+    def test_mismatch(self, mock_vision, authenticated_client):
+        mock_vision.return_value = False
+
+        response = authenticated_client.post("/extract/verify-image", json=PAYLOAD)
+
+        assert response.json()["verdict"] == "mismatch"
+        assert response.json()["matches"] is False
+
+    @patch('app.services.verification_service.ask_openai_vision')
+    def test_unknown_is_retried_next_time(self, mock_vision, authenticated_client):
+        """Failed checks aren't cached, so a later check asks again."""
+        mock_vision.side_effect = [ValueError("boom"), True]
+
+        first = authenticated_client.post("/extract/verify-image", json=PAYLOAD)
+        second = authenticated_client.post("/extract/verify-image", json=PAYLOAD)
+
+        assert first.json() == {"verdict": "unknown", "matches": None, "source": "llm"}
+        assert second.json()["verdict"] == "match"
+        assert mock_vision.call_count == 2
+
+    def test_invalid_payload(self, authenticated_client):
+        response = authenticated_client.post("/extract/verify-image", json={**PAYLOAD, "image_url": "not a url"})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+class TestBatchVerification:
+    """Test suite for multi-image verification."""
+
+    async def test_batched_parser_maps_numbers_to_images(self):
+        """The model's 1-based image numbers should map back to per-image bools."""
+        create = AsyncMock(return_value=SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content='{"matching": [2, 3, 9]}'))]
+        ))
+        urls = [f"https://cdn.shop.com/{i}.jpg" for i in range(3)]
+        with patch('app.services.ai.vision_verifier.settings.IMAGE_PIPELINE_ENABLED', False), \
+             patch('app.services.ai.vision_verifier.client') as mock_client:
+            mock_client.chat.completions.create = create
+            result = await ask_openai_vision_batch(urls, "Lamp")
+
+        assert result == [False, True, True]
+        content = create.call_args.kwargs["messages"][0]["content"]
+        assert [part["image_url"]["url"] for part in content if part["type"] == "image_url"] == urls
+        assert create.call_args.kwargs["response_format"]["type"] == "json_schema"
+
+    async def test_uncached_images_share_calls_in_chunks(self):
+        """Uncached candidates should go out VERIFICATION_BATCH_SIZE at a time."""
+        calls = []
+
+        async def batch(image_urls, product_name):
+            calls.append(image_urls)
+            return [url.endswith("1.jpg") for url in image_urls]
+
+        urls = [f"https://cdn.shop.com/{i}.jpg" for i in range(5)]
+        service = VerificationService(extraction_cache)
+        await extraction_cache.set(VERIFY, verification_cache_key(urls[0], "Lamp", "gpt-4o", "1"), "mismatch", "gpt-4o", "1")
+        with patch('app.services.verification_service.settings.VERIFICATION_BATCH_SIZE', 2), \
+             patch('app.services.verification_service.ask_openai_vision_batch', side_effect=batch), \
+             patch('app.services.verification_service.ask_openai_vision', return_value=False) as mock_single:
+            results = await service.verify_images(urls, "Lamp")
+
+        assert results == [
+            ("mismatch", "cache"),
+            ("match", "llm"),
+            ("mismatch", "llm"),
+            ("mismatch", "llm"),
+            ("mismatch", "llm"),
+        ]
+        assert calls == [urls[1:3], urls[3:5]]
+        mock_single.assert_not_called()
+        assert verification_counters.get("batch_calls") == 2
+
+    async def test_failed_chunk_answers_unknown(self):
+        service = VerificationService(extraction_cache)
+        urls = ["https://cdn.shop.com/1.jpg", "https://cdn.shop.com/2.jpg"]
+        with patch('app.services.verification_service.ask_openai_vision_batch', side_effect=ValueError("boom")):
+            results = await service.verify_images(urls, "Lamp")
+
+        assert results == [(VERDICT_UNKNOWN, "llm")] * 2
+
+    @patch('app.services.verification_service.ask_openai_vision_batch')
+    def test_verify_images_route(self, mock_batch, authenticated_client):
+        """Results should have the single-verification shape plus the image URL."""
+        mock_batch.return_value = [True, False]
+        urls = ["https://cdn.shop.com/1.jpg", "https://cdn.shop.com/2.jpg"]
+
+        response = authenticated_client.post("/extract/verify-images", json={
+            "product_name": "Nike Air Zoom", "price": "$129.99", "image_urls": urls,
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["results"] == [
+            {"image_url": urls[0], "verdict": "match", "matches": True, "source": "llm"},
+            {"image_url": urls[1], "verdict": "mismatch", "matches": False, "source": "llm"},
+        ]
+        single = authenticated_client.post("/extract/verify-image", json={**PAYLOAD, "image_url": urls[0]})
+        assert single.json()["source"] == "cache"
+
+    def test_too_many_images(self, authenticated_client):
+        response = authenticated_client.post("/extract/verify-images", json={
+            "product_name": "Lamp", "price": "$1",
+            "image_urls": [f"https://cdn.shop.com/{i}.jpg" for i in range(13)],
+        })
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
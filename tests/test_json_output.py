@@ -0,0 +1,86 @@
+"""
+Tests for schema-constrained LLM output parsing and local JSON repair.
+"""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from app.services.ai.json_output import (
+    parse_json_output,
+    parse_path_counters,
+    ExtractedProduct,
+    PATH_SCHEMA,
+    PATH_REPAIRED,
+)
+from app.services.ai.openai_parser import parse_inner_text_with_openai
+from app.services.ai.groq_parser import parse_inner_text_with_groq
+
+
+def completion(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class TestJsonRepair:
+    """Test suite for parse_json_output."""
+
+    def test_valid_json_parses_directly(self):
+        """Valid JSON should be reported under the direct path."""
+        assert parse_json_output('{"price": "$1"}', PATH_SCHEMA) == ({"price": "$1"}, PATH_SCHEMA)
+
+    @pytest.mark.parametrize("content, expected", [
+        ('```json\n{"product_name": "A", "price": "$1"}\n```', {"product_name": "A", "price": "$1"}),
+        ('Here it is: {"product_name": "A", "price": "$1"} Hope that helps!', {"product_name": "A", "price": "$1"}),
+        ("{'product_name': 'Men's Running Shoe', 'price': None}", {"product_name": "Men's Running Shoe", "price": None}),
+        ('{"product_name": "Shoe", "price": "$9",}', {"product_name": "Shoe", "price": "$9"}),
+        ('{"product_name": "Trail Sho', {"product_name": "Trail Sho"}),
+        ('[{"price": "$1"}, {"price": "$2"},]', [{"price": "$1"}, {"price": "$2"}]),
+    ])
+    def test_repairs_common_defects(self, content, expected):
+        """Code fences, prose, single quotes, trailing commas and truncation should be repaired."""
+        parsed, path = parse_json_output(content)
+
+        assert parsed == expected
+        assert path == PATH_REPAIRED
+
+    def test_unrepairable_output_raises(self):
+        """Output without any JSON should raise ValueError and count as failed."""
+        with pytest.raises(ValueError):
+            parse_json_output("I could not find a product on this page.")
+        assert parse_path_counters.get("failed") == 1
+
+    def test_typed_model_coerces_numbers(self):
+        """Numeric prices should be coerced to strings; other keys dropped."""
+        product = ExtractedProduct.model_validate({"product_name": "A", "price": 19.99, "currency": "USD"})
+        assert product.model_dump() == {"product_name": "A", "price": "19.99"}
+
+
+class TestParsers:
+    """Test suite for JSON-constrained parser calls."""
+
+    async def test_openai_requests_json_schema_and_repairs(self):
+        """OpenAI should be asked for schema output; fenced output is repaired, not retried."""
+        create = AsyncMock(return_value=completion('```json\n{"product_name": "Lamp", "price": 25}\n```'))
+        with patch('app.services.ai.openai_parser.client.chat.completions.create', new=create):
+            result = await parse_inner_text_with_openai("Lamp $25")
+
+        assert result == {"product_name": "Lamp", "price": "25"}
+        assert create.call_count == 1
+        assert create.call_args.kwargs["response_format"]["type"] == "json_schema"
+        assert parse_path_counters.get(PATH_REPAIRED) == 1
+
+    async def test_groq_requests_json_mode(self):
+        """Groq should be asked for JSON-mode output."""
+        create = AsyncMock(return_value=completion('{"product_name": "Lamp", "price": "$25"}'))
+        with patch('app.services.ai.groq_parser.client.chat.completions.create', new=create):
+            result = await parse_inner_text_with_groq("Lamp $25")
+
+        assert result == {"product_name": "Lamp", "price": "$25"}
+        assert create.call_args.kwargs["response_format"] == {"type": "json_object"}
+        assert parse_path_counters.get("json_mode") == 1
+
+    async def test_non_object_output_raises(self):
+        """A JSON value that isn't a product object should raise ValueError."""
+        create = AsyncMock(return_value=completion('"just a string"'))
+        with patch('app.services.ai.openai_parser.client.chat.completions.create', new=create):
+            with pytest.raises(ValueError):
+                await parse_inner_text_with_openai("Lamp $25")
@@ -0,0 +1,145 @@
+"""
+Tests for LLM micro-batching of extraction prompts.
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from app.services.ai.micro_batcher import MicroBatcher
+from app.services.ai.openai_parser import parse_inner_texts_with_openai
+from app.services.extraction_service import ExtractionService, text_batchers
+from app.services.ai.extraction_cache import extraction_cache
+from app.repositories.product_cache_repository import ProductCacheRepository
+
+
+def completion(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class TestMicroBatcher:
+    """Test suite for MicroBatcher."""
+
+    async def test_concurrent_inputs_share_one_batch(self):
+        """Inputs arriving within the wait window should go out as one batch."""
+        batches = []
+
+        async def batch_call(items):
+            batches.append(items)
+            return [item.upper() for item in items]
+
+        async def single_call(item):
+            raise AssertionError("single call not expected")
+
+        batcher = MicroBatcher(batch_call, single_call, max_batch_size=10, max_wait_ms=5)
+        results = await asyncio.gather(*(batcher.submit(x) for x in ["a", "b", "c"]))
+
+        assert results == ["A", "B", "C"]
+        assert batches == [["a", "b", "c"]]
+        assert batcher.stats()["avg_batch_size"] == 3.0
+
+    async def test_full_batch_flushes_without_waiting(self):
+        """Reaching max_batch_size should send immediately and start a new batch."""
+        batches = []
+
+        async def batch_call(items):
+            batches.append(items)
+            return items
+
+        batcher = MicroBatcher(batch_call, None, max_batch_size=2, max_wait_ms=10_000)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(x) for x in [1, 2, 3, 4])),
+            timeout=1,
+        )
+
+        assert results == [1, 2, 3, 4]
+        assert batches == [[1, 2], [3, 4]]
+
+    async def test_lone_input_uses_single_call(self):
+        """A batch of one should use the single call (no batch prompt overhead)."""
+        async def single_call(item):
+            return item * 2
+
+        batcher = MicroBatcher(None, single_call, max_batch_size=4, max_wait_ms=1)
+
+        assert await batcher.submit(21) == 42
+        assert batcher.stats()["single_calls"] == 1
+        assert batcher.stats()["batches"] == 0
+
+    async def test_unparseable_batch_falls_back_to_single_calls(self):
+        """A failed or mismatched batch should fall back to one call per input."""
+        async def batch_call(items):
+            return items[:1]  # Wrong length
+
+        async def single_call(item):
+            if item == "bad":
+                raise ValueError("boom")
+            return f"single:{item}"
+
+        batcher = MicroBatcher(batch_call, single_call, max_batch_size=10, max_wait_ms=1)
+        results = await asyncio.gather(batcher.submit("x"), batcher.submit("bad"), return_exceptions=True)
+
+        assert results[0] == "single:x"
+        assert isinstance(results[1], ValueError)
+        assert batcher.stats()["fallbacks"] == 1
+
+    async def test_close_cancels_running_batches_and_their_callers(self):
+        """Batches are tracked until done, and close() cancels them and the queued inputs."""
+        started = asyncio.Event()
+
+        async def batch_call(items):
+            started.set()
+            await asyncio.sleep(10)
+
+        batcher = MicroBatcher(batch_call, AsyncMock(), max_batch_size=2, max_wait_ms=1000)
+        running = [asyncio.ensure_future(batcher.submit(x)) for x in ["a", "b"]]
+        queued = asyncio.ensure_future(batcher.submit("c"))
+        await started.wait()
+        assert batcher.stats()["running"] == 1
+
+        await batcher.close()
+
+        for caller in running + [queued]:
+            with pytest.raises(asyncio.CancelledError):
+                await caller
+        assert batcher.stats()["running"] == 0
+        assert batcher.stats()["pending"] == 0
+
+
+class TestBatchedParser:
+    """Test suite for parse_inner_texts_with_openai."""
+
+    async def test_parses_json_array(self):
+        """A JSON array (even wrapped in prose) should be returned in order."""
+        content = 'Here you go:\n```json\n[{"product_name": "A", "price": "$1"}, {"product_name": "B", "price": "$2"}]\n```'
+        with patch('app.services.ai.openai_parser.client.chat.completions.create', new=AsyncMock(return_value=completion(content))):
+            results = await parse_inner_texts_with_openai(["page a", "page b"])
+
+        assert [r["product_name"] for r in results] == ["A", "B"]
+
+    async def test_mismatched_length_raises(self):
+        """A result count that doesn't match the inputs should raise ValueError."""
+        content = '[{"product_name": "A", "price": "$1"}]'
+        with patch('app.services.ai.openai_parser.client.chat.completions.create', new=AsyncMock(return_value=completion(content))):
+            with pytest.raises(ValueError):
+                await parse_inner_texts_with_openai(["page a", "page b"])
+
+
+class TestMicroBatchedExtraction:
+    """Test suite for micro-batching in ExtractionService."""
+
+    async def test_concurrent_extractions_share_one_completion(self):
+        """Concurrent distinct extractions should be answered by one batched call."""
+        async def batched(texts):
+            return [{"product_name": text, "price": "null"} for text in texts]
+
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        with patch('app.services.extraction_service.settings.EXTRACTION_MICRO_BATCH_ENABLED', True), \
+             patch('app.services.extraction_service.parse_inner_texts_with_openai', side_effect=batched) as mock_batch, \
+             patch('app.services.extraction_service.parse_inner_text_with_openai') as mock_single:
+            results = await asyncio.gather(*(service.extract_from_text(f"Page {i}") for i in range(3)))
+
+        assert [r[0]["product_name"] for r in results] == ["Page 0", "Page 1", "Page 2"]
+        mock_batch.assert_called_once()
+        mock_single.assert_not_called()
+        assert text_batchers["openai"].stats()["batched_items"] == 3
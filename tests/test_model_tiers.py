@@ -0,0 +1,107 @@
+"""
+Tests for small-model-first extraction with escalation to the large model.
+"""
+import pytest
+from unittest.mock import patch
+
+from app.services.ai.model_tiers import ModelTiering, SMALL, LARGE
+from app.services.ai.extraction_cache import extraction_cache, TEXT
+from app.services.extraction_service import ExtractionService, text_tiers
+from app.repositories.product_cache_repository import ProductCacheRepository
+
+
+def returning(value):
+    async def call():
+        return value
+    return call
+
+
+def failing():
+    async def call():
+        raise ValueError("OpenAI returned invalid JSON: oops")
+    return call
+
+
+def has_price(result):
+    return result.get("price") is not None
+
+
+class TestModelTiering:
+    """Test suite for ModelTiering."""
+
+    async def test_small_model_answer_is_used_when_valid(self):
+        """A valid small-model answer should not escalate."""
+        tiers = ModelTiering()
+
+        result, tier = await tiers.run(returning({"price": "$5"}), returning({"price": "$6"}), has_price)
+
+        assert (result, tier) == ({"price": "$5"}, SMALL)
+        assert tiers.stats()[SMALL]["hit_rate"] == 1.0
+        assert tiers.stats()[LARGE]["calls"] == 0
+
+    async def test_rejected_answer_escalates(self):
+        """A small-model answer failing validation should escalate."""
+        tiers = ModelTiering()
+
+        result, tier = await tiers.run(returning({"price": None}), returning({"price": "$6"}), has_price)
+
+        assert (result, tier) == ({"price": "$6"}, LARGE)
+        assert tiers.stats()["escalations"]["rejected"] == 1
+        assert tiers.stats()[SMALL]["hit_rate"] == 0.0
+
+    async def test_invalid_json_escalates(self):
+        """A small-model parse error should escalate."""
+        tiers = ModelTiering()
+
+        result, tier = await tiers.run(failing(), returning({"price": "$6"}), has_price)
+
+        assert tier == LARGE
+        assert tiers.stats()["escalations"]["invalid"] == 1
+
+    async def test_large_failure_falls_back_to_partial_small_answer(self):
+        """If the large model fails, a partial small-model answer is returned."""
+        tiers = ModelTiering()
+
+        result, tier = await tiers.run(returning({"price": None}), failing(), has_price)
+
+        assert (result, tier) == ({"price": None}, SMALL)
+        assert tiers.stats()["large_failed_fallbacks"] == 1
+
+    async def test_both_failing_raises(self):
+        """Errors from both tiers should propagate."""
+        tiers = ModelTiering()
+
+        with pytest.raises(ValueError):
+            await tiers.run(failing(), failing(), has_price)
+
+
+class TestTieredExtraction:
+    """Test suite for model tiering in ExtractionService."""
+
+    async def test_escalates_on_null_price_and_caches_large_model(self):
+        """Null fields from the small model should escalate to the large model."""
+        async def parse(text, model):
+            if model == "gpt-4o-mini":
+                return {"product_name": "Nike Shoe", "price": "null"}
+            return {"product_name": "Nike Shoe", "price": "$99"}
+
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        with patch('app.services.extraction_service.settings.EXTRACTION_MODEL_TIERING_ENABLED', True), \
+             patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+             patch('app.services.extraction_service.parse_inner_text_with_openai', side_effect=parse) as mock_parse:
+            result, source = await service.extract_from_text("Nike Shoe $99")
+
+        assert result == {"product_name": "Nike Shoe", "price": "$99"}
+        assert [c.kwargs["model"] for c in mock_parse.call_args_list] == ["gpt-4o-mini", "gpt-4o"]
+        assert text_tiers.stats()[LARGE]["hits"] == 1
+        assert extraction_cache.stats()["kinds"][TEXT]["stores"] == 1
+
+    async def test_disabled_uses_large_model_only(self):
+        """With tiering off, only the large model is called."""
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        with patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+             patch('app.services.extraction_service.parse_inner_text_with_openai') as mock_parse:
+            mock_parse.return_value = {"product_name": "Nike Shoe", "price": "$99"}
+            await service.extract_from_text("Nike Shoe $99")
+
+        mock_parse.assert_called_once_with("Nike Shoe $99")
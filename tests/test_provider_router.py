@@ -0,0 +1,180 @@
+"""
+Tests for latency-aware AI provider routing with failover and hedging.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from app.services.ai.provider_router import ProviderRouter, configured_providers
+from app.services.extraction_service import ExtractionService, text_router
+from app.services.ai.extraction_cache import extraction_cache
+from app.repositories.product_cache_repository import ProductCacheRepository
+
+
+def make_router(**kwargs) -> ProviderRouter:
+    options = dict(window_size=50, max_error_rate=0.5, cooldown_seconds=30.0)
+    options.update(kwargs)
+    return ProviderRouter(**options)
+
+
+def respond(value, delay=0.0):
+    async def call():
+        await asyncio.sleep(delay)
+        return value
+    return call
+
+
+def fail(delay=0.0):
+    async def call():
+        await asyncio.sleep(delay)
+        raise ValueError("provider down")
+    return call
+
+
+def stream(items, error=None, opened=None, name=None):
+    def open_stream():
+        async def generate():
+            for item in items:
+                yield item
+            if error is not None:
+                raise error
+        if opened is not None:
+            opened.append(name)
+        return generate()
+    return open_stream
+
+
+class TestProviderRouter:
+    """Test suite for ProviderRouter."""
+
+    async def test_prefers_faster_provider(self):
+        """Once both are measured, the faster provider should be tried first."""
+        router = make_router()
+        await router.run({"openai": respond("a", 0.03)})
+        await router.run({"groq": respond("b", 0.001)})
+
+        assert router.order(["openai", "groq"]) == ["groq", "openai"]
+        assert await router.run({"openai": respond("a"), "groq": respond("b")}) == ("b", "groq")
+
+    async def test_fails_over_on_error(self):
+        """An erroring provider should fall through to the next one."""
+        router = make_router()
+
+        result = await router.run({"openai": fail(), "groq": respond("ok")})
+
+        assert result == ("ok", "groq")
+        assert router.failovers == 1
+        assert router.stats()["providers"]["openai"]["failures"] == 1
+
+    async def test_raises_when_all_fail(self):
+        """The last provider error should be raised when every provider fails."""
+        router = make_router()
+
+        with pytest.raises(ValueError, match="provider down"):
+            await router.run({"openai": fail(), "groq": fail()})
+
+    async def test_unhealthy_provider_is_demoted(self):
+        """A provider with a high recent error rate should be tried last."""
+        router = make_router()
+        for _ in range(5):
+            await router.run({"openai": fail(), "groq": respond("ok", 0.01)})
+
+        assert router.order(["openai", "groq"]) == ["groq", "openai"]
+        assert router.stats()["providers"]["openai"]["healthy"] is False
+
+    async def test_unhealthy_provider_recovers_after_cooldown(self):
+        """Demotion should lapse after the cooldown so the provider gets probed again."""
+        router = make_router(cooldown_seconds=0.0)
+        for _ in range(5):
+            await router.run({"openai": fail(), "groq": respond("ok", 0.01)})
+
+        assert router.order(["openai", "groq"])[0] == "openai"
+
+    async def test_hedges_after_p95(self):
+        """A slow primary should be raced against the next provider after its p95."""
+        router = make_router(hedge_enabled=True, hedge_min_samples=3)
+        for _ in range(3):
+            await router.run({"openai": respond("a", 0.001)})
+        await router.run({"groq": respond("b", 0.01)})
+
+        result = await router.run({"openai": respond("slow", 0.5), "groq": respond("fast", 0.01)})
+
+        assert result == ("fast", "groq")
+        assert router.hedges == 1
+        assert router.hedge_wins == 1
+
+    async def test_no_hedge_without_enough_samples(self):
+        """Hedging needs a trusted p95; otherwise the primary just runs."""
+        router = make_router(hedge_enabled=True, hedge_min_samples=20)
+
+        result = await router.run({"openai": respond("a", 0.02), "groq": respond("b")})
+
+        assert result == ("a", "openai")
+        assert router.hedges == 0
+
+    async def test_stream_fails_over_before_the_first_item(self):
+        """Only the streams actually tried are opened, and errors before any output fail over."""
+        router = make_router()
+        opened = []
+
+        items = [item async for item in router.stream({
+            "openai": stream([], ValueError("provider down"), opened, "openai"),
+            "groq": stream(["a", "b"], opened=opened, name="groq"),
+        })]
+
+        assert items == [("a", "groq"), ("b", "groq")]
+        assert opened == ["openai", "groq"]
+        assert router.failovers == 1
+        providers = router.stats()["providers"]
+        assert providers["openai"]["failures"] == 1
+        assert (providers["groq"]["calls"], providers["groq"]["failures"]) == (1, 0)
+
+    async def test_stream_error_after_output_is_raised(self):
+        """A stream failing midway is recorded and raised instead of restarted elsewhere."""
+        router = make_router()
+        opened = []
+        items = []
+
+        with pytest.raises(ValueError, match="cut off"):
+            async for item in router.stream({
+                "openai": stream(["a"], ValueError("cut off"), opened, "openai"),
+                "groq": stream(["b"], opened=opened, name="groq"),
+            }):
+                items.append(item)
+
+        assert items == [("a", "openai")]
+        assert opened == ["openai"]
+        assert router.failovers == 0
+        assert router.stats()["providers"]["openai"]["failures"] == 1
+
+    def test_configured_providers_requires_keys(self):
+        """Providers without an API key are skipped, keeping the first as a fallback."""
+        with patch('app.services.ai.provider_router.settings.AI_PROVIDERS', "openai,groq"), \
+             patch('app.services.ai.provider_router.settings.OPENAI_API_KEY', ""), \
+             patch('app.services.ai.provider_router.settings.GROQ_API_KEY', "gsk-test"):
+            assert configured_providers() == ["groq"]
+
+        with patch('app.services.ai.provider_router.settings.OPENAI_API_KEY', ""), \
+             patch('app.services.ai.provider_router.settings.GROQ_API_KEY', ""):
+            assert configured_providers() == ["openai"]
+
+
+class TestRoutedExtraction:
+    """Test suite for provider routing in ExtractionService."""
+
+    async def test_openai_failure_fails_over_to_groq(self):
+        """Text extraction should be answered by Groq when OpenAI errors."""
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+
+        with patch('app.services.ai.provider_router.settings.OPENAI_API_KEY', "sk-test"), \
+             patch('app.services.ai.provider_router.settings.GROQ_API_KEY', "gsk-test"), \
+             patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+             patch('app.services.extraction_service.parse_inner_text_with_openai') as mock_openai, \
+             patch('app.services.extraction_service.parse_inner_text_with_groq') as mock_groq:
+            mock_openai.side_effect = ValueError("Error parsing text with OpenAI: timeout")
+            mock_groq.return_value = {"product_name": "Nike Shoe", "price": "$99"}
+            result, source = await service.extract_from_text("Nike Shoe $99")
+
+        assert result == {"product_name": "Nike Shoe", "price": "$99"}
+        assert source == "llm"
+        assert text_router.failovers == 1
@@ -0,0 +1,123 @@
+"""
+Tests for the rule-based fast-path extractor.
+"""
+import pytest
+from unittest.mock import patch
+from fastapi import status
+
+from app.services.ai.rule_extractor import extract_with_rules, parse_amount
+
+
+class TestParseAmount:
+    """Test suite for locale-aware amount parsing."""
+
+    @pytest.mark.parametrize("amount,expected", [
+        ("1,299.99", 1299.99),
+        ("1.299,99", 1299.99),
+        ("12,99", 12.99),
+        ("1 299", 1299.0),
+        ("1,299", 1299.0),
+        ("99", 99.0),
+    ])
+    def test_decimal_separators(self, amount, expected):
+        """Both decimal-point and decimal-comma locales should parse."""
+        assert parse_amount(amount) == expected
+
+
+class TestRuleExtractor:
+    """Test suite for extract_with_rules."""
+
+    def test_title_above_single_price_is_confident(self):
+        """A heading line directly above a single price should be high confidence."""
+        result = extract_with_rules("Home\nNike Air Zoom Pegasus 40 Running Shoe\n$129.99\nAdd to Cart")
+
+        assert result.product_name == "Nike Air Zoom Pegasus 40 Running Shoe"
+        assert result.price == "$129.99"
+        assert result.confidence >= 0.8
+
+    def test_reference_prices_are_ignored(self):
+        """'Was' and 'Save' prices should not compete with the selling price."""
+        result = extract_with_rules(
+            "Nike Air Zoom Pegasus 40 Running Shoe\nPrice: $129.99\nWas $149.99 - Save $20"
+        )
+
+        assert result.price == "$129.99"
+        assert result.price_confidence >= 0.85
+
+    def test_european_format(self):
+        """Suffix currency with decimal comma should be recognised."""
+        result = extract_with_rules("Sony WH-1000XM5 Kopfhörer Schwarz\n349,99 €\nInkl. MwSt.")
+
+        assert result.product_name == "Sony WH-1000XM5 Kopfhörer Schwarz"
+        assert result.price == "349,99 €"
+
+    def test_competing_prices_are_low_confidence(self):
+        """Listing-like text with several prices should defer to the LLM."""
+        result = extract_with_rules("Product 1 - $99.99\nProduct 2 - $149.99")
+
+        assert result.confidence < 0.8
+
+    @pytest.mark.parametrize("text", [
+        "Acme Coffee Maker Deluxe\nFree shipping on orders over $50",
+        "Acme Coffee Maker Deluxe\nSave $50 today",
+        "Acme Coffee Maker Deluxe\nWas $149.99",
+    ])
+    def test_reference_price_alone_is_not_confident(self, text):
+        """A shipping threshold or saving must not pass for the selling price."""
+        result = extract_with_rules(text)
+
+        assert result.price_confidence < 0.8
+        assert result.confidence < 0.8
+
+    @pytest.mark.parametrize("banner", [
+        "Only 3 left",
+        "Only 3 Left In Stock",
+        "Selling Fast Order Soon",
+        "Free Shipping On All Orders",
+        "Get It By Friday",
+        "Save 20% Today Only",
+        "Limited Time Deal",
+    ])
+    def test_stock_shipping_and_promo_lines_are_not_titles(self, banner):
+        """Banners between the title and the price should be skipped."""
+        result = extract_with_rules(f"Acme Coffee Maker Deluxe\n{banner}\nEUR 1.299")
+
+        assert result.product_name == "Acme Coffee Maker Deluxe"
+        assert result.price == "EUR 1.299"
+
+    def test_no_price_returns_empty(self):
+        """Text without prices should produce no answer."""
+        result = extract_with_rules("About Us\nOur Story")
+
+        assert result.price is None
+        assert result.confidence == 0.0
+
+
+class TestFastPathRoute:
+    """Test suite for the fast path in /extract/extract."""
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_confident_rules_skip_llm(self, mock_openai, authenticated_client):
+        """Confident rule answers should skip OpenAI and keep the response shape."""
+        response = authenticated_client.post("/extract/extract", json={
+            "inner_text": "Nike Air Zoom Pegasus 40 Running Shoe\n$129.99\nAdd to Cart",
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "cart_items": {"product_name": "Nike Air Zoom Pegasus 40 Running Shoe", "price": "$129.99"},
+            "source": "rules",
+        }
+        mock_openai.assert_not_called()
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_unsure_rules_fall_back_to_llm(self, mock_openai, authenticated_client):
+        """Low-confidence rule answers should fall back to OpenAI."""
+        mock_openai.return_value = {"product_name": "Product 1", "price": "$99.99"}
+
+        response = authenticated_client.post("/extract/extract", json={
+            "inner_text": "Product 1 - $99.99\nProduct 2 - $149.99",
+        })
+
+        assert response.json()["source"] == "llm"
+        mock_openai.assert_called_once()
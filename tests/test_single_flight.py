@@ -0,0 +1,117 @@
+"""
+Tests for single-flight deduplication of concurrent extraction requests.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from app.utils.single_flight import SingleFlight
+from app.services.extraction_service import ExtractionService, text_flight, image_flight
+from app.services.ai.extraction_cache import extraction_cache
+from app.repositories.product_cache_repository import ProductCacheRepository
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight."""
+
+    async def test_concurrent_calls_share_one_execution(self):
+        """Concurrent callers with the same key should share one call."""
+        flight = SingleFlight()
+        executions = 0
+
+        async def call():
+            nonlocal executions
+            executions += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", call) for _ in range(5)))
+
+        assert results == ["result"] * 5
+        assert executions == 1
+        assert flight.stats()["calls"] == 1
+        assert flight.stats()["coalesced"] == 4
+        assert flight.stats()["in_flight"] == 0
+
+    async def test_different_keys_run_separately(self):
+        """Different keys should not be coalesced."""
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            return 1
+
+        await asyncio.gather(flight.do("a", call), flight.do("b", call))
+
+        assert flight.calls == 2
+        assert flight.coalesced == 0
+
+    async def test_exception_is_shared_and_not_remembered(self):
+        """All waiters should see the failure, and the next call should retry."""
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(flight.do("k", failing), flight.do("k", failing), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+
+        async def ok():
+            return "ok"
+
+        assert await flight.do("k", ok) == "ok"
+        assert flight.calls == 2
+
+    async def test_cancelled_caller_does_not_cancel_shared_call(self):
+        """Cancelling one waiter should leave the shared call running for others."""
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("k", call))
+        second = asyncio.ensure_future(flight.do("k", call))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
+
+
+class TestExtractionSingleFlight:
+    """Test suite for single-flight in ExtractionService."""
+
+    async def test_identical_text_requests_coalesce(self):
+        """Identical (normalized) innerText requests should make one OpenAI call."""
+        async def slow_parse(text):
+            await asyncio.sleep(0.02)
+            return {"product_name": "Nike Shoe", "price": "$99"}
+
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        with patch('app.services.extraction_service.parse_inner_text_with_openai', side_effect=slow_parse) as mock_parse:
+            results = await asyncio.gather(
+                service.extract_from_text("Nike Shoe $99"),
+                service.extract_from_text("Nike  Shoe   $99"),
+                service.extract_from_text("Nike Shoe $99"),
+            )
+
+        assert all(r == ({"product_name": "Nike Shoe", "price": "$99"}, "llm") for r in results)
+        assert mock_parse.call_count == 1
+        assert text_flight.stats()["coalesced"] == 2
+
+    async def test_identical_image_requests_coalesce(self):
+        """Same page URL and image set should make one OpenAI call."""
+        async def slow_select(page_url, product_name, image_urls):
+            await asyncio.sleep(0.02)
+            return "https://cdn.shop.com/1.jpg"
+
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        with patch('app.services.extraction_service.parse_images_with_openai', side_effect=slow_select) as mock_select:
+            await asyncio.gather(
+                service.select_product_image("https://shop.com/p", "p", ["https://cdn.shop.com/1.jpg", "https://cdn.shop.com/2.jpg"]),
+                service.select_product_image("https://shop.com/p", "p", ["https://cdn.shop.com/2.jpg", "https://cdn.shop.com/1.jpg"]),
+            )
+
+        assert mock_select.call_count == 1
+        assert image_flight.stats()["coalesced"] == 1
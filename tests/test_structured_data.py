@@ -0,0 +1,200 @@
+"""
+Tests for structured-data (JSON-LD / microdata / OpenGraph) extraction from HTML.
+"""
+import pytest
+from unittest.mock import patch
+from fastapi import status
+
+from app.services.ai.structured_data import parse_structured_data, product_from_json_ld
+from app.services.extraction_service import ExtractionService
+from app.services.ai.extraction_cache import extraction_cache
+from app.repositories.product_cache_repository import ProductCacheRepository
+from app.services.ai.usage import usage_user
+
+
+JSON_LD_PAGE = """
+<html><head>
+<meta property="og:title" content="Nike Air Zoom | Nike.com">
+<script type="application/ld+json">
+{"@context": "https://schema.org", "@graph": [
+  {"@type": "BreadcrumbList", "name": "Running"},
+  {"@type": "Product", "name": "Nike Air Zoom Pegasus 40",
+   "image": ["https://cdn.nike.com/pegasus.jpg"],
+   "offers": {"@type": "Offer", "price": "129.99", "priceCurrency": "USD"}}
+]}
+</script>
+</head><body><h1>Nike Air Zoom Pegasus 40</h1></body></html>
+"""
+
+MICRODATA_PAGE = """
+<div itemscope itemtype="https://schema.org/Product">
+  <h1 itemprop="name">Sony WH-1000XM5</h1>
+  <div itemprop="brand" itemscope itemtype="https://schema.org/Brand"><span itemprop="name">Sony</span></div>
+  <img itemprop="image" src="https://cdn.shop.com/sony.jpg">
+  <div itemprop="offers" itemscope itemtype="https://schema.org/Offer">
+    <span itemprop="price" content="349.99">349,99 €</span>
+    <meta itemprop="priceCurrency" content="EUR">
+  </div>
+</div>
+"""
+
+OPENGRAPH_PAGE = """
+<head>
+<meta property="og:title" content="Oak Desk Lamp">
+<meta property="og:image" content="https://cdn.shop.com/lamp.jpg">
+<meta property="product:price:amount" content="25.00">
+<meta property="product:price:currency" content="CHF">
+</head>
+"""
+
+PLAIN_PAGE = """
+<html><head><title>Shop</title><style>h1 {color: red}</style></head>
+<body><nav>Home</nav><h1>Canvas Tote Bag Large</h1><p>$19.99</p><script>var x = 1;</script></body></html>
+"""
+
+
+class TestStructuredDataParser:
+    """Test suite for parse_structured_data."""
+
+    def test_json_ld_product_in_graph(self):
+        """JSON-LD Product nodes inside @graph should be found."""
+        product = parse_structured_data(JSON_LD_PAGE).product()
+
+        assert product.source == "json-ld"
+        assert product.product_name == "Nike Air Zoom Pegasus 40"
+        assert product.display_price == "$129.99"
+        assert product.image == "https://cdn.nike.com/pegasus.jpg"
+
+    def test_microdata_ignores_nested_brand_name(self):
+        """Microdata name should come from the Product scope, price from its Offer."""
+        product = parse_structured_data(MICRODATA_PAGE).product()
+
+        assert product.source == "microdata"
+        assert product.product_name == "Sony WH-1000XM5"
+        assert product.price == "349.99"
+        assert product.display_price == "€349.99"
+        assert product.image == "https://cdn.shop.com/sony.jpg"
+
+    def test_opengraph_product_meta(self):
+        """OpenGraph product meta tags should be used when nothing richer exists."""
+        product = parse_structured_data(OPENGRAPH_PAGE).product()
+
+        assert product.source == "opengraph"
+        assert product.product_name == "Oak Desk Lamp"
+        assert product.display_price == "25.00 CHF"
+
+    def test_aggregate_offer_and_image_object(self):
+        """lowPrice and ImageObject values should be understood."""
+        product = product_from_json_ld({
+            "@type": ["Product", "Thing"],
+            "name": "Desk",
+            "image": {"@type": "ImageObject", "url": "https://cdn.shop.com/desk.jpg"},
+            "offers": {"@type": "AggregateOffer", "lowPrice": 199, "priceCurrency": "GBP"},
+        })
+
+        assert product.display_price == "£199"
+        assert product.image == "https://cdn.shop.com/desk.jpg"
+
+    def test_invalid_json_ld_is_ignored(self):
+        """Malformed JSON-LD should not break parsing of the rest of the page."""
+        html = '<script type="application/ld+json">{not json</script>' + OPENGRAPH_PAGE
+        assert parse_structured_data(html).product().product_name == "Oak Desk Lamp"
+
+    def test_visible_text_skips_scripts_and_styles(self):
+        """Plain pages yield no product but keep readable text for the fallback."""
+        parsed = parse_structured_data(PLAIN_PAGE)
+
+        assert parsed.product() is None
+        assert parsed.visible_text() == "Home\nCanvas Tote Bag Large\n$19.99"
+
+
+class TestExtractFromHtml:
+    """Test suite for ExtractionService.extract_from_html."""
+
+    async def test_structured_data_skips_llm(self):
+        """Pages with structured data should be answered without an LLM call."""
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+
+        with patch('app.services.extraction_service.parse_inner_text_with_openai') as mock_parse:
+            result, image, source = await service.extract_from_html(JSON_LD_PAGE, "https://nike.com/p/pegasus")
+
+        mock_parse.assert_not_called()
+        assert result == {"product_name": "Nike Air Zoom Pegasus 40", "price": "$129.99"}
+        assert image == "https://cdn.nike.com/pegasus.jpg"
+        assert source == "structured_data"
+
+    async def test_structured_data_fills_product_cache_once_users_agree(self, ai_collections):
+        """Client-sent structured data is only shared once a second user's page agrees."""
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+
+        for user_id in ("alice", "bob"):
+            token = usage_user.set(user_id)
+            try:
+                await service.extract_from_html(JSON_LD_PAGE, "https://www.nike.com/p/pegasus?utm_source=x")
+            finally:
+                usage_user.reset(token)
+            doc = await ai_collections["product_cache"].find_one({"canonical_url": "https://nike.com/p/pegasus"})
+            if user_id == "alice":
+                assert "product_name" not in doc and "image" not in doc
+
+        assert doc["product_name"] == "Nike Air Zoom Pegasus 40"
+        assert doc["image"] == "https://cdn.nike.com/pegasus.jpg"
+        assert "detail_votes" not in doc
+
+    async def test_forged_structured_data_is_not_served_to_other_users(self, ai_collections):
+        """JSON-LD one user made up for a page shouldn't answer another user's request."""
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+        forged_page = JSON_LD_PAGE.replace("129.99", "1.00")
+        page_url = "https://nike.com/p/pegasus"
+
+        token = usage_user.set("mallory")
+        try:
+            await service.extract_from_html(forged_page, page_url)
+        finally:
+            usage_user.reset(token)
+
+        token = usage_user.set("alice")
+        try:
+            with patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+                 patch('app.services.extraction_service.parse_inner_text_with_openai') as mock_parse:
+                mock_parse.return_value = {"product_name": "Nike Air Zoom Pegasus 40", "price": "$129.99"}
+                result, source = await service.extract_from_text("Nike Air Zoom Pegasus 40 $129.99", page_url)
+        finally:
+            usage_user.reset(token)
+
+        assert source == "llm"
+        assert result["price"] == "$129.99"
+
+    async def test_falls_back_to_text_extraction(self):
+        """Without structured data the visible text goes through extract_from_text."""
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+
+        with patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+             patch('app.services.extraction_service.parse_inner_text_with_openai') as mock_parse:
+            mock_parse.return_value = {"product_name": "Canvas Tote Bag Large", "price": "$19.99"}
+            result, image, source = await service.extract_from_html(PLAIN_PAGE)
+
+        assert mock_parse.call_args[0][0] == "Home\nCanvas Tote Bag Large\n$19.99"
+        assert result["product_name"] == "Canvas Tote Bag Large"
+        assert image is None
+        assert source == "llm"
+
+
+class TestExtractHtmlRoute:
+    """Test suite for POST /extract/extract-html."""
+
+    def test_extract_html(self, authenticated_client):
+        """The route should return cart_items, image and source."""
+        response = authenticated_client.post("/extract/extract-html", json={"html": MICRODATA_PAGE})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "cart_items": {"product_name": "Sony WH-1000XM5", "price": "€349.99"},
+            "image": "https://cdn.shop.com/sony.jpg",
+            "source": "structured_data",
+        }
+
+    def test_extract_html_empty(self, authenticated_client):
+        """Empty HTML should be rejected by validation."""
+        response = authenticated_client.post("/extract/extract-html", json={"html": "  "})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
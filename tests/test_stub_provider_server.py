@@ -0,0 +1,132 @@
+"""
+Tests for the local chat-completions stub used for load testing.
+
+The real OpenAI and Groq SDK clients talk to the stub through httpx's ASGI
+transport, so requests go through the same client stack as production.
+"""
+import asyncio
+import re
+import httpx
+import openai
+import pytest
+from groq import AsyncGroq
+from openai import AsyncOpenAI
+from unittest.mock import patch
+
+from app.services.ai import groq_parser, openai_parser
+from app.services.ai.limits import run_ai_call
+from app.services.ai.usage import usage_tracker
+from benchmarks.stub_provider_server import (
+    LatencyModel,
+    Recording,
+    StubConfig,
+    StubProviderServer,
+    default_answer,
+)
+
+
+def openai_client(server: StubProviderServer) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key="stub",
+        base_url="http://stub/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app)),
+    )
+
+
+def stub(**kwargs) -> StubProviderServer:
+    return StubProviderServer(StubConfig(latency="fixed:0", seed=1, **kwargs))
+
+
+class TestLatencyModel:
+    """Test suite for latency specs."""
+
+    def test_distributions(self):
+        assert LatencyModel("fixed:250").sample() == 0.25
+        assert all(0.1 <= LatencyModel("uniform:100,300").sample() <= 0.3 for _ in range(50))
+        assert LatencyModel("normal:-500,1").sample() == 0.0
+
+    @pytest.mark.parametrize("spec", ["slow", "fixed", "uniform:100", "lognormal:a,b"])
+    def test_invalid_specs(self, spec):
+        with pytest.raises(ValueError):
+            LatencyModel(spec)
+
+
+class TestDefaultAnswers:
+    """Test suite for replies when no recording matches."""
+
+    def test_vision_and_image_selection(self):
+        assert default_answer("Does this image show a lamp?", 1) == "yes"
+        assert default_answer('Respond with JSON: {"matching": [...]}', 3) == '{"matching": [1, 2, 3]}'
+        assert default_answer('Image URLs:\n["https://a.com/1.jpg", "https://a.com/2.jpg"]', 0) == "https://a.com/1.jpg"
+
+
+class TestStubServer:
+    """Test suite for the stub server through the real SDK clients."""
+
+    async def test_parser_extracts_through_stub(self):
+        server = stub()
+        with patch.object(openai_parser, "client", openai_client(server)):
+            result = await openai_parser.parse_inner_text_with_openai("Nike Air Zoom Pegasus 40 Running Shoe\n$129.99\nAdd to Cart")
+
+        assert result == {"product_name": "Nike Air Zoom Pegasus 40 Running Shoe", "price": "$129.99"}
+        assert server.counts == {"requests": 1, "responses_200": 1}
+
+    async def test_recordings_are_replayed(self):
+        server = stub(recordings=[Recording(re.compile("Lamp"), '{"product_name": "Recorded Lamp", "price": "$1.00"}')])
+        with patch.object(openai_parser, "client", openai_client(server)):
+            result = await openai_parser.parse_inner_text_with_openai("Lamp on sale")
+
+        assert result["product_name"] == "Recorded Lamp"
+
+    async def test_streaming(self):
+        server = stub()
+        with patch.object(openai_parser, "client", openai_client(server)):
+            deltas = [delta async for delta in openai_parser.stream_inner_text_with_openai("Red Lamp\n$49.99\nAdd to Cart")]
+
+        assert len(deltas) > 1
+        assert "$49.99" in "".join(deltas)
+        # The usage chunk requested with stream_options is recorded
+        assert usage_tracker.stats()["models"]["openai/gpt-4o"]["completion_tokens"] > 0
+
+    async def test_groq_route(self):
+        server = stub()
+        client = AsyncGroq(
+            api_key="stub",
+            base_url="http://stub",
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app)),
+        )
+        with patch.object(groq_parser, "client", client):
+            result = await groq_parser.parse_inner_text_with_groq("Red Lamp\n$49.99\nAdd to Cart")
+
+        assert result["price"] == "$49.99"
+
+    async def test_rpm_limit_answers_429_with_retry_after(self):
+        server = stub(rpm=2)
+        client = openai_client(server)
+        for _ in range(2):
+            await client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+
+        with pytest.raises(openai.RateLimitError) as error:
+            await client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+
+        assert int(error.value.response.headers["retry-after"]) > 0
+        assert error.value.response.headers["x-ratelimit-remaining-requests"] == "0"
+        assert server.counts["responses_429"] == 1
+
+    async def test_error_rate(self):
+        server = stub(error_rate=1.0)
+        with pytest.raises(openai.InternalServerError):
+            await openai_client(server).chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+
+    async def test_hanging_requests_hit_call_timeouts(self):
+        server = stub(hang_rate=1.0, hang_seconds=5)
+        client = openai_client(server)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await run_ai_call(
+                lambda: client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}]),
+                timeout=0.05,
+            )
+        assert server.counts["hangs"] == 1
@@ -0,0 +1,77 @@
+"""
+Tests for the token-budgeted innerText reducer.
+"""
+import pytest
+from unittest.mock import patch
+
+from app.services.ai.text_reducer import reduce_inner_text, estimate_tokens, score_window
+from app.services.extraction_service import ExtractionService, reducer_counters
+from app.services.ai.extraction_cache import extraction_cache
+from app.repositories.product_cache_repository import ProductCacheRepository
+
+
+NAV = "\n".join(["Home", "Shop All", "Sign In", "Create Account", "Gift Cards", "Track Your Order"] * 20)
+PRODUCT = "\n".join([
+    "Nike Air Zoom Pegasus 40 Running Shoe",
+    "Price: $129.99",
+    "Was $149.99 - Save $20",
+    "Size: 9  Color: Black",
+    "Add to Cart",
+])
+REVIEWS = "\n".join([f"Great shoe, very comfortable. Verified Purchase. {i} people found this helpful." for i in range(120)])
+FOOTER = "\n".join(["Privacy Policy", "Terms of Use", "Cookie Settings", "© 2024 Shop Inc. All rights reserved"] * 20)
+PAGE = "\n".join([NAV, PRODUCT, REVIEWS, FOOTER])
+
+
+class TestTextReducer:
+    """Test suite for reduce_inner_text."""
+
+    def test_short_text_is_unchanged(self):
+        """Text within budget should pass through untouched."""
+        result = reduce_inner_text("Nike Shoe $99", token_budget=100)
+
+        assert result.text == "Nike Shoe $99"
+        assert not result.was_reduced
+
+    def test_keeps_product_window_within_budget(self):
+        """Long pages should be cut to the budget while keeping name and price."""
+        result = reduce_inner_text(PAGE, token_budget=200, window_lines=5)
+
+        assert result.tokens_before == estimate_tokens(PAGE)
+        assert result.tokens_after <= 200
+        assert result.tokens_after * 4 < result.tokens_before
+        assert "Nike Air Zoom Pegasus 40 Running Shoe" in result.text
+        assert "$129.99" in result.text
+        assert "Privacy Policy" not in result.text
+
+    def test_price_windows_outscore_boilerplate(self):
+        """Windows with prices should score higher than footer windows."""
+        assert score_window(PRODUCT.splitlines()) > score_window(FOOTER.splitlines()[:5])
+
+    def test_single_oversized_line_is_truncated_to_budget(self):
+        """A page collapsed into one huge line should still respect the budget."""
+        result = reduce_inner_text("Nike Shoe $99 " * 2000, token_budget=50)
+
+        assert result.tokens_after <= 50
+        assert "$99" in result.text
+
+
+class TestReducerInService:
+    """Test suite for the reducer in ExtractionService."""
+
+    async def test_parser_receives_reduced_text_and_tokens_are_reported(self):
+        """The LLM should get reduced text and counters should record token savings."""
+        service = ExtractionService(extraction_cache, ProductCacheRepository())
+
+        with patch('app.services.extraction_service.settings.EXTRACTION_INPUT_TOKEN_BUDGET', 200), \
+             patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False), \
+             patch('app.services.extraction_service.parse_inner_text_with_openai') as mock_parse:
+            mock_parse.return_value = {"product_name": "Nike Air Zoom Pegasus 40 Running Shoe", "price": "$129.99"}
+            await service.extract_from_text(PAGE)
+
+        sent = mock_parse.call_args[0][0]
+        assert estimate_tokens(sent) <= 200
+        counters = reducer_counters.snapshot()
+        assert counters["reduced_calls"] == 1
+        assert counters["tokens_before"] == estimate_tokens(PAGE)
+        assert counters["tokens_after"] == estimate_tokens(sent)
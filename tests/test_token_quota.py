@@ -0,0 +1,184 @@
+"""
+Tests for per-user token budgets on the AI endpoints.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi import status
+
+from app.services.ai.token_quota import (
+    TokenQuota,
+    QuotaWindow,
+    OVERSIZE_REJECT,
+    token_quota,
+    text_prompt_tokens,
+    vision_tokens,
+)
+from tests.conftest import TEST_AUTH0_ID
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_quota(clock, hour=1000, day=5000, **kwargs) -> TokenQuota:
+    windows = [QuotaWindow("hour", 3600, hour), QuotaWindow("day", 86400, day)]
+    return TokenQuota(windows, clock=clock, **kwargs)
+
+
+class TestTokenQuota:
+    """Test suite for TokenQuota."""
+
+    def test_charges_until_budget_is_spent(self):
+        clock = FakeClock()
+        quota = make_quota(clock)
+
+        first = quota.charge("alice", 600)
+        second = quota.charge("alice", 600)
+
+        assert first.allowed and first.status.remaining == 400
+        assert not second.allowed
+        assert second.status.window == "hour"
+        assert 0 < second.status.reset_seconds <= 3600
+        # Budgets are per user
+        assert quota.charge("bob", 600).allowed
+
+    def test_budget_rolls_over_as_old_usage_leaves_the_window(self):
+        clock = FakeClock()
+        quota = make_quota(clock)
+        quota.charge("alice", 900)
+
+        clock.now += 1800
+        quota.charge("alice", 100)
+        assert not quota.charge("alice", 100).allowed
+
+        clock.now += 1800 + 60
+        status = quota.status("alice")
+        assert status.window == "hour"
+        assert status.remaining == 900
+
+    def test_daily_window_applies_across_hours(self):
+        clock = FakeClock()
+        quota = make_quota(clock, hour=1000, day=1500)
+        quota.charge("alice", 1000)
+        clock.now += 3700
+
+        refused = quota.charge("alice", 600)
+
+        assert not refused.allowed
+        assert refused.status.window == "day"
+
+    def test_refund_gives_tokens_back(self):
+        quota = make_quota(FakeClock())
+        charge = quota.charge("alice", 600)
+
+        quota.refund(charge, 200)
+        assert charge.tokens == 400
+        quota.refund(charge)
+
+        assert quota.status("alice").remaining == 1000
+        assert quota.stats()["tokens_refunded"] == 600
+
+    def test_disabled_quota_charges_nothing(self):
+        quota = make_quota(FakeClock(), enabled=False)
+        assert quota.charge("alice", 10 ** 9) is None
+        assert quota.status("alice") is None
+
+    def test_oversized_pages_are_trimmed_or_rejected(self):
+        text = "\n".join(f"Footer link {i}" for i in range(2000)) + "\nRed Lamp\n$49.99"
+
+        trimmed = make_quota(FakeClock(), max_request_tokens=200).fit(text)
+        rejected = make_quota(FakeClock(), max_request_tokens=200, oversize_action=OVERSIZE_REJECT).fit(text)
+        page = "<head><title>Lamp</title></head><body>" + '<a href="/footer/link">Footer</a>' * 200
+        html = make_quota(FakeClock(), max_request_tokens=200).fit(page, html=True)
+
+        assert "$49.99" in trimmed and len(trimmed) <= 200 * 4
+        assert rejected is None
+        assert html.startswith("<head>") and html.endswith("</a>") and len(html) <= 800
+
+    def test_size_cap_applies_when_budgets_are_disabled(self):
+        quota = make_quota(FakeClock(), max_request_tokens=200, oversize_action=OVERSIZE_REJECT, enabled=False)
+
+        assert quota.fit("x" * 5000) is None
+        assert quota.charge("alice", 10 ** 9) is None
+
+
+class TestQuotaRoutes:
+    """Test suite for quotas on the extraction routes."""
+
+    @patch('app.services.extraction_service.parse_inner_text_with_openai')
+    def test_llm_answers_are_charged_and_reported(self, mock_parse, authenticated_client):
+        mock_parse.return_value = {"product_name": "Lamp", "price": "$10"}
+        inner_text = "Some page text without a clear product " * 10
+
+        with patch('app.services.extraction_service.settings.EXTRACTION_FAST_PATH_ENABLED', False):
+            response = authenticated_client.post("/extract/extract", json={"inner_text": inner_text})
+
+        assert response.status_code == status.HTTP_200_OK
+        charged = text_prompt_tokens(inner_text.strip())
+        assert response.headers["X-Token-Budget-Charged"] == str(charged)
+        assert int(response.headers["X-Token-Budget-Remaining"]) == token_quota.status(TEST_AUTH0_ID).remaining
+        assert response.headers["X-Token-Budget-Window"] == "hour"
+
+    @patch('app.services.verification_service.ask_openai_vision', new_callable=AsyncMock)
+    def test_cached_answers_are_refunded(self, mock_vision, authenticated_client):
+        mock_vision.return_value = True
+        payload = {"product_name": "Lamp", "price": "$10", "image_url": "https://cdn.shop.com/lamp.jpg"}
+
+        with patch('app.services.verification_service.settings.IMAGE_PIPELINE_ENABLED', False):
+            first = authenticated_client.post("/extract/verify-image", json=payload)
+            second = authenticated_client.post("/extract/verify-image", json=payload)
+
+        assert first.json()["source"] == "llm"
+        assert first.headers["X-Token-Budget-Charged"] == str(vision_tokens(1))
+        assert second.json()["source"] == "cache"
+        assert second.headers["X-Token-Budget-Charged"] == "0"
+        assert first.headers["X-Token-Budget-Remaining"] == second.headers["X-Token-Budget-Remaining"]
+
+    @patch('app.services.verification_service.ask_openai_vision', new_callable=AsyncMock)
+    def test_spent_budget_is_refused_before_the_provider(self, mock_vision, authenticated_client):
+        token_quota.charge(TEST_AUTH0_ID, token_quota.status(TEST_AUTH0_ID).remaining)
+        payload = {"product_name": "Lamp", "price": "$10", "image_url": "https://cdn.shop.com/lamp.jpg"}
+
+        response = authenticated_client.post("/extract/verify-image", json=payload)
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.headers["X-Token-Budget-Remaining"] == "0"
+        assert int(response.headers["Retry-After"]) > 0
+        mock_vision.assert_not_called()
+
+    @pytest.mark.parametrize("action,expected", [("trim", status.HTTP_200_OK), ("reject", status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)])
+    def test_oversized_inner_text(self, action, expected, authenticated_client):
+        inner_text = "Red Lamp\n$49.99\n" + "\n".join(f"Footer link {i}" for i in range(20000))
+
+        with patch.object(token_quota, "oversize_action", action), \
+             patch('app.services.extraction_service.parse_inner_text_with_openai') as mock_parse:
+            mock_parse.return_value = {"product_name": "Red Lamp", "price": "$49.99"}
+            response = authenticated_client.post("/extract/extract", json={"inner_text": inner_text})
+
+        assert response.status_code == expected
+        if action == "reject":
+            mock_parse.assert_not_called()
+
+    def test_oversized_batch_item_fails_alone(self, authenticated_client):
+        huge = "Red Lamp\n$49.99\n" + "\n".join(f"Footer link {i}" for i in range(20000))
+
+        with patch.object(token_quota, "oversize_action", "reject"), \
+             patch('app.services.extraction_service.parse_inner_text_with_openai') as mock_parse:
+            mock_parse.return_value = {"product_name": "Desk Lamp", "price": "$25.00"}
+            response = authenticated_client.post("/extract/extract-batch", json={"items": [
+                {"inner_text": huge},
+                {"inner_text": "Some page text about a desk lamp"},
+            ]})
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert (data["succeeded"], data["failed"]) == (1, 1)
+        assert data["results"][0]["index"] == 0 and "too large" in data["results"][0]["error"]
+        assert data["results"][1]["index"] == 1 and data["results"][1]["source"] == "llm"
+        mock_parse.assert_called_once()
+        # Only the item that was extracted is charged
+        assert int(response.headers["X-Token-Budget-Charged"]) == text_prompt_tokens("Some page text about a desk lamp")